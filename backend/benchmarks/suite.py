@@ -0,0 +1,502 @@
+"""Offline end-to-end benchmarks for menu-service and image-service.
+
+Each scenario boots a fresh gRPC server with local stand-ins for Redis,
+Elasticsearch, Vision and Pub/Sub (each with injected latency), drives
+one RPC at a fixed concurrency from an asyncio client, and records:
+
+- throughput and p50/p95/p99 latency as seen by the client
+- CPU time per request and peak RSS of the server process
+
+The two services have clashing top-level module names (server, ocr,
+metrics), so each server runs in its own child process. A fresh process
+per scenario also keeps the peak RSS high-water marks apart.
+
+Scenarios and the payload parameters they sweep:
+
+- process_menu: ProcessMenuImage without the cache (--menu-lines, --image-kb)
+- get_dish: GetDish over dishes from --seed-menus processed menus, after a
+  warm-up pass over all of them
+- search_dishes: SearchDishes over the same index (--menu-lines), after a
+  warm-up pass over the queries
+- stream_upload: StreamImageUpload (--image-kb, --chunks)
+
+Every scenario runs at each --concurrency level.
+
+Usage:
+    python benchmarks/suite.py run --output base.json
+    python benchmarks/suite.py run --scenarios process_menu --concurrency 1 16 --menu-lines 20 200
+    python benchmarks/suite.py compare base.json head.json --threshold 10
+
+compare exits with status 1 when any matched result regressed by more
+than the threshold, so it can gate CI.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import itertools
+import logging
+import platform
+import resource
+import multiprocessing
+
+SERVICES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services')
+
+# Generated stubs for both services live in each service's proto_gen
+sys.path.insert(0, os.path.join(SERVICES, 'menu-service', 'proto_gen'))
+
+import grpc
+import numpy as np
+
+import image_pb2
+import image_pb2_grpc
+import menu_pb2
+import menu_pb2_grpc
+
+RESULTS_VERSION = 1
+
+ADJECTIVES = [
+    'Grilled', 'Roasted', 'Crispy', 'Spicy', 'Smoked', 'Braised', 'Fresh', 'Classic', 'Garlic', 'Honey',
+    'Lemon', 'Wild', 'Sweet', 'Charred', 'Steamed', 'Pan-fried'
+]
+NOUNS = [
+    'Salmon', 'Chicken', 'Pizza', 'Pasta', 'Salad', 'Burger', 'Tacos', 'Risotto', 'Ramen', 'Curry',
+    'Steak', 'Soup', 'Dumplings', 'Tart', 'Cheesecake', 'Lasagna', 'Shrimp', 'Tofu', 'Noodles', 'Pie'
+]
+SIDES = ['with herbs', 'and fries', 'with rice', 'on greens', 'with cream', 'and toast', 'with aioli']
+
+
+def menu_text(lines: int) -> list:
+    """OCR lines for a menu of ``lines`` dishes, as FakeVisionClient returns them."""
+    text = ['MENU']
+    for i, (adjective, noun) in enumerate(itertools.islice(itertools.cycle(itertools.product(ADJECTIVES, NOUNS)), lines)):
+        price = 5 + (i * 37) % 30 + 0.99
+        text.append(f"{adjective} {noun} - {noun.lower()} {SIDES[i % len(SIDES)]} - ${price:.2f}")
+    return text
+
+
+# Servers (child processes)
+
+def _add_service_path(service: str):
+    sys.path.insert(0, os.path.join(SERVICES, service, 'src'))
+
+
+def _usage() -> dict:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {'cpu_s': usage.ru_utime + usage.ru_stime, 'peak_rss_kb': usage.ru_maxrss}
+
+
+def _control(conn, port: int):
+    """Report the port, then answer usage requests until told to stop."""
+    conn.send(port)
+    while True:
+        command = conn.recv()
+        if command == 'usage':
+            conn.send(_usage())
+        elif command == 'stop':
+            break
+
+
+def _serve_menu(config: dict, conn):
+    _add_service_path('menu-service')
+    logging.disable(logging.CRITICAL)
+    from stand_ins.fake_pubsub import FakePublisherClient
+
+    latency = config['latency_ms']
+    text = menu_text(config['menu_lines'])
+
+    if config['server'] == 'aio':
+        from aio_server import AsyncMenuServiceServicer, create_aio_server
+        from processors.async_menu_processor import AsyncMenuProcessor
+        from stand_ins.fake_vision import AsyncFakeVisionClient
+        from stand_ins.memory_elasticsearch import AsyncInMemoryElasticsearch
+        from stand_ins.memory_redis import AsyncInMemoryRedis
+
+        async def run():
+            processor = AsyncMenuProcessor(
+                redis_client=AsyncInMemoryRedis(latency=latency['redis'] / 1000),
+                es_client=AsyncInMemoryElasticsearch(latency=latency['elasticsearch'] / 1000),
+                vision_client=AsyncFakeVisionClient(text, latency=latency['vision'] / 1000),
+                publisher=FakePublisherClient(latency=latency['pubsub'] / 1000)
+            )
+            server, port = create_aio_server(AsyncMenuServiceServicer(processor), '127.0.0.1:0')
+            await server.start()
+            await asyncio.to_thread(_control, conn, port)
+            await server.stop(None)
+            await processor.close()
+
+        asyncio.run(run())
+        return
+
+    from server import MenuServiceServicer, create_server
+    from processors.menu_processor import MenuProcessor
+    from stand_ins.fake_vision import FakeVisionClient
+    from stand_ins.memory_elasticsearch import InMemoryElasticsearch
+    from stand_ins.memory_redis import InMemoryRedis
+
+    publisher = FakePublisherClient(latency=latency['pubsub'] / 1000)
+    processor = MenuProcessor(
+        redis_client=InMemoryRedis(latency=latency['redis'] / 1000),
+        es_client=InMemoryElasticsearch(latency=latency['elasticsearch'] / 1000),
+        vision_client=FakeVisionClient(text, latency=latency['vision'] / 1000),
+        publisher=publisher
+    )
+    server, port = create_server(MenuServiceServicer(processor), '127.0.0.1:0')
+    server.start()
+    _control(conn, port)
+    server.stop(None)
+    processor.shutdown()
+    publisher.stop()
+
+
+def _serve_image(config: dict, conn):
+    _add_service_path('image-service')
+    logging.disable(logging.CRITICAL)
+    from concurrent import futures
+    import server
+
+    grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    servicer = server.ImageServiceServicer()
+    image_pb2_grpc.add_ImageServiceServicer_to_server(servicer, grpc_server)
+    port = grpc_server.add_insecure_port('127.0.0.1:0')
+    grpc_server.start()
+    _control(conn, port)
+    grpc_server.stop(None)
+    servicer.ocr_engine.close()
+
+
+class Server:
+    """A service in a spawned child process (the parent holds gRPC channels,
+    which do not survive fork)."""
+
+    def __init__(self, target, config: dict):
+        spawn = multiprocessing.get_context('spawn')
+        self.conn, child = spawn.Pipe()
+        self.process = spawn.Process(target=target, args=(config, child), daemon=True)
+        self.process.start()
+        self.port = self.conn.recv()
+
+    def usage(self) -> dict:
+        self.conn.send('usage')
+        return self.conn.recv()
+
+    def stop(self):
+        try:
+            self.conn.send('stop')
+            self.process.join(timeout=30)
+        finally:
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+
+
+# Load generation
+
+async def drive(call, concurrency: int, total: int) -> dict:
+    """Issue ``total`` calls (``call(i)`` returns an awaitable) with
+    ``concurrency`` in flight; returns latencies and the error count."""
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                await call(i)
+                latencies.append(time.perf_counter() - start)
+            except grpc.aio.AioRpcError:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {'latencies': latencies, 'errors': errors, 'elapsed': time.perf_counter() - start}
+
+
+async def seed_menus(stub, count: int) -> list:
+    """Process ``count`` menus and return the dish ids."""
+    dish_ids = []
+    for i in range(count):
+        response = await stub.ProcessMenuImage(menu_pb2.MenuImageRequest(
+            image_data=f"seed-{i}".encode(),
+            options=menu_pb2.ProcessingOptions(extract_prices=True, use_cache=False)
+        ), timeout=120)
+        dish_ids.extend(dish.dish_id for dish in response.dishes)
+    return dish_ids
+
+
+def image_payload(image_kb: int, index: int) -> bytes:
+    """Incompressible bytes, distinct per request."""
+    return index.to_bytes(8, 'big') + os.urandom(max(0, image_kb * 1024 - 8))
+
+
+async def menu_workload(scenario: str, params: dict, args, channel) -> tuple:
+    """(call, warm-up calls) for a menu-service scenario."""
+    stub = menu_pb2_grpc.MenuServiceStub(channel)
+    if scenario == 'process_menu':
+        options = menu_pb2.ProcessingOptions(extract_prices=True, use_cache=False)
+        # Built up front so the client does not spend the server's CPU budget
+        payload = image_payload(params['image_kb'], 0)
+
+        def call(i):
+            return stub.ProcessMenuImage(
+                menu_pb2.MenuImageRequest(image_data=i.to_bytes(8, 'big') + payload[8:], options=options),
+                timeout=120
+            )
+        return call, params['concurrency']
+
+    dish_ids = await seed_menus(stub, args.seed_menus)
+    if not dish_ids:
+        raise RuntimeError('Seeding produced no dishes')
+    if scenario == 'get_dish':
+        requests = [menu_pb2.DishRequest(dish_id=dish_id) for dish_id in dish_ids]
+        # Warm-up touches every dish once, so the measured calls are steady-state cache reads
+        return lambda i: stub.GetDish(requests[i % len(requests)], timeout=30), len(requests)
+
+    queries = [f"{adjective.lower()} {noun.lower()}" for adjective, noun in itertools.product(ADJECTIVES, NOUNS)]
+    requests = [menu_pb2.SearchRequest(query=query, limit=20) for query in queries[:64]]
+    return lambda i: stub.SearchDishes(requests[i % len(requests)], timeout=30), len(requests)
+
+
+async def image_workload(scenario: str, params: dict, args, channel) -> tuple:
+    stub = image_pb2_grpc.ImageServiceStub(channel)
+    payload = image_payload(params['image_kb'], 0)
+    size = -(-len(payload) // params['chunks'])
+    pieces = [payload[offset:offset + size] for offset in range(0, len(payload), size)]
+
+    def chunks(i):
+        for number, piece in enumerate(pieces):
+            yield image_pb2.ImageChunk(chunk=piece, chunk_number=number, upload_id=f"bench-{i}")
+
+    # Failed uploads set a status code, which drive() counts as an error
+    return lambda i: stub.StreamImageUpload(chunks(i), timeout=120), params['concurrency']
+
+
+class Scenario:
+    def __init__(self, service: str, sweeps: tuple):
+        self.service = service
+        self.sweeps = sweeps
+
+    @property
+    def serve(self):
+        return _serve_menu if self.service == 'menu' else _serve_image
+
+    @property
+    def workload(self):
+        return menu_workload if self.service == 'menu' else image_workload
+
+
+SCENARIOS = {
+    'process_menu': Scenario('menu', ('concurrency', 'menu_lines', 'image_kb')),
+    'get_dish': Scenario('menu', ('concurrency',)),
+    'search_dishes': Scenario('menu', ('concurrency', 'menu_lines')),
+    'stream_upload': Scenario('image', ('concurrency', 'image_kb', 'chunks')),
+}
+
+
+def sweep(scenario: Scenario, args) -> list:
+    """Parameter combinations for a scenario; fixed values fill the rest."""
+    values = {'concurrency': args.concurrency, 'menu_lines': args.menu_lines, 'image_kb': args.image_kb, 'chunks': args.chunks}
+    base = {name: options[0] for name, options in values.items()}
+    return [
+        dict(base, **dict(zip(scenario.sweeps, combination)))
+        for combination in itertools.product(*(values[name] for name in scenario.sweeps))
+    ]
+
+
+async def measure(name: str, scenario: Scenario, params: dict, args, server: Server) -> dict:
+    async with grpc.aio.insecure_channel(f"127.0.0.1:{server.port}") as channel:
+        call, warm_up = await scenario.workload(name, params, args, channel)
+        # Warm up connections, caches and lazily built state
+        await drive(call, params['concurrency'], warm_up)
+        before = server.usage()
+        result = await drive(call, params['concurrency'], args.requests)
+        after = server.usage()
+
+    latencies_ms = np.array(result['latencies']) * 1000
+    completed = len(latencies_ms)
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if completed else (None, None, None)
+    return {
+        'scenario': name,
+        'service': scenario.service,
+        'params': {key: params[key] for key in scenario.sweeps},
+        'requests': args.requests,
+        'errors': result['errors'],
+        'throughput_rps': round(completed / result['elapsed'], 2),
+        'latency_ms': {
+            'p50': _round(p50),
+            'p95': _round(p95),
+            'p99': _round(p99),
+            'mean': _round(latencies_ms.mean()) if completed else None
+        },
+        'cpu_ms_per_request': _round((after['cpu_s'] - before['cpu_s']) * 1000 / completed) if completed else None,
+        # ru_maxrss is KiB on Linux
+        'peak_rss_mb': round(after['peak_rss_kb'] / 1024, 1)
+    }
+
+
+def run(args) -> int:
+    config = {
+        'server': args.server,
+        'latency_ms': {
+            'redis': args.redis_latency_ms,
+            'elasticsearch': args.es_latency_ms,
+            'vision': args.vision_latency_ms,
+            'pubsub': args.pubsub_latency_ms
+        }
+    }
+    results = []
+    for name in args.scenarios:
+        scenario = SCENARIOS[name]
+        for params in sweep(scenario, args):
+            server = Server(scenario.serve, dict(config, menu_lines=params['menu_lines']))
+            try:
+                result = asyncio.run(measure(name, scenario, params, args, server))
+            finally:
+                server.stop()
+            results.append(result)
+            latency = result['latency_ms']
+            print(
+                f"{name:14s} {json.dumps(result['params']):45s} "
+                f"rps={result['throughput_rps']:8.1f} p50={latency['p50']} p95={latency['p95']} "
+                f"p99={latency['p99']} ms cpu={result['cpu_ms_per_request']} ms/req "
+                f"rss={result['peak_rss_mb']} MB errors={result['errors']}",
+                file=sys.stderr
+            )
+
+    document = {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'config': dict(config, requests=args.requests, seed_menus=args.seed_menus),
+        'results': results
+    }
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+# Comparison
+
+# (path into a result, True if larger is worse)
+COMPARED = [
+    (('throughput_rps',), False),
+    (('latency_ms', 'p50'), True),
+    (('latency_ms', 'p95'), True),
+    (('latency_ms', 'p99'), True),
+    (('cpu_ms_per_request',), True),
+    (('peak_rss_mb',), True),
+]
+
+
+def _key(result: dict) -> tuple:
+    return result['scenario'], tuple(sorted(result['params'].items()))
+
+
+def _lookup(result: dict, path: tuple):
+    value = result
+    for part in path:
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare_results(base: dict, head: dict, threshold: float, min_delta_ms: float) -> tuple:
+    """Rows of (scenario, params, metric, base, head, change %, regressed)
+    for results present in both runs, and the number of regressions.
+
+    A metric regresses when it is more than ``threshold`` percent worse.
+    Latency and CPU changes smaller than ``min_delta_ms`` are ignored, so
+    sub-millisecond jitter on fast RPCs is not flagged.
+    """
+    if base.get('version') != head.get('version'):
+        raise ValueError(f"Result versions differ: {base.get('version')} vs {head.get('version')}")
+    head_results = {_key(result): result for result in head['results']}
+    rows = []
+    regressions = 0
+    for old in base['results']:
+        new = head_results.get(_key(old))
+        if new is None:
+            continue
+        for path, larger_is_worse in COMPARED:
+            before, after = _lookup(old, path), _lookup(new, path)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            worse = change > threshold if larger_is_worse else change < -threshold
+            if worse and path[0] in ('latency_ms', 'cpu_ms_per_request') and abs(after - before) < min_delta_ms:
+                worse = False
+            regressions += worse
+            rows.append((old['scenario'], old['params'], '.'.join(path), before, after, change, worse))
+        if new['errors'] > old['errors']:
+            regressions += 1
+            rows.append((old['scenario'], old['params'], 'errors', old['errors'], new['errors'], 0.0, True))
+    return rows, regressions
+
+
+def compare(args) -> int:
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    if base.get('config') != head.get('config'):
+        print("warning: the runs used different configurations", file=sys.stderr)
+
+    rows, regressions = compare_results(base, head, args.threshold, args.min_delta_ms)
+    for scenario, params, metric, before, after, change, worse in rows:
+        print(
+            f"{'REGRESSION' if worse else '':10s} {scenario:14s} {json.dumps(params):45s} "
+            f"{metric:18s} {before:>10} -> {after:>10} ({change:+.1f}%)"
+        )
+    unmatched = len(head['results']) - len({_key(result) for result in base['results']} & {_key(result) for result in head['results']})
+    print(f"{regressions} regression(s) over {args.threshold:g}% ({unmatched} head result(s) without a baseline)")
+    return 1 if regressions else 0
+
+
+def _round(value):
+    return None if value is None else round(float(value), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run scenarios and write results as JSON')
+    run_parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    run_parser.add_argument('--server', choices=['sync', 'aio'], default='sync', help='menu-service server flavour')
+    run_parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 16])
+    run_parser.add_argument('--requests', type=int, default=200, help='Measured requests per result')
+    run_parser.add_argument('--menu-lines', nargs='+', type=int, default=[20, 200], help='Dishes per OCR result')
+    run_parser.add_argument('--image-kb', nargs='+', type=int, default=[256], help='Image size')
+    run_parser.add_argument('--chunks', nargs='+', type=int, default=[16], help='Chunks per upload')
+    run_parser.add_argument('--seed-menus', type=int, default=20, help='Menus indexed before get_dish and search_dishes')
+    run_parser.add_argument('--redis-latency-ms', type=float, default=0.5)
+    run_parser.add_argument('--es-latency-ms', type=float, default=5)
+    run_parser.add_argument('--vision-latency-ms', type=float, default=50)
+    run_parser.add_argument('--pubsub-latency-ms', type=float, default=2)
+    run_parser.add_argument('--output', help='Write JSON here instead of stdout')
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help='Diff two result files and flag regressions')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--threshold', type=float, default=10, help='Percent change counted as a regression')
+    compare_parser.add_argument('--min-delta-ms', type=float, default=0.5, help='Ignore smaller latency/CPU changes')
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == '__main__':
+    main()
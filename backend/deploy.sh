@@ -35,17 +35,15 @@ cd ../..
 
 # Menu Service
 echo "Building Menu Service..."
-cd services/menu-service
-docker build -t gcr.io/$PROJECT_ID/menu-scanner-menu-service:latest .
+# Built from backend/ to include shared/ and proto/
+docker build -f services/menu-service/Dockerfile -t gcr.io/$PROJECT_ID/menu-scanner-menu-service:latest .
 docker push gcr.io/$PROJECT_ID/menu-scanner-menu-service:latest
-cd ../..
 
 # Image Service
 echo "Building Image Service..."
-cd services/image-service
-docker build -t gcr.io/$PROJECT_ID/menu-scanner-image-service:latest .
+# Built from backend/ to include shared/ and proto/
+docker build -f services/image-service/Dockerfile -t gcr.io/$PROJECT_ID/menu-scanner-image-service:latest .
 docker push gcr.io/$PROJECT_ID/menu-scanner-image-service:latest
-cd ../..
 
 # Update Kubernetes manifests with project ID
 echo "Updating Kubernetes manifests..."
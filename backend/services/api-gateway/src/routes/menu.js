@@ -1,8 +1,8 @@
 const express = require('express');
 const multer = require('multer');
+const grpc = require('@grpc/grpc-js');
 const router = express.Router();
 const { getMenuServiceClient } = require('../grpc/clients');
-const { getRedisClient } = require('../config/cache');
 const logger = require('../config/logger');
 
 // Configure multer for file upload
@@ -12,10 +12,11 @@ const upload = multer({
     fileSize: 10 * 1024 * 1024 // 10MB limit
   },
   fileFilter: (req, file, cb) => {
-    if (file.mimetype.startsWith('image/')) {
+    // Multi-page PDF menus are split into pages by the menu service
+    if (file.mimetype.startsWith('image/') || file.mimetype === 'application/pdf') {
       cb(null, true);
     } else {
-      cb(new Error('Only image files are allowed'), false);
+      cb(new Error('Only image and PDF files are allowed'), false);
     }
   }
 });
@@ -23,9 +24,11 @@ const upload = multer({
 // Upload and process menu image
 router.post('/upload', upload.single('image'), async (req, res) => {
   try {
-    if (!req.file) {
+    // Either an uploaded file or the URL of an image the menu service fetches
+    const imageUrl = req.body.image_url;
+    if (!req.file && !imageUrl) {
       return res.status(400).json({
-        error: 'No image file provided',
+        error: 'No image file or image_url provided',
         code: 'MISSING_IMAGE'
       });
     }
@@ -35,14 +38,17 @@ router.post('/upload', upload.single('image'), async (req, res) => {
 
     // Prepare gRPC request
     const grpcRequest = {
-      image_data: req.file.buffer,
-      format: req.file.mimetype.split('/')[1],
+      ...(req.file
+        ? { image_data: req.file.buffer, format: req.file.mimetype.split('/')[1] }
+        : { image_url: imageUrl }),
       options: {
         extract_prices: options.extract_prices !== false,
         extract_descriptions: options.extract_descriptions !== false,
         extract_ingredients: options.extract_ingredients || false,
         language: options.language || 'en',
-        use_cache: options.use_cache !== false
+        use_cache: options.use_cache !== false,
+        async_processing: options.async_processing === true,
+        priority: parseInt(options.priority, 10) || 0
       }
     };
 
@@ -50,6 +56,24 @@ router.post('/upload', upload.single('image'), async (req, res) => {
     menuServiceClient.ProcessMenuImage(grpcRequest, (error, response) => {
       if (error) {
         logger.error('gRPC error:', error);
+        if (error.code === grpc.status.RESOURCE_EXHAUSTED) {
+          return res.status(503).set('Retry-After', '5').json({
+            error: 'Menu processing queue is full',
+            code: 'QUEUE_FULL'
+          });
+        }
+        if (error.code === grpc.status.INVALID_ARGUMENT) {
+          return res.status(400).json({
+            error: error.details,
+            code: 'INVALID_IMAGE'
+          });
+        }
+        if (error.code === grpc.status.FAILED_PRECONDITION) {
+          return res.status(422).json({
+            error: error.details,
+            code: 'IMAGE_FETCH_FAILED'
+          });
+        }
         return res.status(500).json({
           error: 'Failed to process menu image',
           code: 'PROCESSING_ERROR',
@@ -57,7 +81,9 @@ router.post('/upload', upload.single('image'), async (req, res) => {
         });
       }
 
-      res.json(response);
+      // Async submissions are accepted now and polled at GET /:menuId
+      const accepted = response.status && response.status.status === 'PROCESSING';
+      res.status(accepted ? 202 : 200).json(response);
     });
   } catch (error) {
     logger.error('Upload error:', error);
@@ -68,24 +94,29 @@ router.post('/upload', upload.single('image'), async (req, res) => {
   }
 });
 
-// Get menu by ID
+// Get menu by ID (status, then result, of an async submission)
 router.get('/:menuId', async (req, res) => {
   try {
     const { menuId } = req.params;
-    const redisClient = getRedisClient();
+    const menuServiceClient = getMenuServiceClient();
 
-    // Try to get from cache first
-    const cached = await redisClient.get(`menu:${menuId}`);
-    if (cached) {
-      logger.info(`Cache hit for menu: ${menuId}`);
-      return res.json(JSON.parse(cached));
-    }
+    menuServiceClient.GetMenuStatus({ menu_id: menuId }, (error, response) => {
+      if (error) {
+        if (error.code === grpc.status.NOT_FOUND) {
+          return res.status(404).json({
+            error: 'Menu not found',
+            code: 'NOT_FOUND'
+          });
+        }
+        logger.error('gRPC error:', error);
+        return res.status(500).json({
+          error: 'Failed to get menu',
+          code: 'INTERNAL_ERROR',
+          details: error.message
+        });
+      }
 
-    // If not in cache, retrieve from service
-    // This is a placeholder - implement actual retrieval logic
-    res.status(404).json({
-      error: 'Menu not found',
-      code: 'NOT_FOUND'
+      res.json(response);
     });
   } catch (error) {
     logger.error('Get menu error:', error);
@@ -0,0 +1,97 @@
+"""Benchmark OCR preprocessing over a corpus of phone photos.
+
+Reports per-stage time and output size (pixel bytes, encoded bytes for the
+final stage) averaged over the corpus, plus input vs output bytes. Without
+--corpus a synthetic set of 12 MP JPEG "phone photos" is generated, with
+EXIF rotation and a few degrees of skew.
+
+Usage:
+    python benchmarks/bench_preprocess.py [--corpus DIR] [--target 2048]
+"""
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import logging
+import resource
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from imaging.metadata import read_metadata
+from imaging.preprocess import preprocess_for_ocr
+
+logging.disable(logging.CRITICAL)
+
+
+def synthetic_corpus(count: int):
+    rng = random.Random(3)
+    for i in range(count):
+        page = Image.new('L', (4032, 3024), color=rng.randint(200, 245))
+        draw = ImageDraw.Draw(page)
+        for y in range(200, 2800, rng.randint(90, 140)):
+            draw.rectangle([300, y, rng.randint(1500, 3000), y + 28], fill=rng.randint(0, 60))
+            draw.rectangle([3300, y, 3700, y + 28], fill=rng.randint(0, 60))
+        page = page.rotate(rng.uniform(-5, 5), fillcolor=220).convert('RGB')
+
+        exif = Image.Exif()
+        exif[0x0112] = rng.choice([1, 6, 8])
+        buffer = io.BytesIO()
+        page.save(buffer, format='JPEG', quality=rng.randint(80, 95), exif=exif)
+        yield f"synthetic-{i}.jpg", buffer.getvalue()
+
+
+def file_corpus(directory: str):
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(('.jpg', '.jpeg', '.png', '.webp', '.heic')):
+            with open(os.path.join(directory, name), 'rb') as f:
+                yield name, f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='directory of photos (default: synthetic)')
+    parser.add_argument('--count', type=int, default=10, help='synthetic photo count')
+    parser.add_argument('--target', type=int, default=2048, help='OCR target long side')
+    args = parser.parse_args()
+
+    corpus = file_corpus(args.corpus) if args.corpus else synthetic_corpus(args.count)
+
+    stage_ms = {}
+    stage_bytes = {}
+    header_ms = []
+    input_bytes = output_bytes = photos = 0
+
+    for name, data in corpus:
+        start = time.perf_counter()
+        read_metadata(data)
+        header_ms.append((time.perf_counter() - start) * 1000)
+
+        result = preprocess_for_ocr(data, target_long_side=args.target)
+        for stage, ms in result.stage_ms.items():
+            stage_ms.setdefault(stage, []).append(ms)
+            stage_bytes.setdefault(stage, []).append(result.stage_bytes[stage])
+        input_bytes += len(data)
+        output_bytes += len(result.image_data)
+        photos += 1
+
+    print(f"photos: {photos}, header read p50 {np.percentile(header_ms, 50):.2f} ms")
+    print(f"{'stage':<10} {'mean ms':>9} {'p95 ms':>9} {'mean output KB':>15}")
+    for stage in stage_ms:
+        print(
+            f"{stage:<10} {np.mean(stage_ms[stage]):9.1f} {np.percentile(stage_ms[stage], 95):9.1f} "
+            f"{np.mean(stage_bytes[stage]) / 1024:15.0f}"
+        )
+    print(
+        f"bytes sent to OCR: {input_bytes / photos / 1024:.0f} KB -> "
+        f"{output_bytes / photos / 1024:.0f} KB per photo"
+    )
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Measure peak RSS of concurrent StreamImageUpload calls.
+
+Compares the previous list-and-join implementation ("before") with the
+UploadBuffer path ("after"). Each variant runs in its own process so the
+peak RSS high-water marks do not mix.
+
+Usage:
+    python benchmarks/bench_upload_memory.py --uploads 100 --size-mb 20
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import resource
+import threading
+import multiprocessing
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+CHUNK_SIZE = 64 * 1024
+
+
+def chunk_stream(upload_id: str, size: int):
+    import image_pb2
+
+    payload = os.urandom(CHUNK_SIZE)
+    for number in range(size // CHUNK_SIZE):
+        yield image_pb2.ImageChunk(chunk=payload, chunk_number=number, upload_id=upload_id)
+
+
+def legacy_upload(request_iterator):
+    """The pre-UploadBuffer implementation: collect chunks, then join."""
+    chunks = []
+    for chunk in request_iterator:
+        chunks.append(chunk.chunk)
+    return len(b''.join(chunks))
+
+
+def run_variant(variant: str, uploads: int, size: int, conn):
+    logging.disable(logging.CRITICAL)
+    import server
+
+    servicer = server.ImageServiceServicer()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def upload(index: int):
+        stream = chunk_stream(f"bench-{index}", size)
+        if variant == 'before':
+            legacy_upload(stream)
+        else:
+            servicer.StreamImageUpload(stream, mock.MagicMock())
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=upload, args=(i,)) for i in range(uploads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((baseline, peak, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', type=int, default=100)
+    parser.add_argument('--size-mb', type=int, default=20)
+    args = parser.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    for variant in ('before', 'after'):
+        parent, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=run_variant, args=(variant, args.uploads, size, child))
+        process.start()
+        baseline, peak, elapsed = parent.recv()
+        process.join()
+        # ru_maxrss is reported in KiB on Linux
+        print(
+            f"{variant:>6}: {args.uploads} x {args.size_mb} MB uploads, "
+            f"peak RSS {peak / 1024:.0f} MB (+{(peak - baseline) / 1024:.0f} MB), "
+            f"{elapsed:.1f} s"
+        )
+
+
+if __name__ == '__main__':
+    main()
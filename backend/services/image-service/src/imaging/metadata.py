@@ -0,0 +1,30 @@
+import io
+import logging
+from typing import Optional, Tuple
+
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+
+def read_metadata(image_data: bytes) -> Optional[Tuple[int, int, str]]:
+    """Return (width, height, format) from the image header.
+
+    PIL only parses the header in Image.open(); pixel data is not decoded
+    until it is accessed, so this is cheap even for large photos. Width and
+    height are reported as displayed, i.e. after EXIF orientation.
+    """
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            width, height = image.size
+            image_format = (image.format or '').lower()
+            orientation = image.getexif().get(0x0112, 1)
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Could not read image header: {e}")
+        return None
+
+    # Orientations 5-8 rotate the image by 90 degrees
+    if orientation in (5, 6, 7, 8):
+        width, height = height, width
+
+    return width, height, image_format
@@ -0,0 +1,141 @@
+import io
+import os
+import time
+import logging
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+class PreprocessResult:
+    """Output of preprocess_for_ocr with per-stage measurements."""
+
+    def __init__(self):
+        self.image_data = b''
+        self.width = 0
+        self.height = 0
+        self.skew_angle = 0.0
+        self.stage_ms = {}
+        self.stage_bytes = {}
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.stage_ms.values())
+
+    def unrotate_box(self, x: float, y: float, width: float, height: float) -> Tuple[float, float, float, float]:
+        """Map a box found in the prepared image back to before deskewing:
+        its corners rotated back about the centre, and the box around them
+        (clipped to the image)."""
+        if not self.skew_angle:
+            return x, y, width, height
+        matrix = cv2.invertAffineTransform(
+            cv2.getRotationMatrix2D((self.width / 2, self.height / 2), self.skew_angle, 1.0)
+        )
+        corners = np.array([[x, y], [x + width, y], [x + width, y + height], [x, y + height]], dtype=np.float64)
+        mapped = corners @ matrix[:, :2].T + matrix[:, 2]
+        left, top = np.maximum(mapped.min(axis=0), 0)
+        right, bottom = np.minimum(mapped.max(axis=0), (self.width, self.height))
+        return float(left), float(top), float(max(right - left, 0)), float(max(bottom - top, 0))
+
+
+def preprocess_for_ocr(
+    image_data: bytes,
+    target_long_side: Optional[int] = None,
+    deskew: bool = True,
+    max_skew_degrees: float = 15.0
+) -> PreprocessResult:
+    """Prepare a menu photo for OCR.
+
+    Stages: decode (JPEG draft mode decodes straight to grayscale at a
+    reduced scale), EXIF orientation fix, grayscale, downscale to
+    target_long_side, deskew, and PNG encode. Each stage's wall time and the size
+    of its output (pixel bytes, or encoded bytes for the last stage) are
+    recorded on the result.
+    """
+    target_long_side = target_long_side or int(os.getenv('OCR_TARGET_LONG_SIDE', 2048))
+    result = PreprocessResult()
+
+    def stage(name: str, start: float, image):
+        result.stage_ms[name] = (time.perf_counter() - start) * 1000
+        if isinstance(image, np.ndarray):
+            result.stage_bytes[name] = image.nbytes
+        else:
+            result.stage_bytes[name] = image.width * image.height * len(image.getbands())
+
+    # Decode. draft() picks a JPEG DCT scale of 1/2, 1/4 or 1/8 that still
+    # covers the requested size; other formats ignore it.
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(image_data))
+    image.draft('L', (target_long_side, target_long_side))
+    image.load()
+    stage('decode', start, image)
+
+    start = time.perf_counter()
+    image = ImageOps.exif_transpose(image)
+    stage('orient', start, image)
+
+    start = time.perf_counter()
+    gray = np.asarray(image.convert('L'))
+    stage('grayscale', start, gray)
+
+    start = time.perf_counter()
+    scale = target_long_side / max(gray.shape)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    stage('downscale', start, gray)
+
+    start = time.perf_counter()
+    if deskew:
+        angle = estimate_skew(gray)
+        if 0.3 <= abs(angle) <= max_skew_degrees:
+            gray = rotate(gray, angle)
+            result.skew_angle = angle
+    stage('deskew', start, gray)
+
+    start = time.perf_counter()
+    ok, encoded = cv2.imencode('.png', gray, [cv2.IMWRITE_PNG_COMPRESSION, 3])
+    if not ok:
+        raise ValueError("Could not encode preprocessed image")
+    result.image_data = encoded.tobytes()
+    result.stage_ms['encode'] = (time.perf_counter() - start) * 1000
+    result.stage_bytes['encode'] = len(result.image_data)
+
+    result.height, result.width = gray.shape
+    return result
+
+
+def estimate_skew(gray: np.ndarray, max_side: int = 1024) -> float:
+    """Estimate text skew in degrees from the minimum-area box around ink."""
+    scale = max_side / max(gray.shape)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    # Join characters into line blobs so the box follows text lines
+    binary = cv2.dilate(binary, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 3)))
+    coords = cv2.findNonZero(binary)
+    if coords is None:
+        return 0.0
+
+    angle = cv2.minAreaRect(coords)[-1]
+    # OpenCV >= 4.5 reports angles in (0, 90]; map to (-45, 45]
+    if angle > 45:
+        angle -= 90
+    return float(angle)
+
+
+def rotate(gray: np.ndarray, angle: float) -> np.ndarray:
+    """Rotate about the centre, padding with the nearest border pixels."""
+    height, width = gray.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        gray,
+        matrix,
+        (width, height),
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_REPLICATE
+    )
@@ -1,14 +1,21 @@
 import os
 import sys
+import time
 import logging
 from concurrent import futures
 import grpc
+from google.cloud import vision
 
 # Add proto_gen to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
 
 import image_pb2
 import image_pb2_grpc
+from imaging.metadata import read_metadata
+from imaging.preprocess import preprocess_for_ocr
+from scanner_common.ocr.router import create_ocr_engine
+from uploads.upload_buffer import UploadTooLarge
+from uploads.upload_registry import UploadRegistry
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,22 +28,58 @@ class ImageServiceServicer(image_pb2_grpc.ImageServiceServicer):
     """Implements the ImageService gRPC service."""
     
     def __init__(self):
+        self.uploads = UploadRegistry()
+        self.preprocess_enabled = os.getenv('IMAGE_PREPROCESS_ENABLED', 'true').lower() == 'true'
+        
+        try:
+            vision_client = vision.ImageAnnotatorClient()
+        except Exception as e:
+            logger.warning(f"Vision client not initialized: {e}")
+            vision_client = None
+        self.ocr_engine = create_ocr_engine(vision_client)
         logger.info("ImageService initialized")
     
     def AnalyzeImage(self, request, context):
         """Analyze an image."""
+        start_time = time.time()
         try:
             logger.info("Analyzing image")
             
-            # Placeholder implementation
+            # Dimensions and format come from the header; no full decode
+            metadata = read_metadata(request.image_data) if request.image_data else None
+            if request.image_data and metadata is None:
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                context.set_details("Unsupported or corrupt image")
+                return image_pb2.ImageAnalysisResponse()
+            width, height, image_format = metadata or (0, 0, '')
+            
+            # Text detection: OCR of the prepared image, boxes in the uploaded image
+            text_annotations = []
+            if request.image_data and request.options.detect_text:
+                language = _language(request.options)
+                result, to_box = self._recognize(request.image_data, width, language)
+                if result is None:
+                    logger.warning("Text detection requested but no OCR engine is available")
+                else:
+                    text_annotations = [
+                        image_pb2.TextAnnotation(
+                            text=block.text,
+                            bounding_box=to_box(block),
+                            confidence=block.confidence,
+                            language=language
+                        )
+                        for block in result.blocks
+                    ]
+            
             response = image_pb2.ImageAnalysisResponse(
                 image_id="img_" + os.urandom(8).hex(),
+                text_annotations=text_annotations,
                 metadata=image_pb2.ImageMetadata(
-                    width=800,
-                    height=600,
-                    format="jpeg",
+                    width=width,
+                    height=height,
+                    format=image_format,
                     size_bytes=len(request.image_data) if request.image_data else 0,
-                    processing_time_ms=100
+                    processing_time_ms=int((time.time() - start_time) * 1000)
                 )
             )
             
@@ -50,14 +93,40 @@ class ImageServiceServicer(image_pb2_grpc.ImageServiceServicer):
     
     def ExtractText(self, request, context):
         """Extract text from image."""
+        start_time = time.time()
         try:
             logger.info("Extracting text from image")
             
-            # Placeholder implementation
+            metadata = read_metadata(request.image_data) if request.image_data else None
+            if metadata is None:
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                context.set_details("Unsupported or corrupt image")
+                return image_pb2.TextExtractionResponse()
+            width, height, image_format = metadata
+            
+            result, to_box = self._recognize(request.image_data, width, _language(request.options))
+            if result is None:
+                context.set_code(grpc.StatusCode.UNAVAILABLE)
+                context.set_details("No OCR engine available")
+                return image_pb2.TextExtractionResponse()
+            
             response = image_pb2.TextExtractionResponse(
-                full_text="Sample extracted text",
+                text_blocks=[
+                    image_pb2.TextBlock(
+                        text=block.text,
+                        bounding_box=to_box(block),
+                        confidence=block.confidence,
+                        page=1
+                    )
+                    for block in result.blocks
+                ],
+                full_text=result.full_text,
                 metadata=image_pb2.ImageMetadata(
-                    processing_time_ms=150
+                    width=width,
+                    height=height,
+                    format=image_format,
+                    size_bytes=len(request.image_data),
+                    processing_time_ms=int((time.time() - start_time) * 1000)
                 )
             )
             
@@ -69,6 +138,46 @@ class ImageServiceServicer(image_pb2_grpc.ImageServiceServicer):
             context.set_details(str(e))
             return image_pb2.TextExtractionResponse()
     
+    def _recognize(self, image_data: bytes, width: int, language: str):
+        """OCR an uploaded image, preprocessed first when enabled.
+        
+        Returns the OCR result (None without an engine) and a function that
+        maps a result box to a BoundingBox in the uploaded image's
+        (EXIF-oriented) coordinates.
+        """
+        prepared = None
+        scale = 1.0
+        if self.preprocess_enabled:
+            prepared = preprocess_for_ocr(image_data)
+            logger.info(
+                f"Preprocessed {len(image_data)} -> {len(prepared.image_data)} bytes "
+                f"({prepared.width}x{prepared.height}, skew {prepared.skew_angle:.1f}): "
+                + ", ".join(f"{name} {ms:.0f}ms" for name, ms in prepared.stage_ms.items())
+            )
+            image_data = prepared.image_data
+            scale = width / prepared.width if prepared.width else 1.0
+        
+        result = self.ocr_engine.extract(image_data, language)
+        if result is not None:
+            logger.info(
+                f"{result.engine} OCR: {len(result.words)} words, "
+                f"confidence {result.confidence:.2f}, {result.latency_ms:.0f}ms"
+            )
+        
+        def to_box(region) -> image_pb2.BoundingBox:
+            x, y, box_width, box_height = region.x, region.y, region.width, region.height
+            if prepared is not None:
+                # Undo the deskew rotation before scaling back up
+                x, y, box_width, box_height = prepared.unrotate_box(x, y, box_width, box_height)
+            return image_pb2.BoundingBox(
+                x=int(x * scale),
+                y=int(y * scale),
+                width=int(box_width * scale),
+                height=int(box_height * scale)
+            )
+        
+        return result, to_box
+    
     def DetectObjects(self, request, context):
         """Detect objects in image."""
         try:
@@ -91,35 +200,86 @@ class ImageServiceServicer(image_pb2_grpc.ImageServiceServicer):
             return image_pb2.ObjectDetectionResponse()
     
     def StreamImageUpload(self, request_iterator, context):
-        """Handle streaming image upload."""
+        """Handle streaming image upload.
+        
+        Chunks are written straight into an UploadBuffer (spilling to disk
+        for large images) and must arrive in order. If the stream breaks
+        off, a new stream with the same upload_id resumes from the next
+        expected chunk; chunks the server already has are skipped.
+        """
+        session = None
         try:
             logger.info("Starting streaming image upload")
             
-            chunks = []
-            upload_id = None
-            
             for chunk in request_iterator:
-                upload_id = chunk.upload_id
-                chunks.append(chunk.chunk)
-                logger.info(f"Received chunk {chunk.chunk_number}")
+                if session is None:
+                    upload_id = chunk.upload_id or "upload_" + os.urandom(8).hex()
+                    session = self.uploads.acquire(upload_id)
+                    if session is None:
+                        context.set_code(grpc.StatusCode.ALREADY_EXISTS)
+                        context.set_details(f"Upload {upload_id} is already in progress")
+                        return image_pb2.UploadResponse(success=False, message="Upload in progress")
+                    if session.next_chunk is None:
+                        session.next_chunk = chunk.chunk_number
+                    elif session.chunks_received:
+                        logger.info(f"Resuming upload {upload_id} at chunk {session.next_chunk}")
+                
+                if chunk.chunk_number < session.next_chunk:
+                    # Already received before a reconnect
+                    continue
+                if chunk.chunk_number > session.next_chunk:
+                    message = f"Expected chunk {session.next_chunk}, got {chunk.chunk_number}"
+                    context.set_code(grpc.StatusCode.OUT_OF_RANGE)
+                    context.set_details(message)
+                    return image_pb2.UploadResponse(success=False, message=message)
+                
+                session.buffer.write(chunk.chunk)
+                session.next_chunk += 1
+                session.chunks_received += 1
             
-            # Combine chunks
-            full_data = b''.join(chunks)
+            if session is None:
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                context.set_details("Upload stream contained no chunks")
+                return image_pb2.UploadResponse(success=False, message="No chunks received")
+            
+            size = session.buffer.size
+            digest = session.buffer.hexdigest()
+            logger.info(f"Received {session.chunks_received} chunks ({size} bytes) for {session.upload_id}")
             
             response = image_pb2.UploadResponse(
-                image_id="img_" + os.urandom(8).hex(),
-                storage_url=f"gs://menu-scanner-images/{upload_id}",
+                image_id="img_" + digest[:16],
+                storage_url=f"gs://menu-scanner-images/{session.upload_id}",
                 success=True,
-                message=f"Uploaded {len(full_data)} bytes successfully"
+                message=f"Uploaded {size} bytes successfully (sha256 {digest})"
             )
             
+            self.uploads.discard(session)
+            session = None
             return response
             
+        except UploadTooLarge as e:
+            logger.warning(f"Rejected upload: {e}")
+            self.uploads.discard(session)
+            session = None
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details(str(e))
+            return image_pb2.UploadResponse(success=False, message=str(e))
+            
         except Exception as e:
             logger.error(f"Error in streaming upload: {e}")
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(str(e))
             return image_pb2.UploadResponse(success=False, message=str(e))
+        
+        finally:
+            # Keep partial uploads around so the client can resume them
+            if session is not None:
+                self.uploads.release(session)
+
+
+def _language(options: image_pb2.ImageOptions) -> str:
+    """First of the comma-separated ImageOptions.language_hints, if any."""
+    return options.language_hints.split(',')[0].strip()
 
 
 def serve():
@@ -127,8 +287,9 @@ def serve():
     port = os.getenv('GRPC_PORT', '50052')
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
     
+    servicer = ImageServiceServicer()
     image_pb2_grpc.add_ImageServiceServicer_to_server(
-        ImageServiceServicer(), server
+        servicer, server
     )
     
     server.add_insecure_port(f'[::]:{port}')
@@ -141,6 +302,8 @@ def serve():
     except KeyboardInterrupt:
         logger.info("Shutting down...")
         server.stop(0)
+    finally:
+        servicer.ocr_engine.close()
 
 
 if __name__ == '__main__':
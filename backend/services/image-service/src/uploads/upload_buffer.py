@@ -0,0 +1,104 @@
+import os
+import mmap
+import hashlib
+import tempfile
+from typing import Optional
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured maximum size."""
+
+
+class UploadBuffer:
+    """Append-only byte buffer that spills to a temp file past a threshold.
+
+    Small uploads are written into one preallocated ``bytearray`` that
+    grows geometrically. Each chunk is copied in once; a resize copies
+    what was written so far again, and because capacity doubles those
+    copies add up to less than the final size. Once the upload crosses
+    ``spill_threshold`` the bytes written so far are moved to an anonymous
+    temp file and the memory is released. A SHA-256 of the content is
+    computed as bytes arrive.
+    """
+
+    def __init__(
+        self,
+        spill_threshold: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        initial_capacity: int = 256 * 1024,
+        spill_dir: Optional[str] = None
+    ):
+        self.spill_threshold = spill_threshold or int(
+            os.getenv('UPLOAD_SPILL_THRESHOLD', 4 * 1024 * 1024)
+        )
+        self.max_bytes = max_bytes or int(os.getenv('UPLOAD_MAX_BYTES', 50 * 1024 * 1024))
+        self.spill_dir = spill_dir or os.getenv('UPLOAD_SPILL_DIR') or None
+
+        self._memory = bytearray(min(initial_capacity, self.spill_threshold))
+        self._file = None
+        self._size = 0
+        self._hash = hashlib.sha256()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def hexdigest(self) -> str:
+        """SHA-256 of everything written so far."""
+        return self._hash.hexdigest()
+
+    def write(self, data: bytes):
+        """Append a chunk."""
+        length = len(data)
+        if self._size + length > self.max_bytes:
+            raise UploadTooLarge(
+                f"Upload exceeds {self.max_bytes} bytes"
+            )
+
+        self._hash.update(data)
+
+        if self._file is None and self._size + length > self.spill_threshold:
+            self._spill()
+
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._reserve(self._size + length)
+            self._memory[self._size:self._size + length] = data
+
+        self._size += length
+
+    def view(self) -> memoryview:
+        """Read-only view of the content (memory-mapped once spilled)."""
+        if self._file is None:
+            return memoryview(self._memory).toreadonly()[:self._size]
+        if self._size == 0:
+            return memoryview(b'')
+        self._file.flush()
+        return memoryview(mmap.mmap(self._file.fileno(), self._size, access=mmap.ACCESS_READ))
+
+    def close(self):
+        """Release memory and delete any spill file."""
+        self._memory = bytearray()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _reserve(self, needed: int):
+        capacity = len(self._memory)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity = max(capacity * 2, 64 * 1024)
+        grown = bytearray(min(capacity, self.spill_threshold))
+        grown[:self._size] = memoryview(self._memory)[:self._size]
+        self._memory = grown
+
+    def _spill(self):
+        self._file = tempfile.TemporaryFile(dir=self.spill_dir)
+        self._file.write(memoryview(self._memory)[:self._size])
+        self._memory = bytearray()
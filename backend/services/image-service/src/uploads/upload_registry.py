@@ -0,0 +1,78 @@
+import os
+import time
+import logging
+import threading
+from typing import Optional
+
+from uploads.upload_buffer import UploadBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class UploadSession:
+    """State of one upload, kept between streams so it can be resumed."""
+
+    def __init__(self, upload_id: str):
+        self.upload_id = upload_id
+        self.buffer = UploadBuffer()
+        self.next_chunk = None  # set from the first chunk received
+        self.chunks_received = 0
+        self.updated_at = time.monotonic()
+        self.active = False
+
+
+class UploadRegistry:
+    """Tracks in-progress uploads by upload_id.
+
+    A stream that breaks off leaves its session here; a later stream with
+    the same upload_id continues from the next expected chunk. Sessions
+    idle for longer than ``ttl_seconds`` are discarded.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds or float(os.getenv('UPLOAD_RESUME_TTL', 600))
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, upload_id: str) -> Optional[UploadSession]:
+        """Get or create the session for upload_id.
+
+        Returns None if another stream is currently writing to it.
+        """
+        self.expire()
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is None:
+                session = UploadSession(upload_id)
+                self._sessions[upload_id] = session
+            elif session.active:
+                return None
+            session.active = True
+            return session
+
+    def release(self, session: UploadSession):
+        """Detach a stream from its session, keeping it for resume."""
+        with self._lock:
+            session.active = False
+            session.updated_at = time.monotonic()
+
+    def discard(self, session: UploadSession):
+        """Drop a finished or failed session and free its buffer."""
+        with self._lock:
+            if self._sessions.get(session.upload_id) is session:
+                del self._sessions[session.upload_id]
+        session.buffer.close()
+
+    def expire(self):
+        """Discard sessions that have been idle past the TTL."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            stale = [
+                session for session in self._sessions.values()
+                if not session.active and session.updated_at < cutoff
+            ]
+            for session in stale:
+                del self._sessions[session.upload_id]
+        for session in stale:
+            logger.info(f"Discarding stale upload {session.upload_id}")
+            session.buffer.close()
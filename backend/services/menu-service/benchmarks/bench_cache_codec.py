@@ -0,0 +1,119 @@
+"""Cache value size and CPU: the text encodings against CacheCodec.
+
+Builds large synthetic menus (Zipf-distributed words from
+bench_search_engine.py) and reports, per cached entry, the bytes stored in
+Redis and the encode/decode CPU time for:
+
+- ``menu:`` entries: hex-encoded MenuResponse (the format used with
+  ``decode_responses=True``) against framed protobuf bytes, uncompressed
+  and with each compressor that is installed
+- ``dish:`` entries: the Elasticsearch source as JSON, parsed back through
+  _dict_to_dish on every hit, against a framed Dish message
+
+Decode times include building the protobuf message.
+
+Usage:
+    python benchmarks/bench_cache_codec.py [--menus 200] [--dishes-per-menu 150]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+import numpy as np
+
+import menu_pb2
+from bench_search_engine import Corpus
+from cache.codec import CacheCodec, compression_available
+from processors.base import MenuProcessorBase
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+
+def menus(corpus: Corpus, count: int, dishes_per_menu: int) -> list:
+    result = []
+    for m in range(count):
+        response = menu_pb2.MenuResponse(menu_id=f"menu-{m}")
+        response.status.status = menu_pb2.ProcessingStatus.COMPLETED
+        for i in range(dishes_per_menu):
+            response.dishes.append(corpus.dish(m * dishes_per_menu + i))
+        response.metadata.processing_time_ms = 1200
+        response.metadata.total_dishes = dishes_per_menu
+        result.append(response)
+    return result
+
+
+def measure(encode, decode, items) -> tuple:
+    """(mean stored bytes, mean encode us, mean decode us) per item."""
+    start = time.perf_counter()
+    values = [encode(item) for item in items]
+    encode_us = (time.perf_counter() - start) / len(items) * 1e6
+    start = time.perf_counter()
+    for value in values:
+        decode(value)
+    decode_us = (time.perf_counter() - start) / len(items) * 1e6
+    return float(np.mean([len(value) for value in values])), encode_us, decode_us
+
+
+def report(label: str, result: tuple, baseline: tuple):
+    size, encode_us, decode_us = result
+    print(
+        f"  {label:22s} {size:10,.0f} B ({size / baseline[0]:5.2f}x)"
+        f"  encode {encode_us:8.1f} us  decode {decode_us:8.1f} us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--menus', type=int, default=200)
+    parser.add_argument('--dishes-per-menu', type=int, default=150)
+    args = parser.parse_args()
+
+    corpus = Corpus(seed=7)
+    responses = menus(corpus, args.menus, args.dishes_per_menu)
+    codecs = [('protobuf', CacheCodec(compression='none'))] + [
+        (f"protobuf + {name}", CacheCodec(compression=name))
+        for name in ('lz4', 'zstd', 'zlib')
+        if compression_available(name)
+    ]
+
+    def hex_decode(value):
+        response = menu_pb2.MenuResponse()
+        response.ParseFromString(bytes.fromhex(value))
+
+    print(f"menu: entries, {args.menus} menus of {args.dishes_per_menu} dishes")
+    baseline = measure(lambda r: r.SerializeToString().hex(), hex_decode, responses)
+    report('hex protobuf', baseline, baseline)
+    for label, codec in codecs:
+        result = measure(
+            codec.encode_message,
+            lambda value: codec.decode_message(value, menu_pb2.MenuResponse),
+            responses
+        )
+        report(label, result, baseline)
+
+    processor = MenuProcessorBase()
+    dishes = [dish for response in responses for dish in response.dishes]
+    sources = [corpus.document(dish) for dish in dishes]
+
+    print(f"dish: entries, {len(dishes)} dishes")
+    baseline = measure(json.dumps, lambda value: processor._dict_to_dish(json.loads(value)), sources)
+    report('JSON source', baseline, baseline)
+    for label, codec in codecs:
+        result = measure(
+            codec.encode_message,
+            lambda value: codec.decode_message(value, menu_pb2.Dish),
+            dishes
+        )
+        report(label, result, baseline)
+
+
+if __name__ == '__main__':
+    main()
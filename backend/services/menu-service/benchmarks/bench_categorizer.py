@@ -0,0 +1,164 @@
+"""Dish categorization: the compiled taxonomy against a keyword loop.
+
+The baseline is the categorizer this replaced, generalized to any
+taxonomy: for each category in turn, ``any(keyword in name)`` over its
+keywords, first hit wins. Both run over the same names with synthetic
+taxonomies of increasing size (the bundled taxonomy's real keywords plus
+generated ones), reporting names per second and compile time. The bundled
+taxonomy is then checked against a small labelled multilingual list, and a
+hot reload through Categorizer is timed.
+
+Usage:
+    python benchmarks/bench_categorizer.py [--keywords 1000,10000] [--names 20000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import logging
+import tempfile
+import shutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from parsing.categorizer import DEFAULT_TAXONOMY_PATH, Categorizer, Taxonomy
+
+logging.disable(logging.CRITICAL)
+
+SYLLABLES = ['ba', 'ko', 'mi', 'ra', 'to', 'su', 'ne', 'li', 'chi', 'ka', 'zo', 'an', 'ri', 'da', 'vu', 'te']
+# Filler words are built from syllables no keyword contains
+FILLER = ['qy', 'xw', 'jq', 'vx', 'wq', 'zx']
+
+LABELLED = [
+    ('Margherita Pizza', 'en', 'main'),
+    ('Grilled Salmon with Lemon Butter', 'en', 'main'),
+    ('Chicken Noodle Soup', 'en', 'soup'),
+    ('Caesar Salad', 'en', 'salad'),
+    ('Crab Cakes', 'en', 'appetizer'),
+    ('Garlic Bread', 'en', 'side'),
+    ('Chocolate Lava Cake', 'en', 'dessert'),
+    ('Iced Latte', 'en', 'drink'),
+    ('Phở Bò Tái', 'vi', 'soup'),
+    ('Bún bò Huế', 'vi', 'soup'),
+    ('Cơm tấm sườn', 'vi', 'main'),
+    ('Gỏi cuốn tôm', 'vi', 'appetizer'),
+    ('Chè ba màu', 'vi', 'dessert'),
+    ('Cà phê sữa đá', 'vi', 'drink'),
+    ('Soupe à l\'oignon', 'fr', 'soup'),
+    ('Crème brûlée', 'fr', 'dessert'),
+    ('Risotto ai funghi', 'it', 'main'),
+    ('Tiramisù', 'it', 'dessert'),
+    ('Gazpacho andaluz', 'es', 'soup'),
+    ('Kartoffelsalat', 'de', 'salad'),
+    ('味噌汁', 'ja', 'soup'),
+    ('豚骨ラーメン', 'ja', 'main'),
+    ('抹茶アイス', 'ja', 'dessert'),
+    ('宫保鸡丁', 'zh', 'main'),
+    ('ต้มยำกุ้ง', 'th', 'soup'),
+    ('ข้าวผัดกุ้ง', 'th', 'main'),
+]
+
+
+def synthetic_taxonomy(base: dict, keywords: int, rng: random.Random) -> dict:
+    """The bundled taxonomy padded with made-up one- and two-word keywords."""
+    data = json.loads(json.dumps(base))
+    categories = list(data['categories'])
+    existing = sum(len(words) for spec in data['categories'].values() for words in spec['keywords'].values())
+    for i in range(max(0, keywords - existing)):
+        word = ' '.join(
+            ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            for _ in range(1 + (i % 3 == 0))
+        )
+        data['categories'][categories[i % len(categories)]]['keywords'].setdefault('en', []).append(word)
+    return data
+
+
+def loop_categorizer(data: dict):
+    """The previous if/elif ``any(word in name)`` chain over a taxonomy."""
+    rules = [
+        (category, [word.lower() for words in spec['keywords'].values() for word in words])
+        for category, spec in data['categories'].items()
+    ]
+    default = data.get('default', 'other')
+
+    def categorize(name: str) -> str:
+        name_lower = name.lower()
+        for category, words in rules:
+            if any(word in name_lower for word in words):
+                return category
+        return default
+    return categorize
+
+
+def names(data: dict, count: int, rng: random.Random) -> list:
+    """Menu-like names; about half contain a keyword."""
+    vocabulary = [word for spec in data['categories'].values() for words in spec['keywords'].values() for word in words]
+    result = []
+    for i in range(count):
+        filler = [''.join(rng.choice(FILLER) for _ in range(rng.randint(2, 3))) for _ in range(rng.randint(1, 3))]
+        if i % 2:
+            filler.insert(rng.randint(0, len(filler)), rng.choice(vocabulary))
+        result.append(' '.join(filler).title())
+    return result
+
+
+def rate(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keywords', default='1000,10000', help='comma-separated taxonomy sizes')
+    parser.add_argument('--names', type=int, default=20000)
+    args = parser.parse_args()
+
+    with open(DEFAULT_TAXONOMY_PATH) as f:
+        base = json.load(f)
+    rng = random.Random(7)
+
+    for size in args.keywords.split(','):
+        data = synthetic_taxonomy(base, int(size), rng)
+        items = names(data, args.names, rng)
+        start = time.perf_counter()
+        taxonomy = Taxonomy(data)
+        compile_s = time.perf_counter() - start
+        loop = loop_categorizer(data)
+        # The loop is slow at large sizes; time it on a slice
+        loop_rate = rate(loop, items[:max(200, args.names * 1000 // int(size))])
+        compiled_rate = rate(taxonomy.categorize, items)
+        print(f"{len(taxonomy.keywords)} keywords, compiled in {compile_s * 1000:.0f} ms "
+              f"({len(taxonomy.words) + len(taxonomy.chars)} automaton states)")
+        print(f"  keyword loop  {loop_rate:10,.0f} names/s")
+        print(f"  automaton     {compiled_rate:10,.0f} names/s  ({compiled_rate / loop_rate:.0f}x)")
+
+    taxonomy = Taxonomy(base)
+    loop = loop_categorizer(base)
+    correct = sum(taxonomy.categorize(name, language) == label for name, language, label in LABELLED)
+    loop_correct = sum(loop(name) == label for name, _, label in LABELLED)
+    print(f"labelled names: automaton {correct}/{len(LABELLED)}, keyword loop {loop_correct}/{len(LABELLED)}")
+    for name, language, label in LABELLED:
+        found = taxonomy.categorize(name, language)
+        if found != label:
+            print(f"  {name!r} ({language}): {found}, expected {label}")
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'taxonomy.json')
+        shutil.copy(DEFAULT_TAXONOMY_PATH, path)
+        categorizer = Categorizer(path, reload_interval=0)
+        with open(path, 'w') as f:
+            json.dump(synthetic_taxonomy(base, 10000, rng), f)
+        start = time.perf_counter()
+        categorizer.reload()
+        print(f"hot reload of a 10k-keyword taxonomy: {(time.perf_counter() - start) * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Microbenchmark GetDish: in-process L1 hit vs the Redis path.
+
+Measures per-call latency of MenuProcessor.get_dish served from the L1,
+compared with the Redis path (GET, CacheCodec frame check, Dish parse),
+then replays a Zipf-distributed workload to report per-tier hit ratios
+and a cold hot-key stampede to show request coalescing.
+
+Without --redis-host the in-process Redis stand-in is used, which leaves
+out the network round trip a real Redis adds to that path.
+
+Usage:
+    python benchmarks/bench_dish_cache.py [--redis-host localhost] [--dishes 10000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import logging
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+import numpy as np
+
+import menu_pb2
+from processors.menu_processor import MenuProcessor
+from stand_ins.memory_elasticsearch import InMemoryElasticsearch
+from stand_ins.memory_redis import InMemoryRedis
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+
+def dish_document(i: int) -> dict:
+    return {
+        'name': f"Dish {i}",
+        'description': 'Slow cooked with herbs, garlic and a little chili',
+        'price': {'amount': 9.5 + i % 20, 'currency': 'USD'},
+        'ingredients': ['beef', 'rice noodles', 'basil', 'lime'],
+        'category': 'main',
+        'confidence_score': 0.93
+    }
+
+
+def timed(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--redis-host', help='use a real Redis instead of the in-process stand-in')
+    parser.add_argument('--dishes', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--zipf', type=float, default=1.1)
+    parser.add_argument('--es-latency-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.redis_host:
+        import redis
+        redis_client = redis.Redis(host=args.redis_host)
+    else:
+        redis_client = InMemoryRedis(max_entries=args.dishes * 2)
+    es = InMemoryElasticsearch(latency=args.es_latency_ms / 1000)
+    for i in range(args.dishes):
+        es.index(index='dishes', id=f"dish-{i}", document=dish_document(i))
+
+    processor = MenuProcessor(redis_client=redis_client, es_client=es)
+
+    # Latency: previous Redis path vs L1 hit
+    processor.get_dish('dish-1', False)
+
+    def redis_path():
+        cached = redis_client.get('dish:dish-1')
+        processor.cache_codec.decode_message(cached, menu_pb2.Dish)
+
+    p50, p99 = timed(redis_path, 20000)
+    print(f"redis + CacheCodec + Dish.FromString  p50 {p50:7.2f} us  p99 {p99:7.2f} us")
+    p50, p99 = timed(lambda: processor.get_dish('dish-1', False), 20000)
+    print(f"get_dish (L1 hit)                     p50 {p50:7.2f} us  p99 {p99:7.2f} us")
+
+    # Hit ratios under a skewed workload
+    processor.dish_l1.clear()
+    processor.dish_stats = type(processor.dish_stats)()
+    ranks = np.arange(1, args.dishes + 1)
+    weights = 1.0 / ranks ** args.zipf
+    rng = np.random.default_rng(5)
+    keys = rng.choice(args.dishes, size=args.requests, p=weights / weights.sum())
+    start = time.perf_counter()
+    for key in keys:
+        processor.get_dish(f"dish-{key}", False)
+    elapsed = time.perf_counter() - start
+    stats = processor.dish_cache_stats()
+    print(
+        f"zipf s={args.zipf} over {args.dishes} dishes, {args.requests} requests: "
+        f"L1 {stats['l1_hit_ratio']:.3f}, L2 {stats['l2_hit_ratio']:.3f}, "
+        f"ES gets {stats['origin_loads']}, {args.requests / elapsed:.0f} req/s, "
+        f"L1 {stats['l1_entries']} entries / {stats['l1_bytes'] / 1024:.0f} KB"
+    )
+
+    # Cold hot key: concurrent misses share one Elasticsearch get
+    key = f"dish-{random.Random(1).randrange(args.dishes)}"
+    redis_client.delete(f"dish:{key}")
+    processor.dish_l1.clear()
+    before = es.calls.get('get', 0)
+    with ThreadPoolExecutor(64) as pool:
+        list(pool.map(lambda _: processor.get_dish(key, False), range(64)))
+    print(f"64 concurrent cold requests for one dish -> {es.calls.get('get', 0) - before} Elasticsearch get")
+
+    processor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
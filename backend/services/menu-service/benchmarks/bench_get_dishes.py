@@ -0,0 +1,125 @@
+"""Batch dish lookups: GetDishes vs a loop of GetDish calls.
+
+Runs the thread-pool server in process on local stand-ins for Redis and
+Elasticsearch, each with a per-round-trip latency, and fetches 1, 10 and
+100 dishes through a real gRPC channel. Each size is measured cold
+(nothing cached, so Elasticsearch is read and Redis is refilled) and warm
+(served from Redis, with the in-process L1 cleared).
+Round trips are counted on the stand-ins.
+
+--similar also requests similar dishes (one msearch per GetDishes). The
+stand-in scores more_like_this in Python, so latencies then include
+its CPU time; the round-trip counts are what carries over to a cluster.
+
+Usage:
+    python benchmarks/bench_get_dishes.py [--sizes 1 10 100] [--redis-latency-ms 0.5] [--es-latency-ms 3] [--similar]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+import grpc
+import numpy as np
+
+import menu_pb2
+import menu_pb2_grpc
+from processors.menu_processor import MenuProcessor
+from server import MenuServiceServicer, create_server
+from stand_ins.memory_elasticsearch import InMemoryElasticsearch
+from stand_ins.memory_redis import InMemoryRedis
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+NAMES = ['Pho Bo', 'Bun Cha', 'Pad Thai', 'Green Curry', 'Margherita Pizza', 'Caesar Salad', 'Ramen', 'Tiramisu']
+
+
+def dish_document(i: int) -> dict:
+    return {
+        'name': f"{NAMES[i % len(NAMES)]} {i}",
+        'description': 'Slow cooked with herbs, garlic and a little chili',
+        'price': {'amount': 9.5 + i % 20, 'currency': 'USD'},
+        'ingredients': ['beef', 'rice noodles', 'basil', 'lime'],
+        'category': 'main',
+        'confidence_score': 0.93
+    }
+
+
+def loop_get_dish(stub, dish_ids, include_similar):
+    for dish_id in dish_ids:
+        stub.GetDish(menu_pb2.DishRequest(dish_id=dish_id, include_similar=include_similar))
+
+
+def batch_get_dishes(stub, dish_ids, include_similar):
+    stub.GetDishes(menu_pb2.DishesRequest(dish_ids=dish_ids, include_similar=include_similar))
+
+
+def measure(fn, stub, dish_ids, include_similar, processor, redis_client, es, warm: bool, repeats: int):
+    """Return (p50 ms, Redis round trips, Elasticsearch round trips) per run."""
+    samples = []
+    redis_trips = es_trips = 0
+    for _ in range(repeats):
+        processor.dish_l1.clear()
+        if warm:
+            fn(stub, dish_ids, include_similar)
+            processor.dish_l1.clear()
+        else:
+            redis_client.delete(*[f"dish:{dish_id}" for dish_id in dish_ids])
+        redis_before = redis_client.round_trips
+        es_before = sum(es.calls.values())
+        start = time.perf_counter()
+        fn(stub, dish_ids, include_similar)
+        samples.append((time.perf_counter() - start) * 1000)
+        redis_trips = redis_client.round_trips - redis_before
+        es_trips = sum(es.calls.values()) - es_before
+    return np.percentile(samples, 50), redis_trips, es_trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--dishes', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--redis-latency-ms', type=float, default=0.5)
+    parser.add_argument('--es-latency-ms', type=float, default=3.0)
+    parser.add_argument('--similar', action='store_true', help='also fetch similar dishes')
+    args = parser.parse_args()
+
+    redis_client = InMemoryRedis(latency=args.redis_latency_ms / 1000)
+    es = InMemoryElasticsearch()
+    for i in range(args.dishes):
+        es.index(index='dishes', id=f"dish-{i}", document=dish_document(i))
+    es.latency = args.es_latency_ms / 1000
+
+    processor = MenuProcessor(redis_client=redis_client, es_client=es)
+    server, port = create_server(MenuServiceServicer(processor), '127.0.0.1:0')
+    server.start()
+
+    print(f"redis {args.redis_latency_ms} ms, elasticsearch {args.es_latency_ms} ms per round trip; include_similar={args.similar}")
+    print(f"{'ids':>4} {'cache':>5} {'method':>9} {'p50 ms':>8} {'redis rt':>9} {'es rt':>6}")
+    with grpc.insecure_channel(f'127.0.0.1:{port}') as channel:
+        stub = menu_pb2_grpc.MenuServiceStub(channel)
+        for size in args.sizes:
+            dish_ids = [f"dish-{i * (args.dishes // size)}" for i in range(size)]
+            for warm in (False, True):
+                for name, fn in (('GetDish', loop_get_dish), ('GetDishes', batch_get_dishes)):
+                    p50, redis_trips, es_trips = measure(
+                        fn, stub, dish_ids, args.similar, processor, redis_client, es, warm, args.repeats
+                    )
+                    print(
+                        f"{size:4d} {'warm' if warm else 'cold':>5} {name:>9} "
+                        f"{p50:8.2f} {redis_trips:9d} {es_trips:6d}"
+                    )
+
+    server.stop(0)
+    processor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
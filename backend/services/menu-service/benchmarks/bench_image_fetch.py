@@ -0,0 +1,165 @@
+"""Bytes transferred and time to fetch image_url menus: ImageFetcher against
+a plain download per request.
+
+The images are served by the local ImageServer stand-in (and gs:// objects
+by FakeStorageClient), each response delayed by ``--latency`` like a
+remote host. Each scenario requests ``--images`` distinct URLs ``--repeat``
+times over:
+
+- naive: urllib.request, a new connection and a full download every time
+- fetcher: ImageFetcher with a fresh disk cache; repeats are revalidated
+  (If-None-Match, answered 304) over pooled keep-alive connections
+- fetcher max-age: the server sends Cache-Control max-age, so repeats are
+  served from disk without a request
+- restart: a new fetcher (an empty pool) over the disk cache left by the
+  first, as after a pod restart on the same volume
+- concurrent: ``--concurrency`` threads fetch the same new URL at once and
+  share one download
+- gs://: objects read through the Storage client; repeats compare ETags
+
+Reported per scenario: HTTP requests, connections opened, body bytes
+transferred, bytes saved against downloading every request, and the
+mean and p99 time per fetch.
+
+Usage:
+    python benchmarks/bench_image_fetch.py [--images 20] [--repeat 5] [--size-kb 400] [--latency 0.02]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import logging
+import tempfile
+import threading
+import urllib.request
+from concurrent import futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+from clients import import_modules
+from fetch.disk_cache import ImageDiskCache
+from fetch.fetcher import ImageFetcher
+from stand_ins.fake_storage import FakeStorageClient
+from stand_ins.image_server import ImageServer
+
+logging.disable(logging.CRITICAL)
+
+
+def images(count: int, size: int) -> list:
+    return [os.urandom(size) for _ in range(count)]
+
+
+def timed(fetch, urls) -> list:
+    """Milliseconds per fetch, checking each returns the image."""
+    times = []
+    for url in urls:
+        start = time.perf_counter()
+        data = fetch(url)
+        times.append((time.perf_counter() - start) * 1000)
+        assert data, url
+    return times
+
+
+def naive_fetch(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return response.read()
+
+
+def report(name: str, server_stats: dict, before: dict, fetches: int, size: int, times: list):
+    requests = server_stats['requests'] - before['requests']
+    connections = server_stats['connections'] - before['connections']
+    sent = server_stats['bytes_sent'] - before['bytes_sent']
+    saved = fetches * size - sent
+    times = sorted(times)
+    p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+    print(
+        f"  {name:18s}  {requests:8d}  {connections:11d}  {sent / 1e6:11.2f}  {saved / 1e6:9.2f}"
+        f"  {sum(times) / len(times):8.2f}  {p99:8.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5, help='requests per URL')
+    parser.add_argument('--size-kb', type=int, default=400, help='image size')
+    parser.add_argument('--latency', type=float, default=0.02, help='server delay per response, seconds')
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    size = args.size_kb * 1024
+    bodies = images(args.images, size)
+    cache_dir = tempfile.mkdtemp(prefix='bench-image-fetch-')
+    server = ImageServer(latency=args.latency)
+    urls = [server.put(f"menus/{i}.jpg", body) for i, body in enumerate(bodies)]
+    workload = [url for _ in range(args.repeat) for url in urls]
+    fetches = len(workload)
+
+    print(f"{args.images} images x {args.repeat} requests, {args.size_kb} KiB each, {args.latency * 1000:.0f} ms server latency")
+    print(f"  {'scenario':18s}  {'requests':>8s}  {'connections':>11s}  {'sent (MB)':>11s}  {'saved MB':>9s}  {'mean ms':>8s}  {'p99 ms':>8s}")
+    try:
+        before = server.stats()
+        times = timed(naive_fetch, workload)
+        report('naive', server.stats(), before, fetches, size, times)
+
+        # The stand-in server is on loopback, which the service refuses by default
+        fetcher = ImageFetcher(ImageDiskCache(os.path.join(cache_dir, 'a')), allow_private=True)
+        # The service imports urllib3 during warm-up
+        import_modules(fetcher.http)
+        before = server.stats()
+        times = timed(fetcher.fetch, workload)
+        report('fetcher', server.stats(), before, fetches, size, times)
+
+        restarted = ImageFetcher(ImageDiskCache(os.path.join(cache_dir, 'a')), allow_private=True)
+        before = server.stats()
+        times = timed(restarted.fetch, urls)
+        report('restart', server.stats(), before, len(urls), size, times)
+        fetcher.close()
+        restarted.close()
+
+        server.max_age = 300
+        urls_max_age = [server.put(f"max-age/{i}.jpg", body) for i, body in enumerate(bodies)]
+        fetcher = ImageFetcher(ImageDiskCache(os.path.join(cache_dir, 'b')), allow_private=True)
+        before = server.stats()
+        times = timed(fetcher.fetch, [url for _ in range(args.repeat) for url in urls_max_age])
+        report('fetcher max-age', server.stats(), before, fetches, size, times)
+        server.max_age = None
+
+        # Everyone asks for the same new image at once
+        url = server.put('concurrent.jpg', bodies[0])
+        barrier = threading.Barrier(args.concurrency)
+
+        def fetch_together(_):
+            barrier.wait()
+            start = time.perf_counter()
+            fetcher.fetch(url)
+            return (time.perf_counter() - start) * 1000
+
+        before = server.stats()
+        with futures.ThreadPoolExecutor(args.concurrency) as pool:
+            times = list(pool.map(fetch_together, range(args.concurrency)))
+        report('concurrent', server.stats(), before, args.concurrency, size, times)
+        fetcher.close()
+
+        storage = FakeStorageClient()
+        gs_urls = [storage.put('menu-scanner-images', f"uploads/{i}.jpg", body) for i, body in enumerate(bodies)]
+        fetcher = ImageFetcher(ImageDiskCache(os.path.join(cache_dir, 'c')), storage_client=storage)
+        times = timed(fetcher.fetch, [url for _ in range(args.repeat) for url in gs_urls])
+        gs_stats = {
+            'requests': storage.metadata_reads + storage.downloads,
+            'connections': 0,
+            'bytes_sent': storage.bytes_sent
+        }
+        report('gs://', gs_stats, {'requests': 0, 'connections': 0, 'bytes_sent': 0}, fetches, size, times)
+        print()
+        print(f"  fetcher stats: {fetcher.stats()}")
+        fetcher.close()
+    finally:
+        server.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""Overhead of the instrumentation layer on the servicer hot paths.
+
+Starts the thread-pool server in child processes (in-process Redis and
+Elasticsearch stand-ins, mock OCR): one with instrumentation off, one with
+it on, and one that also runs the sampling profiler. A client alternates
+blocks of calls between them and reports the per-call medians and the
+median overhead of neighbouring blocks, with a 95% interval, for:
+
+- GetDish served from the L1 (the cheapest RPC, so the worst case)
+- SearchDishes served from the search cache
+- ProcessMenuImage without the cache (mock OCR, parse, bulk index)
+
+The raw cost of one stage timer and one RPC wrapper is printed first,
+then the time the instrumentation adds to servicer calls made directly
+(no gRPC), which is the absolute cost per call. With the stand-ins a
+cached GetDish or SearchDishes does almost no work, so their ratios are an
+upper bound; against a real Redis the same few microseconds are a smaller
+share. The profiler is meant to be switched on while chasing a slow
+request, not left on.
+
+Usage:
+    python benchmarks/bench_instrumentation.py [--rounds 200] [--calls 100]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import multiprocessing
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+import grpc
+import numpy as np
+
+import menu_pb2
+import menu_pb2_grpc
+import instrumentation
+from instrumentation import PROFILER, stage, track_rpc
+from processors.menu_processor import MenuProcessor
+from server import MenuServiceServicer, create_server
+from stand_ins.memory_elasticsearch import InMemoryElasticsearch
+from stand_ins.memory_redis import InMemoryRedis
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+
+class Context:
+    """The parts of grpc.ServicerContext the servicer touches."""
+
+    def __init__(self):
+        self._code = None
+
+    def set_code(self, code):
+        self._code = code
+
+    def set_details(self, details):
+        pass
+
+    def code(self):
+        return self._code
+
+    def time_remaining(self):
+        return None
+
+
+def per_call_us(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def compare(off_fn, on_fn, rounds: int, calls: int) -> tuple:
+    """Per-call microseconds without and with instrumentation (medians), and
+    the per-round on/off ratios. Blocks alternate, and each ratio pairs
+    neighbouring blocks, so drift in machine load affects both sides alike."""
+    off, on = [], []
+    for i in range(rounds):
+        # Alternate which side goes first so neither always runs warmer
+        for fn, samples in ((off_fn, off), (on_fn, on))[::1 if i % 2 == 0 else -1]:
+            samples.append(per_call_us(fn, calls))
+    return float(np.median(off)), float(np.median(on)), np.array(on) / np.array(off)
+
+
+def report(label: str, off: float, on: float, ratios):
+    """Median overhead with a 95% interval (boxplot notch, 1.58 IQR / sqrt(n))."""
+    q1, median, q3 = np.percentile(ratios, [25, 50, 75])
+    margin = 1.58 * (q3 - q1) / np.sqrt(len(ratios))
+    print(
+        f"  {label:28s} off {off:9.2f} us  on {on:9.2f} us"
+        f"  overhead {(median - 1) * 100:+6.2f}% (±{margin * 100:.2f})"
+    )
+
+
+def seed(call) -> tuple:
+    """Process one menu and warm the caches; returns the requests to replay."""
+    menu_request = menu_pb2.MenuImageRequest(
+        image_data=b'menu', options=menu_pb2.ProcessingOptions(extract_prices=True, use_cache=False)
+    )
+    menu = call('ProcessMenuImage', menu_request)
+    dish_request = menu_pb2.DishRequest(dish_id=menu.dishes[0].dish_id)
+    search_request = menu_pb2.SearchRequest(query='pizza', limit=10)
+    call('GetDish', dish_request)
+    call('SearchDishes', search_request)
+    return menu_request, dish_request, search_request
+
+
+def _run_server(instrumented: bool, profiled: bool, conn):
+    logging.disable(logging.CRITICAL)
+    instrumentation.set_enabled(instrumented)
+    if profiled:
+        PROFILER.slow_ms = float('inf')
+        PROFILER.enable()
+    processor = MenuProcessor(redis_client=InMemoryRedis(), es_client=InMemoryElasticsearch())
+    server, port = create_server(MenuServiceServicer(processor), '127.0.0.1:0')
+    server.start()
+    conn.send(port)
+    server.wait_for_termination()
+
+
+class Served:
+    """A server child process and a client stub with its seeded requests."""
+
+    def __init__(self, instrumented: bool, profiled: bool = False):
+        # Spawned rather than forked: the parent already has gRPC channels open
+        spawn = multiprocessing.get_context('spawn')
+        parent, child = spawn.Pipe()
+        self.process = spawn.Process(target=_run_server, args=(instrumented, profiled, child), daemon=True)
+        self.process.start()
+        self.channel = grpc.insecure_channel(f"127.0.0.1:{parent.recv()}")
+        self.stub = menu_pb2_grpc.MenuServiceStub(self.channel)
+        self.menu_request, self.dish_request, self.search_request = seed(
+            lambda method, request: getattr(self.stub, method)(request)
+        )
+
+    def workloads(self) -> list:
+        return [
+            lambda: self.stub.GetDish(self.dish_request),
+            lambda: self.stub.SearchDishes(self.search_request),
+            lambda: self.stub.ProcessMenuImage(self.menu_request)
+        ]
+
+    def close(self):
+        self.channel.close()
+        self.process.terminate()
+        self.process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--calls', type=int, default=100)
+    args = parser.parse_args()
+
+    # Primitive costs
+    instrumentation.set_enabled(True)
+
+    def timed_stage():
+        with stage('bench'):
+            pass
+
+    class Noop:
+        @track_rpc
+        def Bench(self, request, context):
+            return request
+
+    noop, request, context = Noop(), menu_pb2.DishRequest(dish_id='dish-1'), Context()
+    calls = args.calls * 1000
+    print("primitives")
+    print(f"  stage timer      {per_call_us(timed_stage, calls) * 1000:7.0f} ns")
+    print(f"  RPC wrapper      {per_call_us(lambda: noop.Bench(request, context), calls) * 1000:7.0f} ns")
+
+    processor = MenuProcessor(redis_client=InMemoryRedis(), es_client=InMemoryElasticsearch())
+    servicer = MenuServiceServicer(processor)
+    _, dish_request, search_request = seed(lambda method, request: getattr(servicer, method)(request, Context()))
+
+    def toggled(fn, value):
+        def call():
+            instrumentation.set_enabled(value)
+            return fn()
+        return call
+
+    print(f"added per direct servicer call, {args.rounds} interleaved rounds")
+    direct = [
+        ('GetDish (L1 hit)', lambda: servicer.GetDish(dish_request, Context())),
+        ('SearchDishes (cache hit)', lambda: servicer.SearchDishes(search_request, Context())),
+    ]
+    for label, fn in direct:
+        off, on, _ = compare(toggled(fn, False), toggled(fn, True), args.rounds, args.calls * 10)
+        print(f"  {label:28s} {on - off:+6.2f} us")
+    processor.shutdown()
+
+    labels = ['GetDish (L1 hit)', 'SearchDishes (cache hit)', 'ProcessMenuImage (no cache)']
+    block_calls = [args.calls, args.calls, max(1, args.calls // 50)]
+    baseline = Served(instrumented=False)
+    for title, server in (
+        ('served over gRPC on loopback', Served(instrumented=True)),
+        (f"with the sampling profiler on ({PROFILER.interval_ms:g} ms interval)", Served(instrumented=True, profiled=True)),
+    ):
+        print(f"{title}, {args.rounds} interleaved rounds")
+        try:
+            for label, off_fn, on_fn, calls in zip(labels, baseline.workloads(), server.workloads(), block_calls):
+                report(label, *compare(off_fn, on_fn, args.rounds, calls))
+        finally:
+            server.close()
+    baseline.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Accepted ProcessMenuImage requests per second, synchronous vs async jobs,
+as OCR latency grows.
+
+For each OCR latency a server is started in a child process (in-process
+Redis and Elasticsearch stand-ins, FakeVisionClient with that latency) with
+a job worker pool. A client keeps ``--concurrency`` calls in flight for
+``--seconds`` and counts the calls answered:
+
+- sync: ProcessMenuImage waits for OCR, parsing and indexing, so the rate
+  falls as OCR slows down (at best GRPC_MAX_WORKERS / latency).
+- async: the same request with async_processing set only queues a job and
+  returns its PROCESSING status, so the rate should stay flat; the workers
+  drain the queue behind it at their own pace.
+
+Every request is a different image, so nothing is deduplicated or served
+from the cache, and the queue is sized to hold them all.
+
+Usage:
+    python benchmarks/bench_job_queue.py [--latencies-ms 0,50,200,1000] [--seconds 3]
+"""
+import os
+import sys
+import time
+import argparse
+import functools
+import itertools
+import logging
+import multiprocessing
+import threading
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+import grpc
+import numpy as np
+
+import menu_pb2
+import menu_pb2_grpc
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+
+def stand_in_processor(ocr_latency: float):
+    """MenuProcessor on the stand-ins; also the job workers' factory."""
+    from processors.menu_processor import MenuProcessor
+    from stand_ins.fake_vision import FakeVisionClient
+    from stand_ins.memory_elasticsearch import InMemoryElasticsearch
+    from stand_ins.memory_redis import InMemoryRedis
+    return MenuProcessor(
+        redis_client=InMemoryRedis(),
+        es_client=InMemoryElasticsearch(),
+        vision_client=FakeVisionClient(latency=ocr_latency)
+    )
+
+
+def _run_server(ocr_latency: float, workers: int, conn):
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings('ignore')
+    from server import MenuServiceServicer, create_server
+    from stand_ins.memory_queue import InMemoryJobQueue
+
+    processor = stand_in_processor(ocr_latency)
+    processor.job_queue = InMemoryJobQueue(max_depth=10 ** 6)
+    processor.start_job_workers(functools.partial(stand_in_processor, ocr_latency), workers)
+    server, port = create_server(MenuServiceServicer(processor), '127.0.0.1:0')
+    server.start()
+    conn.send(port)
+    server.wait_for_termination()
+
+
+class Served:
+    """A server child process and a client stub."""
+
+    def __init__(self, ocr_latency: float, workers: int):
+        # Spawned rather than forked: the parent already has gRPC channels open
+        spawn = multiprocessing.get_context('spawn')
+        parent, child = spawn.Pipe()
+        self.process = spawn.Process(target=_run_server, args=(ocr_latency, workers, child), daemon=True)
+        self.process.start()
+        self.channel = grpc.insecure_channel(f"127.0.0.1:{parent.recv()}")
+        self.stub = menu_pb2_grpc.MenuServiceStub(self.channel)
+
+    def close(self):
+        self.channel.close()
+        self.process.terminate()
+        self.process.join()
+
+
+def drive(stub, async_processing: bool, concurrency: int, seconds: float) -> tuple:
+    """Keep ``concurrency`` calls in flight for ``seconds``; returns (answered
+    per second, p50 ms, p99 ms, errors)."""
+    images = (f"menu-{i}".encode() for i in itertools.count())
+    options = menu_pb2.ProcessingOptions(extract_prices=True, use_cache=False, async_processing=async_processing)
+    latencies, errors = [], []
+    lock = threading.Lock()
+    slots = threading.Semaphore(concurrency)
+    deadline = time.perf_counter() + seconds
+
+    def done(start, future):
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            if future.exception() is not None:
+                errors.append(future.exception())
+            elif time.perf_counter() <= deadline:
+                latencies.append(elapsed)
+        slots.release()
+
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        slots.acquire()
+        request = menu_pb2.MenuImageRequest(image_data=next(images), options=options)
+        future = stub.ProcessMenuImage.future(request)
+        future.add_done_callback(functools.partial(done, time.perf_counter()))
+    for _ in range(concurrency):
+        slots.acquire()
+    elapsed = min(time.perf_counter(), deadline) - started
+    if not latencies:
+        return 0.0, float('nan'), float('nan'), len(errors)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return len(latencies) / elapsed, float(p50), float(p99), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latencies-ms', default='0,50,200,1000', help='comma-separated OCR latencies')
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=2, help='job worker processes')
+    args = parser.parse_args()
+
+    print(f"{args.concurrency} calls in flight, {args.seconds:g} s per run, {args.workers} job workers")
+    print(f"  {'OCR ms':>7s}  {'mode':5s}  {'req/s':>8s}  {'p50 ms':>8s}  {'p99 ms':>8s}  errors")
+    for latency_ms in [float(value) for value in args.latencies_ms.split(',')]:
+        served = Served(latency_ms / 1000, args.workers)
+        try:
+            # One call each way first, so the first measured call is not a cold start
+            drive(served.stub, False, 1, 0.2)
+            drive(served.stub, True, 1, 0.2)
+            for mode, async_processing in (('sync', False), ('async', True)):
+                rate, p50, p99, errors = drive(served.stub, async_processing, args.concurrency, args.seconds)
+                print(f"  {latency_ms:7g}  {mode:5s}  {rate:8.1f}  {p50:8.2f}  {p99:8.2f}  {errors}")
+        finally:
+            served.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark near-duplicate OCR reuse on synthetic, perturbed menu photos.
+
+Usage:
+    python benchmarks/bench_near_duplicate.py --menus 50 --variants 5 --stored 1000000
+"""
+import os
+import io
+import sys
+import time
+import random
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance
+
+from cache.perceptual_hash import MultiIndexHash, NearDuplicateIndex, dhash
+
+logging.disable(logging.CRITICAL)
+
+
+def render_menu(seed: int) -> Image.Image:
+    """Draw a fake menu page with a random layout of text lines."""
+    rng = random.Random(seed)
+    image = Image.new('L', (800, 1100), color=rng.randint(220, 255))
+    draw = ImageDraw.Draw(image)
+    y = 60
+    while y < 1000:
+        x = rng.randint(40, 120)
+        width = rng.randint(200, 600)
+        draw.rectangle([x, y, x + width, y + rng.randint(10, 22)], fill=rng.randint(0, 80))
+        draw.text((x + width + 20, y), f"${rng.randint(5, 40)}.99", fill=0)
+        y += rng.randint(30, 70)
+    return image
+
+
+def perturb(image: Image.Image, rng: random.Random) -> bytes:
+    """Simulate a re-shot photo: brightness, slight rotation/crop and JPEG quality."""
+    image = ImageEnhance.Brightness(image).enhance(rng.uniform(0.8, 1.2))
+    image = image.rotate(rng.uniform(-1.5, 1.5), fillcolor=235)
+    dx, dy = rng.randint(0, 15), rng.randint(0, 15)
+    image = image.crop((dx, dy, image.width - rng.randint(0, 15), image.height - rng.randint(0, 15)))
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='JPEG', quality=rng.randint(55, 95))
+    return buffer.getvalue()
+
+
+def bench_reuse(menus: int, variants: int, max_distance: int):
+    rng = random.Random(42)
+    index = NearDuplicateIndex(max_distance=max_distance)
+    ocr_calls = 0
+    total = 0
+    hash_times = []
+
+    for menu in range(menus):
+        base = render_menu(menu)
+        for _ in range(variants):
+            data = perturb(base, rng)
+            start = time.perf_counter()
+            phash = dhash(data)
+            hash_times.append(time.perf_counter() - start)
+            total += 1
+            if index.find(phash) is None:
+                ocr_calls += 1
+                index.add(phash, f"menu-{menu}")
+
+    print(f"photos: {total}, distinct menus: {menus}")
+    print(f"OCR calls: {ocr_calls} (avoided {total - ocr_calls}, ideal {total - menus})")
+    print(f"dhash time: p50 {np.percentile(hash_times, 50) * 1000:.2f} ms")
+    print(f"index stats: {index.stats()}")
+
+
+def bench_lookup(stored: int, max_distance: int, queries: int = 200):
+    rng = random.Random(7)
+    index = MultiIndexHash()
+    start = time.perf_counter()
+    for i in range(stored):
+        index.add(rng.getrandbits(64), i)
+    build = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(queries):
+        query = rng.getrandbits(64)
+        start = time.perf_counter()
+        index.search(query, max_distance)
+        latencies.append(time.perf_counter() - start)
+
+    print(f"stored hashes: {len(index)}, build {build:.1f} s")
+    print(
+        f"lookup latency (d<={max_distance}): "
+        f"p50 {np.percentile(latencies, 50) * 1000:.2f} ms, "
+        f"p99 {np.percentile(latencies, 99) * 1000:.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--menus', type=int, default=50)
+    parser.add_argument('--variants', type=int, default=5)
+    parser.add_argument('--stored', type=int, default=1000000)
+    parser.add_argument('--max-distance', type=int, default=6)
+    args = parser.parse_args()
+
+    bench_reuse(args.menus, args.variants, args.max_distance)
+    bench_lookup(args.stored, args.max_distance)
+
+
+if __name__ == '__main__':
+    main()
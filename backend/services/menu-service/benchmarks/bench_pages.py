@@ -0,0 +1,140 @@
+"""Wall-clock time to process a multi-page PDF menu with PagePool at
+different worker counts.
+
+Builds a ``--pages``-page PDF (A4 pages of menu text, drawn with PIL) and
+runs it through PagePool.process() with 1, 4 and 8 workers. Each worker
+renders its page at PAGE_RENDER_DPI, OCRs it and parses it. OCR is a
+stand-in, chosen with ``--ocr``:
+
+- vision: FakeVisionClient answering after ``--latency`` seconds, as the
+  Vision API would; pages wait on the network, so workers overlap them
+- cpu: ``--cpu-ms`` of busy CPU per page, as local Tesseract would; this
+  scales with workers only up to the number of cores
+
+Reported per worker count: the median wall-clock time for the menu, the
+time until the first page's dishes were available (what
+StreamDishProcessing waits for), and the speedup over one worker. Each
+pool is warmed up first, so process start-up is not counted.
+
+Usage:
+    python benchmarks/bench_pages.py [--pages 12] [--workers 1,4,8] [--ocr vision|cpu] [--runs 3]
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import functools
+import logging
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+from PIL import Image, ImageDraw
+
+import menu_pb2
+from scanner_common.ocr.base import OCREngine
+from pages.pool import PagePool
+from stand_ins.fake_vision import fake_vision_ocr_engine
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+DISHES = ['Pho Bo', 'Bun Cha', 'Banh Mi', 'Com Tam', 'Goi Cuon', 'Cha Gio', 'Bun Bo Hue', 'Mi Quang']
+
+
+class BusyOCREngine(OCREngine):
+    """Spends ``cpu_ms`` of CPU per image, then answers like FakeVisionClient."""
+
+    name = 'busy'
+
+    def __init__(self, cpu_ms: float):
+        super().__init__()
+        self.cpu_ms = cpu_ms
+        self.vision = fake_vision_ocr_engine()
+
+    def _extract(self, image_data: bytes, language: str, timeout=None):
+        deadline = time.process_time() + self.cpu_ms / 1000
+        while time.process_time() < deadline:
+            pass
+        return self.vision.extract(image_data, language, timeout)
+
+
+def busy_ocr_engine(cpu_ms: float) -> OCREngine:
+    return BusyOCREngine(cpu_ms)
+
+
+def menu_pdf(pages: int) -> bytes:
+    """A ``pages``-page PDF of menu lines, A4 at 150 dpi."""
+    images = []
+    for number in range(pages):
+        image = Image.new('RGB', (1240, 1754), 'white')
+        draw = ImageDraw.Draw(image)
+        draw.text((100, 80), f"MENU - PAGE {number + 1}", fill='black')
+        for line in range(40):
+            name = DISHES[(number + line) % len(DISHES)]
+            draw.text((100, 140 + line * 38), f"{name} {line} ........ ${5 + line % 20}.{line % 10}9", fill='black')
+        images.append(image)
+    buffer = io.BytesIO()
+    images[0].save(buffer, 'PDF', save_all=True, append_images=images[1:], resolution=150)
+    return buffer.getvalue()
+
+
+def run(pool: PagePool, data: bytes, options: menu_pb2.ProcessingOptions) -> tuple:
+    """(wall ms, ms to the first page, dishes) for one menu."""
+    start = time.perf_counter()
+    first = None
+    dishes = 0
+    pages = pool.split(data)
+    for result in pool.process(data, pages, options):
+        if first is None:
+            first = (time.perf_counter() - start) * 1000
+        dishes += len(result.dishes)
+    return (time.perf_counter() - start) * 1000, first, dishes
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=12)
+    parser.add_argument('--workers', default='1,4,8')
+    parser.add_argument('--ocr', choices=['vision', 'cpu'], default='vision')
+    parser.add_argument('--latency', type=float, default=0.3, help='vision: seconds per page')
+    parser.add_argument('--cpu-ms', type=float, default=300, help='cpu: CPU milliseconds per page')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.ocr == 'vision':
+        ocr_factory = functools.partial(fake_vision_ocr_engine, None, args.latency)
+        cost = f"{args.latency * 1000:.0f} ms Vision latency"
+    else:
+        ocr_factory = functools.partial(busy_ocr_engine, args.cpu_ms)
+        cost = f"{args.cpu_ms:.0f} ms CPU"
+
+    data = menu_pdf(args.pages)
+    options = menu_pb2.ProcessingOptions(extract_prices=True)
+    print(f"{args.pages}-page PDF ({len(data) / 1e6:.1f} MB), OCR {cost} per page, {os.cpu_count()} CPUs, median of {args.runs}")
+    print(f"  {'workers':>7s}  {'wall ms':>9s}  {'first page ms':>13s}  {'speedup':>7s}  {'dishes':>6s}")
+
+    baseline = None
+    for workers in [int(value) for value in args.workers.split(',')]:
+        pool = PagePool(ocr_factory, workers=workers)
+        try:
+            # Start the worker processes outside the measurement
+            run(pool, menu_pdf(workers), options)
+            runs = [run(pool, data, options) for _ in range(args.runs)]
+        finally:
+            pool.close()
+        wall = median([result[0] for result in runs])
+        first = median([result[1] for result in runs])
+        baseline = baseline or wall
+        print(f"  {workers:7d}  {wall:9.0f}  {first:13.0f}  {baseline / wall:6.1f}x  {runs[0][2]:6d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""Accuracy and speed of the menu parser on annotated menus.
+
+Each corpus file holds an OCR result (words with boxes and confidences, and
+the full text in Vision's block order) plus the dishes a person would read
+off the menu. The layout parser is compared with the original line parser
+(`name - description - $price` only), then timed on synthetic pages of
+increasing density to check that parse time grows linearly.
+
+The shipped corpus in benchmarks/parser_corpus/ was generated with
+--write-corpus and covers inline, right-hand price column, dot leader,
+two-column, price-below-name, euro and dong layouts with skew and jitter.
+
+Usage:
+    python benchmarks/bench_parser.py [--corpus DIR] [--scale 100 1000 10000]
+    python benchmarks/bench_parser.py --write-corpus benchmarks/parser_corpus
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from scanner_common.ocr.base import OCRResult, TextRegion
+from parsing.menu_parser import MenuParser
+
+logging.disable(logging.CRITICAL)
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'parser_corpus')
+
+NAMES = [
+    'Margherita Pizza', 'Pasta Carbonara', 'Caesar Salad', 'Tiramisu', 'Pad Thai',
+    'Green Curry', 'Coq-au-vin', 'Beef Bourguignon', 'French Onion Soup', 'Fish and Chips',
+    'Phở bò', 'Bún chả', 'Cơm tấm', 'Bánh xèo', 'Chicken Tikka Masala', 'Lamb Rogan Josh',
+    'Mushroom Risotto', 'Grilled Salmon', 'Cheeseburger', 'Club Sandwich', 'Minestrone',
+    'Crème brûlée', 'Apple Pie', 'Chocolate Cake', 'Spring Rolls', 'Miso Soup',
+    'Ramen Tonkotsu', 'Katsu Curry', 'Falafel Wrap', 'Greek Salad'
+]
+DESCRIPTIONS = [
+    'Classic tomato and mozzarella', 'Creamy sauce with pancetta', 'Fresh romaine with parmesan',
+    'Slow cooked in red wine', 'Rice noodles, peanuts and lime', 'Served with jasmine rice',
+    'Beef broth with herbs', 'With fries and tartar sauce', 'Seasonal vegetables',
+    'Topped with toasted almonds'
+]
+HEADINGS = ['STARTERS', 'MAINS', 'NOODLES', 'DESSERTS', 'SPECIALS']
+LAYOUTS = ['inline', 'right_column', 'leaders', 'two_column', 'price_below', 'euro', 'dong']
+
+CHAR_WIDTH = 11
+LINE_HEIGHT = 22
+
+
+class MenuBuilder:
+    """Lay words out on a page, then skew and jitter them like a phone photo."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.words = []  # (text, x, y, width, height, confidence, block)
+
+    def line(self, text: str, x: float, y: float, block: int):
+        for word in text.split():
+            width = CHAR_WIDTH * len(word)
+            self.words.append([word, x, y, width, LINE_HEIGHT, round(self.rng.uniform(0.72, 0.99), 3), block])
+            x += width + CHAR_WIDTH
+
+    def result(self, skew_degrees: float) -> OCRResult:
+        angle = math.radians(skew_degrees)
+        cos, sin = math.cos(angle), math.sin(angle)
+        words = []
+        blocks = {}
+        for text, x, y, width, height, confidence, block in self.words:
+            corners = [(x, y), (x + width, y), (x + width, y + height), (x, y + height)]
+            rotated = [(cx * cos - cy * sin, cx * sin + cy * cos) for cx, cy in corners]
+            xs = [point[0] for point in rotated]
+            ys = [point[1] for point in rotated]
+            jitter = self.rng.uniform(-1.5, 1.5)
+            words.append(TextRegion(
+                text, int(min(xs) + jitter), int(min(ys) + jitter + 200),
+                int(max(xs) - min(xs)), int(max(ys) - min(ys)), confidence
+            ))
+            blocks.setdefault(block, {}).setdefault(y, []).append(text)
+
+        # Vision reads block by block, so a price column comes after the names
+        lines = [' '.join(line) for block in sorted(blocks) for _, line in sorted(blocks[block].items())]
+        return OCRResult('vision', '\n'.join(lines), words)
+
+
+def _price(rng: random.Random, layout: str):
+    if layout == 'dong':
+        amount = rng.randint(3, 15) * 5000
+        return amount, 'VND', f"{amount // 1000}.000₫"
+    amount = rng.randint(4, 40) + rng.choice([0.0, 0.5, 0.95, 0.99])
+    if layout == 'euro':
+        return amount, 'EUR', f"{amount:.2f}".replace('.', ',') + ' €'
+    if layout == 'leaders':
+        return amount, 'USD', f"{amount:.2f}"
+    # OCR often splits the currency sign from the amount
+    separator = ' ' if rng.random() < 0.2 else ''
+    return amount, 'USD', f"${separator}{amount:.2f}"
+
+
+def generate_menu(seed: int, layout: str, dishes: int = 24):
+    rng = random.Random(seed)
+    builder = MenuBuilder(rng)
+    expected = []
+    columns = [(60, 0)] if layout != 'two_column' else [(60, 0), (760, 2)]
+    per_column = math.ceil(dishes / len(columns))
+
+    for x, block in columns:
+        y = 60
+        for i in range(per_column):
+            if len(expected) >= dishes:
+                break
+            if i % 6 == 0:
+                builder.line(rng.choice(HEADINGS), x, y, block)
+                y += LINE_HEIGHT * 2
+
+            name = rng.choice(NAMES)
+            description = rng.choice(DESCRIPTIONS) if rng.random() < 0.6 else ''
+            amount, currency, price_text = _price(rng, layout)
+            price_x = x + 560
+
+            if layout == 'inline':
+                text = f"{name} - {description} - {price_text}" if description else f"{name} - {price_text}"
+                builder.line(text, x, y, block)
+                description_below = False
+            elif layout in ('dong', 'euro') and rng.random() < 0.5:
+                builder.line(f"{name} {price_text}", x, y, block)
+                description_below = True
+            elif layout == 'leaders':
+                builder.line(name, x, y, block)
+                leader_x = x + CHAR_WIDTH * (len(name) + 1)
+                builder.line('.' * max(3, (price_x - leader_x) // CHAR_WIDTH - 1), leader_x, y, block)
+                builder.line(price_text, price_x, y, block)
+                description_below = True
+            elif layout == 'price_below':
+                builder.line(name, x, y, block)
+                y += LINE_HEIGHT * 1.4
+                builder.line(price_text, x + 420, y, block + 1)
+                description_below = False
+                description = ''
+            else:
+                builder.line(name, x, y, block)
+                builder.line(price_text, price_x, y, block + 1)
+                description_below = True
+
+            y += LINE_HEIGHT * 1.4
+            if description and description_below:
+                builder.line(description, x, y, block)
+                y += LINE_HEIGHT * 1.4
+            y += LINE_HEIGHT * 0.8
+            expected.append({'name': name, 'description': description, 'price': amount, 'currency': currency})
+
+    result = builder.result(skew_degrees=rng.uniform(-4, 4))
+    return result, expected
+
+
+def legacy_parse(result: OCRResult):
+    """The original line parser: `name - description - $price`, split on '-' and '$'."""
+    annotations = result.to_annotations()
+    full_text = annotations[0]
+    lines = full_text.split('\n') if '\n' in full_text else annotations[1:]
+    dishes = []
+    for text in lines:
+        if '-' not in text or '$' not in text:
+            continue
+        parts = text.split('-')
+        name = parts[0].strip()
+        description = parts[1].strip()
+        amount = 0.0
+        if '$' in description:
+            price_parts = description.split('$')
+            try:
+                amount = float(price_parts[-1].strip().replace(',', ''))
+            except ValueError:
+                pass
+            description = '$'.join(price_parts[:-1]).strip()
+        dishes.append({'name': name, 'description': description, 'price': amount, 'currency': 'USD'})
+    return dishes
+
+
+def layout_parse(parser: MenuParser, result: OCRResult):
+    return [
+        {
+            'name': dish.name,
+            'description': dish.description,
+            'price': dish.price.amount if dish.price else 0.0,
+            'currency': dish.price.currency if dish.price else '',
+            'confidence': dish.confidence
+        }
+        for dish in parser.parse(result)
+    ]
+
+
+def score(parsed, expected):
+    """Match parsed dishes to expected ones by name, price and currency."""
+    remaining = list(expected)
+    matched = descriptions = 0
+    for dish in parsed:
+        for i, truth in enumerate(remaining):
+            if (dish['name'] == truth['name'] and abs(dish['price'] - truth['price']) < 0.005
+                    and dish['currency'] == truth['currency']):
+                matched += 1
+                descriptions += dish['description'] == truth['description']
+                del remaining[i]
+                break
+    return matched, descriptions
+
+
+def load_corpus(directory: str):
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name)) as f:
+                data = json.load(f)
+            yield name, OCRResult.from_dict(data['ocr']), data['dishes']
+
+
+def write_corpus(directory: str, per_layout: int):
+    os.makedirs(directory, exist_ok=True)
+    for layout_index, layout in enumerate(LAYOUTS):
+        for i in range(per_layout):
+            result, expected = generate_menu(1000 * layout_index + i, layout)
+            path = os.path.join(directory, f"{layout}_{i}.json")
+            with open(path, 'w') as f:
+                json.dump({'layout': layout, 'ocr': result.to_dict(), 'dishes': expected}, f, ensure_ascii=False)
+            print(f"wrote {path} ({len(expected)} dishes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--scale', type=int, nargs='+', default=[100, 1000, 10000], help='dishes per synthetic page')
+    parser.add_argument('--write-corpus', metavar='DIR', help='generate the corpus into DIR and exit')
+    parser.add_argument('--per-layout', type=int, default=2)
+    args = parser.parse_args()
+
+    if args.write_corpus:
+        write_corpus(args.write_corpus, args.per_layout)
+        return
+
+    menu_parser = MenuParser()
+    totals = {'legacy': [0, 0, 0], 'layout': [0, 0, 0]}  # matched, parsed, descriptions
+    expected_total = 0
+    parse_ms = []
+
+    print(f"{'menu':<22} {'dishes':>6} {'legacy':>7} {'layout':>7} {'desc':>5} {'ms':>6}")
+    for name, result, expected in load_corpus(args.corpus):
+        legacy = legacy_parse(result)
+        start = time.perf_counter()
+        parsed = layout_parse(menu_parser, result)
+        parse_ms.append((time.perf_counter() - start) * 1000)
+
+        legacy_matched, legacy_descriptions = score(legacy, expected)
+        matched, descriptions = score(parsed, expected)
+        for key, values in (('legacy', (legacy_matched, len(legacy), legacy_descriptions)),
+                            ('layout', (matched, len(parsed), descriptions))):
+            totals[key] = [total + value for total, value in zip(totals[key], values)]
+        expected_total += len(expected)
+        print(f"{name:<22} {len(expected):6d} {legacy_matched:7d} {matched:7d} {descriptions:5d} {parse_ms[-1]:6.2f}")
+
+    for key, (matched, parsed, descriptions) in totals.items():
+        precision = matched / parsed if parsed else 0.0
+        recall = matched / expected_total if expected_total else 0.0
+        print(
+            f"{key:<7} precision {precision:.3f} recall {recall:.3f} "
+            f"descriptions {descriptions / matched if matched else 0.0:.3f}"
+        )
+    print(f"layout parse p50 {np.percentile(parse_ms, 50):.2f} ms, p95 {np.percentile(parse_ms, 95):.2f} ms")
+
+    print(f"{'dishes/page':>11} {'words':>8} {'parse ms':>9} {'us/word':>8}")
+    for dishes in args.scale:
+        result, expected = generate_menu(7, 'two_column', dishes=dishes)
+        start = time.perf_counter()
+        count = sum(1 for _ in menu_parser.parse(result))
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{dishes:11d} {len(result.words):8d} {elapsed:9.1f} {elapsed * 1000 / len(result.words):8.2f}  ({count} parsed)")
+
+
+if __name__ == '__main__':
+    main()
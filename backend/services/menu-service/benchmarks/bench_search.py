@@ -0,0 +1,131 @@
+"""SearchDishes latency: deep pages and the search result cache.
+
+Compares fetching page 100 with from/size (offset) against following
+search_after cursors on a point in time, and a first page served by
+Elasticsearch against one served from the search cache.
+
+Without --es-host the in-process stand-in is used. It scores every
+document in Python and keeps the top from + size hits in a heap like a
+shard does; scoring dominates there, so the deep-page difference only
+shows against a real Elasticsearch, where from/size also has every shard
+return from + size hits and stops at index.max_result_window (10000).
+The cache numbers hold for either. With --es-host the existing `dishes`
+index is queried read-only unless --seed is given.
+
+Usage:
+    python benchmarks/bench_search.py [--dishes 5000] [--page 100] [--es-host localhost] [--seed]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import logging
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+import numpy as np
+
+import menu_pb2
+from processors.menu_processor import MenuProcessor
+from stand_ins.memory_elasticsearch import InMemoryElasticsearch
+from stand_ins.memory_redis import InMemoryRedis
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+WORDS = ['beef', 'chicken', 'noodle', 'rice', 'spicy', 'garlic', 'basil', 'curry', 'soup', 'grilled', 'crispy', 'lime']
+
+
+def dish_document(rng: random.Random, i: int) -> dict:
+    return {
+        'dish_id': f"dish-{i}",
+        'name': f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} noodle {i}",
+        'description': ' '.join(rng.sample(WORDS, 4)),
+        'ingredients': rng.sample(WORDS, 3),
+        'category': rng.choice(['main', 'appetizer', 'dessert', 'other']),
+        'confidence_score': 0.9
+    }
+
+
+def p50_ms(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(samples, 50))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dishes', type=int, default=5000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--page', type=int, default=100)
+    parser.add_argument('--query', default='spicy beef noodle')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--es-host', help='use a real Elasticsearch instead of the in-process stand-in')
+    parser.add_argument('--seed', action='store_true', help='index --dishes documents into the real cluster first')
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    if args.es_host:
+        from elasticsearch import Elasticsearch, helpers
+        es = Elasticsearch([f'http://{args.es_host}:9200'])
+        if args.seed:
+            helpers.bulk(es, (
+                {'_index': 'dishes', '_id': f"dish-{i}", '_source': dish_document(rng, i)}
+                for i in range(args.dishes)
+            ), refresh=True)
+    else:
+        es = InMemoryElasticsearch()
+        for i in range(args.dishes):
+            es.index(index='dishes', id=f"dish-{i}", document=dish_document(rng, i))
+
+    processor = MenuProcessor(redis_client=InMemoryRedis(), es_client=es)
+    request = menu_pb2.SearchRequest(query=args.query, limit=args.limit)
+
+    # Deep page with from/size
+    processor.search_cache.enabled = False
+    offset_request = menu_pb2.SearchRequest(query=args.query, limit=args.limit, offset=(args.page - 1) * args.limit)
+    offset_ms = p50_ms(lambda: processor.search_dishes(offset_request), args.repeats)
+
+    # Deep page with search_after: walk the cursors up to the page, then time it
+    walk_start = time.perf_counter()
+    response = processor.search_dishes(request)
+    for _ in range(args.page - 2):
+        response = processor.search_dishes(
+            menu_pb2.SearchRequest(query=args.query, limit=args.limit, cursor=response.next_cursor)
+        )
+    walk_ms = (time.perf_counter() - walk_start) * 1000
+    cursor_request = menu_pb2.SearchRequest(query=args.query, limit=args.limit, cursor=response.next_cursor)
+    cursor_ms = p50_ms(lambda: processor.search_dishes(cursor_request), args.repeats)
+    page = processor.search_dishes(cursor_request)
+    same = [d.dish_id for d in page.dishes] == [d.dish_id for d in processor.search_dishes(offset_request).dishes]
+
+    print(f"{args.dishes} dishes, query {args.query!r}, {response.total_results} matches, limit {args.limit}")
+    print(f"page {args.page} via from/size      p50 {offset_ms:8.2f} ms")
+    print(f"page {args.page} via search_after   p50 {cursor_ms:8.2f} ms  (same dishes: {same})")
+    print(f"cursor walk to page {args.page - 1}: {walk_ms:.0f} ms total, {walk_ms / max(1, args.page - 1):.2f} ms/page")
+
+    # First page: Elasticsearch vs the search cache
+    processor.search_cache.enabled = True
+    processor.search_cache.invalidate_interval = 0
+
+    def miss():
+        processor.search_cache.invalidate()
+        processor.search_dishes(request)
+
+    miss_ms = p50_ms(miss, args.repeats)
+    processor.search_dishes(request)
+    hit_ms = p50_ms(lambda: processor.search_dishes(request), args.repeats * 10)
+    print(f"first page from Elasticsearch   p50 {miss_ms:8.2f} ms")
+    print(f"first page from search cache    p50 {hit_ms:8.3f} ms  ({processor.search_cache.stats()})")
+
+    processor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""SearchDishes on the in-memory engine against the Elasticsearch path.
+
+Builds a synthetic menu corpus (Zipf-distributed words, so postings are as
+skewed as real menus), then reports for the memory engine:
+
+- indexing time, merge time, snapshot save and memory-mapped load time
+- first-page query latency (p50/p99) for one- to three-word queries, with
+  and without a category filter, and similar-dish latency
+- index memory (array bytes and RSS growth after the merge), scaled to
+  one million dishes
+
+The same queries then run through the Elasticsearch backend. Without
+--es-host that is the in-process stand-in, which scores in Python and is
+only there to keep the comparison runnable offline; it is loaded with
+--es-dishes documents and the per-query cost does not mean anything about
+a cluster. With --es-host the existing `dishes` index is queried read-only
+(add --seed to load --es-dishes documents first) and its store size is
+reported next to the engine's memory.
+
+Usage:
+    python benchmarks/bench_search_engine.py [--dishes 200000] [--es-dishes 5000] [--es-host localhost] [--seed]
+"""
+import os
+import sys
+import time
+import random
+import gc
+import argparse
+import logging
+import tempfile
+import shutil
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+import numpy as np
+
+import menu_pb2
+from processors.menu_processor import MenuProcessor
+from search.elasticsearch_backend import ElasticsearchSearchBackend
+from search.memory_engine import MemorySearchEngine
+from stand_ins.memory_elasticsearch import InMemoryElasticsearch
+from stand_ins.memory_redis import InMemoryRedis
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+CATEGORIES = ['main', 'appetizer', 'dessert', 'drink', 'side', 'other']
+CURRENCIES = ['USD', 'EUR', 'VND']
+SYLLABLES = ['ba', 'ko', 'mi', 'ra', 'to', 'su', 'pho', 'ne', 'li', 'chi', 'ka', 'zo', 'an', 'ri', 'da']
+
+
+class Corpus:
+    """Menu-like words drawn from a Zipf distribution."""
+
+    def __init__(self, seed: int, vocabulary: int = 20000):
+        rng = random.Random(seed)
+        words = set()
+        while len(words) < vocabulary:
+            words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+        self.words = sorted(words)
+        rng.shuffle(self.words)
+        weights = 1.0 / np.arange(1, vocabulary + 1) ** 1.1
+        self.cdf = np.cumsum(weights / weights.sum())
+        self.np_rng = np.random.default_rng(seed)
+
+    def sample(self, count: int) -> list:
+        picks = np.searchsorted(self.cdf, self.np_rng.random(count))
+        return [self.words[i] for i in np.minimum(picks, len(self.words) - 1)]
+
+    def dish(self, i: int) -> menu_pb2.Dish:
+        words = self.sample(14)
+        return menu_pb2.Dish(
+            dish_id=f"dish-{i}",
+            name=' '.join(words[:3]).title(),
+            description=' '.join(words[3:10]),
+            ingredients=words[10:14],
+            price=menu_pb2.Price(amount=float(5 + i % 40), currency=CURRENCIES[i % 3]),
+            category=CATEGORIES[i % len(CATEGORIES)],
+            confidence_score=0.9
+        )
+
+    def document(self, dish: menu_pb2.Dish) -> dict:
+        return {
+            'dish_id': dish.dish_id,
+            'name': dish.name,
+            'description': dish.description,
+            'ingredients': list(dish.ingredients),
+            'price': {'amount': dish.price.amount, 'currency': dish.price.currency},
+            'category': dish.category,
+            'confidence_score': dish.confidence_score
+        }
+
+
+def rss_bytes() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def latencies(fn, items) -> tuple:
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+
+
+def queries(corpus: Corpus, count: int) -> list:
+    requests = []
+    for i in range(count):
+        words = corpus.sample(1 + i % 3)
+        request = menu_pb2.SearchRequest(query=' '.join(words), limit=20)
+        if i % 2:
+            request.categories.append(CATEGORIES[i % len(CATEGORIES)])
+        requests.append(request)
+    return requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dishes', type=int, default=200000)
+    parser.add_argument('--es-dishes', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--es-host', help='use a real Elasticsearch instead of the in-process stand-in')
+    parser.add_argument('--seed', action='store_true', help='index --es-dishes documents into the real cluster first')
+    args = parser.parse_args()
+
+    corpus = Corpus(seed=7)
+    requests = queries(corpus, args.queries)
+    per_million = 1_000_000 / args.dishes
+
+    # Memory engine
+    dishes = [corpus.dish(i) for i in range(args.dishes)]
+    rss_before = rss_bytes()
+    engine = MemorySearchEngine(merge_docs=args.dishes + 1)
+    start = time.perf_counter()
+    engine.index(dishes)
+    index_s = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.merge()
+    merge_s = time.perf_counter() - start
+    gc.collect()
+    rss_growth = rss_bytes() - rss_before
+
+    print(f"memory engine, {args.dishes} dishes")
+    print(f"  index {index_s:.1f}s ({args.dishes / index_s:,.0f} dishes/s), merge {merge_s:.2f}s")
+    print(f"  index arrays {engine.nbytes() / 2**20:8.1f} MiB  -> {engine.nbytes() * per_million / 2**20:8.0f} MiB per million dishes")
+    print(f"  RSS growth   {rss_growth / 2**20:8.1f} MiB  -> {rss_growth * per_million / 2**20:8.0f} MiB per million dishes")
+
+    p50, p99 = latencies(engine.search, requests)
+    print(f"  search       p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+    p50, p99 = latencies(lambda dish: engine.similar(dish.dish_id, dish), dishes[:args.queries])
+    print(f"  similar      p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+
+    snapshot_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(snapshot_dir, 'search')
+        start = time.perf_counter()
+        engine.save(path)
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        reloaded = MemorySearchEngine(path)
+        load_s = time.perf_counter() - start
+        p50, _ = latencies(reloaded.search, requests)
+        print(f"  snapshot save {save_s:.2f}s, mmap load {load_s:.2f}s, first queries after load p50 {p50:.2f} ms")
+    finally:
+        shutil.rmtree(snapshot_dir)
+
+    # Elasticsearch path
+    if args.es_host:
+        from elasticsearch import Elasticsearch, helpers
+        es = Elasticsearch([f'http://{args.es_host}:9200'])
+        if args.seed:
+            helpers.bulk(es, (
+                {'_index': 'dishes', '_id': dish.dish_id, '_source': corpus.document(dish)}
+                for dish in dishes[:args.es_dishes]
+            ), refresh=True)
+    else:
+        es = InMemoryElasticsearch()
+        for dish in dishes[:args.es_dishes]:
+            es.index(index='dishes', id=dish.dish_id, document=corpus.document(dish))
+
+    processor = MenuProcessor(redis_client=InMemoryRedis(), es_client=es)
+    backend = ElasticsearchSearchBackend(es, processor)
+    label = f"Elasticsearch at {args.es_host}" if args.es_host else f"Elasticsearch stand-in, {args.es_dishes} dishes"
+    print(label)
+    p50, p99 = latencies(backend.search, requests[:100])
+    print(f"  search       p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+    if args.es_host:
+        stats = es.indices.stats(index='dishes')['_all']['primaries']
+        docs = max(1, stats['docs']['count'])
+        store = stats['store']['size_in_bytes']
+        print(f"  store        {store / 2**20:8.1f} MiB  -> {store * 1_000_000 / docs / 2**20:8.0f} MiB per million dishes")
+    processor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
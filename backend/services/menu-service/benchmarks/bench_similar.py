@@ -0,0 +1,95 @@
+"""Similar-dish lookups: the IVF vector index against brute force.
+
+For each corpus size, vectorizes the synthetic menu corpus from
+bench_search_engine.py, builds the index, and reports build time, matrix
+memory, and for several (nprobe, max_candidates) settings the recall@5
+against an exact brute-force scan of the same vectors together with p50
+and p99 lookup latency. Brute-force latency is reported for comparison.
+
+The corpus draws words at random, so its dishes cluster far less than
+real menus do; recall at a given budget is a lower bound for real data.
+
+Usage:
+    python benchmarks/bench_similar.py [--dishes 100000,1000000] [--queries 300]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+import numpy as np
+
+from bench_search_engine import Corpus
+from search.vector_index import VectorIndex
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+SETTINGS = [(8, 4096), (16, 4096), (16, 8192), (32, 8192), (32, 16384)]
+K = 5
+
+
+def percentiles(samples) -> tuple:
+    return float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+
+
+def run(count: int, queries: int):
+    corpus = Corpus(seed=7)
+    dishes = [corpus.dish(i) for i in range(count)]
+
+    index = VectorIndex(rebuild_rows=count + 1)
+    start = time.perf_counter()
+    index.add(dishes)
+    vectorize_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index.rebuild()
+    rebuild_s = time.perf_counter() - start
+    del dishes
+
+    print(f"{count} dishes, {index.dim} dims, {len(index.centroids)} lists")
+    print(f"  vectorize {vectorize_s:.1f}s, cluster {rebuild_s:.1f}s, matrix {index.matrix[:count].nbytes / 2**20:.0f} MiB")
+
+    rows = np.random.default_rng(1).choice(count, queries, replace=False)
+    exact = {}
+    brute_ms = []
+    for row in rows:
+        start = time.perf_counter()
+        nearest, _ = index.exact_nearest(index.matrix[row], K + 1)
+        brute_ms.append((time.perf_counter() - start) * 1000)
+        exact[row] = set(r for r in nearest if r != row)
+    p50, p99 = percentiles(brute_ms)
+    print(f"  brute force                       p50 {p50:7.3f} ms  p99 {p99:7.3f} ms")
+
+    for nprobe, max_candidates in SETTINGS:
+        index.nprobe, index.max_candidates = nprobe, max_candidates
+        recall, latency = [], []
+        for row in rows:
+            start = time.perf_counter()
+            nearest, _ = index._nearest(index.matrix[row], K + 1)
+            latency.append((time.perf_counter() - start) * 1000)
+            found = [r for r in nearest if r != row][:K]
+            recall.append(len(exact[row].intersection(found)) / K)
+        p50, p99 = percentiles(latency)
+        print(
+            f"  nprobe {nprobe:2d} budget {max_candidates:5d}  recall@{K} {np.mean(recall):.3f}"
+            f"  p50 {p50:7.3f} ms  p99 {p99:7.3f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dishes', default='100000,1000000', help='comma-separated corpus sizes')
+    parser.add_argument('--queries', type=int, default=300)
+    args = parser.parse_args()
+
+    for count in args.dishes.split(','):
+        run(int(count), args.queries)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Cold-start cost of menu-service: import time and time to first
+successful RPC.
+
+Every run is a fresh interpreter, so nothing is cached in the process:
+
+- import: ``import server`` / ``import aio_server``. The client libraries
+  (Redis, Elasticsearch, Vision, Storage, Pub/Sub) are imported on first
+  use or by warm-up, so they are timed separately: that is what startup
+  no longer pays before it can listen.
+- first RPC: the server is started as a child process (in-process Redis
+  and Elasticsearch stand-ins, FakeVisionClient, warm-up in the
+  background) and a client polls it. Reported from the moment the child
+  is spawned: when it listens, when grpc.health.v1 reports menu.MenuService
+  SERVING (warm-up done), and when the first ProcessMenuImage succeeds.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--servers sync,aio]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+PROTO_GEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'proto_gen')
+
+CLIENT_LIBRARIES = ('redis', 'elasticsearch', 'google.cloud.vision', 'google.cloud.storage', 'google.cloud.pubsub_v1')
+
+IMPORT_SNIPPET = """
+import sys, time, warnings
+warnings.filterwarnings('ignore')
+sys.path[:0] = [{src!r}, {proto_gen!r}]
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def import_ms(module: str) -> float:
+    """Milliseconds to import ``module`` in a fresh interpreter."""
+    snippet = IMPORT_SNIPPET.format(src=SRC, proto_gen=PROTO_GEN, module=module)
+    output = subprocess.run([sys.executable, '-c', snippet], capture_output=True, text=True, check=True).stdout
+    return float(output.split()[-1])
+
+
+def _serve(mode: str):
+    """Child: start a server on the stand-ins and print its port."""
+    import logging
+    import warnings
+    sys.path[:0] = [SRC, PROTO_GEN]
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings('ignore')
+
+    from stand_ins.fake_vision import AsyncFakeVisionClient, FakeVisionClient
+    from stand_ins.fake_pubsub import FakePublisherClient
+
+    if mode == 'aio':
+        import asyncio
+        from aio_server import AsyncMenuServiceServicer, create_aio_server
+        from processors.async_menu_processor import AsyncMenuProcessor
+        from stand_ins.memory_elasticsearch import AsyncInMemoryElasticsearch
+        from stand_ins.memory_redis import AsyncInMemoryRedis
+
+        async def run():
+            processor = AsyncMenuProcessor(
+                redis_client=AsyncInMemoryRedis(),
+                es_client=AsyncInMemoryElasticsearch(),
+                vision_client=AsyncFakeVisionClient(),
+                publisher=FakePublisherClient()
+            )
+            processor.start_warmup()
+            server, port = create_aio_server(AsyncMenuServiceServicer(processor), '127.0.0.1:0')
+            await server.start()
+            print(port, flush=True)
+            await server.wait_for_termination()
+
+        asyncio.run(run())
+        return
+
+    from server import MenuServiceServicer, create_server
+    from processors.menu_processor import MenuProcessor
+    from stand_ins.memory_elasticsearch import InMemoryElasticsearch
+    from stand_ins.memory_redis import InMemoryRedis
+
+    processor = MenuProcessor(
+        redis_client=InMemoryRedis(),
+        es_client=InMemoryElasticsearch(),
+        vision_client=FakeVisionClient(),
+        publisher=FakePublisherClient()
+    )
+    processor.start_warmup()
+    server, port = create_server(MenuServiceServicer(processor), '127.0.0.1:0')
+    server.start()
+    print(port, flush=True)
+    server.wait_for_termination()
+
+
+def first_rpc(mode: str, env: dict) -> dict:
+    """Milliseconds from spawning a server to it listening, reporting
+    SERVING and answering ProcessMenuImage."""
+    import grpc
+    from grpc_health.v1 import health_pb2, health_pb2_grpc
+    import menu_pb2
+    import menu_pb2_grpc
+
+    start = time.perf_counter()
+    child = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', mode],
+        stdout=subprocess.PIPE, text=True, env=env
+    )
+    try:
+        port = int(child.stdout.readline())
+        timings = {'listening': (time.perf_counter() - start) * 1000}
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            health = health_pb2_grpc.HealthStub(channel)
+            stub = menu_pb2_grpc.MenuServiceStub(channel)
+            request = health_pb2.HealthCheckRequest(service='menu.MenuService')
+            while health.Check(request).status != health_pb2.HealthCheckResponse.SERVING:
+                time.sleep(0.001)
+            timings['serving'] = (time.perf_counter() - start) * 1000
+            options = menu_pb2.ProcessingOptions(extract_prices=True, use_cache=False)
+            stub.ProcessMenuImage(menu_pb2.MenuImageRequest(image_data=b'menu', options=options))
+            timings['first_rpc'] = (time.perf_counter() - start) * 1000
+        return timings
+    finally:
+        child.terminate()
+        child.wait()
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per measurement (median reported)')
+    parser.add_argument('--servers', default='sync,aio')
+    parser.add_argument('--serve', choices=['sync', 'aio'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args.serve)
+        return
+
+    sys.path[:0] = [SRC, PROTO_GEN]
+    servers = args.servers.split(',')
+    modules = {'sync': 'server', 'aio': 'aio_server'}
+
+    print(f"Median of {args.runs} fresh interpreters, ms")
+    print(f"  {'import':32s}  {'ms':>8s}")
+    for mode in servers:
+        print(f"  {modules[mode]:32s}  {median([import_ms(modules[mode]) for _ in range(args.runs)]):8.1f}")
+    for module in CLIENT_LIBRARIES:
+        print(f"  {module + ' (deferred)':32s}  {median([import_ms(module) for _ in range(args.runs)]):8.1f}")
+
+    # Job workers and the outbox are not what is being timed
+    env = dict(os.environ, JOB_QUEUE_BACKEND='memory', OUTBOX_PUBLISHER='file')
+    env.setdefault('OUTBOX_PATH', os.path.join(tempfile.gettempdir(), 'bench-startup-outbox'))
+    print()
+    print(f"  {'server':6s}  {'listening':>10s}  {'serving':>10s}  {'first RPC':>10s}")
+    for mode in servers:
+        runs = [first_rpc(mode, env) for _ in range(args.runs)]
+        result = {name: median([run[name] for run in runs]) for name in runs[0]}
+        print(f"  {mode:6s}  {result['listening']:10.1f}  {result['serving']:10.1f}  {result['first_rpc']:10.1f}")
+
+
+if __name__ == '__main__':
+    main()
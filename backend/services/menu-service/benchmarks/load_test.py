@@ -0,0 +1,156 @@
+"""Compare the thread-pool and asyncio menu-service servers under load.
+
+Each server runs in a child process with local stand-ins for Redis,
+Elasticsearch and Vision (with injected latency), and is driven by an
+asyncio gRPC client issuing ProcessMenuImage calls at fixed concurrency.
+
+Usage:
+    python benchmarks/load_test.py --modes sync aio --concurrency 10 100 1000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+import grpc
+import numpy as np
+
+import menu_pb2
+import menu_pb2_grpc
+
+
+def _run_sync_server(ocr_latency: float, es_latency: float, conn):
+    from server import MenuServiceServicer, create_server
+    from processors.menu_processor import MenuProcessor
+    from stand_ins.fake_vision import FakeVisionClient
+    from stand_ins.memory_elasticsearch import InMemoryElasticsearch
+    from stand_ins.memory_redis import InMemoryRedis
+
+    logging.disable(logging.CRITICAL)
+    processor = MenuProcessor(
+        redis_client=InMemoryRedis(),
+        es_client=InMemoryElasticsearch(latency=es_latency),
+        vision_client=FakeVisionClient(latency=ocr_latency)
+    )
+    server, port = create_server(MenuServiceServicer(processor), '127.0.0.1:0')
+    server.start()
+    conn.send(port)
+    server.wait_for_termination()
+
+
+def _run_aio_server(ocr_latency: float, es_latency: float, conn):
+    from aio_server import AsyncMenuServiceServicer, create_aio_server
+    from processors.async_menu_processor import AsyncMenuProcessor
+    from stand_ins.fake_vision import AsyncFakeVisionClient
+    from stand_ins.memory_elasticsearch import AsyncInMemoryElasticsearch
+    from stand_ins.memory_redis import AsyncInMemoryRedis
+
+    logging.disable(logging.CRITICAL)
+
+    async def run():
+        processor = AsyncMenuProcessor(
+            redis_client=AsyncInMemoryRedis(),
+            es_client=AsyncInMemoryElasticsearch(latency=es_latency),
+            vision_client=AsyncFakeVisionClient(latency=ocr_latency)
+        )
+        server, port = create_aio_server(AsyncMenuServiceServicer(processor), '127.0.0.1:0')
+        await server.start()
+        conn.send(port)
+        await server.wait_for_termination()
+
+    asyncio.run(run())
+
+
+SERVERS = {'sync': _run_sync_server, 'aio': _run_aio_server}
+
+
+async def drive(port: int, concurrency: int, total: int) -> dict:
+    """Send `total` ProcessMenuImage calls with `concurrency` in flight."""
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async with grpc.aio.insecure_channel(f'127.0.0.1:{port}') as channel:
+        stub = menu_pb2_grpc.MenuServiceStub(channel)
+        options = menu_pb2.ProcessingOptions(extract_prices=True, use_cache=False)
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                request = menu_pb2.MenuImageRequest(
+                    image_data=i.to_bytes(8, 'big'),
+                    format='jpg',
+                    options=options
+                )
+                start = time.perf_counter()
+                try:
+                    await stub.ProcessMenuImage(request, timeout=120)
+                    latencies.append(time.perf_counter() - start)
+                except grpc.aio.AioRpcError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        'requests': total,
+        'errors': errors,
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000) if latencies else None,
+        'p99_ms': float(np.percentile(latencies, 99) * 1000) if latencies else None
+    }
+
+
+def run_mode(mode: str, levels, ocr_latency: float, es_latency: float, rounds: int):
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=SERVERS[mode],
+        args=(ocr_latency, es_latency, child),
+        daemon=True
+    )
+    process.start()
+    port = parent.recv()
+
+    try:
+        for concurrency in levels:
+            result = asyncio.run(drive(port, concurrency, concurrency * rounds))
+            print(
+                f"{mode:>4} c={concurrency:<5} "
+                f"rps={result['throughput_rps']:8.1f} "
+                f"p50={result['p50_ms']:8.1f} ms "
+                f"p99={result['p99_ms']:8.1f} ms "
+                f"errors={result['errors']}"
+            )
+    finally:
+        process.terminate()
+        process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=sorted(SERVERS), default=['sync', 'aio'])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[10, 100, 1000])
+    parser.add_argument('--ocr-latency-ms', type=float, default=50)
+    parser.add_argument('--es-latency-ms', type=float, default=5)
+    parser.add_argument('--rounds', type=int, default=3, help='requests per concurrent client')
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        run_mode(
+            mode,
+            args.concurrency,
+            args.ocr_latency_ms / 1000,
+            args.es_latency_ms / 1000,
+            args.rounds
+        )
+
+
+if __name__ == '__main__':
+    main()
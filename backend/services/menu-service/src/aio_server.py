@@ -0,0 +1,235 @@
+import os
+import sys
+import signal
+import asyncio
+import logging
+import grpc
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
+
+import menu_pb2
+import menu_pb2_grpc
+from fetch.fetcher import ImageFetchError
+from health import add_aio_health_servicer
+from instrumentation import start_metrics_server, track_rpc
+from jobs.queue import QueueFull
+from scanner_common.metrics import REGISTRY
+from processors.async_menu_processor import AsyncMenuProcessor
+from processors.base import GET_DISHES_MAX_IDS
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class AsyncMenuServiceServicer(menu_pb2_grpc.MenuServiceServicer):
+    """Implements the MenuService gRPC service on grpc.aio."""
+    
+    def __init__(self, processor=None):
+        self.processor = processor or AsyncMenuProcessor()
+        self.health = None
+        logger.info("Async MenuService initialized")
+    
+    @track_rpc
+    async def ProcessMenuImage(self, request, context):
+        """Process a menu image and extract dishes."""
+        try:
+            logger.info(f"Processing menu image, format: {request.format}")
+            
+            # Queue it and answer at once; the client polls GetMenuStatus
+            if request.options.async_processing:
+                return await self.processor.submit_menu(
+                    image_data=request.image_data,
+                    image_url=request.image_url,
+                    options=request.options
+                )
+            
+            return await self.processor.process_menu(
+                image_data=request.image_data,
+                image_url=request.image_url,
+                options=request.options,
+                timeout=context.time_remaining()
+            )
+            
+        except QueueFull as e:
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details(str(e))
+            return menu_pb2.MenuResponse()
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return menu_pb2.MenuResponse()
+        except ImageFetchError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+            return menu_pb2.MenuResponse()
+        except Exception as e:
+            logger.error(f"Error processing menu image: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+            return menu_pb2.MenuResponse()
+    
+    @track_rpc
+    async def GetMenuStatus(self, request, context):
+        """Get the status, or the result, of an asynchronously processed menu."""
+        try:
+            result = await self.processor.menu_status(request.menu_id)
+            
+            if not result:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details(f"Menu {request.menu_id} not found")
+                return menu_pb2.MenuResponse()
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error getting menu status: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+            return menu_pb2.MenuResponse()
+    
+    @track_rpc
+    async def GetDish(self, request, context):
+        """Get dish details by ID."""
+        try:
+            logger.info(f"Getting dish: {request.dish_id}")
+            
+            result = await self.processor.get_dish(
+                dish_id=request.dish_id,
+                include_similar=request.include_similar
+            )
+            
+            if not result:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details(f"Dish {request.dish_id} not found")
+                return menu_pb2.DishResponse()
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error getting dish: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+            return menu_pb2.DishResponse()
+    
+    @track_rpc
+    async def GetDishes(self, request, context):
+        """Get several dishes by ID."""
+        try:
+            logger.info(f"Getting {len(request.dish_ids)} dishes")
+            
+            if len(request.dish_ids) > GET_DISHES_MAX_IDS:
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                context.set_details(f"At most {GET_DISHES_MAX_IDS} dish IDs per request")
+                return menu_pb2.DishesResponse()
+            
+            return await self.processor.get_dishes(
+                dish_ids=list(request.dish_ids),
+                include_similar=request.include_similar
+            )
+            
+        except Exception as e:
+            logger.error(f"Error getting dishes: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+            return menu_pb2.DishesResponse()
+    
+    @track_rpc
+    async def SearchDishes(self, request, context):
+        """Search dishes."""
+        try:
+            logger.info(f"Searching dishes: {request.query}")
+            
+            return await self.processor.search_dishes(request)
+            
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return menu_pb2.SearchResponse()
+        except Exception as e:
+            logger.error(f"Error searching dishes: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+            return menu_pb2.SearchResponse()
+    
+    @track_rpc
+    async def StreamDishProcessing(self, request, context):
+        """Stream dish processing results."""
+        try:
+            logger.info("Starting streaming dish processing")
+            
+            async for dish in self.processor.process_menu_stream(
+                image_data=request.image_data,
+                image_url=request.image_url,
+                options=request.options,
+                timeout=context.time_remaining(),
+                is_active=lambda: not context.done()
+            ):
+                yield dish
+                
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+        except ImageFetchError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+        except Exception as e:
+            logger.error(f"Error in streaming processing: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+
+
+def create_aio_server(servicer, address):
+    """Build a grpc.aio server for the servicer; returns (server, port)."""
+    server = grpc.aio.server(
+        maximum_concurrent_rpcs=int(os.getenv('AIO_MAX_CONCURRENT_RPCS', 1000))
+    )
+    
+    menu_pb2_grpc.add_MenuServiceServicer_to_server(servicer, server)
+    # grpc.health.v1: liveness, readiness and each dependency, from the processor's checks
+    servicer.health = add_aio_health_servicer(server, servicer.processor.readiness)
+    
+    port = server.add_insecure_port(address)
+    return server, port
+
+
+async def serve_aio():
+    """Start the asyncio gRPC server."""
+    port = os.getenv('GRPC_PORT', '50051')
+    servicer = AsyncMenuServiceServicer()
+    # Connections, GCP clients and indexes come up in the background; the
+    # health service reports NOT_SERVING for readiness until they have
+    servicer.processor.start_warmup()
+    # Job workers are opt-in: each is a process with its own MenuProcessor
+    if int(os.getenv('JOB_WORKERS', 0)) > 0:
+        servicer.processor.start_job_workers()
+    server, _ = create_aio_server(servicer, f'[::]:{port}')
+    metrics_server = start_metrics_server()
+    await server.start()
+    
+    # Coroutines the event loop is juggling (RPCs plus background tasks)
+    loop = asyncio.get_running_loop()
+    REGISTRY.gauge('asyncio_tasks', 'Pending tasks on the event loop', function=lambda: len(asyncio.all_tasks(loop)))
+    
+    logger.info(f"Menu Service (asyncio) started on port {port}")
+    
+    async def drain():
+        logger.info("Received SIGTERM, draining in-flight requests...")
+        await servicer.health.enter_graceful_shutdown()
+        await server.stop(int(os.getenv('SHUTDOWN_GRACE_SECONDS', 10)))
+    
+    loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.ensure_future(drain()))
+    
+    try:
+        await server.wait_for_termination()
+    finally:
+        await servicer.processor.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(serve_aio())
@@ -0,0 +1,192 @@
+import os
+import zlib
+import struct
+import hashlib
+import logging
+import threading
+from typing import Optional, Type, TypeVar
+
+from google.protobuf.message import DecodeError, Message
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # optional dependency
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar('M', bound=Message)
+
+# Bump when the meaning of a cached payload changes (e.g. dish entries
+# switching from the Elasticsearch JSON source to a Dish message); entries
+# written under another schema read as misses instead of being misparsed.
+CACHE_SCHEMA_VERSION = 1
+
+MAGIC = b'MC'
+FORMAT_VERSION = 1
+# magic, format version, schema version, compression, content hash
+HEADER = struct.Struct('>2sBBB8s')
+
+NONE, ZLIB, ZSTD, LZ4 = 0, 1, 2, 3
+COMPRESSIONS = {'none': NONE, 'zlib': ZLIB, 'zstd': ZSTD, 'lz4': LZ4}
+# Fast settings; lz4 levels above 2 switch to the much slower HC mode
+DEFAULT_LEVELS = {'none': 0, 'zlib': 1, 'zstd': 3, 'lz4': 0}
+
+
+def content_hash(payload: bytes) -> bytes:
+    return hashlib.blake2b(payload, digest_size=8).digest()
+
+
+def compression_available(name: str) -> bool:
+    if name == 'zstd':
+        return zstandard is not None
+    if name == 'lz4':
+        return lz4_frame is not None
+    return name in COMPRESSIONS
+
+
+class CacheCodec:
+    """Binary framing for Redis cache values.
+
+    A value is a 13-byte header followed by the payload, compressed when it
+    is at least ``min_compress_bytes`` long and that saves space::
+
+        b'MC' | format version | schema version | compression | blake2b-64 of payload
+
+    Decoding returns None for anything that does not match: values written
+    in the old text formats, by a replica with another schema version, with
+    a compression this replica lacks, or whose content hash is wrong. Those
+    read as cache misses and get rewritten, so mixed versions can share one
+    Redis during a rolling upgrade.
+    """
+
+    def __init__(
+        self,
+        compression: Optional[str] = None,
+        min_compress_bytes: Optional[int] = None,
+        level: Optional[int] = None,
+        schema_version: int = CACHE_SCHEMA_VERSION
+    ):
+        name = (compression or os.getenv('CACHE_COMPRESSION', 'zstd')).lower()
+        if name not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression: {name}")
+        if not compression_available(name):
+            logger.warning(f"{name} is not installed; compressing cache entries with zlib")
+            name = 'zlib'
+        self.compression = name
+        self.min_compress_bytes = min_compress_bytes if min_compress_bytes is not None else int(
+            os.getenv('CACHE_COMPRESS_MIN_BYTES', 1024)
+        )
+        self.level = level if level is not None else int(
+            os.getenv('CACHE_COMPRESSION_LEVEL', DEFAULT_LEVELS[name])
+        )
+        self.schema_version = schema_version
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {
+            'encoded': 0,
+            'compressed': 0,
+            'decoded': 0,
+            'rejected': 0,
+            'payload_bytes': 0,
+            'stored_bytes': 0
+        }
+
+    def encode(self, payload: bytes) -> bytes:
+        """Frame (and maybe compress) a payload for storage."""
+        method = NONE
+        body = payload
+        if self.compression != 'none' and len(payload) >= self.min_compress_bytes:
+            compressed = self._compress(payload)
+            if len(compressed) < len(payload):
+                method = COMPRESSIONS[self.compression]
+                body = compressed
+
+        value = HEADER.pack(MAGIC, FORMAT_VERSION, self.schema_version, method, content_hash(payload)) + body
+        with self._lock:
+            self._stats['encoded'] += 1
+            self._stats['compressed'] += method != NONE
+            self._stats['payload_bytes'] += len(payload)
+            self._stats['stored_bytes'] += len(value)
+        return value
+
+    def decode(self, value) -> Optional[bytes]:
+        """The payload of a stored value, or None if it cannot be trusted."""
+        if not isinstance(value, (bytes, bytearray, memoryview)) or len(value) < HEADER.size:
+            return self._reject('not a framed value')
+        magic, version, schema_version, method, digest = HEADER.unpack_from(value)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return self._reject('not a framed value')
+        if schema_version != self.schema_version:
+            return self._reject(f"schema version {schema_version}")
+
+        body = memoryview(value)[HEADER.size:]
+        try:
+            payload = self._decompress(method, body)
+        except Exception as e:
+            return self._reject(f"decompression failed: {e}")
+        if payload is None:
+            return self._reject(f"unsupported compression {method}")
+        if content_hash(payload) != digest:
+            return self._reject('content hash mismatch')
+
+        with self._lock:
+            self._stats['decoded'] += 1
+        return payload
+
+    def encode_message(self, message: Message) -> bytes:
+        return self.encode(message.SerializeToString())
+
+    def decode_message(self, value, message_type: Type[M]) -> Optional[M]:
+        payload = self.decode(value)
+        if payload is None:
+            return None
+        try:
+            return message_type.FromString(payload)
+        except DecodeError as e:
+            return self._reject(f"invalid {message_type.__name__}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['compression'] = self.compression
+        stats['ratio'] = round(stats['stored_bytes'] / stats['payload_bytes'], 4) if stats['payload_bytes'] else 0.0
+        return stats
+
+    def _compress(self, payload: bytes) -> bytes:
+        if self.compression == 'zstd':
+            # Compression contexts are not thread-safe; keep one per thread
+            compressor = getattr(self._local, 'compressor', None)
+            if compressor is None:
+                compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+            return compressor.compress(payload)
+        if self.compression == 'lz4':
+            return lz4_frame.compress(payload, compression_level=self.level)
+        return zlib.compress(payload, self.level)
+
+    def _decompress(self, method: int, body: memoryview) -> Optional[bytes]:
+        if method == NONE:
+            return bytes(body)
+        if method == ZLIB:
+            return zlib.decompress(body)
+        if method == ZSTD and zstandard is not None:
+            decompressor = getattr(self._local, 'decompressor', None)
+            if decompressor is None:
+                decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+            return decompressor.decompress(body)
+        if method == LZ4 and lz4_frame is not None:
+            return lz4_frame.decompress(body)
+        return None
+
+    def _reject(self, reason: str) -> None:
+        logger.debug(f"Ignoring cache value: {reason}")
+        with self._lock:
+            self._stats['rejected'] += 1
+        return None
+
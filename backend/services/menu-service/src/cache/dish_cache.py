@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DISH_INVALIDATION_CHANNEL = os.getenv('DISH_INVALIDATION_CHANNEL', 'dish-invalidations')
+
+
+class LocalDishCache:
+    """Bounded in-process LRU of built Dish messages (the L1 in front of Redis).
+
+    Entries expire after ``ttl_seconds`` so a missed invalidation only
+    serves stale data for a bounded time. Cached messages are shared and
+    must be treated as read-only (DishResponse(dish=...) copies them).
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        self.max_entries = max_entries or int(os.getenv('DISH_L1_MAX_ENTRIES', 2000))
+        self.max_bytes = max_bytes or int(os.getenv('DISH_L1_MAX_BYTES', 16 * 1024 * 1024))
+        self.ttl_seconds = ttl_seconds or float(os.getenv('DISH_L1_TTL', 60))
+        self._data = OrderedDict()  # dish_id -> (dish, size, expires_at)
+        self._bytes = 0
+        # Bumped by every invalidation. Each invalidated dish remembers the
+        # generation it was invalidated at, so a load of that dish that
+        # started earlier must not fill, while loads of other dishes still
+        # do; dishes dropped from that bounded record count as invalidated
+        # at _floor.
+        self.generation = 0
+        self._invalidated = OrderedDict()  # dish_id -> generation
+        self._max_invalidated = 4 * self.max_entries
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, dish_id: str):
+        with self._lock:
+            entry = self._data.get(dish_id)
+            if entry is None:
+                return None
+            dish, _, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._evict(dish_id)
+                return None
+            self._data.move_to_end(dish_id)
+            return dish
+
+    def put(self, dish_id: str, dish, generation: Optional[int] = None):
+        """Cache a dish, unless it was invalidated after ``generation`` was read."""
+        size = dish.ByteSize()
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation < self._invalidated.get(dish_id, self._floor):
+                return
+            if dish_id in self._data:
+                self._evict(dish_id)
+            self._data[dish_id] = (dish, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                self._evict(next(iter(self._data)))
+
+    def invalidate(self, dish_ids: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            self.generation += 1
+            for dish_id in dish_ids:
+                self._invalidated.pop(dish_id, None)
+                self._invalidated[dish_id] = self.generation
+                if dish_id in self._data:
+                    self._evict(dish_id)
+                    removed += 1
+            while len(self._invalidated) > self._max_invalidated:
+                _, self._floor = self._invalidated.popitem(last=False)
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._floor = self.generation
+            self._invalidated.clear()
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def _evict(self, dish_id: str):
+        _, size, _ = self._data.pop(dish_id)
+        self._bytes -= size
+
+
+class SingleFlight:
+    """Run at most one load per key; concurrent callers share its result."""
+
+    class _Call:
+        __slots__ = ('done', 'result', 'error')
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls: Dict[str, 'SingleFlight._Call'] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, load: Callable[[], object]):
+        """Return (result, shared); ``shared`` is True if another caller did the load."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = load()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, load):
+        """Await ``load()`` once per key; returns (result, shared)."""
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await load()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure with no waiters is not reported
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
+
+
+class DishCacheStats:
+    """Per-tier counters for GetDish lookups."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            'l1_hits': 0,
+            'l2_hits': 0,
+            'origin_loads': 0,
+            'coalesced': 0,
+            'not_found': 0,
+            'invalidations_sent': 0,
+            'invalidations_received': 0
+        }
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def snapshot(self, l1: LocalDishCache) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['l1_hits'] + stats['l2_hits'] + stats['origin_loads'] + stats['coalesced'] + stats['not_found']
+        stats['l1_hit_ratio'] = round(stats['l1_hits'] / lookups, 4) if lookups else 0.0
+        l2_lookups = lookups - stats['l1_hits']
+        stats['l2_hit_ratio'] = round(stats['l2_hits'] / l2_lookups, 4) if l2_lookups else 0.0
+        stats['l1_entries'] = len(l1)
+        stats['l1_bytes'] = l1.bytes
+        return stats
+
+
+def encode_invalidation(dish_ids: Iterable[str]) -> str:
+    return json.dumps(list(dish_ids))
+
+
+def decode_invalidation(message) -> list:
+    data = message.get('data') if isinstance(message, dict) else None
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    if not isinstance(data, str):
+        return []
+    try:
+        return json.loads(data)
+    except ValueError:
+        logger.warning(f"Ignoring malformed dish invalidation: {data[:100]}")
+        return []
+
+
+class DishInvalidationListener:
+    """Background thread applying dish invalidations published by any replica."""
+
+    def __init__(self, redis_client, l1: LocalDishCache, stats: DishCacheStats, channel: str = DISH_INVALIDATION_CHANNEL):
+        self.redis_client = redis_client
+        self.l1 = l1
+        self.stats = stats
+        self.channel = channel
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='dish-invalidations', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(self.channel)
+                    while not self._stopped.is_set():
+                        message = pubsub.get_message(timeout=1.0)
+                        if message is not None:
+                            dish_ids = decode_invalidation(message)
+                            self.l1.invalidate(dish_ids)
+                            self.stats.count('invalidations_received', len(dish_ids))
+                finally:
+                    pubsub.close()
+            except Exception as e:
+                # Entries still expire by TTL while the subscription is down
+                logger.warning(f"Dish invalidation subscription lost: {e}")
+                # Invalidations may have been missed while disconnected
+                self.l1.clear()
+                self._stopped.wait(1.0)
+
+
+class AsyncDishInvalidationListener:
+    """asyncio task applying dish invalidations, for the redis.asyncio client."""
+
+    def __init__(self, redis_client, l1: LocalDishCache, stats: DishCacheStats, channel: str = DISH_INVALIDATION_CHANNEL):
+        self.redis_client = redis_client
+        self.l1 = l1
+        self.stats = stats
+        self.channel = channel
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.channel)
+                try:
+                    while True:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message is not None:
+                            dish_ids = decode_invalidation(message)
+                            self.l1.invalidate(dish_ids)
+                            self.stats.count('invalidations_received', len(dish_ids))
+                finally:
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Dish invalidation subscription lost: {e}")
+                self.l1.clear()
+                await asyncio.sleep(1.0)
@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+import threading
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+from scanner_common.ocr.base import OCRResult
+from cache.codec import CacheCodec
+from parsing.categorizer import default_categorizer
+from parsing.menu_parser import PARSER_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+class MenuCache:
+    """Content-addressed cache for OCR annotations and processed menus.
+
+    Two layers are kept in the same Redis keyspace:
+
+    - ``ocr:{image_digest}`` holds the OCR result (text and word boxes) for an image.
+    - ``menu:{image_digest}:{options_digest}`` holds the final MenuResponse.
+
+    Changing parse options therefore misses the menu layer but still reuses
+    the OCR result for the same image. Values are framed by CacheCodec:
+    the menu layer holds raw MenuResponse bytes, the OCR layer JSON, both
+    compressed when large.
+    """
+
+    OCR_PREFIX = 'ocr:'
+    MENU_PREFIX = 'menu:'
+
+    def __init__(
+        self,
+        redis_client,
+        ttl_seconds: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        codec: Optional[CacheCodec] = None
+    ):
+        self.redis_client = redis_client
+        self.codec = codec or CacheCodec()
+        self.ttl_seconds = ttl_seconds or int(os.getenv('MENU_CACHE_TTL', 3600))
+        self.max_entry_bytes = max_entry_bytes or int(
+            os.getenv('MENU_CACHE_MAX_ENTRY_BYTES', 4 * 1024 * 1024)
+        )
+
+        self._lock = threading.Lock()
+        self._stats = {
+            'ocr_hits': 0,
+            'ocr_misses': 0,
+            'menu_hits': 0,
+            'menu_misses': 0,
+            'bytes_read': 0,
+            'bytes_written': 0,
+            'skipped_oversize': 0,
+            'errors': 0
+        }
+
+    @staticmethod
+    def image_digest(image_data: bytes, image_url: str = '') -> Optional[str]:
+        """Return a content digest for the request image, or None if there is none."""
+        if image_data:
+            return hashlib.sha256(image_data).hexdigest()
+        if image_url:
+            canonical = MenuCache.canonical_url(image_url)
+            return hashlib.sha256(f'url:{canonical}'.encode('utf-8')).hexdigest()
+        return None
+
+    @staticmethod
+    def canonical_url(image_url: str) -> str:
+        """Normalize a URL so trivially different spellings share a key."""
+        parts = urlsplit(image_url.strip())
+        return urlunsplit((
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path,
+            parts.query,
+            ''
+        ))
+
+    @staticmethod
+    def options_digest(options: menu_pb2.ProcessingOptions) -> str:
+        """Digest of the ProcessingOptions fields that change the parsed output."""
+        key = json.dumps({
+            'extract_prices': options.extract_prices,
+            'extract_descriptions': options.extract_descriptions,
+            'extract_ingredients': options.extract_ingredients,
+            'language': options.language.lower(),
+            'parser': PARSER_VERSION,
+            'taxonomy': default_categorizer().version
+        }, sort_keys=True)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+    def get_ocr(self, image_digest: str, language: str = '') -> Optional[OCRResult]:
+        """Get the cached OCR result for an image, read for ``language``."""
+        cached = self._get(self._ocr_key(image_digest, language))
+        if cached is None:
+            self._count('ocr_misses')
+            return None
+
+        return self._decode_ocr(cached)
+
+    def put_ocr(self, image_digest: str, result: OCRResult, language: str = ''):
+        """Cache the OCR result for an image, read for ``language``."""
+        self._set(self._ocr_key(image_digest, language), self._encode_ocr(result))
+
+    def get_menu(
+        self,
+        image_digest: str,
+        options: menu_pb2.ProcessingOptions
+    ) -> Optional[menu_pb2.MenuResponse]:
+        """Get a cached MenuResponse for an image and option set."""
+        cached = self._get(self._menu_key(image_digest, options))
+        if cached is None:
+            self._count('menu_misses')
+            return None
+
+        return self._deserialize_menu_response(cached)
+
+    def put_menu(
+        self,
+        image_digest: str,
+        options: menu_pb2.ProcessingOptions,
+        response: menu_pb2.MenuResponse
+    ):
+        """Cache a MenuResponse for an image and option set."""
+        self._set(
+            self._menu_key(image_digest, options),
+            self._serialize_menu_response(response)
+        )
+
+    def stats(self) -> dict:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _ocr_key(self, image_digest: str, language: str) -> str:
+        # Text read without a language hint keeps the original key
+        return f"{self.OCR_PREFIX}{image_digest}:{language}" if language else f"{self.OCR_PREFIX}{image_digest}"
+
+    def _menu_key(self, image_digest: str, options: menu_pb2.ProcessingOptions) -> str:
+        return f"{self.MENU_PREFIX}{image_digest}:{self.options_digest(options)}"
+
+    def _get(self, key: str):
+        try:
+            cached = self.redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Cache read failed for {key}: {e}")
+            self._count('errors')
+            return None
+
+        if cached is not None:
+            self._count('bytes_read', len(cached))
+        return cached
+
+    def _set(self, key: str, payload: bytes):
+        if len(payload) > self.max_entry_bytes:
+            logger.info(f"Not caching {key}: {len(payload)} bytes exceeds limit")
+            self._count('skipped_oversize')
+            return
+
+        try:
+            self.redis_client.setex(key, self.ttl_seconds, payload)
+            self._count('bytes_written', len(payload))
+        except Exception as e:
+            logger.warning(f"Cache write failed for {key}: {e}")
+            self._count('errors')
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _serialize_menu_response(self, response: menu_pb2.MenuResponse) -> bytes:
+        """Serialize MenuResponse to a framed cache value."""
+        return self.codec.encode_message(response)
+
+    def _encode_ocr(self, result: OCRResult) -> bytes:
+        return self.codec.encode(json.dumps(result.to_dict()).encode('utf-8'))
+
+    def _decode_ocr(self, data: bytes) -> Optional[OCRResult]:
+        payload = self.codec.decode(data)
+        if payload is None:
+            self._count('ocr_misses')
+            return None
+        self._count('ocr_hits')
+        decoded = json.loads(payload)
+        if isinstance(decoded, list):
+            # Entries written before word boxes were cached: plain annotations
+            return OCRResult.from_annotations(decoded)
+        return OCRResult.from_dict(decoded)
+
+    def _deserialize_menu_response(self, data: bytes) -> Optional[menu_pb2.MenuResponse]:
+        """Deserialize MenuResponse from a framed cache value."""
+        response = self.codec.decode_message(data, menu_pb2.MenuResponse)
+        self._count('menu_hits' if response is not None else 'menu_misses')
+        return response
+
+
+class AsyncMenuCache(MenuCache):
+    """MenuCache over an asyncio Redis client (redis.asyncio)."""
+
+    async def get_ocr(self, image_digest: str, language: str = '') -> Optional[OCRResult]:
+        """Get the cached OCR result for an image, read for ``language``."""
+        cached = await self._get(self._ocr_key(image_digest, language))
+        if cached is None:
+            self._count('ocr_misses')
+            return None
+
+        return self._decode_ocr(cached)
+
+    async def put_ocr(self, image_digest: str, result: OCRResult, language: str = ''):
+        """Cache the OCR result for an image, read for ``language``."""
+        await self._set(self._ocr_key(image_digest, language), self._encode_ocr(result))
+
+    async def get_menu(
+        self,
+        image_digest: str,
+        options: menu_pb2.ProcessingOptions
+    ) -> Optional[menu_pb2.MenuResponse]:
+        """Get a cached MenuResponse for an image and option set."""
+        cached = await self._get(self._menu_key(image_digest, options))
+        if cached is None:
+            self._count('menu_misses')
+            return None
+
+        return self._deserialize_menu_response(cached)
+
+    async def put_menu(
+        self,
+        image_digest: str,
+        options: menu_pb2.ProcessingOptions,
+        response: menu_pb2.MenuResponse
+    ):
+        """Cache a MenuResponse for an image and option set."""
+        await self._set(
+            self._menu_key(image_digest, options),
+            self._serialize_menu_response(response)
+        )
+
+    async def _get(self, key: str):
+        try:
+            cached = await self.redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Cache read failed for {key}: {e}")
+            self._count('errors')
+            return None
+
+        if cached is not None:
+            self._count('bytes_read', len(cached))
+        return cached
+
+    async def _set(self, key: str, payload: bytes):
+        if len(payload) > self.max_entry_bytes:
+            logger.info(f"Not caching {key}: {len(payload)} bytes exceeds limit")
+            self._count('skipped_oversize')
+            return
+
+        try:
+            await self.redis_client.setex(key, self.ttl_seconds, payload)
+            self._count('bytes_written', len(payload))
+        except Exception as e:
+            logger.warning(f"Cache write failed for {key}: {e}")
+            self._count('errors')
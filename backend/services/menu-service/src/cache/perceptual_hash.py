@@ -0,0 +1,226 @@
+import os
+import io
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def dhash(image_data: bytes, hash_size: int = 8) -> Optional[int]:
+    """Compute a difference hash of an image as a hash_size**2 bit integer."""
+    try:
+        image = Image.open(io.BytesIO(image_data))
+        # JPEG draft mode lets the decoder skip most of the full-resolution work
+        image.draft('L', (hash_size * 8, hash_size * 8))
+        image = image.convert('L').resize(
+            (hash_size + 1, hash_size),
+            Image.Resampling.LANCZOS
+        )
+    except Exception as e:
+        logger.debug(f"Could not compute perceptual hash: {e}")
+        return None
+
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+class MultiIndexHash:
+    """Multi-index hashing for Hamming-radius search over 64-bit hashes.
+
+    Each hash is split into ``chunks`` substrings, each with its own exact
+    lookup table. By the pigeonhole principle any hash within ``max_distance``
+    differs from the query by at most ``max_distance // chunks`` bits in at
+    least one substring, so only those buckets need to be probed.
+    """
+
+    def __init__(self, bits: int = 64, chunks: int = 4):
+        self.bits = bits
+        self.chunks = chunks
+        self.chunk_bits = bits // chunks
+        self._mask = (1 << self.chunk_bits) - 1
+        self._tables = [{} for _ in range(chunks)]
+        self._hashes = {}  # item id -> hash
+        self._values = {}  # item id -> value
+        self._ids = {}  # hash -> item id
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def add(self, hash_value: int, value):
+        """Insert a hash; an exact duplicate replaces the stored value."""
+        existing = self._ids.get(hash_value)
+        if existing is not None:
+            self._values[existing] = value
+            return
+
+        item_id = self._next_id
+        self._next_id += 1
+        self._hashes[item_id] = hash_value
+        self._values[item_id] = value
+        self._ids[hash_value] = item_id
+        for table, chunk in zip(self._tables, self._split(hash_value)):
+            table.setdefault(chunk, []).append(item_id)
+
+    def remove(self, hash_value: int) -> bool:
+        """Remove a hash; returns False if it was not stored."""
+        item_id = self._ids.pop(hash_value, None)
+        if item_id is None:
+            return False
+
+        del self._hashes[item_id]
+        del self._values[item_id]
+        for table, chunk in zip(self._tables, self._split(hash_value)):
+            bucket = table[chunk]
+            bucket.remove(item_id)
+            if not bucket:
+                del table[chunk]
+        return True
+
+    def search(self, hash_value: int, max_distance: int) -> List[Tuple[int, object]]:
+        """Return (distance, value) pairs within max_distance, closest first."""
+        radius = max_distance // self.chunks
+        candidates = set()
+        for table, chunk in zip(self._tables, self._split(hash_value)):
+            for probe in self._neighbours(chunk, radius):
+                bucket = table.get(probe)
+                if bucket:
+                    candidates.update(bucket)
+
+        matches = []
+        for item_id in candidates:
+            distance = hamming_distance(hash_value, self._hashes[item_id])
+            if distance <= max_distance:
+                matches.append((distance, self._values[item_id]))
+
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def _split(self, hash_value: int) -> List[int]:
+        return [
+            (hash_value >> (i * self.chunk_bits)) & self._mask
+            for i in range(self.chunks)
+        ]
+
+    def _neighbours(self, chunk: int, radius: int):
+        """All values within `radius` bit flips of chunk."""
+        yield chunk
+        seen = {chunk}
+        frontier = [chunk]
+        for _ in range(radius):
+            next_frontier = []
+            for value in frontier:
+                for bit in range(self.chunk_bits):
+                    neighbour = value ^ (1 << bit)
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        next_frontier.append(neighbour)
+                        yield neighbour
+            frontier = next_frontier
+
+
+class NearDuplicateIndex:
+    """Maps perceptual hashes of menu photos to the digest of their OCR result.
+
+    Entries are kept per OCR language, since the OCR cache is. The index is
+    bounded: entries older than the OCR cache TTL are dropped on lookup,
+    the least recently used go once ``max_entries`` is reached, and callers
+    ``discard`` a digest whose OCR entry has already left Redis.
+    """
+
+    def __init__(
+        self,
+        max_distance: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[int] = None
+    ):
+        if max_distance is None:
+            max_distance = int(os.getenv('PHASH_MAX_DISTANCE', 6))
+        self.max_distance = max_distance
+        self.max_entries = max_entries or int(os.getenv('PHASH_MAX_ENTRIES', 100000))
+        # The OCR entries the index points to expire after MENU_CACHE_TTL
+        self.ttl_seconds = ttl_seconds or int(os.getenv('MENU_CACHE_TTL', 3600))
+
+        self._indexes = {}  # language -> MultiIndexHash
+        self._entries = OrderedDict()  # (language, phash) -> (image_digest, expires_at), LRU order
+        self._hashes = {}  # (language, image_digest) -> phash
+        self._lock = threading.Lock()
+        self._stats = {'lookups': 0, 'hits': 0, 'misses': 0, 'evicted': 0, 'expired': 0, 'discarded': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find(self, phash: int, language: str = '') -> Optional[str]:
+        """Return the image digest of the closest stored hash within the threshold."""
+        with self._lock:
+            self._stats['lookups'] += 1
+            index = self._indexes.get(language)
+            matches = index.search(phash, self.max_distance) if index is not None else []
+            now = time.monotonic()
+            for _, stored in matches:
+                key = (language, stored)
+                image_digest, expires_at = self._entries[key]
+                if expires_at <= now:
+                    self._remove(key)
+                    self._stats['expired'] += 1
+                    continue
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return image_digest
+            self._stats['misses'] += 1
+            return None
+
+    def add(self, phash: int, image_digest: str, language: str = ''):
+        """Remember which OCR result a perceptual hash belongs to."""
+        key = (language, phash)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            index = self._indexes.get(language)
+            if index is None:
+                index = self._indexes[language] = MultiIndexHash()
+            # The index stores the hash itself; the digest lives in _entries
+            index.add(phash, phash)
+            self._entries[key] = (image_digest, time.monotonic() + self.ttl_seconds)
+            self._hashes[(language, image_digest)] = phash
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats['evicted'] += 1
+
+    def discard(self, image_digest: str, language: str = ''):
+        """Forget a digest whose OCR entry is no longer cached."""
+        with self._lock:
+            phash = self._hashes.get((language, image_digest))
+            if phash is not None:
+                self._remove((language, phash))
+                self._stats['discarded'] += 1
+
+    def stats(self) -> dict:
+        """Return lookup and eviction counters and the current hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['hit_rate'] = stats['hits'] / stats['lookups'] if stats['lookups'] else 0.0
+        return stats
+
+    def _remove(self, key: Tuple[str, int]):
+        language, phash = key
+        image_digest, _ = self._entries.pop(key)
+        if self._hashes.get((language, image_digest)) == phash:
+            del self._hashes[(language, image_digest)]
+        index = self._indexes[language]
+        index.remove(phash)
+        if not len(index):
+            del self._indexes[language]
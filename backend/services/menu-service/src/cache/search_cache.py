@@ -0,0 +1,208 @@
+import os
+import sys
+import asyncio
+import logging
+import threading
+from typing import Optional, Tuple
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+from cache.codec import CacheCodec
+from search.pagination import request_digest
+
+logger = logging.getLogger(__name__)
+
+
+class SearchCache:
+    """Short-lived Redis cache of first-page SearchResponses.
+
+    Entries are keyed by the normalized request and tagged with the index
+    generation they were built at. Index writes bump ``search:generation``,
+    so older entries stop matching instead of living out their TTL. The
+    writes of ``invalidate_interval`` seconds (every dish of a streamed
+    menu, every menu scanned meanwhile) share one bump, made when the
+    interval ends, so the cache is not emptied on every write. A lookup
+    reads the generation and the entry with one MGET. Entries are the
+    generation, ``:`` and a CacheCodec-framed SearchResponse.
+    """
+
+    PREFIX = 'search:'
+    GENERATION_KEY = 'search:generation'
+
+    def __init__(self, redis_client, ttl_seconds: Optional[int] = None, codec: Optional[CacheCodec] = None):
+        self.redis_client = redis_client
+        self.codec = codec or CacheCodec()
+        self.ttl_seconds = ttl_seconds or int(os.getenv('SEARCH_CACHE_TTL', 30))
+        self.enabled = os.getenv('SEARCH_CACHE_ENABLED', 'true').lower() == 'true'
+        self.invalidate_interval = float(os.getenv('SEARCH_CACHE_INVALIDATE_INTERVAL', 1.0))
+
+        self._lock = threading.Lock()
+        self._pending = None  # the timer that will make the next bump
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'invalidations': 0,
+            'coalesced': 0,
+            'errors': 0
+        }
+
+    def get(self, request: menu_pb2.SearchRequest) -> Tuple[Optional[menu_pb2.SearchResponse], Optional[str]]:
+        """Return (cached response or None, current generation for put())."""
+        if not self.enabled:
+            return None, None
+        try:
+            generation, cached = self.redis_client.mget([self.GENERATION_KEY, self._key(request)])
+        except Exception as e:
+            logger.warning(f"Search cache read failed: {e}")
+            self._count('errors')
+            return None, None
+        generation = self._generation(generation)
+        return self._decode(cached, generation), generation
+
+    def put(self, request: menu_pb2.SearchRequest, response: menu_pb2.SearchResponse, generation: Optional[str]):
+        """Cache a response built after reading ``generation``."""
+        if generation is None:
+            return
+        try:
+            self.redis_client.setex(self._key(request), self.ttl_seconds, self._encode(response, generation))
+        except Exception as e:
+            logger.warning(f"Search cache write failed: {e}")
+            self._count('errors')
+
+    def invalidate(self):
+        """Expire every cached search (called after index writes), at the
+        end of the current invalidate_interval."""
+        if not self.enabled:
+            return
+        if self.invalidate_interval <= 0:
+            self._bump()
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._stats['coalesced'] += 1
+                return
+            self._pending = threading.Timer(self.invalidate_interval, self._bump_pending)
+            self._pending.daemon = True
+            self._pending.start()
+
+    def close(self):
+        """Make a pending bump now."""
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.cancel()
+            self._bump()
+
+    def _bump_pending(self):
+        with self._lock:
+            self._pending = None
+        self._bump()
+
+    def _bump(self):
+        try:
+            self.redis_client.incr(self.GENERATION_KEY)
+            self._count('invalidations')
+        except Exception as e:
+            logger.warning(f"Search cache invalidation failed: {e}")
+            self._count('errors')
+
+    def stats(self) -> dict:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _key(self, request: menu_pb2.SearchRequest) -> str:
+        return f"{self.PREFIX}{request_digest(request)}"
+
+    def _encode(self, response: menu_pb2.SearchResponse, generation: str) -> bytes:
+        return f"{generation}:".encode('ascii') + self.codec.encode_message(response)
+
+    @staticmethod
+    def _generation(value) -> str:
+        if isinstance(value, bytes):
+            value = value.decode('ascii')
+        return value or '0'
+
+    def _decode(self, cached, generation: str) -> Optional[menu_pb2.SearchResponse]:
+        if cached is None:
+            self._count('misses')
+            return None
+        if isinstance(cached, str):
+            # Hex entries from before the binary codec
+            self._count('misses')
+            return None
+        entry_generation, _, payload = cached.partition(b':')
+        if entry_generation.decode('ascii', 'replace') != generation:
+            self._count('stale')
+            return None
+        response = self.codec.decode_message(payload, menu_pb2.SearchResponse)
+        self._count('hits' if response is not None else 'misses')
+        return response
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+
+class AsyncSearchCache(SearchCache):
+    """SearchCache over an asyncio Redis client (redis.asyncio)."""
+
+    async def get(self, request: menu_pb2.SearchRequest) -> Tuple[Optional[menu_pb2.SearchResponse], Optional[str]]:
+        """Return (cached response or None, current generation for put())."""
+        if not self.enabled:
+            return None, None
+        try:
+            generation, cached = await self.redis_client.mget([self.GENERATION_KEY, self._key(request)])
+        except Exception as e:
+            logger.warning(f"Search cache read failed: {e}")
+            self._count('errors')
+            return None, None
+        generation = self._generation(generation)
+        return self._decode(cached, generation), generation
+
+    async def put(self, request: menu_pb2.SearchRequest, response: menu_pb2.SearchResponse, generation: Optional[str]):
+        """Cache a response built after reading ``generation``."""
+        if generation is None:
+            return
+        try:
+            await self.redis_client.setex(self._key(request), self.ttl_seconds, self._encode(response, generation))
+        except Exception as e:
+            logger.warning(f"Search cache write failed: {e}")
+            self._count('errors')
+
+    async def invalidate(self):
+        """Expire every cached search (called after index writes), at the
+        end of the current invalidate_interval."""
+        if not self.enabled:
+            return
+        if self.invalidate_interval <= 0:
+            await self._bump()
+            return
+        if self._pending is not None:
+            self._count('coalesced')
+            return
+        self._pending = asyncio.get_running_loop().create_task(self._bump_later())
+
+    async def close(self):
+        """Make a pending bump now."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+            await self._bump()
+
+    async def _bump_later(self):
+        await asyncio.sleep(self.invalidate_interval)
+        self._pending = None
+        await self._bump()
+
+    async def _bump(self):
+        try:
+            await self.redis_client.incr(self.GENERATION_KEY)
+            self._count('invalidations')
+        except Exception as e:
+            logger.warning(f"Search cache invalidation failed: {e}")
+            self._count('errors')
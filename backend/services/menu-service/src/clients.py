@@ -0,0 +1,147 @@
+import os
+
+# LazyClient is shared with the OCR engines in scanner_common; the service
+# imports it from here
+from scanner_common.lazy_client import (
+    DependencyUnavailable, LazyClient, async_resolve, created, import_modules, resolve
+)
+
+
+def warm_redis_pool(client, connections: int):
+    """Open ``connections`` pooled connections ahead of the first requests;
+    a no-op for clients without a connection pool (the stand-ins)."""
+    pool = getattr(resolve(client), 'connection_pool', None)
+    if pool is None:
+        return
+    held = []
+    try:
+        for _ in range(connections):
+            held.append(pool.get_connection('PING'))
+    finally:
+        for connection in held:
+            pool.release(connection)
+
+
+async def async_warm_redis_pool(client, connections: int):
+    """asyncio counterpart of warm_redis_pool."""
+    pool = getattr(resolve(client), 'connection_pool', None)
+    if pool is None:
+        return
+    held = []
+    try:
+        for _ in range(connections):
+            held.append(await pool.get_connection('PING'))
+    finally:
+        for connection in held:
+            await pool.release(connection)
+
+
+# Factories; connection pools are sized explicitly rather than left to the library defaults
+
+def redis_client() -> LazyClient:
+    """Redis behind a blocking pool of REDIS_MAX_CONNECTIONS: callers past
+    the limit wait up to REDIS_POOL_TIMEOUT seconds for a connection instead
+    of failing."""
+    def create():
+        import redis
+        pool = redis.BlockingConnectionPool(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', 64)),
+            timeout=float(os.getenv('REDIS_POOL_TIMEOUT', 5))
+        )
+        return redis.Redis(connection_pool=pool)
+    return LazyClient('redis', create, modules=('redis',))
+
+
+def async_redis_client() -> LazyClient:
+    def create():
+        import redis.asyncio as aioredis
+        return aioredis.Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            max_connections=int(os.getenv('AIO_REDIS_MAX_CONNECTIONS', 100))
+        )
+    return LazyClient('redis', create, modules=('redis.asyncio',))
+
+
+def elasticsearch_client() -> LazyClient:
+    """Elasticsearch with ES_CONNECTIONS_PER_NODE pooled connections."""
+    def create():
+        from elasticsearch import Elasticsearch
+        return Elasticsearch(
+            [elasticsearch_url()],
+            connections_per_node=int(os.getenv('ES_CONNECTIONS_PER_NODE', 32))
+        )
+    return LazyClient('elasticsearch', create, modules=('elasticsearch',))
+
+
+def async_elasticsearch_client() -> LazyClient:
+    def create():
+        from elasticsearch import AsyncElasticsearch
+        return AsyncElasticsearch(
+            [elasticsearch_url()],
+            connections_per_node=int(os.getenv('AIO_ES_CONNECTIONS', 32))
+        )
+    return LazyClient('elasticsearch', create, modules=('elasticsearch',))
+
+
+def elasticsearch_url() -> str:
+    es_host = os.getenv('ELASTICSEARCH_HOST', 'localhost')
+    es_port = int(os.getenv('ELASTICSEARCH_PORT', 9200))
+    return f'http://{es_host}:{es_port}'
+
+
+def http_pool(allow_private: bool = False) -> LazyClient:
+    """urllib3 pool for fetching image URLs: FETCH_POOL_SIZE keep-alive
+    connections to each of up to FETCH_POOLS hosts. Redirects are not
+    followed (the fetcher checks each hop itself), and unless
+    ``allow_private`` connections to non-public addresses are refused."""
+    def create():
+        import urllib3
+        from fetch.guarded_pool import public_pool_manager
+        timeout = float(os.getenv('FETCH_TIMEOUT', 10))
+        settings = dict(
+            num_pools=int(os.getenv('FETCH_POOLS', 16)),
+            maxsize=int(os.getenv('FETCH_POOL_SIZE', 8)),
+            retries=urllib3.Retry(total=2, redirect=False, backoff_factor=0.1, status_forcelist=(502, 503, 504)),
+            timeout=urllib3.Timeout(connect=min(timeout, 3.0), read=timeout)
+        )
+        return urllib3.PoolManager(**settings) if allow_private else public_pool_manager(**settings)
+    return LazyClient('http', create, modules=('urllib3',))
+
+
+def vision_client() -> LazyClient:
+    def create():
+        from google.cloud import vision
+        return vision.ImageAnnotatorClient()
+    return LazyClient('vision', create, required=False, modules=('google.cloud.vision',))
+
+
+def async_vision_client() -> LazyClient:
+    """The asyncio Vision client binds to the loop it is created on; its
+    credential lookup, which can wait on the metadata server, is the
+    prepare step that async_resolve() runs off the loop."""
+    def credentials():
+        import google.auth
+        found, _ = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
+        return found
+
+    def create(found):
+        from google.cloud import vision
+        return vision.ImageAnnotatorAsyncClient(credentials=found)
+    return LazyClient('vision', create, required=False, modules=('google.cloud.vision',), prepare=credentials)
+
+
+def storage_client() -> LazyClient:
+    def create():
+        from google.cloud import storage
+        return storage.Client()
+    return LazyClient('storage', create, required=False, modules=('google.cloud.storage',))
+
+
+def pubsub_publisher() -> LazyClient:
+    def create():
+        from google.cloud import pubsub_v1
+        return pubsub_v1.PublisherClient()
+    return LazyClient('pubsub', create, required=False, modules=('google.cloud.pubsub_v1',))
@@ -0,0 +1,260 @@
+import os
+import mmap
+import time
+import zlib
+import fcntl
+import struct
+import logging
+import threading
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Record header: payload length, CRC-32 of the payload, sequence, append time
+RECORD_HEADER = struct.Struct('<IIQd')
+
+# Highest acknowledged sequence
+CHECKPOINT = struct.Struct('<Q')
+
+SEGMENT_SUFFIX = '.log'
+
+
+class Record(NamedTuple):
+    sequence: int
+    appended_at: float
+    payload: bytes
+
+
+class Segment:
+    """One preallocated, memory-mapped log file.
+
+    Named after its first sequence number. Unused space is zeros, so a
+    zero length marks the end of the records; a record out of sequence or
+    whose CRC does not match was torn by a crash mid-write. Either ends the
+    segment on replay, and appends continue from there.
+    """
+
+    def __init__(self, path: str, first_sequence: int, size: Optional[int] = None):
+        self.path = path
+        self.first_sequence = first_sequence
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if size is not None and os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self.size = os.fstat(fd).st_size
+            self.map = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        self.end = 0  # write offset
+        self.last_sequence = first_sequence - 1
+
+    def scan(self):
+        """Find the end of the valid records."""
+        offset = 0
+        while offset + RECORD_HEADER.size <= self.size:
+            length, crc, sequence, _ = RECORD_HEADER.unpack_from(self.map, offset)
+            body = offset + RECORD_HEADER.size
+            if not length or body + length > self.size or sequence != self.last_sequence + 1:
+                break
+            if zlib.crc32(self.map[body:body + length]) != crc:
+                break
+            self.last_sequence = sequence
+            offset = body + length
+        self.end = offset
+
+    def fits(self, length: int) -> bool:
+        return self.end + RECORD_HEADER.size + length <= self.size
+
+    def write(self, sequence: int, appended_at: float, payload: bytes):
+        body = self.end + RECORD_HEADER.size
+        # Payload first, header last: a crash in between leaves a zero length, not a torn record
+        self.map[body:body + len(payload)] = payload
+        RECORD_HEADER.pack_into(self.map, self.end, len(payload), zlib.crc32(payload), sequence, appended_at)
+        self.end = body + len(payload)
+        self.last_sequence = sequence
+
+    def read(self, offset: int) -> tuple:
+        """The record at ``offset`` and the offset after it."""
+        length, _, sequence, appended_at = RECORD_HEADER.unpack_from(self.map, offset)
+        body = offset + RECORD_HEADER.size
+        return Record(sequence, appended_at, bytes(self.map[body:body + length])), body + length
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.close()
+
+
+class EventLog:
+    """Durable append-only log of events awaiting publication, with one reader.
+
+    Events are appended to memory-mapped segment files in ``path``, so an
+    append is a memory copy that survives the process dying (the kernel
+    writes the pages back); ``sync()`` also makes it survive the machine
+    going down. The reader takes records in order with ``read()`` and
+    acknowledges them with ``ack()``, which records the sequence in a
+    checkpoint file and deletes segments that are fully acknowledged.
+    Reopening the directory replays everything after the checkpoint.
+
+    The directory is locked while open, so two processes never share one.
+    """
+
+    def __init__(self, path: str, segment_bytes: Optional[int] = None):
+        self.path = path
+        self.segment_bytes = segment_bytes or int(os.getenv('OUTBOX_SEGMENT_BYTES', 16 * 1024 * 1024))
+        os.makedirs(path, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(path, 'lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(self._lock_fd)
+            raise
+
+        self._lock = threading.Lock()
+        self._checkpoint_path = os.path.join(path, 'checkpoint')
+        self.acked = self._read_checkpoint()
+        self._segments: List[Segment] = []
+        self._cursor = (0, 0)  # (segment index, offset) of the next record to read
+        self._replay()
+
+    @property
+    def next_sequence(self) -> int:
+        return self._segments[-1].last_sequence + 1
+
+    def pending(self) -> int:
+        """Records appended and not yet acknowledged; 0 once closed (the
+        lag gauges still read it at scrape time)."""
+        segments = self._segments
+        if not segments:
+            return 0
+        return segments[-1].last_sequence - self.acked
+
+    def append(self, payload: bytes) -> int:
+        """Add a record; returns its sequence number."""
+        with self._lock:
+            segment = self._segments[-1]
+            sequence = segment.last_sequence + 1
+            if not segment.fits(len(payload)):
+                segment = self._new_segment(sequence, len(payload))
+            segment.write(sequence, time.time(), payload)
+        return sequence
+
+    def read(self, max_records: int) -> List[Record]:
+        """Up to ``max_records`` unacknowledged records, oldest first. The
+        same records are returned again until they are acknowledged."""
+        records = []
+        with self._lock:
+            index, offset = self._cursor
+            while len(records) < max_records and index < len(self._segments):
+                segment = self._segments[index]
+                if offset >= segment.end:
+                    if index == len(self._segments) - 1:
+                        break
+                    index, offset = index + 1, 0
+                    continue
+                record, offset = segment.read(offset)
+                records.append(record)
+        return records
+
+    def oldest_age(self) -> float:
+        """Seconds since the oldest unacknowledged record was appended."""
+        records = self.read(1)
+        return time.time() - records[0].appended_at if records else 0.0
+
+    def ack(self, sequence: int):
+        """Mark every record up to ``sequence`` as published."""
+        with self._lock:
+            index, offset = self._cursor
+            while index < len(self._segments):
+                segment = self._segments[index]
+                if offset >= segment.end:
+                    if index == len(self._segments) - 1:
+                        break
+                    index, offset = index + 1, 0
+                    continue
+                length, _, record_sequence, _ = RECORD_HEADER.unpack_from(segment.map, offset)
+                if record_sequence > sequence:
+                    break
+                offset += RECORD_HEADER.size + length
+            self._cursor = (index, offset)
+            self.acked = max(self.acked, sequence)
+            self._write_checkpoint()
+            self._drop_acknowledged()
+
+    def sync(self):
+        """Flush the pages of segments with unacknowledged records to disk."""
+        with self._lock:
+            segments = self._segments[self._cursor[0]:]
+        for segment in segments:
+            segment.flush()
+
+    def disk_bytes(self) -> int:
+        return sum(segment.size for segment in self._segments)
+
+    def close(self):
+        with self._lock:
+            if self._lock_fd is None:
+                return
+            for segment in self._segments:
+                segment.flush()
+                segment.close()
+            self._segments = []
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    # Replay
+
+    def _replay(self):
+        names = sorted(name for name in os.listdir(self.path) if name.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            path = os.path.join(self.path, name)
+            if not os.path.getsize(path):
+                # Created, but the process died before it was sized
+                os.unlink(path)
+                continue
+            segment = Segment(path, int(name[:-len(SEGMENT_SUFFIX)]))
+            segment.scan()
+            self._segments.append(segment)
+        if not self._segments:
+            self._new_segment(self.acked + 1, 0)
+        elif self._segments[-1].last_sequence < self.acked:
+            # Everything was published; start over after the checkpoint
+            self._new_segment(self.acked + 1, 0)
+
+        # Position the reader after the checkpoint, then drop what is behind it
+        self._cursor = (0, 0)
+        self.ack(self.acked)
+        if self.pending():
+            logger.info(f"Event log {self.path}: replaying {self.pending()} unpublished events")
+
+    def _new_segment(self, first_sequence: int, length: int) -> Segment:
+        path = os.path.join(self.path, f"{first_sequence:020d}{SEGMENT_SUFFIX}")
+        size = max(self.segment_bytes, RECORD_HEADER.size + length)
+        segment = Segment(path, first_sequence, size)
+        self._segments.append(segment)
+        return segment
+
+    def _drop_acknowledged(self):
+        # Segments before the reader's are fully acknowledged; the last one stays for appends
+        index = self._cursor[0]
+        if index == 0:
+            return
+        for segment in self._segments[:index]:
+            segment.close()
+            os.unlink(segment.path)
+        self._segments = self._segments[index:]
+        self._cursor = (0, self._cursor[1])
+
+    def _read_checkpoint(self) -> int:
+        try:
+            with open(self._checkpoint_path, 'rb') as f:
+                return CHECKPOINT.unpack(f.read(CHECKPOINT.size))[0]
+        except (OSError, struct.error):
+            return 0
+
+    def _write_checkpoint(self):
+        tmp_path = f"{self._checkpoint_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(CHECKPOINT.pack(self.acked))
+        os.replace(tmp_path, self._checkpoint_path)
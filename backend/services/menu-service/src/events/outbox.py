@@ -0,0 +1,200 @@
+import os
+import time
+import logging
+import tempfile
+import threading
+from typing import List, Optional
+
+from events.log import EventLog, Record
+from events.publishers import EventPublisher, FileEventPublisher, PubSubEventPublisher
+from scanner_common.metrics import REGISTRY, Histogram
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Processes sharing OUTBOX_PATH (the server and its job workers) each take a slot directory
+MAX_SLOTS = 64
+
+
+class EventOutbox:
+    """Publishes events in batches from a durable local log, off the request path.
+
+    append() writes the event to the EventLog and returns; a flusher
+    thread publishes a batch once ``batch_size`` events are waiting or the
+    oldest has waited ``max_delay`` seconds. A failed batch is retried with
+    exponential backoff, up to ``max_attempts`` tries, then written to the
+    dead-letter file beside the log and skipped. Events not yet published
+    when the process stops stay in the log and are published after the
+    next start.
+    """
+
+    def __init__(
+        self,
+        log: EventLog,
+        publisher: EventPublisher,
+        batch_size: Optional[int] = None,
+        max_delay: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff: Optional[float] = None
+    ):
+        self.log = log
+        self.publisher = publisher
+        self.batch_size = batch_size or int(os.getenv('OUTBOX_BATCH_SIZE', 100))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv('OUTBOX_MAX_DELAY_MS', 200)) / 1000
+        self.max_attempts = max_attempts or int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5))
+        self.retry_backoff = retry_backoff or float(os.getenv('OUTBOX_RETRY_BACKOFF_MS', 500)) / 1000
+        self.dead_letter_path = os.path.join(log.path, 'dead-letter.log')
+
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._stats = {
+            'appended': 0,
+            'published': 0,
+            'batches': 0,
+            'retries': 0,
+            'dead_lettered': 0,
+            'append_errors': 0
+        }
+        self.batch_sizes = Histogram('menu_events_batch_size', 'Events per published batch', buckets=BATCH_SIZE_BUCKETS)
+        self.publish_time = Histogram('menu_events_publish_ms', 'Time to publish one batch, retries included')
+        REGISTRY.gauge('menu_events_outbox_lag', 'Events appended and not yet published', function=log.pending)
+        REGISTRY.gauge('menu_events_outbox_lag_seconds', 'Age of the oldest unpublished event', function=log.oldest_age)
+
+        self._thread = threading.Thread(target=self._run, name='event-outbox', daemon=True)
+        self._thread.start()
+
+    def append(self, event: bytes):
+        """Queue an event for publication; never blocks on the publisher."""
+        try:
+            self.log.append(event)
+        except Exception as e:
+            with self._lock:
+                self._stats['append_errors'] += 1
+            logger.warning(f"Failed to record event: {e}")
+            return
+        with self._lock:
+            self._stats['appended'] += 1
+        # Wake the flusher to start the delay clock, or because a batch is full
+        pending = self.log.pending()
+        if pending == 1 or pending >= self.batch_size:
+            with self._wakeup:
+                self._wakeup.notify()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['lag'] = self.log.pending()
+        stats['lag_seconds'] = self.log.oldest_age()
+        stats['log_bytes'] = self.log.disk_bytes()
+        return stats
+
+    def close(self, timeout: Optional[float] = None):
+        """Publish what is waiting (within ``timeout``) and stop. Whatever is
+        left stays in the log for the next start."""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Event outbox closed with {self.log.pending()} events unpublished; they will be replayed")
+            return
+        logger.info(f"Event outbox: {self.stats()}")
+        self.publisher.close()
+        self.log.close()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch or not self._deliver(batch):
+                break
+
+    def _next_batch(self) -> List[Record]:
+        """Wait for a full batch or for the oldest event to reach max_delay;
+        empty once stopping with nothing left."""
+        with self._wakeup:
+            while True:
+                pending = self.log.pending()
+                if pending >= self.batch_size or (pending and self._stopping):
+                    break
+                if self._stopping:
+                    return []
+                # Idle waits are bounded too, in case an append's wakeup was missed
+                timeout = self.max_delay
+                if pending:
+                    timeout -= self.log.oldest_age()
+                    if timeout <= 0:
+                        break
+                self._wakeup.wait(timeout)
+        return self.log.read(self.batch_size)
+
+    def _deliver(self, batch: List[Record]) -> bool:
+        """Publish a batch, retrying; False if a stop interrupted the retries."""
+        events = [record.payload for record in batch]
+        start = time.perf_counter()
+        attempt = 1
+        while True:
+            try:
+                # Durable against a machine crash before it can be lost in transit
+                self.log.sync()
+                self.publisher.publish(events)
+                outcome = 'published'
+                break
+            except Exception as e:
+                logger.warning(f"Publishing {len(events)} events failed (attempt {attempt}/{self.max_attempts}): {e}")
+                if attempt >= self.max_attempts:
+                    self._dead_letter(events)
+                    outcome = 'dead_lettered'
+                    break
+            with self._lock:
+                self._stats['retries'] += 1
+            # A stop abandons the retries; the batch is replayed on the next start
+            with self._wakeup:
+                if not self._stopping:
+                    self._wakeup.wait(self.retry_backoff * 2 ** (attempt - 1))
+                if self._stopping:
+                    return False
+            attempt += 1
+
+        self.log.ack(batch[-1].sequence)
+        self.publish_time.observe((time.perf_counter() - start) * 1000)
+        with self._lock:
+            self._stats[outcome] += len(events)
+            if outcome == 'published':
+                self._stats['batches'] += 1
+        if outcome == 'published':
+            self.batch_sizes.observe(len(events))
+        return True
+
+    def _dead_letter(self, events: List[bytes]):
+        logger.error(f"Giving up on {len(events)} events after {self.max_attempts} attempts; see {self.dead_letter_path}")
+        with open(self.dead_letter_path, 'ab') as f:
+            f.write(b''.join(data + b'\n' for data in events))
+
+
+def open_event_log(root: str) -> EventLog:
+    """The first free slot directory under ``root``."""
+    for slot in range(MAX_SLOTS):
+        try:
+            return EventLog(os.path.join(root, str(slot)))
+        except BlockingIOError:
+            continue
+    raise RuntimeError(f"All {MAX_SLOTS} event log slots under {root} are in use")
+
+
+def create_event_outbox(pubsub_client, topic: str = 'menu-processed') -> Optional[EventOutbox]:
+    """Outbox for ``topic`` through the publisher named by OUTBOX_PUBLISHER
+    ("pubsub" or "file"); None when Pub/Sub is chosen but there is no client."""
+    name = os.getenv('OUTBOX_PUBLISHER', 'pubsub').lower()
+    root = os.getenv('OUTBOX_PATH', os.path.join(tempfile.gettempdir(), 'menu-service-outbox'))
+    if name == 'file':
+        os.makedirs(root, exist_ok=True)
+        publisher = FileEventPublisher(os.path.join(root, f'{topic}.events'))
+    else:
+        if name != 'pubsub':
+            logger.warning(f"Unknown OUTBOX_PUBLISHER {name!r}, using pubsub")
+        if pubsub_client is None:
+            return None
+        publisher = PubSubEventPublisher(pubsub_client, topic)
+    return EventOutbox(open_event_log(os.path.join(root, topic)), publisher)
@@ -0,0 +1,78 @@
+import os
+import logging
+import threading
+from typing import List, Optional
+
+from clients import resolve
+
+logger = logging.getLogger(__name__)
+
+
+class EventPublisher:
+    """Delivers a batch of events; publish() returns once all of them are
+    accepted and raises if any was not, so the outbox can retry the batch.
+    Redelivery after a retry or a restart is possible, so consumers should
+    treat events as at-least-once."""
+
+    name = 'base'
+
+    def publish(self, events: List[bytes]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PubSubEventPublisher(EventPublisher):
+    """Publishes to one Pub/Sub topic through a pubsub_v1.PublisherClient
+    (or a stand-in, or a LazyClient for either).
+
+    The client and the topic path are resolved on the first publish, on the
+    outbox's flusher thread. When no client can be created (no credentials)
+    events are dropped with a warning.
+    """
+
+    name = 'pubsub'
+
+    def __init__(self, client, topic: str, project_id: Optional[str] = None, timeout: Optional[float] = None):
+        self.client = client
+        self.topic = topic
+        self.project_id = project_id or os.getenv('GCP_PROJECT_ID')
+        self.timeout = timeout or float(os.getenv('OUTBOX_PUBLISH_TIMEOUT', 30))
+        self.topic_path = None
+        self._dropping = False
+
+    def publish(self, events: List[bytes]):
+        client = resolve(self.client)
+        if client is None:
+            if not self._dropping:
+                logger.warning(f"No Pub/Sub client; dropping events for {self.topic}")
+                self._dropping = True
+            return
+        if self.topic_path is None:
+            self.topic_path = client.topic_path(self.project_id, self.topic)
+        # The client batches the messages itself; wait for every one to be accepted
+        pending = [client.publish(self.topic_path, data) for data in events]
+        for future in pending:
+            future.result(timeout=self.timeout)
+
+
+class FileEventPublisher(EventPublisher):
+    """Appends events to a local file, one per line, for development
+    without Pub/Sub (OUTBOX_PUBLISHER=file)."""
+
+    name = 'file'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab')
+
+    def publish(self, events: List[bytes]):
+        with self._lock:
+            self._file.write(b''.join(data + b'\n' for data in events))
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
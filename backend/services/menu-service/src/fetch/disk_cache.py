@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CachedImage(NamedTuple):
+    """What the cache knows about one URL: the content it last served and
+    the validators to revalidate it with."""
+    url: str
+    sha256: str
+    size: int
+    etag: str
+    last_modified: str
+    expires: float  # served without revalidation until then
+
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+
+class ImageDiskCache:
+    """Size-bounded local disk cache of fetched images.
+
+    Content is stored once per SHA-256 under ``blobs/``, so the same image
+    at several URLs takes the space once; ``urls/`` maps a URL to the
+    digest of its content and the validators (ETag, Last-Modified) it was
+    served with. When the blobs pass ``max_bytes`` the least recently used
+    are deleted; a URL whose blob is gone is a miss.
+
+    Files are written to a temp name and renamed into place, so processes
+    sharing the directory (the server and its job workers) never read a
+    partial file. Each process counts only its own writes against the
+    bound until its next start rescans the directory.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None):
+        self.path = path
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv('FETCH_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        )
+        self._blobs = os.path.join(path, 'blobs')
+        self._urls = os.path.join(path, 'urls')
+        os.makedirs(self._blobs, exist_ok=True)
+        os.makedirs(self._urls, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._bytes = sum(
+            entry.stat().st_size for entry in os.scandir(self._blobs)
+            if entry.is_file() and not entry.name.endswith('.tmp')
+        )
+        self._stats = {'stores': 0, 'evictions': 0, 'errors': 0}
+
+    def lookup(self, url: str) -> Optional[CachedImage]:
+        """The entry for ``url`` if its content is still on disk."""
+        try:
+            with open(self._url_path(url), 'r') as f:
+                entry = CachedImage(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Dropping unreadable image cache entry for {url}: {e}")
+            self._count('errors')
+            self._remove(self._url_path(url))
+            return None
+        if entry.url != url or not os.path.exists(self._blob_path(entry.sha256)):
+            return None
+        return entry
+
+    def read(self, entry: CachedImage) -> Optional[bytes]:
+        """The entry's content; None if it was evicted meanwhile."""
+        path = self._blob_path(entry.sha256)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Recently used blobs are the last to be evicted
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        if len(data) != entry.size:
+            return None
+        return data
+
+    def store(self, url: str, data: bytes, etag: str = '', last_modified: str = '', expires: float = 0.0) -> CachedImage:
+        """Record ``data`` as the content of ``url``."""
+        digest = hashlib.sha256(data).hexdigest()
+        entry = CachedImage(url, digest, len(data), etag, last_modified, expires)
+        if len(data) > self.max_bytes:
+            return entry
+        try:
+            blob_path = self._blob_path(digest)
+            if not os.path.exists(blob_path):
+                self._write(blob_path, data)
+                with self._lock:
+                    self._bytes += len(data)
+            self._write_entry(entry)
+            self._count('stores')
+        except OSError as e:
+            logger.warning(f"Could not cache image for {url}: {e}")
+            self._count('errors')
+        self._evict()
+        return entry
+
+    def refresh(self, entry: CachedImage, etag: str, last_modified: str, expires: float) -> CachedImage:
+        """Update an entry after the origin confirmed it unchanged."""
+        entry = entry._replace(etag=etag or entry.etag, last_modified=last_modified or entry.last_modified, expires=expires)
+        try:
+            self._write_entry(entry)
+        except OSError as e:
+            logger.warning(f"Could not update image cache entry for {entry.url}: {e}")
+            self._count('errors')
+        return entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['bytes'] = self._bytes
+        return stats
+
+    def _evict(self):
+        with self._lock:
+            if self._bytes <= self.max_bytes:
+                return
+        blobs = []
+        for dir_entry in os.scandir(self._blobs):
+            if dir_entry.is_file() and not dir_entry.name.endswith('.tmp'):
+                stat = dir_entry.stat()
+                blobs.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        blobs.sort()
+        total = sum(size for _, size, _ in blobs)
+        evicted = 0
+        for _, size, path in blobs:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                total -= size
+                evicted += 1
+        with self._lock:
+            self._bytes = total
+            self._stats['evictions'] += evicted
+
+    def _write_entry(self, entry: CachedImage):
+        self._write(self._url_path(entry.url), json.dumps(entry._asdict()).encode('utf-8'))
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _url_path(self, url: str) -> str:
+        return os.path.join(self._urls, hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blobs, digest)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
@@ -0,0 +1,276 @@
+import os
+import re
+import time
+import logging
+import tempfile
+import threading
+from typing import Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from cache.dish_cache import SingleFlight
+from cache.menu_cache import MenuCache
+from clients import created, http_pool, resolve
+from fetch.disk_cache import CachedImage, ImageDiskCache
+from scanner_common.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+FETCH_CHUNK_BYTES = 64 * 1024
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+_MAX_AGE = re.compile(r'(?:^|,)\s*max-age\s*=\s*(\d+)', re.IGNORECASE)
+
+
+class ImageFetchError(Exception):
+    """The image at a URL could not be fetched (unreachable, missing, HTTP error)."""
+
+
+class ImageTooLarge(ImageFetchError, ValueError):
+    """The image at a URL is larger than FETCH_MAX_BYTES."""
+
+
+class BoundedBuffer:
+    """Write-only buffer that refuses to grow past ``max_bytes``; a file
+    object for downloads that stream into it."""
+
+    def __init__(self, max_bytes: int, expected: int = 0):
+        self.max_bytes = max_bytes
+        self._data = bytearray()
+        if expected > max_bytes:
+            raise ImageTooLarge(f"Image is {expected} bytes, the limit is {max_bytes}")
+
+    def write(self, chunk: bytes) -> int:
+        if len(self._data) + len(chunk) > self.max_bytes:
+            raise ImageTooLarge(f"Image exceeds {self.max_bytes} bytes")
+        self._data += chunk
+        return len(chunk)
+
+    def getvalue(self) -> bytes:
+        return bytes(self._data)
+
+
+def _expires(cache_control: str) -> float:
+    """Until when a response may be served without revalidating it: its
+    Cache-Control max-age, else not at all."""
+    if 'no-cache' in cache_control.lower():
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    return time.time() + int(match.group(1)) if match else 0.0
+
+
+class ImageFetcher:
+    """Fetches the images behind MenuImageRequest.image_url.
+
+    ``http(s)://`` URLs go through a urllib3 pool of keep-alive connections
+    (clients.http_pool); ``gs://bucket/object`` URLs, as returned by
+    the image service's StreamImageUpload, through the Storage client.
+    Downloads stream into a buffer bounded by FETCH_MAX_BYTES.
+
+    image_url comes from clients, so what it may reach is restricted: HTTP
+    hosts must be in FETCH_ALLOWED_HOSTS when that is set, and connections
+    to loopback, private and link-local addresses (the metadata server,
+    in-cluster services) are refused unless FETCH_ALLOW_PRIVATE_ADDRESSES.
+    Redirects are followed by the fetcher, up to FETCH_MAX_REDIRECTS, and
+    every hop is checked like the first URL. ``gs://`` URLs are limited
+    to the buckets in FETCH_GCS_BUCKETS.
+
+    Fetched images are kept in an ImageDiskCache. A cached image is served
+    as is while its Cache-Control max-age lasts, and otherwise revalidated
+    (If-None-Match / If-Modified-Since over HTTP, the object's ETag on
+    Cloud Storage), so an unchanged image is not downloaded again.
+    Concurrent fetches of one URL share a single download.
+    """
+
+    def __init__(
+        self,
+        disk_cache: Optional[ImageDiskCache] = None,
+        storage_client=None,
+        http=None,
+        max_bytes: Optional[int] = None,
+        allow_private: Optional[bool] = None
+    ):
+        self.disk_cache = disk_cache
+        self.storage_client = storage_client
+        if allow_private is None:
+            allow_private = os.getenv('FETCH_ALLOW_PRIVATE_ADDRESSES', 'false').lower() == 'true'
+        # urllib3 is imported, and the pool created, on the first fetch or by warm-up
+        self.http = http if http is not None else http_pool(allow_private)
+        self.max_bytes = max_bytes or int(os.getenv('FETCH_MAX_BYTES', 20 * 1024 * 1024))
+        self.max_redirects = int(os.getenv('FETCH_MAX_REDIRECTS', 3))
+        allowed = os.getenv('FETCH_ALLOWED_HOSTS', '')
+        self.allowed_hosts = tuple(host.strip().lower() for host in allowed.split(',') if host.strip())
+        buckets = os.getenv('FETCH_GCS_BUCKETS', 'menu-scanner-images')
+        self.allowed_buckets = frozenset(bucket.strip() for bucket in buckets.split(',') if bucket.strip())
+
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'downloads': 0,
+            'fresh_hits': 0,
+            'revalidated': 0,
+            'coalesced': 0,
+            'bytes_downloaded': 0,
+            'bytes_saved': 0,
+            'too_large': 0,
+            'errors': 0
+        }
+        self.latency = Histogram('menu_image_fetch_ms', 'Time to fetch an image_url, cache hits included')
+
+    def fetch(self, url: str) -> bytes:
+        """The image at ``url``. Raises ValueError for a URL that cannot be
+        fetched from, ImageTooLarge past FETCH_MAX_BYTES and ImageFetchError
+        when the fetch fails."""
+        url = MenuCache.canonical_url(url)
+        self._check_url(url)
+        start = time.perf_counter()
+        self._count('requests')
+        try:
+            data, shared = self._flights.do(url, lambda: self._fetch(url))
+        except ImageTooLarge:
+            self._count('too_large')
+            raise
+        except Exception:
+            self._count('errors')
+            raise
+        if shared:
+            self._count('coalesced', 'bytes_saved', amount=len(data))
+        self.latency.observe((time.perf_counter() - start) * 1000)
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        if self.disk_cache is not None:
+            stats['disk_cache'] = self.disk_cache.stats()
+        return stats
+
+    def close(self):
+        if created(self.http):
+            self.http.clear()
+
+    def _check_url(self, url: str, schemes: Tuple[str, ...] = ('http', 'https', 'gs')):
+        """Raise ValueError for a URL the service must not fetch from.
+        Non-public addresses are refused by the pool, once the host is resolved."""
+        parts = urlsplit(url)
+        if parts.scheme not in schemes or not parts.netloc:
+            raise ValueError(f"Unsupported image_url {url!r}; expected {' or '.join(f'{scheme}://' for scheme in schemes)}")
+        if parts.scheme == 'gs':
+            if parts.netloc not in self.allowed_buckets:
+                raise ValueError(f"image_url bucket {parts.netloc!r} is not in FETCH_GCS_BUCKETS")
+        elif self.allowed_hosts:
+            host = (parts.hostname or '').lower()
+            if not any(host == allowed or (allowed.startswith('.') and host.endswith(allowed))
+                       for allowed in self.allowed_hosts):
+                raise ValueError(f"image_url host {host!r} is not in FETCH_ALLOWED_HOSTS")
+
+    def _fetch(self, url: str) -> bytes:
+        cached = self.disk_cache.lookup(url) if self.disk_cache is not None else None
+        cached_data = self.disk_cache.read(cached) if cached is not None else None
+        if cached_data is None:
+            cached = None
+        elif cached.fresh():
+            self._count('fresh_hits', 'bytes_saved', amount=len(cached_data))
+            return cached_data
+
+        if url.startswith('gs://'):
+            data, etag, last_modified, expires = self._fetch_gcs(url, cached)
+        else:
+            data, etag, last_modified, expires = self._fetch_http(url, cached)
+
+        if data is None:
+            # Unchanged at the origin
+            self.disk_cache.refresh(cached, etag, last_modified, expires)
+            self._count('revalidated', 'bytes_saved', amount=len(cached_data))
+            return cached_data
+
+        self._count('downloads', 'bytes_downloaded', amount=len(data))
+        if self.disk_cache is not None:
+            self.disk_cache.store(url, data, etag, last_modified, expires)
+        return data
+
+    def _fetch_http(self, url: str, cached: Optional[CachedImage]) -> Tuple[Optional[bytes], str, str, float]:
+        """(content, or None if ``cached`` is still current; ETag; Last-Modified; expiry)."""
+        import urllib3
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        response = self._request(url, headers)
+        try:
+            etag = response.headers.get('ETag', '')
+            last_modified = response.headers.get('Last-Modified', '')
+            expires = _expires(response.headers.get('Cache-Control', ''))
+            if response.status == 304 and cached is not None:
+                return None, etag, last_modified, expires
+            if response.status != 200:
+                raise ImageFetchError(f"Could not fetch {url}: HTTP {response.status}")
+            buffer = BoundedBuffer(self.max_bytes, int(response.headers.get('Content-Length') or 0))
+            for chunk in response.stream(FETCH_CHUNK_BYTES):
+                buffer.write(chunk)
+            return buffer.getvalue(), etag, last_modified, expires
+        except urllib3.exceptions.HTTPError as e:
+            raise ImageFetchError(f"Could not fetch {url}: {e}") from e
+        finally:
+            # Back to the pool when fully read; a connection abandoned mid-body is closed
+            response.release_conn()
+
+    def _request(self, url: str, headers: dict):
+        """GET ``url``, following redirects here rather than in urllib3 so
+        that each hop's URL is checked before it is requested."""
+        import urllib3
+        for _ in range(self.max_redirects + 1):
+            try:
+                response = self.http.request('GET', url, headers=headers, preload_content=False, redirect=False)
+            except urllib3.exceptions.HTTPError as e:
+                raise ImageFetchError(f"Could not fetch {url}: {e}") from e
+            location = response.headers.get('Location')
+            if response.status not in REDIRECT_STATUSES or not location:
+                return response
+            response.drain_conn()
+            response.release_conn()
+            url = urljoin(url, location)
+            self._check_url(url, ('http', 'https'))
+        raise ImageFetchError(f"Could not fetch {url}: more than {self.max_redirects} redirects")
+
+    def _fetch_gcs(self, url: str, cached: Optional[CachedImage]) -> Tuple[Optional[bytes], str, str, float]:
+        """Cloud Storage counterpart of _fetch_http: a metadata read stands
+        in for the conditional request."""
+        client = resolve(self.storage_client)
+        if client is None:
+            raise ImageFetchError(f"Could not fetch {url}: no Cloud Storage client")
+        parts = urlsplit(url)
+        try:
+            blob = client.bucket(parts.netloc).get_blob(parts.path.lstrip('/'))
+            if blob is None:
+                raise ImageFetchError(f"Could not fetch {url}: no such object")
+            etag = blob.etag or ''
+            if cached is not None and etag and etag == cached.etag:
+                return None, etag, '', 0.0
+            buffer = BoundedBuffer(self.max_bytes, blob.size or 0)
+            # Pinned to the generation read above, so content and ETag match
+            blob.download_to_file(buffer, if_generation_match=blob.generation)
+            return buffer.getvalue(), etag, '', 0.0
+        except ImageFetchError:
+            raise
+        except Exception as e:
+            raise ImageFetchError(f"Could not fetch {url}: {e}") from e
+
+    def _count(self, name: str, bytes_name: Optional[str] = None, amount: int = 0):
+        with self._lock:
+            self._stats[name] += 1
+            if bytes_name is not None:
+                self._stats[bytes_name] += amount
+
+
+def create_image_fetcher(storage_client) -> ImageFetcher:
+    """Fetcher with a disk cache at FETCH_CACHE_PATH, unless
+    FETCH_CACHE_MAX_BYTES is 0."""
+    disk_cache = None
+    if int(os.getenv('FETCH_CACHE_MAX_BYTES', 256 * 1024 * 1024)) > 0:
+        path = os.getenv('FETCH_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'menu-service-images'))
+        disk_cache = ImageDiskCache(path)
+    return ImageFetcher(disk_cache, storage_client)
@@ -0,0 +1,56 @@
+import ipaddress
+
+import urllib3
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class BlockedAddress(ValueError):
+    """An image_url host resolved to an address the service must not fetch
+    from (loopback, private, link-local such as the metadata server)."""
+
+
+def is_public(address: str) -> bool:
+    """Whether ``address`` is a globally routable unicast address."""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def _check_peer(sock, host: str):
+    # Checked on the connected socket, not a separate DNS lookup, so a host
+    # that resolves differently the second time cannot slip through
+    address = sock.getpeername()[0]
+    if not is_public(address):
+        sock.close()
+        raise BlockedAddress(f"image_url host {host!r} resolves to non-public address {address}")
+
+
+class PublicHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        sock = super()._new_conn()
+        _check_peer(sock, self.host)
+        return sock
+
+
+class PublicHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        sock = super()._new_conn()
+        _check_peer(sock, self.host)
+        return sock
+
+
+class PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = PublicHTTPConnection
+
+
+class PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = PublicHTTPSConnection
+
+
+def public_pool_manager(**kwargs) -> urllib3.PoolManager:
+    """A PoolManager whose connections refuse non-public peer addresses."""
+    manager = urllib3.PoolManager(**kwargs)
+    manager.pool_classes_by_scheme = {'http': PublicHTTPConnectionPool, 'https': PublicHTTPSConnectionPool}
+    return manager
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List
+
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
+
+logger = logging.getLogger(__name__)
+
+# Health service names: '' is liveness (the process is up), SERVICE_NAME is
+# readiness (every required dependency is), and each dependency is reported
+# on its own as SERVICE_NAME/<dependency>
+SERVICE_NAME = 'menu.MenuService'
+
+SERVING = health_pb2.HealthCheckResponse.SERVING
+NOT_SERVING = health_pb2.HealthCheckResponse.NOT_SERVING
+
+
+class Readiness:
+    """Readiness of each dependency as of its last check.
+
+    Dependencies start out not ready and are marked by warm-up and the
+    periodic re-checks. Required ones (Redis, Elasticsearch, a search index
+    still loading) gate readiness of the service as a whole; optional ones
+    (Vision, Pub/Sub) have fallbacks and are only reported.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._required: Dict[str, bool] = {}
+        self._ready: Dict[str, bool] = {}
+        self._subscribers: List[Callable[[str, int], None]] = []
+
+    def add(self, name: str, required: bool = True):
+        with self._lock:
+            before = self._statuses()
+            self._required[name] = required
+            self._ready.setdefault(name, False)
+            self._notify(before)
+
+    def mark(self, name: str, ready: bool, detail: str = ''):
+        with self._lock:
+            before = self._statuses()
+            if self._ready.get(name) != ready:
+                if ready:
+                    logger.info(f"Dependency {name} is ready")
+                else:
+                    logger.warning(f"Dependency {name} is not ready: {detail}")
+            self._ready[name] = ready
+            self._required.setdefault(name, True)
+            self._notify(before)
+
+    def is_ready(self, name: str) -> bool:
+        with self._lock:
+            return self._ready.get(name, False)
+
+    def ready(self) -> bool:
+        with self._lock:
+            return all(self._ready[name] for name, required in self._required.items() if required)
+
+    def subscribe(self, callback: Callable[[str, int], None]):
+        """Call ``callback(service, status)`` now for every health service
+        name and again whenever one changes."""
+        with self._lock:
+            self._subscribers.append(callback)
+            for service, status in self._statuses().items():
+                callback(service, status)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {name: int(ready) for name, ready in self._ready.items()}
+        stats['ready'] = int(self.ready())
+        return stats
+
+    def _statuses(self) -> Dict[str, int]:
+        ready = all(self._ready[name] for name, required in self._required.items() if required)
+        statuses = {SERVICE_NAME: SERVING if ready else NOT_SERVING}
+        for name, dependency_ready in self._ready.items():
+            statuses[f"{SERVICE_NAME}/{name}"] = SERVING if dependency_ready else NOT_SERVING
+        return statuses
+
+    def _notify(self, before: Dict[str, int]):
+        # Under the lock, so subscribers see changes in the order they were made
+        for service, status in self._statuses().items():
+            if before.get(service) != status:
+                for callback in self._subscribers:
+                    callback(service, status)
+
+
+def add_health_servicer(server, readiness: Readiness) -> health.HealthServicer:
+    """Serve grpc.health.v1.Health on ``server`` from ``readiness``."""
+    servicer = health.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(servicer, server)
+    readiness.subscribe(servicer.set)
+    return servicer
+
+
+def add_aio_health_servicer(server, readiness: Readiness) -> health.aio.HealthServicer:
+    """grpc.aio counterpart of add_health_servicer; call it on the event loop."""
+    servicer = health.aio.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(servicer, server)
+    loop = asyncio.get_running_loop()
+
+    def update(service: str, status: int):
+        # Readiness changes can come from threads (the job queue, to_thread calls)
+        loop.call_soon_threadsafe(asyncio.ensure_future, servicer.set(service, status))
+
+    readiness.subscribe(update)
+    return servicer
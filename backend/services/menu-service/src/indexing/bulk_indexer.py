@@ -0,0 +1,426 @@
+import os
+import json
+import time
+import queue
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-item statuses worth retrying: rejected by a busy node or a transient server error
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class IndexTicket:
+    """Tracks the outcome of a group of documents submitted together."""
+
+    def __init__(self, count: int):
+        self._pending = count
+        self._errors = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._callbacks = []
+        if count == 0:
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> List[str]:
+        """Block until every document is indexed or failed; return the failures."""
+        finished = self._done.wait(timeout)
+        with self._lock:
+            errors = list(self._errors)
+            if not finished:
+                errors.append(f"{self._pending} documents still pending after {timeout}s")
+        return errors
+
+    def add_done_callback(self, callback):
+        """Call ``callback(errors)`` once every document is indexed or failed."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+            errors = list(self._errors)
+        callback(errors)
+
+    def _resolve(self, error: Optional[str] = None):
+        with self._lock:
+            if error:
+                self._errors.append(error)
+            self._pending -= 1
+            if self._pending > 0 or self._done.is_set():
+                return
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+            errors = list(self._errors)
+        for callback in callbacks:
+            try:
+                callback(errors)
+            except Exception as e:
+                logger.error(f"Index ticket callback failed: {e}")
+
+
+class _BulkIndexerBase:
+    """Batch limits, counters and per-item outcome handling shared by both indexers."""
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        es_client,
+        index: str = 'dishes',
+        max_actions: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.es_client = es_client
+        self.index = index
+        self.max_actions = max_actions or int(os.getenv('ES_BULK_MAX_ACTIONS', 500))
+        self.max_bytes = max_bytes or int(os.getenv('ES_BULK_MAX_BYTES', 5 * 1024 * 1024))
+        self.flush_interval = flush_interval or float(os.getenv('ES_BULK_FLUSH_INTERVAL_MS', 50)) / 1000
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('ES_BULK_MAX_RETRIES', 3))
+        self.max_queue = max_queue or int(os.getenv('ES_BULK_MAX_QUEUE', 10000))
+        self.submit_timeout = float(os.getenv('ES_BULK_SUBMIT_TIMEOUT', 30))
+
+        self._lock = threading.Lock()
+        # Submits in progress; close() waits for them before queueing the
+        # stop marker, so nothing is queued behind it
+        self._submitting = 0
+        self._closed = False
+        self._draining = False
+        self._stats = {
+            'submitted': 0,
+            'indexed': 0,
+            'failed': 0,
+            'retried': 0,
+            'bulk_requests': 0
+        }
+
+    def stats(self) -> dict:
+        """Return a snapshot of the indexer counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _reject(self, ticket: IndexTicket, documents: List[tuple]):
+        for doc_id, _ in documents:
+            ticket._resolve(f"{doc_id}: indexer is shut down")
+        self._count('failed', len(documents))
+
+    def _resolve_items(self, batch: List[tuple], items: List[dict], attempt: int) -> List[tuple]:
+        """Resolve each document's ticket from its bulk item; return those to retry."""
+        retry = []
+        for entry, item in zip(batch, items):
+            doc_id, _, _, ticket = entry
+            outcome = item.get('index', {})
+            status = outcome.get('status', 500)
+            if status < 300:
+                ticket._resolve()
+                self._count('indexed')
+            elif status in RETRYABLE_STATUSES and attempt < self.max_retries:
+                retry.append(entry)
+            else:
+                error = outcome.get('error', f'status {status}')
+                if isinstance(error, dict):
+                    error = error.get('reason') or error.get('type') or str(error)
+                logger.error(f"Error indexing dish {doc_id}: {error}")
+                ticket._resolve(f"{doc_id}: {error}")
+                self._count('failed')
+        return retry
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+
+class BulkIndexer(_BulkIndexerBase):
+    """Groups documents from concurrent requests into Elasticsearch _bulk calls.
+
+    Documents are queued and flushed by a background thread once
+    ``max_actions`` documents or ``max_bytes`` of payload are pending, or
+    ``flush_interval`` seconds after the first pending document. The queue is
+    bounded, so producers block when Elasticsearch falls behind. Only the
+    items that fail with a retryable status are resent.
+    """
+
+    def __init__(self, es_client, index: str = 'dishes', **limits):
+        super().__init__(es_client, index, **limits)
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._submits_done = threading.Condition(self._lock)
+        self._worker = threading.Thread(target=self._run, name='bulk-indexer', daemon=True)
+        self._worker.start()
+
+    def submit(self, documents: List[Tuple[str, Dict[str, Any]]]) -> IndexTicket:
+        """Queue (doc_id, document) pairs for indexing.
+
+        Blocks while the queue is full. Documents that cannot be queued are
+        reported as failures on the returned ticket.
+        """
+        ticket = IndexTicket(len(documents))
+        with self._lock:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._submitting += 1
+        if closed:
+            self._reject(ticket, documents)
+            return ticket
+
+        try:
+            for doc_id, document in documents:
+                try:
+                    size = len(json.dumps(document))
+                    self._queue.put((doc_id, document, size, ticket), timeout=self.submit_timeout)
+                    self._count('submitted')
+                except queue.Full:
+                    ticket._resolve(f"{doc_id}: indexing queue full")
+                    self._count('failed')
+        finally:
+            with self._lock:
+                self._submitting -= 1
+                self._submits_done.notify_all()
+        return ticket
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush everything still queued and stop the worker thread.
+
+        Later submits fail their tickets. Waits at most ``timeout`` (default
+        ES_BULK_SUBMIT_TIMEOUT) to queue the stop marker; if the queue stays
+        full the worker stops on its own once it has drained it.
+        """
+        timeout = timeout if timeout is not None else self.submit_timeout
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if not self._submits_done.wait_for(lambda: self._submitting == 0, timeout):
+                logger.warning(f"Bulk indexer closing with {self._submitting} submits in progress")
+            self._draining = True
+        try:
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning(f"Bulk indexer queue still full after {timeout}s; stopping once drained")
+        self._worker.join(timeout)
+        logger.info(f"Bulk indexer drained: {self.stats()}")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+
+            batch = [item]
+            batch_bytes = item[2]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_actions and batch_bytes < self.max_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                batch_bytes += item[2]
+
+            self._flush(batch)
+            if self._draining and self._queue.empty():
+                # close() could not queue the stop marker
+                break
+
+        # Drain whatever was queued behind the stop marker
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.max_actions):
+            self._flush(leftover[start:start + self.max_actions])
+
+    def _flush(self, batch: List[tuple]):
+        attempt = 0
+        while batch:
+            try:
+                self._count('bulk_requests')
+                result = self.es_client.bulk(operations=_operations(self.index, batch))
+                items = result['items']
+            except Exception as e:
+                logger.error(f"Bulk request failed: {e}")
+                items = [{'index': {'status': 503, 'error': str(e)}}] * len(batch)
+
+            retry = self._resolve_items(batch, items, attempt)
+            if retry:
+                attempt += 1
+                self._count('retried', len(retry))
+                time.sleep(_backoff(attempt))
+            batch = retry
+
+
+class AsyncIndexTicket(IndexTicket):
+    """IndexTicket of the AsyncBulkIndexer, awaited on the event loop."""
+
+    def __init__(self, count: int):
+        super().__init__(count)
+        self._finished = asyncio.get_running_loop().create_future()
+        super().add_done_callback(self._finished.set_result)
+
+    async def wait(self, timeout: Optional[float] = None) -> List[str]:
+        """Wait until every document is indexed or failed; return the failures."""
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._finished), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                return list(self._errors) + [f"{self._pending} documents still pending after {timeout}s"]
+
+
+class AsyncBulkIndexer(_BulkIndexerBase):
+    """asyncio counterpart of BulkIndexer for AsyncElasticsearch.
+
+    Same batching, bounded queue and retries; a task on the event loop
+    (started by the first submit) takes the place of the worker thread,
+    and submit() waits for queue space instead of blocking.
+    """
+
+    def __init__(self, es_client, index: str = 'dishes', **limits):
+        super().__init__(es_client, index, **limits)
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker = None
+        self._submits_done = None
+
+    async def submit(self, documents: List[Tuple[str, Dict[str, Any]]]) -> AsyncIndexTicket:
+        """Queue (doc_id, document) pairs for indexing, waiting while the
+        queue is full. Documents that cannot be queued are reported as
+        failures on the returned ticket."""
+        ticket = AsyncIndexTicket(len(documents))
+        if self._closed:
+            self._reject(ticket, documents)
+            return ticket
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+        self._submitting += 1
+        try:
+            for doc_id, document in documents:
+                try:
+                    size = len(json.dumps(document))
+                    await asyncio.wait_for(self._queue.put((doc_id, document, size, ticket)), self.submit_timeout)
+                    self._count('submitted')
+                except asyncio.TimeoutError:
+                    ticket._resolve(f"{doc_id}: indexing queue full")
+                    self._count('failed')
+        finally:
+            self._submitting -= 1
+            if not self._submitting and self._submits_done is not None:
+                self._submits_done.set()
+        return ticket
+
+    async def close(self, timeout: Optional[float] = None):
+        """Flush everything still queued and stop the worker task.
+
+        Later submits fail their tickets. Waits at most ``timeout`` (default
+        ES_BULK_SUBMIT_TIMEOUT) to queue the stop marker; if the queue stays
+        full the worker stops on its own once it has drained it.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._worker is None:
+            return
+        timeout = timeout if timeout is not None else self.submit_timeout
+        if self._submitting:
+            self._submits_done = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._submits_done.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Bulk indexer closing with {self._submitting} submits in progress")
+        self._draining = True
+        try:
+            await asyncio.wait_for(self._queue.put(self._STOP), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Bulk indexer queue still full after {timeout}s; stopping once drained")
+        try:
+            # Shielded: like the worker thread, the task keeps draining past the timeout
+            await asyncio.wait_for(asyncio.shield(self._worker), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Bulk indexer not drained after {timeout}s")
+        logger.info(f"Bulk indexer drained: {self.stats()}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is self._STOP:
+                break
+
+            batch = [item]
+            batch_bytes = item[2]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_actions and batch_bytes < self.max_bytes:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                batch_bytes += item[2]
+
+            await self._flush(batch)
+            if self._draining and self._queue.empty():
+                # close() could not queue the stop marker
+                break
+
+        # Drain whatever was queued behind the stop marker
+        leftover = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not self._STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.max_actions):
+            await self._flush(leftover[start:start + self.max_actions])
+
+    async def _flush(self, batch: List[tuple]):
+        attempt = 0
+        while batch:
+            try:
+                self._count('bulk_requests')
+                result = await self.es_client.bulk(operations=_operations(self.index, batch))
+                items = result['items']
+            except Exception as e:
+                logger.error(f"Bulk request failed: {e}")
+                items = [{'index': {'status': 503, 'error': str(e)}}] * len(batch)
+
+            retry = self._resolve_items(batch, items, attempt)
+            if retry:
+                attempt += 1
+                self._count('retried', len(retry))
+                await asyncio.sleep(_backoff(attempt))
+            batch = retry
+
+
+def _operations(index: str, batch: List[tuple]) -> List[Dict[str, Any]]:
+    operations = []
+    for doc_id, document, _, _ in batch:
+        operations.append({'index': {'_index': index, '_id': doc_id}})
+        operations.append(document)
+    return operations
+
+
+def _backoff(attempt: int) -> float:
+    return min(0.05 * (2 ** attempt), 2.0)
@@ -0,0 +1,445 @@
+import os
+import sys
+import hmac
+import json
+import time
+import inspect
+import logging
+import ipaddress
+import threading
+import functools
+import contextlib
+from collections import Counter as StackCounter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from scanner_common.metrics import DEFAULT_SIZE_BUCKETS, REGISTRY, Histogram, Registry
+
+logger = logging.getLogger(__name__)
+
+STAGE_METRIC = 'menu_stage_duration_ms'
+
+_enabled = os.getenv('INSTRUMENTATION_ENABLED', 'true').lower() == 'true'
+_NULL_CONTEXT = contextlib.nullcontext()
+_stage_histograms: Dict[str, Histogram] = {}
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(value: bool):
+    """Turn stage and RPC timing on or off (the benchmark's baseline is off)."""
+    global _enabled
+    _enabled = value
+
+
+class _StageTimer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe((time.perf_counter() - self.start) * 1000)
+        return False
+
+
+def stage(name: str):
+    """Context manager timing one processing stage into
+    ``menu_stage_duration_ms{stage=name}``. Works around awaits too, where
+    it measures wall time including waits on other tasks."""
+    if not _enabled:
+        return _NULL_CONTEXT
+    histogram = _stage_histograms.get(name)
+    if histogram is None:
+        histogram = _stage_histograms[name] = REGISTRY.histogram(
+            STAGE_METRIC, 'Time spent in each menu processing stage', stage=name
+        )
+    return _StageTimer(histogram)
+
+
+class SamplingProfiler:
+    """Samples the stacks of threads serving RPCs, for slow-request flamegraphs.
+
+    While enabled, a background thread reads ``sys._current_frames()`` every
+    ``interval_ms`` and counts the collapsed stack of each thread that has an
+    RPC in flight. When an RPC that took at least ``slow_ms`` finishes, its
+    stacks are written to ``output_dir`` in the folded format that
+    flamegraph.pl and speedscope read (``frame;frame;frame count``). Disabled,
+    it costs the RPC wrapper one attribute check.
+
+    On the asyncio server every RPC runs on the event loop thread, so a slow
+    RPC's samples include whatever other coroutines ran meanwhile.
+    """
+
+    def __init__(
+        self,
+        interval_ms: Optional[float] = None,
+        slow_ms: Optional[float] = None,
+        output_dir: Optional[str] = None,
+        keep: int = 20
+    ):
+        self.interval_ms = interval_ms or float(os.getenv('PROFILER_INTERVAL_MS', 5))
+        self.slow_ms = slow_ms or float(os.getenv('PROFILER_SLOW_MS', 1000))
+        self.output_dir = output_dir or os.getenv('PROFILER_DIR', '/tmp/menu-service-profiles')
+        self.enabled = False
+        self._active: Dict[int, set] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self.slow_requests = deque(maxlen=keep)
+        self._stats = {'samples': 0, 'slow_requests': 0, 'dump_errors': 0}
+
+    def enable(self):
+        with self._lock:
+            if self.enabled:
+                return
+            self.enabled = True
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        logger.info(f"Sampling profiler enabled: every {self.interval_ms} ms, dumping RPCs over {self.slow_ms} ms")
+
+    def disable(self):
+        with self._lock:
+            if not self.enabled:
+                return
+            self.enabled = False
+            self._stopped.set()
+            thread = self._thread
+            self._active.clear()
+        thread.join(timeout=2)
+        logger.info("Sampling profiler disabled")
+
+    def begin(self, name: str) -> '_Trace':
+        trace = _Trace(name, threading.get_ident())
+        with self._lock:
+            self._active.setdefault(trace.thread_id, set()).add(trace)
+        return trace
+
+    def end(self, trace: '_Trace', elapsed_ms: float):
+        with self._lock:
+            traces = self._active.get(trace.thread_id)
+            if traces is not None:
+                traces.discard(trace)
+                if not traces:
+                    del self._active[trace.thread_id]
+        if elapsed_ms >= self.slow_ms and trace.stacks:
+            self._dump(trace, elapsed_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['enabled'] = self.enabled
+            stats['active'] = sum(len(traces) for traces in self._active.values())
+        return stats
+
+    def _run(self):
+        interval = self.interval_ms / 1000
+        while not self._stopped.wait(interval):
+            with self._lock:
+                if not self._active:
+                    continue
+                active = {thread_id: list(traces) for thread_id, traces in self._active.items()}
+            frames = sys._current_frames()
+            for thread_id, traces in active.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = _fold(frame)
+                for trace in traces:
+                    trace.stacks[stack] += 1
+            with self._lock:
+                self._stats['samples'] += 1
+
+    def _dump(self, trace: '_Trace', elapsed_ms: float):
+        path = os.path.join(
+            self.output_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{trace.name}-{int(elapsed_ms)}ms-{id(trace):x}.folded"
+        )
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(path, 'w') as f:
+                for stack, count in trace.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.warning(f"Could not write profile {path}: {e}")
+            with self._lock:
+                self._stats['dump_errors'] += 1
+            return
+        self.slow_requests.append({'rpc': trace.name, 'elapsed_ms': round(elapsed_ms, 1), 'path': path})
+        with self._lock:
+            self._stats['slow_requests'] += 1
+        logger.info(f"Slow {trace.name} ({elapsed_ms:.0f} ms), profile written to {path}")
+
+
+class _Trace:
+    __slots__ = ('name', 'thread_id', 'stacks')
+
+    def __init__(self, name: str, thread_id: int):
+        self.name = name
+        self.thread_id = thread_id
+        self.stacks = StackCounter()
+
+
+def _fold(frame) -> str:
+    """Collapsed stack, outermost frame first."""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+PROFILER = SamplingProfiler()
+
+
+class _RpcMetrics:
+    __slots__ = ('method', 'registry', 'in_flight', 'latency', 'request_bytes', 'response_bytes')
+
+    def __init__(self, method: str, registry: Registry):
+        self.method = method
+        self.registry = registry
+        self.in_flight = registry.gauge('grpc_server_in_flight', 'RPCs being served', method=method)
+        self.latency = registry.histogram('grpc_server_duration_ms', 'RPC latency in the servicer', method=method)
+        self.request_bytes = registry.histogram(
+            'grpc_server_request_bytes', 'Serialized request size', DEFAULT_SIZE_BUCKETS, method=method
+        )
+        self.response_bytes = registry.histogram(
+            'grpc_server_response_bytes', 'Serialized response size (sum over a stream)', DEFAULT_SIZE_BUCKETS,
+            method=method
+        )
+
+    def status(self, context):
+        """Count the RPC if the servicer set a non-OK status code."""
+        code = context.code() if hasattr(context, 'code') else None
+        name = getattr(code, 'name', code)
+        if name is None or name in ('OK', 0):
+            return
+        self.registry.counter(
+            'grpc_server_errors_total', 'RPCs that ended with a non-OK status', method=self.method, code=str(name)
+        ).inc()
+
+
+def track_rpc(function):
+    """Decorator for servicer methods (sync or async, unary or streaming).
+
+    Records in-flight count, latency, request and response sizes and the
+    status code set on the context, and registers the call with the
+    sampling profiler when it is enabled.
+    """
+    method = function.__name__
+    metrics = _RpcMetrics(method, REGISTRY)
+    in_flight, latency = metrics.in_flight, metrics.latency
+    request_bytes, response_bytes = metrics.request_bytes, metrics.response_bytes
+    clock = time.perf_counter
+
+    # The metric updates are written out in each wrapper rather than shared
+    # helpers: on a cached GetDish the wrapper is most of the added cost.
+    def finish(context, start, trace, size):
+        elapsed_ms = (clock() - start) * 1000
+        in_flight.dec()
+        latency.observe(elapsed_ms)
+        response_bytes.observe(size)
+        metrics.status(context)
+        if trace is not None:
+            PROFILER.end(trace, elapsed_ms)
+
+    if inspect.isasyncgenfunction(function):
+        @functools.wraps(function)
+        async def wrapper(self, request, context):
+            if not _enabled:
+                async for response in function(self, request, context):
+                    yield response
+                return
+            in_flight.inc()
+            request_bytes.observe(request.ByteSize())
+            trace = PROFILER.begin(method) if PROFILER.enabled else None
+            start = clock()
+            size = 0
+            try:
+                async for response in function(self, request, context):
+                    size += response.ByteSize()
+                    yield response
+            finally:
+                finish(context, start, trace, size)
+    elif inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(self, request, context):
+            if not _enabled:
+                return await function(self, request, context)
+            in_flight.inc()
+            request_bytes.observe(request.ByteSize())
+            trace = PROFILER.begin(method) if PROFILER.enabled else None
+            start = clock()
+            response = None
+            try:
+                response = await function(self, request, context)
+                return response
+            finally:
+                finish(context, start, trace, response.ByteSize() if response is not None else 0)
+    elif inspect.isgeneratorfunction(function):
+        @functools.wraps(function)
+        def wrapper(self, request, context):
+            if not _enabled:
+                yield from function(self, request, context)
+                return
+            in_flight.inc()
+            request_bytes.observe(request.ByteSize())
+            trace = PROFILER.begin(method) if PROFILER.enabled else None
+            start = clock()
+            size = 0
+            try:
+                for response in function(self, request, context):
+                    size += response.ByteSize()
+                    yield response
+            finally:
+                finish(context, start, trace, size)
+    else:
+        @functools.wraps(function)
+        def wrapper(self, request, context):
+            if not _enabled:
+                return function(self, request, context)
+            in_flight.inc()
+            request_bytes.observe(request.ByteSize())
+            trace = PROFILER.begin(method) if PROFILER.enabled else None
+            start = clock()
+            response = None
+            try:
+                response = function(self, request, context)
+                return response
+            finally:
+                finish(context, start, trace, response.ByteSize() if response is not None else 0)
+    return wrapper
+
+
+# Values of POST /debug/profiler?enabled=; '' leaves the profiler as it is
+_SWITCH = {'': None, '1': True, 'true': True, 'on': True, '0': False, 'false': False, 'off': False}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+    profiler: SamplingProfiler = PROFILER
+    token: str = ''
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/metrics':
+            self._reply(200, self.registry.render(), 'text/plain; version=0.0.4; charset=utf-8')
+        elif path == '/debug/profiler':
+            body = dict(self.profiler.stats(), slow_requests=list(self.profiler.slow_requests))
+            self._reply(200, json.dumps(body), 'application/json')
+        elif path == '/healthz':
+            self._reply(200, 'ok\n', 'text/plain')
+        else:
+            self._reply(404, 'not found\n', 'text/plain')
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        if parts.path != '/debug/profiler':
+            self._reply(404, 'not found\n', 'text/plain')
+            return
+        if not self._authorized():
+            self._reply(403, 'forbidden\n', 'text/plain')
+            return
+        query = parse_qs(parts.query)
+        slow_ms = None
+        if 'slow_ms' in query:
+            try:
+                slow_ms = float(query['slow_ms'][0])
+            except ValueError:
+                slow_ms = -1.0
+            if not 0 <= slow_ms < float('inf'):
+                self._reply(400, 'slow_ms must be a non-negative number\n', 'text/plain')
+                return
+        enabled = query.get('enabled', [''])[0].lower()
+        if enabled not in _SWITCH:
+            self._reply(400, 'enabled must be true or false\n', 'text/plain')
+            return
+
+        if slow_ms is not None:
+            self.profiler.slow_ms = slow_ms
+        if _SWITCH[enabled] is True:
+            self.profiler.enable()
+        elif _SWITCH[enabled] is False:
+            self.profiler.disable()
+        self._reply(200, json.dumps(self.profiler.stats()), 'application/json')
+
+    def _authorized(self) -> bool:
+        """With a token configured, POSTs must send it as a bearer token;
+        without one, only clients on this host may change the profiler."""
+        if self.token:
+            sent = self.headers.get('Authorization', '')
+            return hmac.compare_digest(sent.encode('utf-8'), f"Bearer {self.token}".encode('utf-8'))
+        return ipaddress.ip_address(self.client_address[0]).is_loopback
+
+    def log_message(self, format, *args):
+        logger.debug(f"metrics endpoint: {format % args}")
+
+    def _reply(self, status: int, body: str, content_type: str):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MetricsServer:
+    """HTTP endpoint on its own thread.
+
+    - ``GET /metrics``: the registry in Prometheus text format
+    - ``GET /debug/profiler``: profiler state and recent slow-RPC dumps
+    - ``POST /debug/profiler?enabled=true|false[&slow_ms=N]``: toggle it;
+      needs ``Authorization: Bearer <token>`` when a token is set, and
+      otherwise only answers clients on the loopback interface
+
+    It listens on ``host`` only: loopback by default, or the pod IP so
+    Prometheus can scrape it without exposing it on every interface.
+    """
+
+    def __init__(
+        self,
+        port: int,
+        host: str = '127.0.0.1',
+        registry: Registry = REGISTRY,
+        profiler: SamplingProfiler = PROFILER,
+        token: str = ''
+    ):
+        handler = type('MetricsHandler', (_Handler,), {'registry': registry, 'profiler': profiler, 'token': token})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-http', daemon=True)
+
+    def start(self) -> 'MetricsServer':
+        self._thread.start()
+        logger.info(f"Metrics endpoint listening on {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def start_metrics_server() -> Optional[MetricsServer]:
+    """Start the endpoint on METRICS_HOST:METRICS_PORT (port 0 disables it)
+    and the profiler when PROFILER_ENABLED is set."""
+    if os.getenv('PROFILER_ENABLED', 'false').lower() == 'true':
+        PROFILER.enable()
+    port = int(os.getenv('METRICS_PORT', 9090))
+    if not port:
+        return None
+    host = os.getenv('METRICS_HOST', '127.0.0.1')
+    try:
+        return MetricsServer(port, host, token=os.getenv('PROFILER_TOKEN', '')).start()
+    except OSError as e:
+        logger.warning(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
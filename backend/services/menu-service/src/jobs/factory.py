@@ -0,0 +1,23 @@
+import os
+import logging
+
+from jobs.queue import RedisJobQueue
+from stand_ins.memory_queue import InMemoryJobQueue
+
+logger = logging.getLogger(__name__)
+
+
+def job_queue_backend_name() -> str:
+    """JOB_QUEUE_BACKEND, defaulting to the in-process queue when CACHE_BACKEND=memory."""
+    default = 'memory' if os.getenv('CACHE_BACKEND', 'redis') == 'memory' else 'redis'
+    return os.getenv('JOB_QUEUE_BACKEND', default).lower()
+
+
+def create_job_queue(redis_client):
+    """Create the queue named by JOB_QUEUE_BACKEND ("redis" or "memory")."""
+    name = job_queue_backend_name()
+    if name == 'memory':
+        return InMemoryJobQueue()
+    if name != 'redis':
+        logger.warning(f"Unknown JOB_QUEUE_BACKEND {name!r}, using redis")
+    return RedisJobQueue(redis_client)
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Job priorities run from 0 to MAX_PRIORITY; higher runs first
+MAX_PRIORITY = 9
+
+
+class QueueFull(Exception):
+    """The job queue is at capacity; the caller should retry later."""
+
+
+class Job:
+    """A queued ProcessMenuImage request.
+
+    ``request`` is the serialized MenuImageRequest, so a job can be handed
+    to another process or replica as is. Jobs with the same ``dedupe_key``
+    (image and parse options) produce the same menu, so only one of them
+    is queued or running at a time.
+    """
+
+    __slots__ = ('menu_id', 'request', 'dedupe_key', 'priority', 'submitted_at')
+
+    def __init__(
+        self,
+        menu_id: str,
+        request: bytes,
+        dedupe_key: str,
+        priority: int = 0,
+        submitted_at: Optional[float] = None
+    ):
+        self.menu_id = menu_id
+        self.request = request
+        self.dedupe_key = dedupe_key
+        self.priority = max(0, min(MAX_PRIORITY, priority))
+        self.submitted_at = submitted_at or time.time()
+
+    def score(self) -> float:
+        """Sort score: priority first, then earliest submitted (higher pops first)."""
+        return self.priority * 2 ** 32 - self.submitted_at
+
+    def encode(self) -> bytes:
+        header = json.dumps({
+            'dedupe_key': self.dedupe_key,
+            'priority': self.priority,
+            'submitted_at': self.submitted_at
+        })
+        return header.encode('utf-8') + b'\n' + self.request
+
+    @classmethod
+    def decode(cls, menu_id: str, data: bytes) -> 'Job':
+        header, request = data.split(b'\n', 1)
+        fields = json.loads(header)
+        return cls(menu_id, request, fields['dedupe_key'], fields['priority'], fields['submitted_at'])
+
+
+class RedisJobQueue:
+    """Bounded priority queue of menu jobs, shared by all replicas through Redis.
+
+    - ``jobs:queue`` is a sorted set of waiting menu ids scored by Job.score().
+    - ``jobs:request:{menu_id}`` holds the encoded job.
+    - ``jobs:inflight:{dedupe_key}`` holds the menu id queued or running for
+      that image and options (SET NX), so an identical submission gets the
+      existing id back instead of a second job. It expires after
+      ``inflight_ttl`` seconds, re-armed when the job starts, so a job lost
+      with its worker only blocks resubmission that long.
+
+    The depth bound is checked before adding, so submitters racing on the
+    last slot can overshoot it by a few.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        max_depth: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        key_prefix: str = 'jobs',
+        inflight_ttl: Optional[int] = None
+    ):
+        self.redis_client = redis_client
+        self.max_depth = max_depth or int(os.getenv('JOB_QUEUE_MAX_DEPTH', 1000))
+        self.ttl_seconds = ttl_seconds or int(os.getenv('JOB_RESULT_TTL', 3600))
+        # Bounds how long a job lost with its worker keeps blocking resubmission
+        self.inflight_ttl = inflight_ttl or int(os.getenv('JOB_INFLIGHT_TTL', 300))
+        self.poll_interval = poll_interval or float(os.getenv('JOB_POLL_INTERVAL_MS', 100)) / 1000
+        self.queue_key = f"{key_prefix}:queue"
+        self.key_prefix = key_prefix
+
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'deduplicated': 0,
+            'rejected': 0,
+            'popped': 0
+        }
+
+    def submit(self, job: Job) -> Tuple[str, bool]:
+        """Queue the job; returns (menu_id, created). ``created`` is False when
+        an identical job was already queued or running, whose id is returned.
+        Raises QueueFull when the queue is at capacity."""
+        inflight_key = self._inflight_key(job.dedupe_key)
+        for _ in range(2):
+            if self.redis_client.set(inflight_key, job.menu_id, ex=self.inflight_ttl, nx=True):
+                break
+            existing = self.redis_client.get(inflight_key)
+            if existing is not None:
+                self._count('deduplicated')
+                return _text(existing), False
+            # Finished between the two calls; try to claim it again
+
+        if self.redis_client.zcard(self.queue_key) >= self.max_depth:
+            self.redis_client.delete(inflight_key)
+            self._count('rejected')
+            raise QueueFull(f"Job queue is full ({self.max_depth} waiting)")
+
+        # The request is written before the id is queued, so a popped id always has one
+        with self.redis_client.pipeline() as pipe:
+            pipe.set(self._job_key(job.menu_id), job.encode(), ex=self.ttl_seconds)
+            pipe.zadd(self.queue_key, {job.menu_id: job.score()})
+            pipe.execute()
+        self._count('submitted')
+        return job.menu_id, True
+
+    def pop(self, timeout: float = 0.0) -> Optional[Job]:
+        """Take the highest-priority job, polling for up to ``timeout`` seconds."""
+        deadline = time.monotonic() + timeout
+        while True:
+            popped = self.redis_client.zpopmax(self.queue_key)
+            if popped:
+                menu_id = _text(popped[0][0])
+                data = self.redis_client.get(self._job_key(menu_id))
+                if data is None:
+                    logger.warning(f"Job {menu_id} expired before it ran")
+                    continue
+                self._count('popped')
+                job = Job.decode(menu_id, data)
+                # The job may have waited most of its in-flight TTL; it runs from now
+                self.redis_client.expire(self._inflight_key(job.dedupe_key), self.inflight_ttl)
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(self.poll_interval, remaining))
+
+    def done(self, job: Job):
+        """Forget a finished job so the same image can be submitted again."""
+        inflight_key = self._inflight_key(job.dedupe_key)
+        keys = [self._job_key(job.menu_id)]
+        if _text(self.redis_client.get(inflight_key) or b'') == job.menu_id:
+            keys.append(inflight_key)
+        self.redis_client.delete(*keys)
+
+    def position(self, menu_id: str) -> Optional[int]:
+        """1-based place of a waiting job in the queue, or None once it has started."""
+        rank = self.redis_client.zrevrank(self.queue_key, menu_id)
+        return None if rank is None else rank + 1
+
+    def depth(self) -> int:
+        return self.redis_client.zcard(self.queue_key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        try:
+            stats['depth'] = self.depth()
+        except Exception as e:
+            logger.warning(f"Job queue depth unavailable: {e}")
+        return stats
+
+    def _job_key(self, menu_id: str) -> str:
+        return f"{self.key_prefix}:request:{menu_id}"
+
+    def _inflight_key(self, dedupe_key: str) -> str:
+        return f"{self.key_prefix}:inflight:{dedupe_key}"
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+
+def _text(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
@@ -0,0 +1,69 @@
+import os
+import sys
+from typing import Iterable, Optional
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+from cache.codec import CacheCodec
+
+QUEUED_MESSAGE = 'Queued for processing'
+RUNNING_MESSAGE = 'Processing'
+
+
+def job_status(
+    menu_id: str,
+    status: int,
+    message: str,
+    errors: Iterable[str] = ()
+) -> menu_pb2.MenuResponse:
+    """MenuResponse carrying only a job's status."""
+    return menu_pb2.MenuResponse(
+        menu_id=menu_id,
+        status=menu_pb2.ProcessingStatus(status=status, message=message, errors=list(errors))
+    )
+
+
+class JobStore:
+    """Progress and results of asynchronously processed menus.
+
+    ``job:{menu_id}`` holds the latest MenuResponse for the job: a
+    PROCESSING status while it is queued or running, then the full result
+    (COMPLETED or PARTIAL) or a FAILED status. Any replica can answer
+    GetMenuStatus from it, whichever one ran the job.
+    """
+
+    PREFIX = 'job:'
+
+    def __init__(self, redis_client, ttl_seconds: Optional[int] = None, codec: Optional[CacheCodec] = None):
+        self.redis_client = redis_client
+        self.codec = codec or CacheCodec()
+        self.ttl_seconds = ttl_seconds or int(os.getenv('JOB_RESULT_TTL', 3600))
+
+    def put(self, menu_id: str, response: menu_pb2.MenuResponse):
+        self.redis_client.setex(self.PREFIX + menu_id, self.ttl_seconds, self.codec.encode_message(response))
+
+    def get(self, menu_id: str) -> Optional[menu_pb2.MenuResponse]:
+        return self._decode(self.redis_client.get(self.PREFIX + menu_id))
+
+    def delete(self, menu_id: str):
+        self.redis_client.delete(self.PREFIX + menu_id)
+
+    def _decode(self, data) -> Optional[menu_pb2.MenuResponse]:
+        if data is None:
+            return None
+        return self.codec.decode_message(data, menu_pb2.MenuResponse)
+
+
+class AsyncJobStore(JobStore):
+    """JobStore over a redis.asyncio client."""
+
+    async def put(self, menu_id: str, response: menu_pb2.MenuResponse):
+        await self.redis_client.setex(self.PREFIX + menu_id, self.ttl_seconds, self.codec.encode_message(response))
+
+    async def get(self, menu_id: str) -> Optional[menu_pb2.MenuResponse]:
+        return self._decode(await self.redis_client.get(self.PREFIX + menu_id))
+
+    async def delete(self, menu_id: str):
+        await self.redis_client.delete(self.PREFIX + menu_id)
@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import logging
+import functools
+import threading
+import multiprocessing
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+from jobs.queue import Job
+from jobs.store import RUNNING_MESSAGE, JobStore, job_status
+from scanner_common.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# The MenuProcessor of a worker process, built once by _init_worker
+_processor = None
+
+
+def _init_worker(processor_factory: Callable):
+    global _processor
+    _processor = processor_factory()
+
+
+def _run_job(menu_id: str, request: bytes) -> bytes:
+    """Process one job in a worker process; returns the serialized MenuResponse."""
+    request = menu_pb2.MenuImageRequest.FromString(request)
+    response = _processor.process_menu(
+        image_data=request.image_data,
+        image_url=request.image_url,
+        options=request.options,
+        menu_id=menu_id
+    )
+    return response.SerializeToString()
+
+
+class JobWorkerPool:
+    """Runs queued menu jobs in a pool of worker processes.
+
+    A dispatcher thread pops the highest-priority job whenever a worker is
+    free, marks it running in the job store and hands the request to a
+    worker process, which builds its own MenuProcessor with
+    ``processor_factory`` (picklable, e.g. the class itself). The finished
+    MenuResponse, or a FAILED status, is then written to the store and the
+    job's dedupe entry cleared. OCR, parsing and indexing happen outside
+    the serving process, so accepting a job costs the same however slow
+    they are.
+
+    A worker that dies takes the pool with it; its jobs are failed and a
+    fresh pool is started for the next ones.
+    """
+
+    def __init__(
+        self,
+        queue,
+        store: JobStore,
+        processor_factory: Callable,
+        workers: Optional[int] = None,
+        poll_interval: Optional[float] = None
+    ):
+        self.queue = queue
+        self.store = store
+        self.processor_factory = processor_factory
+        self.workers = workers or int(os.getenv('JOB_WORKERS', 2))
+        self.poll_interval = poll_interval or float(os.getenv('JOB_POLL_INTERVAL_MS', 100)) / 1000
+
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.workers)
+        self._stopped = threading.Event()
+        self._stats = {
+            'started': 0,
+            'completed': 0,
+            'failed': 0,
+            'running': 0,
+            'pool_restarts': 0
+        }
+        self.queue_wait = Histogram('menu_job_queue_wait_ms', 'Time from job submission to a worker picking it up')
+        self.run_time = Histogram('menu_job_run_ms', 'Time a job spent in a worker process')
+
+        self._executor = self._new_executor()
+        self._thread = threading.Thread(target=self._dispatch, name='menu-job-dispatcher', daemon=True)
+        self._thread.start()
+        logger.info(f"Job worker pool started with {self.workers} processes")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, workers=self.workers)
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop taking jobs and wait for the running ones to finish.
+        Jobs still queued stay in the queue (for other replicas, if shared)."""
+        self._stopped.set()
+        self._thread.join(timeout)
+        with self._lock:
+            executor = self._executor
+        executor.shutdown(wait=True)
+        logger.info(f"Job workers: {self.stats()}")
+
+    def _new_executor(self) -> futures.ProcessPoolExecutor:
+        # Spawned rather than forked: the server process has gRPC and client threads running
+        return futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.processor_factory,)
+        )
+
+    def _dispatch(self):
+        while not self._stopped.is_set():
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            try:
+                job = self.queue.pop(timeout=self.poll_interval)
+            except Exception as e:
+                logger.warning(f"Job queue unavailable: {e}")
+                job = None
+                self._stopped.wait(self.poll_interval)
+            if job is None:
+                self._slots.release()
+                continue
+            self._start(job)
+
+    def _start(self, job: Job):
+        started = time.time()
+        self.queue_wait.observe((started - job.submitted_at) * 1000)
+        with self._lock:
+            self._stats['started'] += 1
+            self._stats['running'] += 1
+            executor = self._executor
+        try:
+            self.store.put(job.menu_id, job_status(job.menu_id, menu_pb2.ProcessingStatus.Status.PROCESSING, RUNNING_MESSAGE))
+            future = executor.submit(_run_job, job.menu_id, job.request)
+        except Exception as e:
+            future = futures.Future()
+            future.set_exception(e)
+        future.add_done_callback(functools.partial(self._finished, job, started, executor))
+
+    def _finished(self, job: Job, started: float, executor: futures.ProcessPoolExecutor, future: futures.Future):
+        self.run_time.observe((time.time() - started) * 1000)
+        try:
+            response = menu_pb2.MenuResponse.FromString(future.result())
+            outcome = 'completed'
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._restart(executor)
+            logger.error(f"Menu job {job.menu_id} failed: {e}")
+            response = job_status(
+                job.menu_id,
+                menu_pb2.ProcessingStatus.Status.FAILED,
+                'Menu processing failed',
+                [str(e) or type(e).__name__]
+            )
+            outcome = 'failed'
+
+        try:
+            self.store.put(job.menu_id, response)
+            self.queue.done(job)
+        except Exception as e:
+            logger.error(f"Could not record the result of menu job {job.menu_id}: {e}")
+        finally:
+            with self._lock:
+                self._stats[outcome] += 1
+                self._stats['running'] -= 1
+            self._slots.release()
+
+    def _restart(self, broken: futures.ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is not broken or self._stopped.is_set():
+                return
+            self._executor = self._new_executor()
+            self._stats['pool_restarts'] += 1
+        broken.shutdown(wait=False)
+        logger.warning("Job worker process died; started a new pool")
@@ -0,0 +1,79 @@
+import os
+import sys
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+from pages.splitter import Page
+
+DishKey = Tuple[str, Optional[float]]
+
+
+def dish_key(dish: menu_pb2.Dish) -> DishKey:
+    """Name (case and spacing folded) and price: what makes two readings
+    of a menu entry the same dish."""
+    price = round(dish.price.amount, 2) if dish.HasField('price') else None
+    return ' '.join(dish.name.casefold().split()), price
+
+
+class PageResult(NamedTuple):
+    """The dishes of one page, less those already read from an overlapping tile."""
+    page: Page
+    dishes: List[menu_pb2.Dish]
+
+
+class OverlapDeduper:
+    """Drops dishes read twice from the overlap of two adjacent tiles.
+
+    Tiles are added in whatever order they finish. A dish of a tile is
+    dropped when the same dish (dish_key) was kept from a neighbouring
+    tile already added, both readings lying in the band the two tiles
+    share; the first reading to arrive wins. Dishes parsed without
+    positions count as lying in the band. PDF pages do not overlap and are
+    kept whole: a dish listed on two pages is listed twice.
+    """
+
+    def __init__(self, pages: Iterable[Page]):
+        self._pages: Dict[int, Page] = {page.index: page for page in pages}
+        # Per added tile: (key, bottom in image rows, None without a position)
+        self._kept: Dict[int, List[Tuple[DishKey, Optional[float]]]] = {}
+        self.dropped = 0
+
+    def add(self, page: Page, dishes: List[menu_pb2.Dish], bottoms: List[float]) -> List[menu_pb2.Dish]:
+        """The dishes of ``page`` not already kept from a neighbour."""
+        if page.kind != 'tile':
+            return dishes
+
+        kept = []
+        entries = []
+        for dish, bottom in zip(dishes, bottoms):
+            key = dish_key(dish)
+            position = page.top + bottom if bottom else None
+            if self._in_neighbour(page, key, position):
+                self.dropped += 1
+                continue
+            kept.append(dish)
+            entries.append((key, position))
+        self._kept[page.index] = entries
+        return kept
+
+    def _in_neighbour(self, page: Page, key: DishKey, position: Optional[float]) -> bool:
+        for index in (page.index - 1, page.index + 1):
+            neighbour = self._pages.get(index)
+            entries = self._kept.get(index)
+            if neighbour is None or entries is None:
+                continue
+            band_top = max(page.top, neighbour.top)
+            band_bottom = min(page.bottom, neighbour.bottom)
+            if not _in_band(position, band_top, band_bottom):
+                continue
+            for other_key, other_position in entries:
+                if other_key == key and _in_band(other_position, band_top, band_bottom):
+                    return True
+        return False
+
+
+def _in_band(position: Optional[float], top: int, bottom: int) -> bool:
+    return position is None or top <= position <= bottom
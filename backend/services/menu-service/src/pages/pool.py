@@ -0,0 +1,209 @@
+import os
+import sys
+import time
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+import clients
+from scanner_common.cpus import available_cpus
+from scanner_common.metrics import Histogram
+from scanner_common.ocr.router import create_ocr_engine
+from pages.merge import OverlapDeduper, PageResult
+from pages.splitter import Page, PageSplitter, render_page
+from processors.base import MenuProcessorBase
+
+logger = logging.getLogger(__name__)
+
+# The OCR engine of a page worker process, built once by _init_worker
+_ocr_engine = None
+_processor_base = MenuProcessorBase()
+
+
+def create_page_ocr_engine():
+    """Default OCR engine of a page worker: the one OCR_ENGINE selects,
+    with Tesseract run in the worker itself."""
+    return create_ocr_engine(clients.vision_client(), in_process=True)
+
+
+def _init_worker(ocr_factory: Callable):
+    global _ocr_engine
+    _ocr_engine = ocr_factory()
+
+
+def _process_page(path: str, page: Page, dpi: int, options: bytes) -> Tuple[List[bytes], List[float]]:
+    """Render, OCR and parse one page in a worker process; returns the
+    serialized dishes and where each ends on the page (0 if unknown)."""
+    options = menu_pb2.ProcessingOptions.FromString(options)
+    image_data = render_page(path, page, dpi)
+    ocr_result = _ocr_engine.extract(image_data, options.language)
+    if ocr_result is None or not ocr_result.full_text:
+        return [], []
+
+    parsed_dishes = list(_processor_base.menu_parser.parse(ocr_result))
+    categories = _processor_base.categorizer.categorize([parsed.name for parsed in parsed_dishes], options.language)
+    dishes = [
+        _processor_base._to_dish(parsed, category, options).SerializeToString()
+        for parsed, category in zip(parsed_dishes, categories)
+    ]
+    return dishes, [parsed.bottom for parsed in parsed_dishes]
+
+
+class PagePool:
+    """OCRs and parses the pages of PDF menus, and the tiles of very tall
+    images, in parallel in a pool of PAGE_WORKERS processes.
+
+    Each worker builds its own OCR engine with ``ocr_factory`` (picklable;
+    default create_page_ocr_engine) and renders, OCRs and parses whole
+    pages, so only the dishes come back to the serving process. The menu is
+    written to a temporary file that workers render their page from, and at
+    most PAGE_MAX_IN_FLIGHT pages are submitted at a time: memory grows with
+    the workers, not with the page count.
+
+    process() yields each page as soon as it is done, in completion order.
+    The pool is started on the first split menu; a worker that dies takes
+    the pool with it, and the next menu starts a fresh one.
+    """
+
+    def __init__(
+        self,
+        ocr_factory: Optional[Callable] = None,
+        workers: Optional[int] = None,
+        splitter: Optional[PageSplitter] = None,
+        max_in_flight: Optional[int] = None
+    ):
+        self.ocr_factory = ocr_factory or create_page_ocr_engine
+        self.workers = workers or int(os.getenv('PAGE_WORKERS', available_cpus()))
+        self.splitter = splitter or PageSplitter()
+        self.max_in_flight = max_in_flight or int(os.getenv('PAGE_MAX_IN_FLIGHT', self.workers))
+        self.timeout = float(os.getenv('PAGE_TIMEOUT', 60))
+        self.spool_dir = os.getenv('PAGE_SPOOL_DIR') or None
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'menus': 0,
+            'pages': 0,
+            'failed_pages': 0,
+            'overlap_duplicates': 0,
+            'pool_restarts': 0
+        }
+        self.page_time = Histogram('menu_page_ms', 'Time to render, OCR and parse one page or tile in a worker')
+
+    def split(self, image_data: bytes) -> Optional[List[Page]]:
+        """The pages to process in parallel; None for an ordinary image."""
+        return self.splitter.split(image_data)
+
+    def process(
+        self,
+        image_data: bytes,
+        pages: List[Page],
+        options: menu_pb2.ProcessingOptions
+    ) -> Iterator[PageResult]:
+        """OCR and parse ``pages`` of ``image_data``, yielding each as it
+        finishes. A page that fails is logged and yields no dishes.
+        Closing the iterator early cancels the pages not yet started."""
+        fd, path = tempfile.mkstemp(prefix='menu-pages-', dir=self.spool_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(image_data)
+        self._count('menus')
+
+        executor = self._executor()
+        options_data = options.SerializeToString()
+        deduper = OverlapDeduper(pages)
+        queued = iter(pages)
+        pending = {}
+
+        def submit():
+            page = next(queued, None)
+            if page is not None:
+                future = executor.submit(_process_page, path, page, self.splitter.render_dpi, options_data)
+                pending[future] = (page, time.perf_counter())
+
+        try:
+            for _ in range(self.max_in_flight):
+                submit()
+            while pending:
+                done, _ = futures.wait(pending, timeout=self.timeout, return_when=futures.FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError(f"No page finished within {self.timeout}s")
+                for future in done:
+                    page, started = pending.pop(future)
+                    submit()
+                    yield PageResult(page, self._page_dishes(deduper, page, started, future))
+        except BrokenProcessPool:
+            # Raised by the dead worker's future or by the next submit
+            self._restart(executor)
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+            self._count('overlap_duplicates', deduper.dropped)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, workers=self.workers)
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _page_dishes(
+        self,
+        deduper: OverlapDeduper,
+        page: Page,
+        started: float,
+        future: futures.Future
+    ) -> List[menu_pb2.Dish]:
+        self.page_time.observe((time.perf_counter() - started) * 1000)
+        try:
+            serialized, bottoms = future.result()
+        except BrokenProcessPool:
+            # Not a failed page: process() restarts the pool
+            raise
+        except Exception as e:
+            logger.error(f"Page {page.index} ({page.kind}) failed: {e}")
+            self._count('failed_pages')
+            return []
+        self._count('pages')
+        dishes = [menu_pb2.Dish.FromString(dish) for dish in serialized]
+        return deduper.add(page, dishes, bottoms)
+
+    def _executor(self) -> futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned rather than forked: the server process has gRPC and client threads running
+                self._pool = futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.ocr_factory,)
+                )
+            return self._pool
+
+    def _restart(self, broken: futures.ProcessPoolExecutor):
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = None
+            self._stats['pool_restarts'] += 1
+        broken.shutdown(wait=False)
+        logger.warning("Page worker process died; the next menu starts a new pool")
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
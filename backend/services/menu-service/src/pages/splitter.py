@@ -0,0 +1,152 @@
+import io
+import os
+import logging
+import threading
+from typing import List, NamedTuple, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+PDF_MAGIC = b'%PDF-'
+
+# EXIF orientations that rotate the image by 90 degrees
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+class Page(NamedTuple):
+    """One part of a split menu: a PDF page, or a band (tile) of a tall
+    image spanning rows ``top`` to ``bottom`` of it."""
+    index: int
+    kind: str  # 'pdf' or 'tile'
+    top: int = 0
+    bottom: int = 0
+
+
+def _pdfium():
+    try:
+        import pypdfium2
+    except ImportError:  # optional dependency
+        raise ValueError("PDF menus need pypdfium2, which is not installed") from None
+    return pypdfium2
+
+
+class PageSplitter:
+    """Splits PDF menus into pages and very tall images (stitched photos
+    of a long menu) into overlapping tiles.
+
+    An image is tiled when it is taller than PAGE_TILE_HEIGHT and at least
+    PAGE_TILE_MIN_ASPECT times as tall as it is wide. Tiles are
+    PAGE_TILE_HEIGHT high and overlap by PAGE_TILE_OVERLAP, which should
+    exceed a menu entry so that every dish is whole in at least one tile.
+    Requests are recognized by content; MenuImageRequest.format is not
+    needed.
+    """
+
+    def __init__(
+        self,
+        tile_height: Optional[int] = None,
+        tile_overlap: Optional[int] = None,
+        min_aspect: Optional[float] = None,
+        render_dpi: Optional[int] = None,
+        max_pages: Optional[int] = None
+    ):
+        self.tile_height = tile_height or int(os.getenv('PAGE_TILE_HEIGHT', 2000))
+        self.tile_overlap = tile_overlap if tile_overlap is not None else int(os.getenv('PAGE_TILE_OVERLAP', 300))
+        self.min_aspect = min_aspect or float(os.getenv('PAGE_TILE_MIN_ASPECT', 2.0))
+        self.render_dpi = render_dpi or int(os.getenv('PAGE_RENDER_DPI', 150))
+        self.max_pages = max_pages or int(os.getenv('PAGE_MAX_PAGES', 50))
+        if not 0 <= self.tile_overlap < self.tile_height:
+            raise ValueError("PAGE_TILE_OVERLAP must be smaller than PAGE_TILE_HEIGHT")
+
+    def split(self, data: bytes) -> Optional[List[Page]]:
+        """The pages of a PDF or the tiles of a tall image; None for an
+        image that is processed whole. Raises ValueError for a PDF that
+        cannot be read or has more than PAGE_MAX_PAGES pages."""
+        if not data:
+            return None
+        if data.startswith(PDF_MAGIC):
+            return self._pdf_pages(data)
+        return self._tiles(data)
+
+    def _pdf_pages(self, data: bytes) -> List[Page]:
+        pdfium = _pdfium()
+        try:
+            document = pdfium.PdfDocument(data)
+        except pdfium.PdfiumError as e:
+            raise ValueError(f"Could not read PDF menu: {e}") from e
+        try:
+            count = len(document)
+        finally:
+            document.close()
+        if count == 0:
+            raise ValueError("PDF menu has no pages")
+        if count > self.max_pages:
+            raise ValueError(f"PDF menu has {count} pages, at most {self.max_pages} are processed")
+        return [Page(index, 'pdf') for index in range(count)]
+
+    def _tiles(self, data: bytes) -> Optional[List[Page]]:
+        # Only the header is read here, not the pixels
+        try:
+            image = Image.open(io.BytesIO(data))
+            width, height = image.size
+            if image.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+        except Exception:
+            return None
+        if height <= self.tile_height or height < self.min_aspect * width:
+            return None
+
+        tiles = []
+        top = 0
+        while True:
+            bottom = min(top + self.tile_height, height)
+            tiles.append(Page(len(tiles), 'tile', top, bottom))
+            if bottom >= height:
+                break
+            top = bottom - self.tile_overlap
+        if len(tiles) > self.max_pages:
+            raise ValueError(f"Image splits into {len(tiles)} tiles, at most {self.max_pages} are processed")
+        return tiles
+
+
+def render_page(path: str, page: Page, dpi: int) -> bytes:
+    """JPEG of one page of the PDF, or one tile of the image, at ``path``."""
+    if page.kind == 'pdf':
+        document = _pdfium().PdfDocument(path)
+        try:
+            image = document[page.index].render(scale=dpi / 72).to_pil()
+        finally:
+            document.close()
+    else:
+        image = _decoded_image(path)
+        image = image.crop((0, page.top, image.width, page.bottom))
+
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+# The tall image a page worker decoded last, keyed by the file's identity:
+# a worker usually renders several tiles of the same menu in a row
+_decoded: Optional[Tuple[tuple, Image.Image]] = None
+_decoded_lock = threading.Lock()
+
+
+def _decoded_image(path: str) -> Image.Image:
+    """The upright, fully decoded image at ``path``, decoded once for all
+    its tiles. Only the latest image is kept, so an idle worker holds at
+    most one menu's pixels."""
+    global _decoded
+    stat = os.stat(path)
+    key = (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _decoded_lock:
+        if _decoded is not None and _decoded[0] == key:
+            return _decoded[1]
+        # Drop the previous menu before decoding the next one
+        _decoded = None
+        with Image.open(path) as image:
+            upright = ImageOps.exif_transpose(image)
+            upright.load()
+        _decoded = (key, upright)
+        return upright
@@ -0,0 +1,309 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, FrozenSet, Hashable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(__file__), 'taxonomy.json')
+DEFAULT_CATEGORY = 'other'
+
+# Keywords in a language other than ProcessingOptions.language count a bit less
+OTHER_LANGUAGE_FACTOR = 0.8
+# The head noun ("... salad", "phở ...") outweighs modifiers
+HEAD_FACTOR = 1.5
+
+def _unspaced(char: str) -> bool:
+    """Scripts written without spaces between words (CJK, kana, Thai)."""
+    code = ord(char)
+    return 0x3040 <= code <= 0x30FF or 0x3400 <= code <= 0x9FFF or 0x0E00 <= code <= 0x0E7F
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Lowercased word tokens with Latin accents removed and a light plural
+    stem, so "Phở Bò", "pho bo" and "PHO BOS" normalize alike."""
+    text = unicodedata.normalize('NFKD', text.lower().replace('đ', 'd'))
+    kept = []
+    base = ''
+    for char in text:
+        if unicodedata.category(char).startswith('M'):
+            # Only strip accents from Latin letters; Thai and kana marks are letters' parts
+            if not base or ord(base) < 0x250:
+                continue
+        elif char.isalnum():
+            base = char
+        else:
+            base = ''
+            char = ' '
+        kept.append(char)
+    tokens = unicodedata.normalize('NFC', ''.join(kept)).split()
+    return [_stem(token) for token in tokens]
+
+
+def _stem(token: str) -> str:
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss') and token.isascii():
+        return token[:-1]
+    return token
+
+
+def _language(language: str) -> str:
+    return language.lower().replace('_', '-').split('-')[0]
+
+
+class Automaton:
+    """Aho-Corasick automaton over sequences of symbols.
+
+    Used with word tokens (multi-word keywords match whole words only) and
+    with characters (keywords in unspaced scripts match anywhere). One pass
+    over the input finds every keyword occurrence, however many keywords
+    there are.
+    """
+
+    def __init__(self):
+        self.goto: List[Dict[Hashable, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]
+
+    def add(self, symbols: Sequence[Hashable], value: int):
+        state = 0
+        for symbol in symbols:
+            next_state = self.goto[state].get(symbol)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][symbol] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(value)
+
+    def build(self):
+        """Compute failure links breadth-first and merge outputs along them."""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and symbol not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(symbol, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def find(self, symbols: Sequence[Hashable]) -> List[Tuple[int, int]]:
+        """(value, end position) for every keyword occurrence."""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = []
+        state = 0
+        for position, symbol in enumerate(symbols):
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            for value in output[state]:
+                found.append((value, position))
+        return found
+
+    def __len__(self) -> int:
+        return len(self.goto)
+
+
+class Keyword:
+    __slots__ = ('category', 'weight', 'length', 'languages')
+
+    def __init__(self, category: str, weight: float, length: int, languages: FrozenSet[str]):
+        self.category = category
+        self.weight = weight
+        self.length = length
+        self.languages = languages
+
+
+class Taxonomy:
+    """A taxonomy file compiled into word and character automata.
+
+    The file maps each category to keywords per language code, with
+    optional per-keyword weights (default 1, plus 0.5 per extra word, so
+    phrases beat the words in them)::
+
+        {"default": "other", "head_final": ["en"],
+         "categories": {"dessert": {"keywords": {"en": ["ice cream"]},
+                                    "weights": {"sweet": 0.5}}}}
+    """
+
+    def __init__(self, data: dict, version: str = ''):
+        self.version = version
+        self.default = data.get('default', DEFAULT_CATEGORY)
+        self.head_final = frozenset(data.get('head_final', []))
+        self.keywords: List[Keyword] = []
+        self.words = Automaton()
+        self.chars = Automaton()
+
+        patterns: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+        for category, spec in data['categories'].items():
+            weights = {tuple(normalize_tokens(k)): float(w) for k, w in spec.get('weights', {}).items()}
+            for language, keywords in spec['keywords'].items():
+                for keyword in keywords:
+                    tokens = tuple(normalize_tokens(keyword))
+                    if not tokens:
+                        continue
+                    index = patterns.get((category, tokens))
+                    if index is not None:
+                        entry = self.keywords[index]
+                        entry.languages = entry.languages | {_language(language)}
+                        continue
+                    weight = weights.get(tokens, 1.0 + 0.5 * (len(tokens) - 1))
+                    index = patterns[(category, tokens)] = len(self.keywords)
+                    if any(_unspaced(char) for char in ''.join(tokens)):
+                        text = ''.join(tokens)
+                        self.keywords.append(Keyword(category, weight, len(text), frozenset([_language(language)])))
+                        self.chars.add(text, index)
+                    else:
+                        self.keywords.append(Keyword(category, weight, len(tokens), frozenset([_language(language)])))
+                        self.words.add(tokens, index)
+        self.words.build()
+        self.chars.build()
+
+    @classmethod
+    def load(cls, path: str) -> 'Taxonomy':
+        with open(path, 'rb') as f:
+            raw = f.read()
+        return cls(json.loads(raw), hashlib.sha256(raw).hexdigest()[:12])
+
+    def categorize(self, name: str, language: str = '') -> str:
+        tokens = normalize_tokens(name)
+        starts = []
+        offset = 0
+        for token in tokens:
+            starts.append(offset)
+            offset += len(token) + 1
+        # (start, end, keyword) character spans in the normalized name
+        spans = []
+        for index, end in self.words.find(tokens):
+            start = starts[end - self.keywords[index].length + 1]
+            spans.append((start, starts[end] + len(tokens[end]) - 1, index))
+        for token, start in zip(tokens, starts):
+            if not token.isascii() and any(_unspaced(char) for char in token):
+                for index, end in self.chars.find(token):
+                    spans.append((start + end - self.keywords[index].length + 1, start + end, index))
+        if not spans:
+            return self.default
+        if len(spans) > 1:
+            spans = self._longest(spans)
+
+        language = _language(language)
+        head_final = language in self.head_final if language else None
+        scores: Dict[str, float] = {}
+        first = min(spans)
+        last = max(spans, key=lambda span: span[1])
+        for span in spans:
+            keyword = self.keywords[span[2]]
+            score = keyword.weight
+            if language and language not in keyword.languages:
+                score *= OTHER_LANGUAGE_FACTOR
+            is_head_final = head_final if head_final is not None else bool(keyword.languages & self.head_final)
+            if span is (last if is_head_final else first):
+                score *= HEAD_FACTOR
+            scores[keyword.category] = scores.get(keyword.category, 0.0) + score
+        return max(scores, key=scores.get)
+
+    @staticmethod
+    def _longest(spans: list) -> list:
+        """Drop matches inside a longer match ("bún bò" inside "bún bò huế")."""
+        kept = []
+        for span in sorted(spans, key=lambda s: (s[0] - s[1], s[0])):
+            if not any(start <= span[0] and span[1] <= end for start, end, _ in kept):
+                kept.append(span)
+        return sorted(kept)
+
+
+class Categorizer:
+    """Dish categorizer backed by a taxonomy file that reloads on change.
+
+    At most every ``reload_interval`` seconds a call checks the file's
+    modification time; a changed file is compiled and swapped in while the
+    old taxonomy keeps serving, and a file that fails to load is logged and
+    ignored.
+    """
+
+    def __init__(self, path: Optional[str] = None, reload_interval: Optional[float] = None):
+        self.path = path or os.getenv('CATEGORY_TAXONOMY_PATH', DEFAULT_TAXONOMY_PATH)
+        self.reload_interval = reload_interval if reload_interval is not None else float(
+            os.getenv('CATEGORY_RELOAD_INTERVAL', 5)
+        )
+        self._reload_lock = threading.Lock()
+        self._stats = {'reloads': 0, 'reload_errors': 0}
+        self._mtime = os.path.getmtime(self.path)
+        self._checked = time.monotonic()
+        self.taxonomy = Taxonomy.load(self.path)
+        logger.info(f"Loaded taxonomy {self.taxonomy.version} with {len(self.taxonomy.keywords)} keywords")
+
+    @property
+    def version(self) -> str:
+        self._maybe_reload()
+        return self.taxonomy.version
+
+    def categorize(self, names: List[str], language: str = '') -> List[str]:
+        """Category of each dish name, in order."""
+        self._maybe_reload()
+        taxonomy = self.taxonomy
+        return [taxonomy.categorize(name, language) for name in names]
+
+    def reload(self) -> bool:
+        """Load the taxonomy file now; returns False if it failed."""
+        try:
+            mtime = os.path.getmtime(self.path)
+            taxonomy = Taxonomy.load(self.path)
+        except Exception as e:
+            logger.error(f"Failed to reload taxonomy {self.path}: {e}")
+            self._stats['reload_errors'] += 1
+            return False
+        self._mtime = mtime
+        self.taxonomy = taxonomy
+        self._stats['reloads'] += 1
+        logger.info(f"Reloaded taxonomy {taxonomy.version} with {len(taxonomy.keywords)} keywords")
+        return True
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats['version'] = self.taxonomy.version
+        stats['keywords'] = len(self.taxonomy.keywords)
+        return stats
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return
+        # One caller checks; the rest keep using the current taxonomy
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                logger.warning(f"Cannot stat taxonomy {self.path}: {e}")
+                return
+            if mtime != self._mtime:
+                if not self.reload():
+                    # Do not retry a broken file until it changes again
+                    self._mtime = mtime
+        finally:
+            self._reload_lock.release()
+
+
+_default_categorizer: Optional[Categorizer] = None
+_default_lock = threading.Lock()
+
+
+def default_categorizer() -> Categorizer:
+    """The process-wide categorizer for CATEGORY_TAXONOMY_PATH."""
+    global _default_categorizer
+    with _default_lock:
+        if _default_categorizer is None:
+            _default_categorizer = Categorizer()
+        return _default_categorizer
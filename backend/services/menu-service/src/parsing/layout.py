@@ -0,0 +1,148 @@
+import math
+import statistics
+from typing import Dict, List, Tuple
+
+from scanner_common.ocr.base import TextRegion, mean_confidence
+
+# Steeper text than this (about 8.5 degrees) is left to image preprocessing
+MAX_SLOPE = 0.15
+
+
+class Segment:
+    """Words on one row that sit close together, e.g. a dish name or a price."""
+
+    __slots__ = ('words', 'x', 'y', 'right', 'bottom')
+
+    def __init__(self, words: List[TextRegion]):
+        self.words = words
+        self.x = min(word.x for word in words)
+        self.y = min(word.y for word in words)
+        self.right = max(word.x + word.width for word in words)
+        self.bottom = max(word.y + word.height for word in words)
+
+    @property
+    def text(self) -> str:
+        return ' '.join(word.text for word in self.words)
+
+    @property
+    def confidence(self) -> float:
+        return mean_confidence(self.words)
+
+
+def has_geometry(words: List[TextRegion]) -> bool:
+    """True when the OCR engine returned usable word boxes."""
+    return any(word.height > 0 and word.width > 0 for word in words)
+
+
+def line_height(words: List[TextRegion]) -> float:
+    """Median word height, sampled so it stays cheap on very dense pages."""
+    step = max(1, len(words) // 2000)
+    heights = [word.height for word in words[::step] if word.height > 0]
+    return float(statistics.median(heights)) if heights else 1.0
+
+
+def _is_leader(text: str) -> bool:
+    # Dot leaders and rules between a dish and its price: "......", "---", "___"
+    return len(text) >= 2 and all(char in '.·…-_–—' for char in text)
+
+
+def estimate_slope(words: List[TextRegion], height: float) -> float:
+    """Median dy/dx between each word and its nearest right-hand neighbour.
+
+    Words are bucketed into a grid of cells one line high and four lines
+    wide, so each lookup only touches neighbouring cells.
+    """
+    cell_w = 4 * height
+    grid: Dict[Tuple[int, int], List[TextRegion]] = {}
+    for word in words:
+        center_y = word.y + word.height / 2
+        grid.setdefault((int(center_y // height), int(word.x // cell_w)), []).append(word)
+
+    slopes = []
+    for word in words:
+        center_y = word.y + word.height / 2
+        right = word.x + word.width
+        band = int(center_y // height)
+        best = None
+        best_gap = 2 * height
+        for b in (band - 1, band, band + 1):
+            for c in range(int(right // cell_w), int((right + best_gap) // cell_w) + 1):
+                for other in grid.get((b, c), ()):
+                    gap = other.x - right
+                    if 0 <= gap < best_gap and abs(other.y + other.height / 2 - center_y) < height:
+                        best, best_gap = other, gap
+        if best is not None:
+            dx = (best.x + best.width / 2) - (word.x + word.width / 2)
+            if dx > 0:
+                slopes.append((best.y + best.height / 2 - center_y) / dx)
+
+    if len(slopes) < 3:
+        return 0.0
+    slope = statistics.median(slopes)
+    return max(-MAX_SLOPE, min(MAX_SLOPE, slope))
+
+
+def group_rows(words: List[TextRegion], height: float, slope: float = 0.0) -> List[List[TextRegion]]:
+    """Group words whose (skew-corrected) vertical centres agree into rows.
+
+    Rows are found through a grid of one-line-high bands, so each word is
+    compared only with rows in its own and adjacent bands. Returns rows
+    top to bottom, each sorted left to right.
+    """
+    tolerance = height / 2
+    rows: List[list] = []  # [center_y, count, words]
+    bands: Dict[int, List[int]] = {}
+
+    for word in words:
+        if not word.text.strip():
+            continue
+        center_y = word.y + word.height / 2 - slope * (word.x + word.width / 2)
+        band = int(math.floor(center_y / height))
+        best = None
+        best_distance = tolerance
+        for b in (band - 1, band, band + 1):
+            for row_index in bands.get(b, ()):
+                distance = abs(rows[row_index][0] - center_y)
+                if distance <= best_distance:
+                    best, best_distance = row_index, distance
+        if best is None:
+            bands.setdefault(band, []).append(len(rows))
+            rows.append([center_y, 1, [word]])
+        else:
+            row = rows[best]
+            row[0] = (row[0] * row[1] + center_y) / (row[1] + 1)
+            row[1] += 1
+            row[2].append(word)
+
+    rows.sort(key=lambda row: row[0])
+    return [sorted(row[2], key=lambda word: word.x) for row in rows]
+
+
+def split_segments(row: List[TextRegion], height: float, gap_factor: float = 1.2) -> List[Segment]:
+    """Split a row at wide horizontal gaps and dot leaders."""
+    segments = []
+    current: List[TextRegion] = []
+    for word in row:
+        if _is_leader(word.text.strip()):
+            if current:
+                segments.append(Segment(current))
+                current = []
+            continue
+        if current and word.x - (current[-1].x + current[-1].width) > gap_factor * height:
+            segments.append(Segment(current))
+            current = []
+        current.append(word)
+    if current:
+        segments.append(Segment(current))
+    return segments
+
+
+def layout_rows(words: List[TextRegion], gap_factor: float = 1.2) -> Tuple[List[List[Segment]], float]:
+    """Rows of segments in reading order, plus the typical line height."""
+    words = [word for word in words if word.height > 0]
+    if not words:
+        return [], 1.0
+    height = line_height(words)
+    slope = estimate_slope(words, height)
+    rows = group_rows(words, height, slope)
+    return [split_segments(row, height, gap_factor) for row in rows], height
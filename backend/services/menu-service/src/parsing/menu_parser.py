@@ -0,0 +1,267 @@
+import re
+from typing import Iterator, List, Optional, Tuple
+
+from scanner_common.ocr.base import OCRResult, TextRegion, mean_confidence
+from parsing.layout import Segment, has_geometry, layout_rows
+
+# Bump when parsing output changes so cached menus are re-parsed
+PARSER_VERSION = 3
+
+CURRENCY_SYMBOLS = {
+    '$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY', '₫': 'VND', 'đ': 'VND', 'vnd': 'VND'
+}
+
+_AMOUNT = r'\d{1,3}(?:[,.]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?'
+_PRICE = (
+    rf'(?P<prefix>[$€£¥₫])?\s?(?P<amount>{_AMOUNT})'
+    r'(?:\s?(?P<suffix>€|₫|đ|VND|vnd|k|K))?'
+)
+PRICE_RE = re.compile(rf'^{_PRICE}$')
+TRAILING_PRICE_RE = re.compile(rf'(?:^|[\s.·…_\-–—:]){_PRICE}\s*$')
+NAME_SEPARATOR_RE = re.compile(r'\s+[-–—:|]\s+')
+LEADER_RE = re.compile(r'[.·…_]{2,}\s*$')
+TRAILING_SEPARATOR_RE = re.compile(r'[\s.·…_\-–—:|]+$')
+
+# Structure weights: how sure we are the pieces belong together
+SAME_LINE = 1.0
+SAME_ROW = 0.95
+NEXT_ROW = 0.85
+# Used when the OCR engine reports no confidence (e.g. text-only annotations)
+UNKNOWN_OCR_CONFIDENCE = 0.9
+
+
+class ParsedPrice:
+    __slots__ = ('amount', 'currency', 'text')
+
+    def __init__(self, amount: float, currency: str, text: str):
+        self.amount = amount
+        self.currency = currency
+        self.text = text
+
+
+class ParsedDish:
+    """A dish found on the menu, before conversion to a Dish message."""
+
+    __slots__ = ('name', 'description', 'price', 'confidence', 'bottom')
+
+    def __init__(self, name: str, description: str, price: Optional[ParsedPrice], confidence: float):
+        self.name = name
+        self.description = description
+        self.price = price
+        self.confidence = confidence
+        self.bottom = 0.0
+
+
+def _to_price(match, text: str, allow_bare: bool) -> Optional[ParsedPrice]:
+    amount_text = match.group('amount')
+    symbol = match.group('prefix') or match.group('suffix') or ''
+    has_decimals = re.search(r'[.,]\d{1,2}$', amount_text) is not None
+    if not symbol and not has_decimals and not allow_bare:
+        return None
+
+    if symbol in ('k', 'K'):
+        # "45k" is shorthand for thousands, common on Vietnamese menus
+        amount = float(amount_text.replace(',', '').replace('.', '')) * 1000
+        currency = 'VND'
+    else:
+        if re.search(r'[,.]\d{3}(?:[,.]|$)', amount_text):
+            # Thousands separators; a trailing 1-2 digit group is the fraction
+            whole, fraction = re.match(r'^(.*?)(?:[.,](\d{1,2}))?$', amount_text).groups()
+            amount = float(re.sub(r'[,.]', '', whole) + ('.' + fraction if fraction else ''))
+        else:
+            amount = float(amount_text.replace(',', '.'))
+        currency = CURRENCY_SYMBOLS.get(symbol.lower() if symbol else '$', 'USD')
+    return ParsedPrice(amount, currency, text.strip())
+
+
+def parse_price(text: str, allow_bare: bool = False) -> Optional[ParsedPrice]:
+    """Parse text that is only a price, e.g. "$12.99", "12,50 €", "45k"."""
+    text = text.strip()
+    match = PRICE_RE.match(text)
+    if not match:
+        return None
+    return _to_price(match, text, allow_bare)
+
+
+def split_trailing_price(text: str) -> Tuple[str, Optional[ParsedPrice]]:
+    """Split "Pad Thai ..... $11.50" into ("Pad Thai", price)."""
+    match = TRAILING_PRICE_RE.search(text)
+    if not match:
+        return text.strip(), None
+    price_start = match.start('prefix') if match.group('prefix') else match.start('amount')
+    # A bare number only counts as a price after a dot leader
+    after_leader = LEADER_RE.search(text[:price_start]) is not None
+    price = _to_price(match, text[price_start:], allow_bare=after_leader)
+    if price is None:
+        return text.strip(), None
+    rest = TRAILING_SEPARATOR_RE.sub('', text[:price_start])
+    return rest.strip(), price
+
+
+def split_name_description(text: str) -> Tuple[str, str]:
+    """Split "Name - description" on the first spaced separator.
+
+    Hyphenated names ("Coq-au-vin") are kept whole because only separators
+    surrounded by spaces count.
+    """
+    parts = NAME_SEPARATOR_RE.split(text, maxsplit=1)
+    if len(parts) == 2:
+        return parts[0].strip(), parts[1].strip()
+    return text.strip(), ''
+
+
+def _is_heading(text: str) -> bool:
+    letters = [char for char in text if char.isalpha()]
+    return len(letters) >= 3 and all(char.isupper() for char in letters)
+
+
+class _Candidate:
+    """An unpriced text segment that may become a dish name or a description."""
+
+    __slots__ = ('segment', 'used')
+
+    def __init__(self, segment: Segment):
+        self.segment = segment
+        self.used = False
+
+
+class MenuParser:
+    """Turn OCR output into dishes.
+
+    With word boxes, words are grouped into rows and segments by geometry
+    (see parsing.layout) and names are paired with prices in a separate
+    column, including a price on the row below its name. Unpriced text
+    directly under a dish becomes its description. Without boxes the full
+    text is parsed line by line.
+    """
+
+    def __init__(self, gap_factor: float = 1.2, description_gap: float = 1.2):
+        self.gap_factor = gap_factor
+        self.description_gap = description_gap
+
+    def parse(self, result: OCRResult) -> Iterator[ParsedDish]:
+        if has_geometry(result.words):
+            return self._parse_layout(result.words)
+        return self._parse_text(result.full_text, result.confidence)
+
+    def _parse_text(self, full_text: str, ocr_confidence: float) -> Iterator[ParsedDish]:
+        ocr_confidence = ocr_confidence or UNKNOWN_OCR_CONFIDENCE
+        pending_name = None
+        for line in full_text.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            rest, price = split_trailing_price(line)
+            if price is not None and rest:
+                name, description = split_name_description(rest)
+                if name:
+                    yield ParsedDish(name, description, price, round(ocr_confidence * SAME_LINE, 3))
+                pending_name = None
+            elif price is not None and pending_name:
+                name, description = split_name_description(pending_name)
+                yield ParsedDish(name, description, price, round(ocr_confidence * NEXT_ROW, 3))
+                pending_name = None
+            else:
+                pending_name = None if _is_heading(line) else line
+
+    def _parse_layout(self, words: List[TextRegion]) -> Iterator[ParsedDish]:
+        rows, height = layout_rows(words, self.gap_factor)
+        open_dishes: List[Tuple[ParsedDish, Segment]] = []
+        previous: List[_Candidate] = []
+
+        for row in rows:
+            if not row:
+                continue
+            row_top = min(segment.y for segment in row)
+
+            # Dishes that can no longer get description lines are complete
+            still_open = []
+            for dish, anchor in open_dishes:
+                if row_top - dish.bottom > self.description_gap * height:
+                    yield dish
+                else:
+                    still_open.append((dish, anchor))
+            open_dishes = still_open
+
+            candidates: List[_Candidate] = []
+            for segment in row:
+                text = segment.text
+                rest, price = split_trailing_price(text)
+                if price is not None and rest:
+                    open_dishes.append(self._dish(rest, segment, [segment], price, SAME_LINE))
+                    continue
+
+                # A price on its own, usually in a right-hand column
+                price = parse_price(text, allow_bare=any(not c.used for c in candidates))
+                if price is None:
+                    candidates.append(_Candidate(segment))
+                    continue
+
+                name = next((c for c in reversed(candidates) if not c.used), None)
+                weight = SAME_ROW
+                if name is None:
+                    # Name on the row above, price below it
+                    name = self._nearest_above(previous, segment, height)
+                    weight = NEXT_ROW
+                if name is None:
+                    continue
+                name.used = True
+                open_dishes.append(self._dish(name.segment.text, name.segment, [name.segment, segment], price, weight))
+
+            leftover = []
+            for candidate in candidates:
+                if candidate.used:
+                    continue
+                if not self._attach_description(open_dishes, candidate.segment, height):
+                    leftover.append(candidate)
+            previous = leftover
+
+        for dish, _ in open_dishes:
+            yield dish
+
+    def _dish(
+        self,
+        text: str,
+        anchor: Segment,
+        segments: List[Segment],
+        price: ParsedPrice,
+        weight: float
+    ) -> Tuple[ParsedDish, Segment]:
+        name, description = split_name_description(text)
+        words = [word for segment in segments for word in segment.words]
+        ocr_confidence = mean_confidence(words) or UNKNOWN_OCR_CONFIDENCE
+        dish = ParsedDish(name, description, price, round(ocr_confidence * weight, 3))
+        # Descriptions continue below the name column, not below a price
+        # that sits on the next row
+        dish.bottom = anchor.bottom
+        return dish, anchor
+
+    def _nearest_above(self, previous: List[_Candidate], price: Segment, height: float) -> Optional[_Candidate]:
+        best = None
+        for candidate in previous:
+            segment = candidate.segment
+            if candidate.used or _is_heading(segment.text) or segment.x >= price.x:
+                continue
+            if price.y - segment.bottom <= self.description_gap * height:
+                if best is None or segment.right > best.segment.right:
+                    best = candidate
+        return best
+
+    def _attach_description(self, open_dishes, segment: Segment, height: float) -> bool:
+        if _is_heading(segment.text):
+            return False
+        best = None
+        for dish, anchor in open_dishes:
+            if segment.y - dish.bottom > self.description_gap * height or segment.y < anchor.bottom - height / 2:
+                continue
+            # Same column: starts near the name, or within its span
+            if abs(segment.x - anchor.x) > 2 * height and not (anchor.x <= segment.x <= anchor.right):
+                continue
+            if best is None or dish.bottom > best.bottom:
+                best = dish
+        if best is None:
+            return False
+        text = segment.text
+        best.description = f"{best.description} {text}".strip() if best.description else text
+        best.bottom = max(best.bottom, segment.bottom)
+        return True
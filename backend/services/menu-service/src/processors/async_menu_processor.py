@@ -0,0 +1,793 @@
+import os
+import sys
+import time
+import uuid
+import json
+import asyncio
+import logging
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+
+import clients
+from cache.dish_cache import (
+    DISH_INVALIDATION_CHANNEL,
+    AsyncDishInvalidationListener,
+    AsyncSingleFlight,
+    DishCacheStats,
+    LocalDishCache,
+    encode_invalidation
+)
+from cache.codec import CacheCodec
+from cache.menu_cache import AsyncMenuCache
+from cache.search_cache import AsyncSearchCache
+from cache.perceptual_hash import NearDuplicateIndex, dhash
+from events.outbox import create_event_outbox
+from fetch.fetcher import create_image_fetcher
+from indexing.bulk_indexer import AsyncBulkIndexer, AsyncIndexTicket
+from instrumentation import stage
+from jobs.factory import create_job_queue
+from jobs.store import QUEUED_MESSAGE, AsyncJobStore, JobStore, job_status
+from jobs.workers import JobWorkerPool
+from scanner_common.metrics import Histogram
+from scanner_common.ocr.base import OCRResult
+from scanner_common.ocr.tesseract_engine import TesseractOCREngine
+from scanner_common.ocr.vision_batcher import AsyncVisionBatcher
+from scanner_common.ocr.vision_engine import result_from_vision_response
+from pages.pool import PagePool
+from processors.base import MenuProcessorBase, mock_ocr_result, request_deadline, time_left
+from processors.menu_processor import MenuProcessor
+from search.factory import create_memory_engine, create_similar_index, search_backend_name
+from search.pagination import PIT_KEEP_ALIVE, SearchCursor
+from stand_ins.memory_elasticsearch import AsyncInMemoryElasticsearch
+from stand_ins.memory_redis import AsyncInMemoryRedis
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMenuProcessor(MenuProcessorBase):
+    """asyncio counterpart of MenuProcessor for the grpc.aio server.
+
+    Redis, Elasticsearch and Vision calls are awaited instead of blocking a
+    worker thread; semaphores bound how many of each run at once.
+    """
+
+    def __init__(self, redis_client=None, es_client=None, vision_client=None, publisher=None):
+        # Initialize Redis (CACHE_BACKEND=memory uses an in-process stand-in)
+        if redis_client is not None:
+            self.redis_client = redis_client
+        elif os.getenv('CACHE_BACKEND', 'redis') == 'memory':
+            self.redis_client = AsyncInMemoryRedis(
+                max_entries=int(os.getenv('CACHE_MEMORY_MAX_ENTRIES', 10000)),
+                max_bytes=int(os.getenv('CACHE_MEMORY_MAX_BYTES', 64 * 1024 * 1024))
+            )
+        else:
+            # Connected on first use or by warm_up(), from a pool of AIO_REDIS_MAX_CONNECTIONS
+            self.redis_client = clients.async_redis_client()
+        # Cache values are raw framed bytes (CacheCodec), so the client does not decode
+        self.cache_codec = CacheCodec()
+        self.menu_cache = AsyncMenuCache(self.redis_client, codec=self.cache_codec)
+        self.search_cache = AsyncSearchCache(self.redis_client, codec=self.cache_codec)
+
+        # async_processing: the job queue and the worker pool run on threads,
+        # so they get a synchronous client; status reads stay on the loop
+        if isinstance(self.redis_client, AsyncInMemoryRedis):
+            jobs_redis = self.redis_client.sync
+        else:
+            jobs_redis = clients.redis_client()
+        self.job_queue = create_job_queue(jobs_redis)
+        self.job_results = JobStore(jobs_redis, codec=self.cache_codec)
+        self.job_store = AsyncJobStore(self.redis_client, codec=self.cache_codec)
+        self.job_workers = None
+
+        # Perceptual-hash index for re-photographed menus
+        self.near_duplicates = None
+        if os.getenv('NEAR_DUPLICATE_ENABLED', 'true').lower() == 'true':
+            self.near_duplicates = NearDuplicateIndex()
+
+        # Initialize Elasticsearch
+        self.es_client = es_client if es_client is not None else clients.async_elasticsearch_client()
+        self.bulk_indexer = AsyncBulkIndexer(self.es_client, index='dishes')
+        self.index_wait_timeout = float(os.getenv('ES_BULK_WAIT_TIMEOUT', 10))
+
+        # SEARCH_BACKEND=memory serves search from an in-process engine. Without
+        # a snapshot, warm_up() scans the index into it on a thread, through a
+        # synchronous client
+        self.search_backend = None
+        if search_backend_name() == 'memory':
+            self.search_backend = create_memory_engine()
+        self.similar_index = create_similar_index()
+        self.scan_es_client = None
+        if self._in_process_indexes():
+            if isinstance(self.es_client, AsyncInMemoryElasticsearch):
+                self.scan_es_client = self.es_client.sync
+            else:
+                self.scan_es_client = clients.elasticsearch_client()
+
+        # Concurrency limits per dependency
+        self._ocr_slots = asyncio.Semaphore(int(os.getenv('AIO_MAX_CONCURRENT_OCR', 64)))
+        self._es_slots = asyncio.Semaphore(int(os.getenv('AIO_MAX_CONCURRENT_ES', 32)))
+
+        # GetDish: in-process L1 in front of Redis, invalidated over pub/sub
+        self.dish_l1 = LocalDishCache()
+        self.dish_stats = DishCacheStats()
+        self.dish_loads = AsyncSingleFlight()
+        self.dish_invalidations = AsyncDishInvalidationListener(self.redis_client, self.dish_l1, self.dish_stats)
+
+        self.time_to_first_dish = Histogram(
+            'menu_stream_time_to_first_dish_ms',
+            'Time from stream start to the first DishResponse'
+        )
+
+        # GCP clients (require credentials) are created on first use or by warm_up()
+        self.vision_client = vision_client or clients.async_vision_client()
+        self.storage_client = clients.storage_client()
+        self.pubsub_publisher = publisher or clients.pubsub_publisher()
+
+        # image_url requests: fetched on a thread, over pooled connections into a local disk cache
+        self.image_fetcher = create_image_fetcher(self.storage_client)
+
+        # menu-processed events go through a durable local outbox, published in batches
+        self.event_outbox = create_event_outbox(self.pubsub_publisher)
+
+        # Local Tesseract runs in its own process pool; Vision stays on the async client
+        self.ocr_mode = os.getenv('OCR_ENGINE', 'vision')
+        self.local_ocr = TesseractOCREngine() if self.ocr_mode != 'vision' else None
+        self.ocr_min_confidence = float(os.getenv('OCR_MIN_CONFIDENCE', 0.8))
+        self.vision_batcher = None
+        if self.vision_client is not None and os.getenv('VISION_BATCH_ENABLED', 'true').lower() == 'true':
+            self.vision_batcher = AsyncVisionBatcher(self.vision_client)
+
+        # PDF menus and very tall images: pages OCR'd and parsed in a process
+        # pool (whose workers build their own synchronous OCR engines)
+        self.page_pool = PagePool()
+
+        # Per-dependency readiness for the gRPC health service
+        self.readiness = self._track_readiness()
+        self._watch_task = None
+        self._tasks = set()
+
+        self._register_metrics()
+
+        logger.info("AsyncMenuProcessor initialized")
+
+    async def process_menu(
+        self,
+        image_data: bytes,
+        image_url: str,
+        options: menu_pb2.ProcessingOptions,
+        menu_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> menu_pb2.MenuResponse:
+        """Process a menu image and extract dishes. ``timeout`` is what is
+        left of the RPC deadline; OCR is given the part of it still left."""
+        deadline = request_deadline(timeout)
+        start_time = time.time()
+        menu_id = menu_id or str(uuid.uuid4())
+
+        logger.info(f"Processing menu {menu_id}")
+
+        image_data = await self._fetch_image(image_data, image_url)
+
+        # Check cache if enabled (keyed on image content, not the menu id)
+        image_digest = None
+        if options.use_cache:
+            # SHA-256 of the whole upload: off the loop, like the other CPU work
+            image_digest = await asyncio.to_thread(self.menu_cache.image_digest, image_data, image_url)
+
+        if image_digest:
+            with stage('menu_cache_get'):
+                cached = await self.menu_cache.get_menu(image_digest, options)
+            if cached:
+                logger.info(f"Cache hit for menu {cached.menu_id}")
+                return cached
+
+        pages = await asyncio.to_thread(self.page_pool.split, image_data)
+        if pages:
+            # Pages (or tiles) in parallel, merged back in page order
+            with stage('pages'):
+                dishes = self._merge_pages([result async for result in self._iter_pages(image_data, pages, options)])
+        else:
+            ocr_result = await self._resolve_text(image_data, image_digest, options.language, deadline)
+            with stage('parse'):
+                dishes = await asyncio.to_thread(self._parse_dishes, ocr_result, options)
+        with stage('index'):
+            ticket = await self._index_dishes(dishes)
+            index_errors = await ticket.wait(self.index_wait_timeout)
+
+        response = self._build_menu_response(menu_id, dishes, start_time, index_errors)
+
+        # Cache the result (partial results are retried on the next scan)
+        if image_digest and not index_errors:
+            with stage('menu_cache_put'):
+                await self.menu_cache.put_menu(image_digest, options, response)
+
+        with stage('publish'):
+            self._publish_menu_processed(menu_id, len(dishes))
+
+        return response
+
+    async def submit_menu(
+        self,
+        image_data: bytes,
+        image_url: str,
+        options: menu_pb2.ProcessingOptions
+    ) -> menu_pb2.MenuResponse:
+        """Queue a menu for the job workers and return its PROCESSING status
+        (see MenuProcessor.submit_menu)."""
+        image_digest = await asyncio.to_thread(self.menu_cache.image_digest, image_data, image_url)
+        if not image_digest:
+            raise ValueError("image_data or image_url is required")
+
+        if options.use_cache:
+            with stage('menu_cache_get'):
+                cached = await self.menu_cache.get_menu(image_digest, options)
+            if cached:
+                return cached
+
+        job = self._menu_job(image_data, image_url, options, image_digest)
+        with stage('job_submit'):
+            # Before the job is queued (see MenuProcessor.submit_menu)
+            queued = job_status(job.menu_id, menu_pb2.ProcessingStatus.Status.PROCESSING, QUEUED_MESSAGE)
+            await self.job_store.put(job.menu_id, queued)
+            try:
+                menu_id, created = await asyncio.to_thread(self.job_queue.submit, job)
+            except Exception:
+                await self.job_store.delete(job.menu_id)
+                raise
+            if not created:
+                await self.job_store.delete(job.menu_id)
+
+        logger.info(f"Menu {menu_id} {'queued' if created else 'already queued or running'}")
+        queued.menu_id = menu_id
+        return await self.menu_status(menu_id) or queued
+
+    async def menu_status(self, menu_id: str) -> Optional[menu_pb2.MenuResponse]:
+        """Status, or the result once finished, of a submitted menu; None if unknown."""
+        response = await self.job_store.get(menu_id)
+        if response is not None and response.status.status == menu_pb2.ProcessingStatus.Status.PROCESSING:
+            response.status.queue_position = await asyncio.to_thread(self.job_queue.position, menu_id) or 0
+        return response
+
+    def start_job_workers(self, processor_factory=None, workers: Optional[int] = None) -> JobWorkerPool:
+        """Run queued jobs in worker processes; each runs the synchronous
+        MenuProcessor (or what ``processor_factory`` builds)."""
+        self.job_workers = JobWorkerPool(self.job_queue, self.job_results, processor_factory or MenuProcessor, workers)
+        return self.job_workers
+
+    async def warm_up(self):
+        """Import the client libraries, open Redis and Elasticsearch
+        connections, load in-process indexes and create the GCP clients,
+        marking each dependency's readiness. Requests served meanwhile
+        create whatever they need themselves."""
+        # Imports first (off the event loop), so the first request after
+        # readiness does not pay for them
+        for client in (self.redis_client, self.es_client, self.vision_client, self.pubsub_publisher, self.image_fetcher.http):
+            await asyncio.to_thread(clients.import_modules, client)
+        # Vision requests are built from its message types, whatever the client
+        await asyncio.to_thread(importlib.import_module, 'google.cloud.vision')
+        await self._check_dependencies(warm=True)
+        # Optional clients last: looking up credentials can wait on the metadata
+        # server, so that happens in a thread. The async Vision client itself
+        # binds to this loop; the Pub/Sub publisher is synchronous
+        vision = await clients.async_resolve(self.vision_client)
+        self.readiness.mark('vision', vision is not None, 'no client (credentials?)')
+        pubsub = await asyncio.to_thread(clients.resolve, self.pubsub_publisher)
+        self.readiness.mark('pubsub', pubsub is not None, 'no client (credentials?)')
+        logger.info(f"Warm-up done; ready: {self.readiness.ready()}")
+
+    def start_warmup(self) -> asyncio.Task:
+        """warm_up() as a task on the running loop, which then re-checks the
+        dependencies every HEALTH_CHECK_INTERVAL seconds until close()."""
+        self._watch_task = asyncio.create_task(self._warm_up_and_watch())
+        return self._watch_task
+
+    async def _warm_up_and_watch(self):
+        await self.warm_up()
+        interval = float(os.getenv('HEALTH_CHECK_INTERVAL', 10))
+        while True:
+            await asyncio.sleep(interval)
+            await self._check_dependencies()
+
+    async def _check_dependencies(self, warm: bool = False):
+        """Ping Redis and Elasticsearch (opening REDIS_WARM_CONNECTIONS pooled
+        connections first when warming), and load in-process indexes that
+        are not loaded yet."""
+        try:
+            if warm:
+                await clients.async_warm_redis_pool(self.redis_client, int(os.getenv('REDIS_WARM_CONNECTIONS', 4)))
+            await self.redis_client.ping()
+            self.readiness.mark('redis', True)
+        except Exception as e:
+            self.readiness.mark('redis', False, str(e))
+
+        try:
+            self.readiness.mark('elasticsearch', bool(await self.es_client.ping()), 'ping failed')
+        except Exception as e:
+            self.readiness.mark('elasticsearch', False, str(e))
+
+        if self._in_process_indexes() and not self.readiness.is_ready('search_index'):
+            loaded = await asyncio.to_thread(self._load_indexes, self.scan_es_client)
+            self.readiness.mark('search_index', loaded, 'not loaded from Elasticsearch')
+
+    async def get_dish(
+        self,
+        dish_id: str,
+        include_similar: bool
+    ) -> Optional[menu_pb2.DishResponse]:
+        """Get dish details by ID."""
+        self.dish_invalidations.start()
+        dish = self.dish_l1.get(dish_id)
+        if dish is not None:
+            self.dish_stats.count('l1_hits')
+        else:
+            generation = self.dish_l1.generation
+            with stage('dish_load'):
+                (dish, tier), shared = await self.dish_loads.do(dish_id, lambda: self._load_dish(dish_id))
+            self.dish_stats.count('coalesced' if shared else tier)
+            if dish is None:
+                return None
+            if not shared:
+                self.dish_l1.put(dish_id, dish, generation)
+
+        response = menu_pb2.DishResponse(dish=dish)
+
+        if include_similar:
+            with stage('similar'):
+                if self.similar_index is not None and len(self.similar_index):
+                    similar = (await self._similar_dishes({dish_id: dish})).get(dish_id, [])
+                elif self.search_backend is not None:
+                    similar = await asyncio.to_thread(self.search_backend.similar, dish_id, dish)
+                else:
+                    similar = await self._find_similar_dishes(dish_id, dish.name)
+            response.similar_dishes.extend(similar)
+
+        return response
+
+    async def get_dishes(
+        self,
+        dish_ids: List[str],
+        include_similar: bool
+    ) -> menu_pb2.DishesResponse:
+        """Get several dishes by ID (one MGET, one mget, one msearch)."""
+        self.dish_invalidations.start()
+        with stage('dish_load'):
+            found = await self._lookup_dishes(list(dict.fromkeys(dish_ids)))
+
+        similar = {}
+        if include_similar and found:
+            with stage('similar'):
+                similar = await self._similar_dishes(found)
+
+        return self._dishes_response(dish_ids, found, similar)
+
+    def dish_cache_stats(self) -> dict:
+        """Per-tier GetDish hit counts and ratios."""
+        return self.dish_stats.snapshot(self.dish_l1)
+
+    async def search_dishes(self, request: menu_pb2.SearchRequest) -> menu_pb2.SearchResponse:
+        """Search dishes using Elasticsearch or the memory engine (see MenuProcessor.search_dishes)."""
+        cursor = SearchCursor.decode(request.cursor, request) if request.cursor else None
+        try:
+            if cursor is not None:
+                with stage('search'):
+                    if self.search_backend is not None:
+                        return await asyncio.to_thread(self.search_backend.search, request, cursor)
+                    return await self._search_page(request, cursor)
+
+            with stage('search_cache_get'):
+                response, generation = await self.search_cache.get(request)
+            if response is not None:
+                return response
+            with stage('search'):
+                if self.search_backend is not None:
+                    response = await asyncio.to_thread(self.search_backend.search, request)
+                else:
+                    async with self._es_slots:
+                        result = await self.es_client.msearch(searches=self._search_searches(request))
+                    response = self._msearch_response(request, result)
+            with stage('search_cache_put'):
+                await self.search_cache.put(request, response, generation)
+            return response
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Search error: {e}")
+            return menu_pb2.SearchResponse()
+
+    async def process_menu_stream(self, image_data, image_url, options, is_active=None, timeout=None):
+        """Stream dish processing results as each OCR line (or, for PDF and
+        tiled menus, each page) is parsed; ``timeout`` as for process_menu."""
+        deadline = request_deadline(timeout)
+        start_time = time.monotonic()
+
+        image_data = await self._fetch_image(image_data, image_url)
+
+        image_digest = None
+        if options.use_cache:
+            # SHA-256 of the whole upload: off the loop, like the other CPU work
+            image_digest = await asyncio.to_thread(self.menu_cache.image_digest, image_data, image_url)
+
+        cached = None
+        if image_digest:
+            with stage('menu_cache_get'):
+                cached = await self.menu_cache.get_menu(image_digest, options)
+        pages = None if cached else await asyncio.to_thread(self.page_pool.split, image_data)
+        if cached:
+            dishes = _async_iter(cached.dishes)
+        elif pages:
+            # Each page's dishes as soon as that page is done, whatever its place
+            dishes = _page_dishes(self._iter_pages(image_data, pages, options))
+        else:
+            ocr_result = await self._resolve_text(image_data, image_digest, options.language, deadline)
+            # Parsed line by line on a thread, so a long menu does not hold the loop
+            dishes = self._step_in_thread(self._iter_dishes(ocr_result, options), 'menu-parse')
+
+        first_dish = True
+        try:
+            async for dish in dishes:
+                if is_active is not None and not is_active():
+                    logger.info("Stream cancelled by client")
+                    return
+
+                if not cached:
+                    # Queued on the bulk indexer, which indexes it off the response path
+                    await self._index_dishes([dish])
+
+                if first_dish:
+                    self.time_to_first_dish.observe((time.monotonic() - start_time) * 1000)
+                    first_dish = False
+
+                yield menu_pb2.DishResponse(dish=dish)
+        finally:
+            await dishes.aclose()
+
+    async def close(self):
+        """Release client connections."""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+        if self.job_workers is not None:
+            await asyncio.to_thread(self.job_workers.close)
+        await self.dish_invalidations.stop()
+        if self.event_outbox is not None:
+            await asyncio.to_thread(self.event_outbox.close, float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', 20)))
+        logger.info(f"Dish cache: {self.dish_cache_stats()}")
+        logger.info(f"Search cache: {self.search_cache.stats()}")
+        logger.info(f"Cache codec: {self.cache_codec.stats()}")
+        if self.search_backend is not None:
+            self.search_backend.close()
+            logger.info(f"Search backend: {self.search_backend.stats()}")
+        if self.similar_index is not None:
+            self.similar_index.close()
+            logger.info(f"Similar-dish index: {self.similar_index.stats()}")
+        if self.vision_batcher is not None:
+            await self.vision_batcher.close()
+        await self.bulk_indexer.close(timeout=float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', 20)))
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.search_cache.close()
+        if clients.created(self.es_client):
+            await self.es_client.close()
+        if clients.created(self.redis_client):
+            await self.redis_client.aclose()
+        if self.local_ocr is not None:
+            self.local_ocr.close()
+        await asyncio.to_thread(self.page_pool.close)
+        self.image_fetcher.close()
+
+    def _iter_pages(self, image_data: bytes, pages, options: menu_pb2.ProcessingOptions):
+        """PagePool.process() stepped on a thread: each page as it is done."""
+        return self._step_in_thread(self.page_pool.process(image_data, pages, options), 'menu-pages')
+
+    async def _step_in_thread(self, results, name: str):
+        """Step a blocking or CPU-bound generator on its own thread."""
+        # A single thread steps and closes the generator, so closing it on
+        # cancellation never races a step in progress
+        stepper = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                result = await loop.run_in_executor(stepper, next, results, None)
+                if result is None:
+                    return
+                yield result
+        finally:
+            stepper.submit(results.close)
+            stepper.shutdown(wait=False)
+
+    async def _fetch_image(self, image_data: bytes, image_url: str) -> bytes:
+        """The request image: ``image_data``, else the image at ``image_url``
+        (see MenuProcessor._fetch_image)."""
+        if image_data or not image_url:
+            return image_data
+        with stage('fetch'):
+            return await asyncio.to_thread(self.image_fetcher.fetch, image_url)
+
+    async def _resolve_text(
+        self,
+        image_data: bytes,
+        image_digest: Optional[str],
+        language: str = '',
+        deadline: Optional[float] = None
+    ) -> OCRResult:
+        """Get the OCR result from the exact or near-duplicate cache, else run
+        OCR; ``language`` is the menu's (ProcessingOptions.language) and
+        ``deadline`` the request's, as a time.monotonic() value."""
+        if not image_digest:
+            with stage('ocr'):
+                return await self._extract_text(image_data, language, deadline)
+
+        with stage('ocr_cache'):
+            ocr_result = await self.menu_cache.get_ocr(image_digest, language)
+        if ocr_result is not None:
+            return ocr_result
+
+        phash = None
+        if self.near_duplicates is not None and image_data:
+            with stage('phash'):
+                phash = await asyncio.to_thread(dhash, image_data)
+        if phash is not None:
+            match = self.near_duplicates.find(phash, language)
+            if match:
+                with stage('ocr_cache'):
+                    ocr_result = await self.menu_cache.get_ocr(match, language)
+                if ocr_result is not None:
+                    logger.info(f"Near-duplicate OCR hit for {image_digest[:12]}")
+                    await self.menu_cache.put_ocr(image_digest, ocr_result, language)
+                    return ocr_result
+                # The OCR entry it pointed to has expired or been evicted
+                self.near_duplicates.discard(match, language)
+
+        with stage('ocr'):
+            ocr_result = await self._extract_text(image_data, language, deadline)
+        with stage('ocr_cache'):
+            await self.menu_cache.put_ocr(image_digest, ocr_result, language)
+        if phash is not None:
+            self.near_duplicates.add(phash, image_digest, language)
+
+        return ocr_result
+
+    async def _extract_text(self, image_data: bytes, language: str = '', deadline: Optional[float] = None) -> OCRResult:
+        """Extract text locally when configured, else (or below threshold) with Vision."""
+        if self.local_ocr is not None and image_data:
+            try:
+                result = await asyncio.to_thread(self.local_ocr.extract, image_data, language, time_left(deadline))
+                if result is not None and result.full_text and (
+                    self.ocr_mode == 'local' or result.confidence >= self.ocr_min_confidence
+                ):
+                    return result
+            except Exception as e:
+                logger.warning(f"Local OCR error: {e}")
+            if self.ocr_mode == 'local':
+                return mock_ocr_result()
+
+        if image_data and await clients.async_resolve(self.vision_client) is not None:
+            try:
+                if self.vision_batcher is not None:
+                    async with self._ocr_slots:
+                        response = await self.vision_batcher.annotate(image_data, language, time_left(deadline))
+                else:
+                    from google.cloud import vision
+                    request = vision.AnnotateImageRequest(
+                        image=vision.Image(content=image_data),
+                        features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)],
+                        image_context=vision.ImageContext(language_hints=[language]) if language else None
+                    )
+                    # Without a request deadline the client's default timeout applies
+                    timeout = {'timeout': time_left(deadline)} if deadline is not None else {}
+                    async with self._ocr_slots:
+                        batch = await self.vision_client.batch_annotate_images(requests=[request], **timeout)
+                    response = batch.responses[0]
+
+                result = result_from_vision_response(response)
+                if result.full_text:
+                    return result
+            except Exception as e:
+                logger.error(f"Vision API error: {e}")
+
+        # Return mock data for development
+        return mock_ocr_result()
+
+    async def _load_dish(self, dish_id: str):
+        """Load a dish from Redis or Elasticsearch; returns (dish, tier counter)."""
+        cache_key = f"dish:{dish_id}"
+        cached = await self.redis_client.get(cache_key)
+
+        dish = self.cache_codec.decode_message(cached, menu_pb2.Dish) if cached else None
+        if dish is not None:
+            return dish, 'l2_hits'
+
+        try:
+            async with self._es_slots:
+                result = await self.es_client.get(index='dishes', id=dish_id)
+            dish = self._dict_to_dish(result['_source'], dish_id)
+            await self.redis_client.setex(cache_key, 3600, self.cache_codec.encode_message(dish))
+        except Exception as e:
+            logger.error(f"Dish not found: {e}")
+            return None, 'not_found'
+
+        return dish, 'origin_loads'
+
+    async def _load_dishes(self, dish_ids: List[str]) -> dict:
+        """Load dishes from Redis (one MGET) and Elasticsearch (one mget)."""
+        cached = await self.redis_client.mget([f"dish:{dish_id}" for dish_id in dish_ids])
+
+        loaded = {}
+        origin_ids = []
+        for dish_id, value in zip(dish_ids, cached):
+            dish = self.cache_codec.decode_message(value, menu_pb2.Dish) if value else None
+            if dish is not None:
+                loaded[dish_id] = dish
+            else:
+                origin_ids.append(dish_id)
+        self.dish_stats.count('l2_hits', len(loaded))
+
+        if not origin_ids:
+            return loaded
+
+        try:
+            async with self._es_slots:
+                result = await self.es_client.mget(index='dishes', ids=origin_ids)
+        except Exception as e:
+            logger.error(f"Error getting dishes: {e}")
+            self.dish_stats.count('not_found', len(origin_ids))
+            return loaded
+
+        sources = {doc['_id']: doc['_source'] for doc in result['docs'] if doc.get('found')}
+        for dish_id, source in sources.items():
+            loaded[dish_id] = self._dict_to_dish(source, dish_id)
+        self.dish_stats.count('origin_loads', len(sources))
+        self.dish_stats.count('not_found', len(origin_ids) - len(sources))
+
+        if sources:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for dish_id in sources:
+                    pipe.setex(f"dish:{dish_id}", 3600, self.cache_codec.encode_message(loaded[dish_id]))
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Dish cache refill failed: {e}")
+
+        return loaded
+
+    async def _lookup_dishes(self, dish_ids: List[str]) -> dict:
+        """Dishes by ID from the L1, then one batched Redis/Elasticsearch load."""
+        found = {}
+        generation = self.dish_l1.generation
+        for dish_id in dish_ids:
+            dish = self.dish_l1.get(dish_id)
+            if dish is not None:
+                found[dish_id] = dish
+        self.dish_stats.count('l1_hits', len(found))
+
+        misses = [dish_id for dish_id in dish_ids if dish_id not in found]
+        if misses:
+            loaded = await self._load_dishes(misses)
+            for dish_id, dish in loaded.items():
+                found[dish_id] = dish
+                self.dish_l1.put(dish_id, dish, generation)
+        return found
+
+    async def _similar_dishes(self, dishes: dict) -> dict:
+        """Similar dishes from the vector index, the memory engine or Elasticsearch."""
+        if self.similar_index is not None and len(self.similar_index):
+            similar_ids = self.similar_index.similar_batch(dishes)
+            loaded = await self._lookup_dishes(list(dict.fromkeys(
+                similar_id for ids in similar_ids.values() for similar_id in ids
+            )))
+            return {
+                dish_id: [loaded[similar_id] for similar_id in ids if similar_id in loaded]
+                for dish_id, ids in similar_ids.items()
+            }
+        if self.search_backend is not None:
+            return await asyncio.to_thread(self.search_backend.similar_batch, dishes)
+        return await self._find_similar_batch(dishes)
+
+    async def _invalidate_dishes(self, dish_ids: List[str]):
+        """Drop reindexed dishes from Redis, every replica's L1 and the search cache."""
+        if not dish_ids:
+            return
+        self.dish_l1.invalidate(dish_ids)
+        await self.search_cache.invalidate()
+        try:
+            await self.redis_client.delete(*[f"dish:{dish_id}" for dish_id in dish_ids])
+            await self.redis_client.publish(DISH_INVALIDATION_CHANNEL, encode_invalidation(dish_ids))
+            self.dish_stats.count('invalidations_sent', len(dish_ids))
+        except Exception as e:
+            logger.warning(f"Dish invalidation failed: {e}")
+
+    async def _index_dishes(self, dishes: List[menu_pb2.Dish], reindex: bool = False) -> AsyncIndexTicket:
+        """Queue dishes for bulk indexing in Elasticsearch.
+
+        New dishes have fresh IDs nobody can have cached, so only search
+        results go stale; ``reindex`` marks existing dishes whose cached
+        copies must be dropped too.
+        """
+        if self.search_backend is not None or self.similar_index is not None:
+            # In-process indexes tokenize and vectorize: CPU work, off the loop
+            await asyncio.to_thread(self._index_in_process, dishes)
+        ticket = await self.bulk_indexer.submit(
+            [(dish.dish_id, self._dish_to_document(dish)) for dish in dishes]
+        )
+        # Cached copies are only stale once the new document is searchable
+        if reindex:
+            dish_ids = [dish.dish_id for dish in dishes]
+            ticket.add_done_callback(lambda errors: self._spawn(self._invalidate_dishes(dish_ids)))
+        else:
+            ticket.add_done_callback(lambda errors: self._spawn(self.search_cache.invalidate()))
+        return ticket
+
+    def _index_in_process(self, dishes: List[menu_pb2.Dish]):
+        if self.search_backend is not None:
+            self.search_backend.index(dishes)
+        if self.similar_index is not None:
+            self.similar_index.add(dishes)
+
+    def _spawn(self, coroutine):
+        """Run ``coroutine`` as a task that close() waits for."""
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _search_page(self, request: menu_pb2.SearchRequest, cursor: SearchCursor) -> menu_pb2.SearchResponse:
+        """Read the page after a cursor from its point in time."""
+        async with self._es_slots:
+            if not cursor.pit_id:
+                pit = await self.es_client.open_point_in_time(index='dishes', keep_alive=PIT_KEEP_ALIVE)
+                cursor.pit_id = pit['id']
+            result = await self.es_client.search(body=self._search_body(request, cursor))
+        response = self._search_response(request, result, cursor)
+        if not response.next_cursor:
+            try:
+                await self.es_client.close_point_in_time(id=result.get('pit_id', cursor.pit_id))
+            except Exception as e:
+                logger.warning(f"Failed to close point in time: {e}")
+        return response
+
+    async def _find_similar_dishes(self, dish_id: str, dish_name: str) -> List[menu_pb2.Dish]:
+        """Find similar dishes using Elasticsearch."""
+        try:
+            async with self._es_slots:
+                result = await self.es_client.search(index='dishes', body=self._similar_body(dish_name))
+            return self._similar_from_result(dish_id, result)
+        except Exception as e:
+            logger.error(f"Error finding similar dishes: {e}")
+            return []
+
+    async def _find_similar_batch(self, dishes: dict) -> dict:
+        """Find similar dishes for a batch of dishes with one msearch."""
+        try:
+            async with self._es_slots:
+                result = await self.es_client.msearch(searches=self._similar_searches(list(dishes.values())))
+            return self._similar_from_msearch(list(dishes), result)
+        except Exception as e:
+            logger.error(f"Error finding similar dishes: {e}")
+            return {}
+
+    def _publish_menu_processed(self, menu_id: str, dish_count: int):
+        """Record a menu processed event; the outbox publishes it later."""
+        if self.event_outbox is not None:
+            self.event_outbox.append(json.dumps({
+                'menu_id': menu_id,
+                'dish_count': dish_count,
+                'timestamp': int(time.time())
+            }).encode('utf-8'))
+
+
+async def _page_dishes(results):
+    try:
+        async for result in results:
+            for dish in result.dishes:
+                yield dish
+    finally:
+        await results.aclose()
+
+
+async def _async_iter(iterable):
+    for item in iterable:
+        yield item
@@ -0,0 +1,485 @@
+import os
+import sys
+import time
+import uuid
+import logging
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+from health import Readiness
+from jobs.queue import Job
+from scanner_common.metrics import REGISTRY, Sample, stats_samples
+from scanner_common.ocr.base import OCRResult
+from pages.merge import PageResult
+from parsing.categorizer import default_categorizer
+from parsing.menu_parser import MenuParser, ParsedDish
+from search.backend import MAX_SUGGESTIONS, PRICE_HISTOGRAM_INTERVAL, SIMILAR_DISHES, suggested_queries
+from search.factory import load_memory_engine, load_similar_index
+from search.memory_engine import MemorySearchEngine
+from search.pagination import DEFAULT_PAGE_SIZE, PIT_KEEP_ALIVE, SearchCursor, request_digest
+
+logger = logging.getLogger(__name__)
+
+# Largest GetDishes request served; bounds the MGET, mget and msearch sizes
+GET_DISHES_MAX_IDS = int(os.getenv('GET_DISHES_MAX_IDS', 500))
+
+# Search facets: dynamic mappings index category as text with a keyword subfield
+CATEGORY_AGG_FIELD = os.getenv('SEARCH_CATEGORY_AGG_FIELD', 'category.keyword')
+
+# Returned by OCR when no Vision client is configured, for development
+MOCK_TEXT_ANNOTATIONS = [
+    "MENU",
+    "Margherita Pizza - Classic tomato and mozzarella - $12.99",
+    "Pasta Carbonara - Creamy pasta with bacon - $14.99",
+    "Caesar Salad - Fresh romaine with parmesan - $8.99",
+    "Tiramisu - Italian coffee dessert - $6.99"
+]
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """Seconds until a time.monotonic() deadline (at least 0), or None without one."""
+    return max(deadline - time.monotonic(), 0.0) if deadline is not None else None
+
+
+def request_deadline(timeout: Optional[float]) -> Optional[float]:
+    """time.monotonic() deadline for an RPC's remaining ``timeout`` (context.time_remaining())."""
+    return time.monotonic() + timeout if timeout is not None else None
+
+
+def mock_ocr_result() -> OCRResult:
+    """OCR result for MOCK_TEXT_ANNOTATIONS (text only, no word boxes)."""
+    return OCRResult('mock', '\n'.join(MOCK_TEXT_ANNOTATIONS), [])
+
+
+class MenuProcessorBase:
+    """I/O-free parsing, conversion and query building shared by the
+    sync and asyncio menu processors."""
+    
+    menu_parser = MenuParser()
+    categorizer = default_categorizer()
+    
+    # Components whose stats() counters are exported on the metrics endpoint
+    STATS_COMPONENTS = (
+        'menu_cache', 'search_cache', 'cache_codec', 'near_duplicates', 'bulk_indexer', 'ocr_engine',
+        'local_ocr', 'vision_batcher', 'search_backend', 'similar_index', 'job_queue', 'job_workers',
+        'event_outbox', 'readiness', 'image_fetcher', 'page_pool'
+    )
+    
+    def _track_readiness(self) -> Readiness:
+        """Dependencies reported by the health service, all not ready until
+        warm-up checks them. Vision and Pub/Sub have fallbacks (mock OCR,
+        dropped events), so only they are optional."""
+        readiness = Readiness()
+        readiness.add('redis')
+        readiness.add('elasticsearch')
+        if self._in_process_indexes():
+            readiness.add('search_index')
+        readiness.add('vision', required=False)
+        readiness.add('pubsub', required=False)
+        return readiness
+    
+    def _in_process_indexes(self) -> bool:
+        """Whether search or similar dishes are served from an index held in
+        this process, which warm-up loads."""
+        return isinstance(self.search_backend, MemorySearchEngine) or self.similar_index is not None
+    
+    def _load_indexes(self, es_client) -> bool:
+        """Scan the `dishes` index into in-process indexes that have no
+        snapshot; False if any could not be loaded."""
+        loaded = True
+        if isinstance(self.search_backend, MemorySearchEngine):
+            loaded = load_memory_engine(self.search_backend, es_client, self)
+        if self.similar_index is not None:
+            loaded = load_similar_index(self.similar_index, es_client, self) and loaded
+        return loaded
+    
+    def _register_metrics(self):
+        """Export cache, indexer, OCR and search counters; they are read
+        from the components' stats() at scrape time, off the request path."""
+        REGISTRY.add_collector('menu_processor', self._metric_samples)
+    
+    def _metric_samples(self) -> List[Sample]:
+        samples = stats_samples('dish_cache', self.dish_cache_stats())
+        samples.extend(stats_samples('category_taxonomy', self.categorizer.stats()))
+        for name in self.STATS_COMPONENTS:
+            component = getattr(self, name, None)
+            if component is not None:
+                samples.extend(stats_samples(name, component.stats()))
+        return samples
+    
+    def _menu_job(
+        self,
+        image_data: bytes,
+        image_url: str,
+        options: menu_pb2.ProcessingOptions,
+        image_digest: str
+    ) -> Job:
+        """Job for an async_processing request; identical image and parse
+        options share a dedupe key, like the menu cache."""
+        request = menu_pb2.MenuImageRequest(image_data=image_data, image_url=image_url, options=options)
+        return Job(
+            menu_id=str(uuid.uuid4()),
+            request=request.SerializeToString(),
+            dedupe_key=f"{image_digest}:{self.menu_cache.options_digest(options)}",
+            priority=options.priority
+        )
+    
+    def _build_menu_response(
+        self,
+        menu_id: str,
+        dishes: List[menu_pb2.Dish],
+        start_time: float,
+        index_errors: List[str]
+    ) -> menu_pb2.MenuResponse:
+        """Assemble the MenuResponse for a processed menu."""
+        processing_time = int((time.time() - start_time) * 1000)
+        
+        if index_errors:
+            status = menu_pb2.ProcessingStatus(
+                status=menu_pb2.ProcessingStatus.Status.PARTIAL,
+                message=f"Menu processed, {len(index_errors)} dishes not indexed",
+                errors=index_errors
+            )
+        else:
+            status = menu_pb2.ProcessingStatus(
+                status=menu_pb2.ProcessingStatus.Status.COMPLETED,
+                message="Menu processed successfully"
+            )
+        
+        return menu_pb2.MenuResponse(
+            menu_id=menu_id,
+            dishes=dishes,
+            metadata=menu_pb2.Metadata(
+                processing_time_ms=processing_time,
+                total_dishes=len(dishes),
+                source='vision_api',
+                timestamp=int(time.time())
+            ),
+            status=status
+        )
+    
+    def _filter_clauses(self, request: menu_pb2.SearchRequest) -> List[Dict[str, Any]]:
+        """Non-scoring clauses for the categories, price range and filters.
+        
+        Raises ValueError for a filter that is not "field:value".
+        """
+        clauses = []
+        if request.categories:
+            clauses.append({"terms": {"category": list(request.categories)}})
+        
+        if request.HasField('price_range'):
+            price_range = request.price_range
+            bounds = {}
+            if price_range.min > 0:
+                bounds["gte"] = price_range.min
+            if price_range.max > 0:
+                bounds["lte"] = price_range.max
+            if bounds:
+                clauses.append({"range": {"price.amount": bounds}})
+            if price_range.currency:
+                clauses.append({"match": {"price.currency": price_range.currency}})
+        
+        for search_filter in request.filters:
+            field, _, value = search_filter.partition(':')
+            if not field.strip() or not value.strip():
+                raise ValueError(f"Invalid filter {search_filter!r}, expected field:value")
+            clauses.append({"match": {field.strip(): {"query": value.strip(), "operator": "and"}}})
+        
+        return clauses
+    
+    def _search_body(
+        self,
+        request: menu_pb2.SearchRequest,
+        cursor: Optional[SearchCursor] = None
+    ) -> Dict[str, Any]:
+        """Build the Elasticsearch query for a SearchRequest (or a cursor page of it).
+        
+        Filters go in the bool filter context, which does not score and is
+        cached by Elasticsearch. First pages also ask for the facet
+        aggregations; cursor pages reuse the facets of the first page.
+        """
+        query = {
+            "query": {
+                "multi_match": {
+                    "query": request.query,
+                    "fields": ["name^3", "description^2", "ingredients"]
+                }
+            },
+            "size": request.limit or DEFAULT_PAGE_SIZE,
+            "from": request.offset or 0
+        }
+        
+        # Add filters
+        filters = self._filter_clauses(request)
+        if filters:
+            query["query"] = {
+                "bool": {
+                    "must": query["query"],
+                    "filter": filters
+                }
+            }
+        
+        if cursor is not None:
+            # The PIT adds an implicit _shard_doc tiebreaker to the sort
+            query["pit"] = {"id": cursor.pit_id, "keep_alive": PIT_KEEP_ALIVE}
+            query["sort"] = [{"_score": "desc"}]
+            if cursor.search_after is not None:
+                query["search_after"] = cursor.search_after
+                del query["from"]
+            else:
+                query["from"] = cursor.offset
+        else:
+            query["aggs"] = {
+                "categories": {"terms": {"field": CATEGORY_AGG_FIELD, "size": 20}},
+                "prices": {
+                    "histogram": {"field": "price.amount", "interval": PRICE_HISTOGRAM_INTERVAL, "min_doc_count": 1}
+                }
+            }
+        
+        return query
+    
+    def _suggest_body(self, request: menu_pb2.SearchRequest) -> Dict[str, Any]:
+        """Build the spelling suggestion request for the query."""
+        return {
+            "size": 0,
+            "suggest": {
+                "text": request.query,
+                "names": {"term": {"field": "name", "suggest_mode": "missing", "size": MAX_SUGGESTIONS}}
+            }
+        }
+    
+    def _search_searches(self, request: menu_pb2.SearchRequest) -> List[Dict[str, Any]]:
+        """msearch header/body pairs for a first page: results with facets, then suggestions."""
+        return [
+            {"index": "dishes"}, self._search_body(request),
+            {"index": "dishes"}, self._suggest_body(request)
+        ]
+    
+    def _msearch_response(self, request: menu_pb2.SearchRequest, result: Dict[str, Any]) -> menu_pb2.SearchResponse:
+        """Convert the _search_searches msearch result to a SearchResponse."""
+        search, suggest = result['responses']
+        if 'error' in search:
+            raise RuntimeError(f"Search failed: {search['error']}")
+        response = self._search_response(request, search)
+        if 'error' in suggest:
+            logger.warning(f"Search suggestions failed: {suggest['error']}")
+        else:
+            response.metadata.suggested_queries.extend(self._suggested_queries(request.query, suggest))
+        return response
+    
+    def _suggested_queries(self, query: str, result: Dict[str, Any]) -> List[str]:
+        """Rewrite the query with the term suggester's corrections, best first."""
+        return suggested_queries(query, result.get('suggest', {}).get('names', []))
+    
+    def _search_response(
+        self,
+        request: menu_pb2.SearchRequest,
+        result: Dict[str, Any],
+        cursor: Optional[SearchCursor] = None
+    ) -> menu_pb2.SearchResponse:
+        """Convert an Elasticsearch search result to a SearchResponse."""
+        hits = result['hits']['hits']
+        dishes = []
+        for hit in hits:
+            dishes.append(self._dict_to_dish(hit['_source'], hit['_id']))
+        
+        total = result['hits']['total']['value']
+        limit = request.limit or DEFAULT_PAGE_SIZE
+        if cursor is not None:
+            page = cursor.page
+            offset = cursor.offset
+        else:
+            page = (request.offset // request.limit) + 1 if request.limit else 1
+            offset = request.offset
+        
+        next_cursor = ''
+        if hits and offset + len(hits) < total:
+            next_page = SearchCursor(
+                digest=request_digest(request, include_offset=False),
+                page=page + 1,
+                offset=offset + len(hits)
+            )
+            if cursor is not None and len(hits) == limit:
+                next_page.pit_id = result.get('pit_id', cursor.pit_id)
+                next_page.search_after = hits[-1]['sort']
+            next_cursor = next_page.encode()
+        
+        metadata = menu_pb2.SearchMetadata(search_time_ms=result['took'])
+        aggregations = result.get('aggregations', {})
+        for bucket in aggregations.get('categories', {}).get('buckets', []):
+            metadata.category_counts[bucket['key']] = bucket['doc_count']
+        for bucket in aggregations.get('prices', {}).get('buckets', []):
+            metadata.price_histogram.append(menu_pb2.PriceBucket(
+                min=bucket['key'],
+                max=bucket['key'] + PRICE_HISTOGRAM_INTERVAL,
+                count=bucket['doc_count']
+            ))
+        
+        return menu_pb2.SearchResponse(
+            dishes=dishes,
+            total_results=total,
+            page=page,
+            next_cursor=next_cursor,
+            metadata=metadata
+        )
+    
+    def _similar_body(self, dish_name: str) -> Dict[str, Any]:
+        """Build the more_like_this query for similar dishes."""
+        return {
+            "query": {
+                "more_like_this": {
+                    "fields": ["name", "description"],
+                    "like": dish_name,
+                    "min_term_freq": 1,
+                    "max_query_terms": 12
+                }
+            },
+            "size": SIMILAR_DISHES
+        }
+    
+    def _similar_from_result(self, dish_id: str, result: Dict[str, Any]) -> List[menu_pb2.Dish]:
+        """Extract similar dishes from a search result, excluding the dish itself."""
+        similar = []
+        for hit in result['hits']['hits']:
+            if hit['_id'] != dish_id:
+                similar.append(self._dict_to_dish(hit['_source'], hit['_id']))
+        
+        return similar
+    
+    def _similar_searches(self, dishes: List[menu_pb2.Dish]) -> List[Dict[str, Any]]:
+        """Build msearch header/body pairs, one similar-dish query per dish."""
+        searches = []
+        for dish in dishes:
+            searches.append({'index': 'dishes'})
+            searches.append(self._similar_body(dish.name))
+        return searches
+    
+    def _similar_from_msearch(
+        self,
+        dish_ids: List[str],
+        result: Dict[str, Any]
+    ) -> Dict[str, List[menu_pb2.Dish]]:
+        """Map each dish ID to the similar dishes from its msearch response."""
+        similar = {}
+        for dish_id, response in zip(dish_ids, result['responses']):
+            if 'error' in response:
+                logger.error(f"Error finding similar dishes for {dish_id}: {response['error']}")
+                continue
+            similar[dish_id] = self._similar_from_result(dish_id, response)
+        return similar
+    
+    def _dishes_response(
+        self,
+        dish_ids: List[str],
+        found: Dict[str, menu_pb2.Dish],
+        similar: Dict[str, List[menu_pb2.Dish]]
+    ) -> menu_pb2.DishesResponse:
+        """Build a DishesResponse in request order."""
+        response = menu_pb2.DishesResponse()
+        for dish_id in dish_ids:
+            dish = found.get(dish_id)
+            if dish is None:
+                response.missing_ids.append(dish_id)
+                continue
+            response.dishes.append(
+                menu_pb2.DishResponse(dish=dish, similar_dishes=similar.get(dish_id, []))
+            )
+        return response
+    
+    def _parse_dishes(
+        self,
+        ocr_result: OCRResult,
+        options: menu_pb2.ProcessingOptions
+    ) -> List[menu_pb2.Dish]:
+        """Parse dish information from an OCR result, categorizing the
+        whole menu in one batch."""
+        parsed_dishes = list(self.menu_parser.parse(ocr_result))
+        categories = self.categorizer.categorize([parsed.name for parsed in parsed_dishes], options.language)
+        return [
+            self._to_dish(parsed, category, options)
+            for parsed, category in zip(parsed_dishes, categories)
+        ]
+    
+    def _merge_pages(self, results: Iterable[PageResult]) -> List[menu_pb2.Dish]:
+        """The dishes of all pages of a split menu, in page order."""
+        results = sorted(results, key=lambda result: result.page.index)
+        return [dish for result in results for dish in result.dishes]
+    
+    def _iter_dishes(
+        self,
+        ocr_result: OCRResult,
+        options: menu_pb2.ProcessingOptions
+    ) -> Iterator[menu_pb2.Dish]:
+        """Lazily convert parsed dishes to Dish messages as the parser finds them."""
+        for parsed in self.menu_parser.parse(ocr_result):
+            category = self.categorizer.categorize([parsed.name], options.language)[0]
+            yield self._to_dish(parsed, category, options)
+    
+    def _to_dish(
+        self,
+        parsed: ParsedDish,
+        category: str,
+        options: menu_pb2.ProcessingOptions
+    ) -> menu_pb2.Dish:
+        """Build a Dish message from a parsed dish."""
+        price = None
+        if options.extract_prices and parsed.price is not None:
+            price = menu_pb2.Price(
+                amount=parsed.price.amount,
+                currency=parsed.price.currency,
+                original_text=parsed.price.text
+            )
+        
+        return menu_pb2.Dish(
+            dish_id=str(uuid.uuid4()),
+            name=parsed.name,
+            description=parsed.description,
+            price=price,
+            category=category,
+            confidence_score=parsed.confidence,
+            image_url=""
+        )
+    
+    def _dish_to_document(self, dish: menu_pb2.Dish) -> Dict[str, Any]:
+        """Convert Dish message to an Elasticsearch document."""
+        return {
+            'dish_id': dish.dish_id,
+            'name': dish.name,
+            'description': dish.description,
+            'price': {
+                'amount': dish.price.amount,
+                'currency': dish.price.currency
+            } if dish.HasField('price') else None,
+            'ingredients': list(dish.ingredients),
+            'category': dish.category,
+            'confidence_score': dish.confidence_score
+        }
+    
+    def _dict_to_dish(self, data: Dict[str, Any], dish_id: str = '') -> menu_pb2.Dish:
+        """Convert dictionary to Dish message.
+        
+        Documents indexed before dish_id was stored in the source take it
+        from ``dish_id`` (the document _id).
+        """
+        dish = menu_pb2.Dish(
+            dish_id=data.get('dish_id') or dish_id,
+            name=data.get('name', ''),
+            description=data.get('description', ''),
+            category=data.get('category', ''),
+            confidence_score=data.get('confidence_score', 0.0)
+        )
+        
+        if 'price' in data and data['price']:
+            dish.price.CopyFrom(menu_pb2.Price(
+                amount=data['price'].get('amount', 0.0),
+                currency=data['price'].get('currency', 'USD'),
+                original_text=data['price'].get('original_text', '')
+            ))
+        
+        if 'ingredients' in data:
+            dish.ingredients.extend(data['ingredients'])
+        
+        return dish
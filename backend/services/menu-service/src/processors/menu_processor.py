@@ -3,53 +3,124 @@ import sys
 import time
 import uuid
 import logging
-from typing import List, Dict, Any, Optional
+import importlib
+import threading
+from typing import List, Optional
 import json
 
 # Add proto_gen to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
 
 import menu_pb2
-from google.cloud import vision
-from google.cloud import storage
-from google.cloud import pubsub_v1
-import redis
-from elasticsearch import Elasticsearch
-from PIL import Image
-import io
+
+import clients
+from cache.dish_cache import (
+    DISH_INVALIDATION_CHANNEL,
+    DishCacheStats,
+    DishInvalidationListener,
+    LocalDishCache,
+    SingleFlight,
+    encode_invalidation
+)
+from cache.codec import CacheCodec
+from cache.menu_cache import MenuCache
+from cache.search_cache import SearchCache
+from cache.perceptual_hash import NearDuplicateIndex, dhash
+from events.outbox import create_event_outbox
+from fetch.fetcher import create_image_fetcher
+from indexing.bulk_indexer import BulkIndexer, IndexTicket
+from instrumentation import stage
+from jobs.factory import create_job_queue
+from jobs.store import QUEUED_MESSAGE, JobStore, job_status
+from jobs.workers import JobWorkerPool
+from scanner_common.metrics import Histogram
+from scanner_common.ocr.base import OCRResult
+from scanner_common.ocr.router import create_ocr_engine
+from pages.pool import PagePool
+from processors.base import MenuProcessorBase, mock_ocr_result, request_deadline, time_left
+from search.factory import create_search_backend, create_similar_index
+from search.pagination import SearchCursor
+from stand_ins.memory_redis import InMemoryRedis
 
 logger = logging.getLogger(__name__)
 
 
-class MenuProcessor:
+class MenuProcessor(MenuProcessorBase):
     """Processes menu images and extracts dish information."""
     
-    def __init__(self):
-        # Initialize Redis
-        redis_host = os.getenv('REDIS_HOST', 'localhost')
-        redis_port = int(os.getenv('REDIS_PORT', 6379))
-        self.redis_client = redis.Redis(
-            host=redis_host,
-            port=redis_port,
-            decode_responses=True
-        )
+    def __init__(self, redis_client=None, es_client=None, vision_client=None, publisher=None):
+        # Initialize Redis (CACHE_BACKEND=memory uses an in-process stand-in)
+        if redis_client is not None:
+            self.redis_client = redis_client
+        elif os.getenv('CACHE_BACKEND', 'redis') == 'memory':
+            self.redis_client = InMemoryRedis(
+                max_entries=int(os.getenv('CACHE_MEMORY_MAX_ENTRIES', 10000)),
+                max_bytes=int(os.getenv('CACHE_MEMORY_MAX_BYTES', 64 * 1024 * 1024))
+            )
+        else:
+            # Connected on first use or by warm_up(), from a pool of REDIS_MAX_CONNECTIONS
+            self.redis_client = clients.redis_client()
+        # Cache values are raw framed bytes (CacheCodec), so the client does not decode
+        self.cache_codec = CacheCodec()
+        self.menu_cache = MenuCache(self.redis_client, codec=self.cache_codec)
+        self.search_cache = SearchCache(self.redis_client, codec=self.cache_codec)
+        
+        # async_processing: jobs queue here and run in a worker process pool
+        # (start_job_workers); status and results are kept in Redis
+        self.job_queue = create_job_queue(self.redis_client)
+        self.job_store = JobStore(self.redis_client, codec=self.cache_codec)
+        self.job_workers = None
+        
+        # Perceptual-hash index for re-photographed menus
+        self.near_duplicates = None
+        if os.getenv('NEAR_DUPLICATE_ENABLED', 'true').lower() == 'true':
+            self.near_duplicates = NearDuplicateIndex()
         
         # Initialize Elasticsearch
-        es_host = os.getenv('ELASTICSEARCH_HOST', 'localhost')
-        es_port = int(os.getenv('ELASTICSEARCH_PORT', 9200))
-        self.es_client = Elasticsearch([f'http://{es_host}:{es_port}'])
+        self.es_client = es_client if es_client is not None else clients.elasticsearch_client()
+        self.bulk_indexer = BulkIndexer(self.es_client, index='dishes')
+        self.index_wait_timeout = float(os.getenv('ES_BULK_WAIT_TIMEOUT', 10))
         
-        # Initialize GCP clients (requires credentials)
-        try:
-            self.vision_client = vision.ImageAnnotatorClient()
-            self.storage_client = storage.Client()
-            self.pubsub_publisher = pubsub_v1.PublisherClient()
-            logger.info("GCP clients initialized")
-        except Exception as e:
-            logger.warning(f"GCP clients not initialized: {e}")
-            self.vision_client = None
-            self.storage_client = None
-            self.pubsub_publisher = None
+        # SearchDishes and similar dishes: Elasticsearch or the in-process engine (SEARCH_BACKEND)
+        self.search_backend = create_search_backend(self.es_client, self, load=False)
+        # Similar dishes from a vector index instead (SIMILAR_BACKEND=vector);
+        # in-process indexes without a snapshot are loaded by warm_up()
+        self.similar_index = create_similar_index()
+        
+        # GetDish: in-process L1 of built Dish messages in front of Redis,
+        # invalidated across replicas over Redis pub/sub
+        self.dish_l1 = LocalDishCache()
+        self.dish_stats = DishCacheStats()
+        self.dish_loads = SingleFlight()
+        self.dish_invalidations = DishInvalidationListener(self.redis_client, self.dish_l1, self.dish_stats)
+        
+        self.time_to_first_dish = Histogram(
+            'menu_stream_time_to_first_dish_ms',
+            'Time from stream start to the first DishResponse'
+        )
+        
+        # GCP clients (require credentials) are created on first use or by warm_up()
+        self.vision_client = vision_client or clients.vision_client()
+        self.storage_client = clients.storage_client()
+        self.pubsub_publisher = publisher or clients.pubsub_publisher()
+        
+        # image_url requests: fetched over pooled connections into a local disk cache
+        self.image_fetcher = create_image_fetcher(self.storage_client)
+        
+        # menu-processed events go through a durable local outbox, published in batches
+        self.event_outbox = create_event_outbox(self.pubsub_publisher)
+        
+        # Vision, local Tesseract, or local-first with Vision fallback (OCR_ENGINE)
+        self.ocr_engine = create_ocr_engine(self.vision_client)
+        
+        # PDF menus and very tall images: pages OCR'd and parsed in a process pool
+        self.page_pool = PagePool()
+        
+        # Per-dependency readiness for the gRPC health service
+        self.readiness = self._track_readiness()
+        self._stopping = threading.Event()
+        
+        self._register_metrics()
         
         logger.info("MenuProcessor initialized")
     
@@ -57,337 +128,535 @@ class MenuProcessor:
         self,
         image_data: bytes,
         image_url: str,
-        options: menu_pb2.ProcessingOptions
+        options: menu_pb2.ProcessingOptions,
+        menu_id: Optional[str] = None,
+        timeout: Optional[float] = None
     ) -> menu_pb2.MenuResponse:
-        """Process a menu image and extract dishes."""
+        """Process a menu image and extract dishes. ``timeout`` is what is
+        left of the RPC deadline; OCR is given the part of it still left."""
+        deadline = request_deadline(timeout)
         start_time = time.time()
-        menu_id = str(uuid.uuid4())
+        menu_id = menu_id or str(uuid.uuid4())
         
         logger.info(f"Processing menu {menu_id}")
         
-        # Check cache if enabled
+        image_data = self._fetch_image(image_data, image_url)
+        
+        # Check cache if enabled (keyed on image content, not the menu id)
+        image_digest = None
         if options.use_cache:
-            cache_key = f"menu:{menu_id}"
-            cached = self.redis_client.get(cache_key)
-            if cached:
-                logger.info(f"Cache hit for menu {menu_id}")
-                return self._deserialize_menu_response(cached)
+            image_digest = self.menu_cache.image_digest(image_data, image_url)
         
-        # Extract text using Google Cloud Vision (or mock if not available)
-        text_annotations = self._extract_text(image_data)
+        if image_digest:
+            with stage('menu_cache_get'):
+                cached = self.menu_cache.get_menu(image_digest, options)
+            if cached:
+                logger.info(f"Cache hit for menu {cached.menu_id}")
+                return cached
         
-        # Parse dishes from text
-        dishes = self._parse_dishes(text_annotations, options)
+        pages = self.page_pool.split(image_data)
+        if pages:
+            # Pages (or tiles) in parallel, merged back in page order
+            with stage('pages'):
+                dishes = self._merge_pages(self.page_pool.process(image_data, pages, options))
+        else:
+            # Extract text, reusing cached OCR output where possible
+            ocr_result = self._resolve_text(image_data, image_digest, options.language, deadline)
+            
+            # Parse dishes from text
+            with stage('parse'):
+                dishes = self._parse_dishes(ocr_result, options)
         
-        # Index in Elasticsearch
-        for dish in dishes:
-            self._index_dish(dish)
+        # Index in Elasticsearch as one bulk group
+        with stage('index'):
+            index_errors = self._index_dishes(dishes).wait(self.index_wait_timeout)
         
         # Create response
-        processing_time = int((time.time() - start_time) * 1000)
-        
-        response = menu_pb2.MenuResponse(
-            menu_id=menu_id,
-            dishes=dishes,
-            metadata=menu_pb2.Metadata(
-                processing_time_ms=processing_time,
-                total_dishes=len(dishes),
-                source='vision_api',
-                timestamp=int(time.time())
-            ),
-            status=menu_pb2.ProcessingStatus(
-                status=menu_pb2.ProcessingStatus.Status.COMPLETED,
-                message="Menu processed successfully"
-            )
-        )
+        response = self._build_menu_response(menu_id, dishes, start_time, index_errors)
         
-        # Cache the result
-        if options.use_cache:
-            cache_key = f"menu:{menu_id}"
-            self.redis_client.setex(
-                cache_key,
-                3600,  # 1 hour TTL
-                self._serialize_menu_response(response)
-            )
+        # Cache the result (partial results are retried on the next scan)
+        if image_digest and not index_errors:
+            with stage('menu_cache_put'):
+                self.menu_cache.put_menu(image_digest, options, response)
         
         # Publish to Pub/Sub (if available)
-        self._publish_menu_processed(menu_id, len(dishes))
+        with stage('publish'):
+            self._publish_menu_processed(menu_id, len(dishes))
         
         return response
     
+    def submit_menu(
+        self,
+        image_data: bytes,
+        image_url: str,
+        options: menu_pb2.ProcessingOptions
+    ) -> menu_pb2.MenuResponse:
+        """Queue a menu for the job workers and return its PROCESSING status.
+        
+        A cached menu is returned as is, and a submission identical to one
+        already queued or running gets that job's status. Raises QueueFull
+        when the queue is at capacity and ValueError without an image.
+        """
+        image_digest = self.menu_cache.image_digest(image_data, image_url)
+        if not image_digest:
+            raise ValueError("image_data or image_url is required")
+        
+        if options.use_cache:
+            with stage('menu_cache_get'):
+                cached = self.menu_cache.get_menu(image_digest, options)
+            if cached:
+                return cached
+        
+        job = self._menu_job(image_data, image_url, options, image_digest)
+        with stage('job_submit'):
+            # Before the job is queued: a worker may take it and write its
+            # own status at once, which this must not overwrite
+            queued = job_status(job.menu_id, menu_pb2.ProcessingStatus.Status.PROCESSING, QUEUED_MESSAGE)
+            self.job_store.put(job.menu_id, queued)
+            try:
+                menu_id, created = self.job_queue.submit(job)
+            except Exception:
+                self.job_store.delete(job.menu_id)
+                raise
+            if not created:
+                # The identical job already queued or running has its own status
+                self.job_store.delete(job.menu_id)
+        
+        logger.info(f"Menu {menu_id} {'queued' if created else 'already queued or running'}")
+        queued.menu_id = menu_id
+        return self.menu_status(menu_id) or queued
+    
+    def menu_status(self, menu_id: str) -> Optional[menu_pb2.MenuResponse]:
+        """Status, or the result once finished, of a submitted menu; None if unknown."""
+        response = self.job_store.get(menu_id)
+        if response is not None and response.status.status == menu_pb2.ProcessingStatus.Status.PROCESSING:
+            response.status.queue_position = self.job_queue.position(menu_id) or 0
+        return response
+    
+    def start_job_workers(self, processor_factory=None, workers: Optional[int] = None) -> JobWorkerPool:
+        """Run queued jobs in worker processes, each with its own processor
+        built by ``processor_factory`` (default: MenuProcessor from the
+        environment)."""
+        self.job_workers = JobWorkerPool(self.job_queue, self.job_store, processor_factory or MenuProcessor, workers)
+        return self.job_workers
+    
+    def warm_up(self):
+        """Import the client libraries, open Redis and Elasticsearch
+        connections, load in-process indexes and create the GCP clients,
+        marking each dependency's readiness. Requests served meanwhile
+        create whatever they need themselves."""
+        # Imports first, so the first request after readiness does not pay for them
+        for client in (self.redis_client, self.es_client, self.vision_client, self.pubsub_publisher, self.image_fetcher.http):
+            clients.import_modules(client)
+        # Vision requests are built from its message types, whatever the client
+        importlib.import_module('google.cloud.vision')
+        self._check_dependencies(warm=True)
+        # Optional clients last: looking up credentials can wait on the metadata server
+        for name, client in (('vision', self.vision_client), ('pubsub', self.pubsub_publisher)):
+            self.readiness.mark(name, clients.resolve(client) is not None, 'no client (credentials?)')
+        logger.info(f"Warm-up done; ready: {self.readiness.ready()}")
+    
+    def start_warmup(self) -> threading.Thread:
+        """warm_up() on a background thread, which then re-checks the
+        dependencies every HEALTH_CHECK_INTERVAL seconds until shutdown."""
+        thread = threading.Thread(target=self._warm_up_and_watch, name='warmup', daemon=True)
+        thread.start()
+        return thread
+    
+    def _warm_up_and_watch(self):
+        self.warm_up()
+        interval = float(os.getenv('HEALTH_CHECK_INTERVAL', 10))
+        while not self._stopping.wait(interval):
+            self._check_dependencies()
+    
+    def _check_dependencies(self, warm: bool = False):
+        """Ping Redis and Elasticsearch (opening REDIS_WARM_CONNECTIONS pooled
+        connections first when warming), and load in-process indexes that
+        are not loaded yet."""
+        try:
+            if warm:
+                clients.warm_redis_pool(self.redis_client, int(os.getenv('REDIS_WARM_CONNECTIONS', 4)))
+            self.redis_client.ping()
+            self.readiness.mark('redis', True)
+        except Exception as e:
+            self.readiness.mark('redis', False, str(e))
+        
+        try:
+            self.readiness.mark('elasticsearch', bool(self.es_client.ping()), 'ping failed')
+        except Exception as e:
+            self.readiness.mark('elasticsearch', False, str(e))
+        
+        if self._in_process_indexes() and not self.readiness.is_ready('search_index'):
+            self.readiness.mark('search_index', self._load_indexes(self.es_client), 'not loaded from Elasticsearch')
+    
     def get_dish(
         self,
         dish_id: str,
         include_similar: bool
     ) -> Optional[menu_pb2.DishResponse]:
         """Get dish details by ID."""
-        # Try cache first
-        cache_key = f"dish:{dish_id}"
-        cached = self.redis_client.get(cache_key)
-        
-        if cached:
-            dish_data = json.loads(cached)
-            dish = self._dict_to_dish(dish_data)
+        # In-process L1 first, then Redis, then Elasticsearch
+        dish = self.dish_l1.get(dish_id)
+        if dish is not None:
+            self.dish_stats.count('l1_hits')
         else:
-            # Get from Elasticsearch
-            try:
-                result = self.es_client.get(index='dishes', id=dish_id)
-                dish = self._dict_to_dish(result['_source'])
-                
-                # Cache it
-                self.redis_client.setex(
-                    cache_key,
-                    3600,
-                    json.dumps(result['_source'])
-                )
-            except Exception as e:
-                logger.error(f"Dish not found: {e}")
+            generation = self.dish_l1.generation
+            with stage('dish_load'):
+                (dish, tier), shared = self.dish_loads.do(dish_id, lambda: self._load_dish(dish_id))
+            self.dish_stats.count('coalesced' if shared else tier)
+            if dish is None:
                 return None
+            if not shared:
+                self.dish_l1.put(dish_id, dish, generation)
         
         response = menu_pb2.DishResponse(dish=dish)
         
         # Find similar dishes if requested
         if include_similar:
-            similar = self._find_similar_dishes(dish_id, dish.name)
+            with stage('similar'):
+                if self.similar_index is not None and len(self.similar_index):
+                    similar = self._similar_dishes({dish_id: dish}).get(dish_id, [])
+                else:
+                    similar = self.search_backend.similar(dish_id, dish)
             response.similar_dishes.extend(similar)
         
         return response
     
-    def search_dishes(self, request: menu_pb2.SearchRequest) -> menu_pb2.SearchResponse:
-        """Search dishes using Elasticsearch."""
-        # Build Elasticsearch query
-        query = {
-            "query": {
-                "multi_match": {
-                    "query": request.query,
-                    "fields": ["name^3", "description^2", "ingredients"]
-                }
-            },
-            "size": request.limit or 20,
-            "from": request.offset or 0
-        }
+    def get_dishes(
+        self,
+        dish_ids: List[str],
+        include_similar: bool
+    ) -> menu_pb2.DishesResponse:
+        """Get several dishes by ID.
+        
+        Misses in the L1 are read with one Redis MGET, the rest with one
+        Elasticsearch mget, and Redis is refilled in one pipelined SETEX
+        batch. Similar dishes for the whole batch come from one search
+        backend call (one msearch on Elasticsearch) or the vector index.
+        """
+        with stage('dish_load'):
+            found = self._lookup_dishes(list(dict.fromkeys(dish_ids)))
         
-        # Add filters
-        if request.categories:
-            query["query"] = {
-                "bool": {
-                    "must": query["query"],
-                    "filter": {
-                        "terms": {"category": list(request.categories)}
-                    }
-                }
-            }
+        similar = {}
+        if include_similar and found:
+            with stage('similar'):
+                similar = self._similar_dishes(found)
         
+        return self._dishes_response(dish_ids, found, similar)
+    
+    def dish_cache_stats(self) -> dict:
+        """Per-tier GetDish hit counts and ratios."""
+        return self.dish_stats.snapshot(self.dish_l1)
+    
+    def search_dishes(self, request: menu_pb2.SearchRequest) -> menu_pb2.SearchResponse:
+        """Search dishes with the configured search backend.
+        
+        First pages come from the search cache when possible, else from the
+        backend along with facets and suggestions; pages after a cursor go
+        straight to the backend. Raises ValueError for a bad filter or a
+        cursor that does not belong to the request.
+        """
+        cursor = SearchCursor.decode(request.cursor, request) if request.cursor else None
         try:
-            result = self.es_client.search(index='dishes', body=query)
+            if cursor is not None:
+                with stage('search'):
+                    return self.search_backend.search(request, cursor)
             
-            dishes = []
-            for hit in result['hits']['hits']:
-                dishes.append(self._dict_to_dish(hit['_source']))
-            
-            return menu_pb2.SearchResponse(
-                dishes=dishes,
-                total_results=result['hits']['total']['value'],
-                page=(request.offset // request.limit) + 1 if request.limit else 1,
-                metadata=menu_pb2.SearchMetadata(
-                    search_time_ms=result['took']
-                )
-            )
+            with stage('search_cache_get'):
+                response, generation = self.search_cache.get(request)
+            if response is not None:
+                return response
+            with stage('search'):
+                response = self.search_backend.search(request)
+            with stage('search_cache_put'):
+                self.search_cache.put(request, response, generation)
+            return response
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Search error: {e}")
             return menu_pb2.SearchResponse()
     
-    def process_menu_stream(self, image_data, image_url, options):
-        """Stream dish processing results."""
-        # This is a generator that yields dishes as they are processed
-        text_annotations = self._extract_text(image_data)
-        dishes = self._parse_dishes(text_annotations, options)
+    def process_menu_stream(self, image_data, image_url, options, is_active=None, timeout=None):
+        """Stream dish processing results.
+        
+        Dishes are yielded as soon as each OCR line is parsed (for PDF and
+        tiled menus, as soon as each page is); indexing is queued on the
+        bulk indexer so it overlaps with parsing the rest of the menu.
+        `is_active` is polled between dishes to stop on cancel, and
+        `timeout` is the RPC's remaining deadline, as for process_menu.
+        """
+        deadline = request_deadline(timeout)
+        start_time = time.monotonic()
+        first_dish = True
+        
+        image_data = self._fetch_image(image_data, image_url)
+        
+        image_digest = None
+        if options.use_cache:
+            image_digest = self.menu_cache.image_digest(image_data, image_url)
+        
+        with stage('menu_cache_get'):
+            cached = self.menu_cache.get_menu(image_digest, options) if image_digest else None
+        pages = None if cached else self.page_pool.split(image_data)
+        if cached:
+            dishes = iter(cached.dishes)
+        elif pages:
+            # Each page's dishes as soon as that page is done, whatever its place
+            results = self.page_pool.process(image_data, pages, options)
+            dishes = (dish for result in results for dish in result.dishes)
+        else:
+            ocr_result = self._resolve_text(image_data, image_digest, options.language, deadline)
+            dishes = self._iter_dishes(ocr_result, options)
         
         for dish in dishes:
-            self._index_dish(dish)
+            if is_active is not None and not is_active():
+                logger.info("Stream cancelled by client")
+                return
+            
+            if not cached:
+                self._index_dish(dish)
+            
+            if first_dish:
+                self.time_to_first_dish.observe((time.monotonic() - start_time) * 1000)
+                first_dish = False
+            
             yield menu_pb2.DishResponse(dish=dish)
     
-    def _extract_text(self, image_data: bytes) -> List[str]:
-        """Extract text from image using Google Cloud Vision."""
-        if self.vision_client and image_data:
+    def shutdown(self):
+        """Flush pending work before the process exits."""
+        self._stopping.set()
+        if self.job_workers is not None:
+            self.job_workers.close()
+        self.bulk_indexer.close(timeout=float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', 20)))
+        self.search_cache.close()
+        if self.event_outbox is not None:
+            self.event_outbox.close(timeout=float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', 20)))
+        self.ocr_engine.close()
+        self.page_pool.close()
+        self.image_fetcher.close()
+        self.search_backend.close()
+        if self.similar_index is not None:
+            self.similar_index.close()
+            logger.info(f"Similar-dish index: {self.similar_index.stats()}")
+        self.dish_invalidations.stop()
+        logger.info(f"Dish cache: {self.dish_cache_stats()}")
+        logger.info(f"Search cache: {self.search_cache.stats()}")
+        logger.info(f"Cache codec: {self.cache_codec.stats()}")
+        logger.info(f"Search backend: {self.search_backend.stats()}")
+    
+    def _fetch_image(self, image_data: bytes, image_url: str) -> bytes:
+        """The request image: ``image_data``, else the image at ``image_url``,
+        so that it is cached and OCR'd by its content."""
+        if image_data or not image_url:
+            return image_data
+        with stage('fetch'):
+            return self.image_fetcher.fetch(image_url)
+    
+    def _resolve_text(
+        self,
+        image_data: bytes,
+        image_digest: Optional[str],
+        language: str = '',
+        deadline: Optional[float] = None
+    ) -> OCRResult:
+        """Get the OCR result from the exact or near-duplicate cache, else run
+        OCR; ``language`` is the menu's (ProcessingOptions.language) and
+        ``deadline`` the request's, as a time.monotonic() value."""
+        if not image_digest:
+            with stage('ocr'):
+                return self._extract_text(image_data, language, deadline)
+        
+        # Exact content match (e.g. only the parse options changed)
+        with stage('ocr_cache'):
+            ocr_result = self.menu_cache.get_ocr(image_digest, language)
+        if ocr_result is not None:
+            return ocr_result
+        
+        # Same menu photographed again from a slightly different angle/light
+        phash = None
+        if self.near_duplicates is not None and image_data:
+            with stage('phash'):
+                phash = dhash(image_data)
+        if phash is not None:
+            match = self.near_duplicates.find(phash, language)
+            if match:
+                with stage('ocr_cache'):
+                    ocr_result = self.menu_cache.get_ocr(match, language)
+                if ocr_result is not None:
+                    logger.info(f"Near-duplicate OCR hit for {image_digest[:12]}")
+                    self.menu_cache.put_ocr(image_digest, ocr_result, language)
+                    return ocr_result
+                # The OCR entry it pointed to has expired or been evicted
+                self.near_duplicates.discard(match, language)
+        
+        # Extract text using Google Cloud Vision (or mock if not available)
+        with stage('ocr'):
+            ocr_result = self._extract_text(image_data, language, deadline)
+        with stage('ocr_cache'):
+            self.menu_cache.put_ocr(image_digest, ocr_result, language)
+        if phash is not None:
+            self.near_duplicates.add(phash, image_digest, language)
+        
+        return ocr_result
+    
+    def _extract_text(self, image_data: bytes, language: str = '', deadline: Optional[float] = None) -> OCRResult:
+        """Extract text from image using the configured OCR engine."""
+        if image_data:
             try:
-                image = vision.Image(content=image_data)
-                response = self.vision_client.text_detection(image=image)
-                
-                if response.text_annotations:
-                    return [annotation.description for annotation in response.text_annotations]
+                result = self.ocr_engine.extract(image_data, language, time_left(deadline))
+                if result is not None and result.full_text:
+                    return result
             except Exception as e:
-                logger.error(f"Vision API error: {e}")
+                logger.error(f"OCR error: {e}")
         
         # Return mock data for development
-        return [
-            "MENU",
-            "Margherita Pizza - Classic tomato and mozzarella - $12.99",
-            "Pasta Carbonara - Creamy pasta with bacon - $14.99",
-            "Caesar Salad - Fresh romaine with parmesan - $8.99",
-            "Tiramisu - Italian coffee dessert - $6.99"
-        ]
-    
-    def _parse_dishes(
-        self,
-        text_annotations: List[str],
-        options: menu_pb2.ProcessingOptions
-    ) -> List[menu_pb2.Dish]:
-        """Parse dish information from text annotations."""
-        dishes = []
-        
-        # Simple parsing logic (should be more sophisticated in production)
-        for i, text in enumerate(text_annotations[1:], 1):  # Skip first annotation (full text)
-            if '-' in text and '$' in text:
-                parts = text.split('-')
-                if len(parts) >= 2:
-                    name = parts[0].strip()
-                    description = parts[1].strip() if len(parts) > 1 else ""
-                    
-                    # Extract price
-                    price_text = ""
-                    amount = 0.0
-                    if '$' in description:
-                        price_parts = description.split('$')
-                        if len(price_parts) > 1:
-                            price_text = '$' + price_parts[-1].strip()
-                            try:
-                                amount = float(price_parts[-1].strip().replace(',', ''))
-                            except ValueError:
-                                pass
-                            description = '$'.join(price_parts[:-1]).strip()
-                    
-                    dish = menu_pb2.Dish(
-                        dish_id=str(uuid.uuid4()),
-                        name=name,
-                        description=description,
-                        price=menu_pb2.Price(
-                            amount=amount,
-                            currency='USD',
-                            original_text=price_text
-                        ) if options.extract_prices else None,
-                        category=self._categorize_dish(name),
-                        confidence_score=0.85,
-                        image_url=""
-                    )
-                    
-                    dishes.append(dish)
-        
-        return dishes
-    
-    def _categorize_dish(self, name: str) -> str:
-        """Simple categorization based on keywords."""
-        name_lower = name.lower()
-        
-        if any(word in name_lower for word in ['pizza', 'burger', 'sandwich', 'pasta']):
-            return 'main'
-        elif any(word in name_lower for word in ['salad', 'soup', 'appetizer']):
-            return 'appetizer'
-        elif any(word in name_lower for word in ['cake', 'pie', 'ice cream', 'tiramisu']):
-            return 'dessert'
-        else:
-            return 'other'
+        return mock_ocr_result()
     
-    def _index_dish(self, dish: menu_pb2.Dish):
-        """Index dish in Elasticsearch."""
+    def _load_dish(self, dish_id: str):
+        """Load a dish from Redis or Elasticsearch; returns (dish, tier counter)."""
+        # Try cache first
+        cache_key = f"dish:{dish_id}"
+        cached = self.redis_client.get(cache_key)
+        
+        dish = self.cache_codec.decode_message(cached, menu_pb2.Dish) if cached else None
+        if dish is not None:
+            return dish, 'l2_hits'
+        
+        # Get from Elasticsearch
         try:
-            doc = {
-                'name': dish.name,
-                'description': dish.description,
-                'price': {
-                    'amount': dish.price.amount,
-                    'currency': dish.price.currency
-                } if dish.price else None,
-                'ingredients': list(dish.ingredients),
-                'category': dish.category,
-                'confidence_score': dish.confidence_score
-            }
+            result = self.es_client.get(index='dishes', id=dish_id)
+            dish = self._dict_to_dish(result['_source'], dish_id)
             
-            self.es_client.index(
-                index='dishes',
-                id=dish.dish_id,
-                document=doc
+            # Cache it
+            self.redis_client.setex(
+                cache_key,
+                3600,
+                self.cache_codec.encode_message(dish)
             )
-            logger.info(f"Indexed dish: {dish.dish_id}")
         except Exception as e:
-            logger.error(f"Error indexing dish: {e}")
+            logger.error(f"Dish not found: {e}")
+            return None, 'not_found'
+        
+        return dish, 'origin_loads'
     
-    def _find_similar_dishes(self, dish_id: str, dish_name: str) -> List[menu_pb2.Dish]:
-        """Find similar dishes using Elasticsearch."""
+    def _load_dishes(self, dish_ids: List[str]) -> dict:
+        """Load dishes from Redis (one MGET) and Elasticsearch (one mget)."""
+        cached = self.redis_client.mget([f"dish:{dish_id}" for dish_id in dish_ids])
+        
+        loaded = {}
+        origin_ids = []
+        for dish_id, value in zip(dish_ids, cached):
+            dish = self.cache_codec.decode_message(value, menu_pb2.Dish) if value else None
+            if dish is not None:
+                loaded[dish_id] = dish
+            else:
+                origin_ids.append(dish_id)
+        self.dish_stats.count('l2_hits', len(loaded))
+        
+        if not origin_ids:
+            return loaded
+        
         try:
-            query = {
-                "query": {
-                    "more_like_this": {
-                        "fields": ["name", "description"],
-                        "like": dish_name,
-                        "min_term_freq": 1,
-                        "max_query_terms": 12
-                    }
-                },
-                "size": 5
-            }
-            
-            result = self.es_client.search(index='dishes', body=query)
-            
-            similar = []
-            for hit in result['hits']['hits']:
-                if hit['_id'] != dish_id:
-                    similar.append(self._dict_to_dish(hit['_source']))
-            
-            return similar
+            result = self.es_client.mget(index='dishes', ids=origin_ids)
         except Exception as e:
-            logger.error(f"Error finding similar dishes: {e}")
-            return []
-    
-    def _publish_menu_processed(self, menu_id: str, dish_count: int):
-        """Publish menu processed event to Pub/Sub."""
-        if self.pubsub_publisher:
+            logger.error(f"Error getting dishes: {e}")
+            self.dish_stats.count('not_found', len(origin_ids))
+            return loaded
+        
+        sources = {doc['_id']: doc['_source'] for doc in result['docs'] if doc.get('found')}
+        for dish_id, source in sources.items():
+            loaded[dish_id] = self._dict_to_dish(source, dish_id)
+        self.dish_stats.count('origin_loads', len(sources))
+        self.dish_stats.count('not_found', len(origin_ids) - len(sources))
+        
+        # Refill Redis in one round trip
+        if sources:
             try:
-                project_id = os.getenv('GCP_PROJECT_ID')
-                topic_path = self.pubsub_publisher.topic_path(
-                    project_id,
-                    'menu-processed'
-                )
-                
-                data = json.dumps({
-                    'menu_id': menu_id,
-                    'dish_count': dish_count,
-                    'timestamp': int(time.time())
-                }).encode('utf-8')
-                
-                self.pubsub_publisher.publish(topic_path, data)
-                logger.info(f"Published menu processed event: {menu_id}")
+                pipe = self.redis_client.pipeline(transaction=False)
+                for dish_id in sources:
+                    pipe.setex(f"dish:{dish_id}", 3600, self.cache_codec.encode_message(loaded[dish_id]))
+                pipe.execute()
             except Exception as e:
-                logger.warning(f"Failed to publish event: {e}")
-    
-    def _dict_to_dish(self, data: Dict[str, Any]) -> menu_pb2.Dish:
-        """Convert dictionary to Dish message."""
-        dish = menu_pb2.Dish(
-            dish_id=data.get('dish_id', ''),
-            name=data.get('name', ''),
-            description=data.get('description', ''),
-            category=data.get('category', ''),
-            confidence_score=data.get('confidence_score', 0.0)
-        )
-        
-        if 'price' in data and data['price']:
-            dish.price.CopyFrom(menu_pb2.Price(
-                amount=data['price'].get('amount', 0.0),
-                currency=data['price'].get('currency', 'USD'),
-                original_text=data['price'].get('original_text', '')
-            ))
+                logger.warning(f"Dish cache refill failed: {e}")
         
-        if 'ingredients' in data:
-            dish.ingredients.extend(data['ingredients'])
+        return loaded
+    
+    def _lookup_dishes(self, dish_ids: List[str]) -> dict:
+        """Dishes by ID from the L1, then one batched Redis/Elasticsearch load."""
+        found = {}
+        generation = self.dish_l1.generation
+        for dish_id in dish_ids:
+            dish = self.dish_l1.get(dish_id)
+            if dish is not None:
+                found[dish_id] = dish
+        self.dish_stats.count('l1_hits', len(found))
         
-        return dish
+        misses = [dish_id for dish_id in dish_ids if dish_id not in found]
+        if misses:
+            loaded = self._load_dishes(misses)
+            for dish_id, dish in loaded.items():
+                found[dish_id] = dish
+                self.dish_l1.put(dish_id, dish, generation)
+        return found
     
-    def _serialize_menu_response(self, response: menu_pb2.MenuResponse) -> str:
-        """Serialize MenuResponse to string."""
-        return response.SerializeToString().hex()
+    def _similar_dishes(self, dishes: dict) -> dict:
+        """Similar dishes for each dish, from the vector index when it has
+        entries, else from the search backend."""
+        if self.similar_index is None or not len(self.similar_index):
+            return self.search_backend.similar_batch(dishes)
+        similar_ids = self.similar_index.similar_batch(dishes)
+        loaded = self._lookup_dishes(list(dict.fromkeys(
+            similar_id for ids in similar_ids.values() for similar_id in ids
+        )))
+        return {
+            dish_id: [loaded[similar_id] for similar_id in ids if similar_id in loaded]
+            for dish_id, ids in similar_ids.items()
+        }
     
-    def _deserialize_menu_response(self, data: str) -> menu_pb2.MenuResponse:
-        """Deserialize MenuResponse from string."""
-        response = menu_pb2.MenuResponse()
-        response.ParseFromString(bytes.fromhex(data))
-        return response
+    def _invalidate_dishes(self, dish_ids: List[str]):
+        """Drop reindexed dishes from Redis, every replica's L1 and the search cache."""
+        if not dish_ids:
+            return
+        self.dish_l1.invalidate(dish_ids)
+        self.search_cache.invalidate()
+        try:
+            self.redis_client.delete(*[f"dish:{dish_id}" for dish_id in dish_ids])
+            self.redis_client.publish(DISH_INVALIDATION_CHANNEL, encode_invalidation(dish_ids))
+            self.dish_stats.count('invalidations_sent', len(dish_ids))
+        except Exception as e:
+            logger.warning(f"Dish invalidation failed: {e}")
+    
+    def _index_dish(self, dish: menu_pb2.Dish) -> IndexTicket:
+        """Queue a dish for bulk indexing in Elasticsearch."""
+        return self._index_dishes([dish])
+    
+    def _index_dishes(self, dishes: List[menu_pb2.Dish], reindex: bool = False) -> IndexTicket:
+        """Queue dishes for bulk indexing in Elasticsearch.
+        
+        New dishes have fresh IDs nobody can have cached, so only search
+        results go stale; ``reindex`` marks existing dishes whose cached
+        copies must be dropped too.
+        """
+        self.search_backend.index(dishes)
+        if self.similar_index is not None:
+            self.similar_index.add(dishes)
+        ticket = self.bulk_indexer.submit(
+            [(dish.dish_id, self._dish_to_document(dish)) for dish in dishes]
+        )
+        # Cached copies are only stale once the new document is searchable
+        if reindex:
+            dish_ids = [dish.dish_id for dish in dishes]
+            ticket.add_done_callback(lambda errors: self._invalidate_dishes(dish_ids))
+        else:
+            ticket.add_done_callback(lambda errors: self.search_cache.invalidate())
+        return ticket
+    
+    def _publish_menu_processed(self, menu_id: str, dish_count: int):
+        """Record a menu processed event; the outbox publishes it later."""
+        if self.event_outbox is not None:
+            self.event_outbox.append(json.dumps({
+                'menu_id': menu_id,
+                'dish_count': dish_count,
+                'timestamp': int(time.time())
+            }).encode('utf-8'))
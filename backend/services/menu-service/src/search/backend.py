@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import threading
+from typing import Dict, List, Optional
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+from scanner_common.metrics import Histogram
+from search.pagination import SearchCursor
+
+MAX_SUGGESTIONS = 3
+SIMILAR_DISHES = 5
+PRICE_HISTOGRAM_INTERVAL = float(os.getenv('SEARCH_PRICE_INTERVAL', 5))
+
+
+def suggested_queries(query: str, entries: List[dict]) -> List[str]:
+    """Rewrite the query with per-term corrections, best first.
+
+    ``entries`` has the shape of an Elasticsearch term suggester result: one
+    ``{'text': term, 'options': [{'text': correction}, ...]}`` per query term.
+    """
+    if not any(entry['options'] for entry in entries):
+        return []
+    suggestions = []
+    for rank in range(MAX_SUGGESTIONS):
+        words = []
+        for entry in entries:
+            options = entry['options']
+            if not options:
+                words.append(entry['text'])
+            else:
+                words.append(options[min(rank, len(options) - 1)]['text'])
+        suggestion = ' '.join(words)
+        if suggestion != query.lower() and suggestion not in suggestions:
+            suggestions.append(suggestion)
+    return suggestions
+
+
+class SearchBackend:
+    """Base class for engines that answer SearchDishes and similar-dish lookups.
+
+    Subclasses implement _search(), _similar_batch() and, if they keep
+    their own index, index() and remove(); search() and similar_batch()
+    add latency accounting.
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        self.latency = Histogram(
+            f'search_{self.name}_latency_ms',
+            f'Latency of the {self.name} search backend'
+        )
+        self._lock = threading.Lock()
+        self._stats = {'searches': 0, 'similar': 0}
+
+    def search(
+        self,
+        request: menu_pb2.SearchRequest,
+        cursor: Optional[SearchCursor] = None
+    ) -> menu_pb2.SearchResponse:
+        """Run a search; raises ValueError for an invalid request."""
+        start = time.perf_counter()
+        try:
+            return self._search(request, cursor)
+        finally:
+            self._count('searches')
+            self.latency.observe((time.perf_counter() - start) * 1000)
+
+    def similar(self, dish_id: str, dish: menu_pb2.Dish) -> List[menu_pb2.Dish]:
+        """Dishes similar to one dish, excluding itself."""
+        return self.similar_batch({dish_id: dish}).get(dish_id, [])
+
+    def similar_batch(self, dishes: Dict[str, menu_pb2.Dish]) -> Dict[str, List[menu_pb2.Dish]]:
+        """Similar dishes for each dish ID in ``dishes``."""
+        self._count('similar', len(dishes))
+        return self._similar_batch(dishes)
+
+    def index(self, dishes: List[menu_pb2.Dish]):
+        """Add or replace dishes. Backends fed by the bulk indexer ignore this."""
+
+    def remove(self, dish_ids: List[str]):
+        """Remove dishes from the index."""
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['latency_p50_ms'] = self.latency.percentile(50)
+        stats['latency_p99_ms'] = self.latency.percentile(99)
+        return {self.name: stats}
+
+    def close(self):
+        pass
+
+    def _search(self, request: menu_pb2.SearchRequest, cursor: Optional[SearchCursor]) -> menu_pb2.SearchResponse:
+        raise NotImplementedError
+
+    def _similar_batch(self, dishes: Dict[str, menu_pb2.Dish]) -> Dict[str, List[menu_pb2.Dish]]:
+        raise NotImplementedError
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + amount
@@ -0,0 +1,91 @@
+import logging
+from typing import Dict, Iterator, List, Optional
+
+from search.backend import SearchBackend
+from search.pagination import PIT_KEEP_ALIVE, SearchCursor
+
+logger = logging.getLogger(__name__)
+
+
+class ElasticsearchSearchBackend(SearchBackend):
+    """Search served by the Elasticsearch `dishes` index.
+
+    Query bodies and response conversion come from ``queries`` (the menu
+    processor), which the asyncio processor shares for its own client.
+    Writes reach the index through the bulk indexer, so index() is a no-op.
+    """
+
+    name = 'elasticsearch'
+
+    def __init__(self, es_client, queries):
+        super().__init__()
+        self.es_client = es_client
+        self.queries = queries
+
+    def _search(self, request, cursor: Optional[SearchCursor]):
+        if cursor is not None:
+            return self._search_page(request, cursor)
+        # Results, facets and suggestions in one round trip
+        result = self.es_client.msearch(searches=self.queries._search_searches(request))
+        return self.queries._msearch_response(request, result)
+
+    def _search_page(self, request, cursor: SearchCursor):
+        """Read the page after a cursor from its point in time."""
+        if not cursor.pit_id:
+            # Second page: snapshot the index for the rest of the pages
+            cursor.pit_id = self.es_client.open_point_in_time(index='dishes', keep_alive=PIT_KEEP_ALIVE)['id']
+        result = self.es_client.search(body=self.queries._search_body(request, cursor))
+        response = self.queries._search_response(request, result, cursor)
+        if not response.next_cursor:
+            try:
+                self.es_client.close_point_in_time(id=result.get('pit_id', cursor.pit_id))
+            except Exception as e:
+                logger.warning(f"Failed to close point in time: {e}")
+        return response
+
+    def similar(self, dish_id: str, dish) -> List:
+        self._count('similar')
+        try:
+            result = self.es_client.search(index='dishes', body=self.queries._similar_body(dish.name))
+            return self.queries._similar_from_result(dish_id, result)
+        except Exception as e:
+            logger.error(f"Error finding similar dishes: {e}")
+            return []
+
+    def _similar_batch(self, dishes: Dict) -> Dict[str, List]:
+        """One msearch for the whole batch."""
+        try:
+            result = self.es_client.msearch(searches=self.queries._similar_searches(list(dishes.values())))
+            return self.queries._similar_from_msearch(list(dishes), result)
+        except Exception as e:
+            logger.error(f"Error finding similar dishes: {e}")
+            return {}
+
+
+def scan_dishes(es_client, queries, batch_size: int = 1000) -> Iterator:
+    """Every dish in the `dishes` index, read in _shard_doc order from a
+    point in time with search_after."""
+    pit_id = es_client.open_point_in_time(index='dishes', keep_alive=PIT_KEEP_ALIVE)['id']
+    search_after = None
+    try:
+        while True:
+            body = {
+                "pit": {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE},
+                "sort": ["_shard_doc"],
+                "size": batch_size
+            }
+            if search_after is not None:
+                body["search_after"] = search_after
+            result = es_client.search(body=body)
+            pit_id = result.get('pit_id', pit_id)
+            hits = result['hits']['hits']
+            for hit in hits:
+                yield queries._dict_to_dish(hit['_source'], hit['_id'])
+            if len(hits) < batch_size:
+                return
+            search_after = hits[-1]['sort']
+    finally:
+        try:
+            es_client.close_point_in_time(id=pit_id)
+        except Exception as e:
+            logger.warning(f"Failed to close point in time: {e}")
@@ -0,0 +1,75 @@
+import os
+import logging
+from typing import Optional
+
+from search.backend import SearchBackend
+from search.elasticsearch_backend import ElasticsearchSearchBackend, scan_dishes
+from search.memory_engine import MemorySearchEngine
+from search.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+
+def search_backend_name() -> str:
+    return os.getenv('SEARCH_BACKEND', 'elasticsearch').lower()
+
+
+def create_memory_engine(es_client=None, queries=None) -> MemorySearchEngine:
+    """Build the in-memory engine from its snapshot, or from the `dishes`
+    index when there is no snapshot and a synchronous client is given."""
+    engine = MemorySearchEngine(os.getenv('SEARCH_MEMORY_PATH', ''))
+    if es_client is not None:
+        load_memory_engine(engine, es_client, queries)
+    return engine
+
+
+def load_memory_engine(engine: MemorySearchEngine, es_client, queries=None) -> bool:
+    """Fill an engine that has no snapshot from the `dishes` index (it
+    serves empty results meanwhile); False if that failed."""
+    if len(engine):
+        return True
+    try:
+        engine.index(list(scan_dishes(es_client, queries)))
+        engine.merge()
+        logger.info(f"Loaded {len(engine)} dishes from Elasticsearch into the memory search engine")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not load dishes from Elasticsearch, starting empty: {e}")
+        return False
+
+
+def create_search_backend(es_client, queries, load: bool = True) -> SearchBackend:
+    """Create the backend named by SEARCH_BACKEND ("elasticsearch" or "memory").
+    With ``load`` false a memory engine is left for load_memory_engine()."""
+    name = search_backend_name()
+    if name == 'memory':
+        return create_memory_engine(es_client if load else None, queries)
+    if name != 'elasticsearch':
+        logger.warning(f"Unknown SEARCH_BACKEND {name!r}, using elasticsearch")
+    return ElasticsearchSearchBackend(es_client, queries)
+
+
+def create_similar_index(es_client=None, queries=None) -> Optional[VectorIndex]:
+    """The vector index for similar dishes when SIMILAR_BACKEND=vector, else
+    None (similar dishes then come from the search backend)."""
+    if os.getenv('SIMILAR_BACKEND', 'search').lower() != 'vector':
+        return None
+    index = VectorIndex(path=os.getenv('SIMILAR_INDEX_PATH', ''))
+    if es_client is not None:
+        load_similar_index(index, es_client, queries)
+    return index
+
+
+def load_similar_index(index: VectorIndex, es_client, queries=None) -> bool:
+    """Fill an index that has no snapshot from the `dishes` index; False if that failed."""
+    if len(index):
+        return True
+    try:
+        index.add(list(scan_dishes(es_client, queries)))
+        if len(index):
+            index.rebuild()
+        logger.info(f"Loaded {len(index)} dishes from Elasticsearch into the similar-dish index")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not load dishes from Elasticsearch, starting empty: {e}")
+        return False
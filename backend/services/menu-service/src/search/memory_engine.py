@@ -0,0 +1,595 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import shutil
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+from search.backend import PRICE_HISTOGRAM_INTERVAL, SIMILAR_DISHES, SearchBackend, suggested_queries
+from search.pagination import DEFAULT_PAGE_SIZE, SearchCursor, request_digest
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Same fields and boosts as the Elasticsearch multi_match query
+FIELDS = (('name', 3.0), ('description', 2.0), ('ingredients', 1.0))
+SIMILAR_FIELDS = (('name', 1.0), ('description', 1.0))
+FIELD_INDEX = {field: i for i, (field, _) in enumerate(FIELDS)}
+
+# Elasticsearch BM25 defaults
+K1 = 1.2
+B = 0.75
+
+CATEGORY_FACETS = 20
+SNAPSHOT_VERSION = 1
+INITIAL_CAPACITY = 1024
+
+
+def analyze(text: str) -> List[str]:
+    """Lowercase word tokens, like the standard analyzer."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def field_tokens(dish: menu_pb2.Dish, field: str) -> List[str]:
+    if field == 'ingredients':
+        return [token for ingredient in dish.ingredients for token in analyze(ingredient)]
+    return analyze(getattr(dish, field))
+
+
+def edit_distance(a: str, b: str, limit: int = 2) -> int:
+    """Levenshtein distance, giving up once it exceeds ``limit``."""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class Postings:
+    """Term -> (doc numbers, term frequencies) for one field.
+
+    Merged postings are CSR arrays: the docs and tfs of term ``t`` are
+    ``docs[offsets[t]:offsets[t + 1]]``, sorted by doc number. They can be
+    memory-mapped from a snapshot. Documents indexed since the last merge
+    go to small per-term lists instead, so an update never copies arrays.
+    """
+
+    def __init__(self, terms: Optional[Dict[str, int]] = None, offsets=None, docs=None, tfs=None):
+        self.terms = terms if terms is not None else {}
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self.docs = docs if docs is not None else np.empty(0, dtype=np.int32)
+        self.tfs = tfs if tfs is not None else np.empty(0, dtype=np.uint16)
+        self.delta: Dict[str, Tuple[List[int], List[int]]] = {}
+
+    def add(self, doc: int, tokens: List[str]):
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            entry = self.delta.get(term)
+            if entry is None:
+                entry = self.delta[term] = ([], [])
+            entry[0].append(doc)
+            entry[1].append(tf)
+
+    def get(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        docs = self.docs[:0]
+        tfs = self.tfs[:0]
+        i = self.terms.get(term)
+        if i is not None:
+            start, end = self.offsets[i], self.offsets[i + 1]
+            docs, tfs = self.docs[start:end], self.tfs[start:end]
+        entry = self.delta.get(term)
+        if entry:
+            docs = np.concatenate([docs, np.asarray(entry[0], dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.asarray(entry[1], dtype=np.uint16)])
+        return docs, tfs
+
+    def vocabulary(self) -> List[str]:
+        return list(self.terms) + [term for term in self.delta if term not in self.terms]
+
+    def merge(self, remap: np.ndarray) -> 'Postings':
+        """Fold the delta into new CSR arrays, renumbering docs through
+        ``remap`` (old doc number -> new, or -1 for a deleted doc)."""
+        terms = dict(self.terms)
+        term_ids = [np.repeat(np.arange(len(self.terms), dtype=np.int64), np.diff(self.offsets))]
+        docs = [np.asarray(self.docs, dtype=np.int32)]
+        tfs = [np.asarray(self.tfs, dtype=np.uint16)]
+        for term, (delta_docs, delta_tfs) in self.delta.items():
+            term_id = terms.setdefault(term, len(terms))
+            term_ids.append(np.full(len(delta_docs), term_id, dtype=np.int64))
+            docs.append(np.asarray(delta_docs, dtype=np.int32))
+            tfs.append(np.asarray(delta_tfs, dtype=np.uint16))
+
+        term_ids = np.concatenate(term_ids)
+        docs = remap[np.concatenate(docs)]
+        tfs = np.concatenate(tfs)
+        keep = docs >= 0
+        term_ids, docs, tfs = term_ids[keep], docs[keep], tfs[keep]
+        order = np.lexsort((docs, term_ids))
+
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=offsets[1:])
+        return Postings(terms, offsets, docs[order].astype(np.int32), tfs[order])
+
+    def nbytes(self) -> int:
+        delta = sum(len(docs) for docs, _ in self.delta.values()) * 16
+        return int(self.offsets.nbytes + self.docs.nbytes + self.tfs.nbytes + delta)
+
+
+class MemorySearchEngine(SearchBackend):
+    """In-process BM25 search over NumPy postings, a drop-in for Elasticsearch.
+
+    Scores follow the `dishes` query: a best_fields multi_match over
+    ``name^3, description^2, ingredients`` with Elasticsearch's BM25
+    parameters, filters that do not score, and the category and price
+    facets. Documents are numbered in insertion order; deletes set a
+    tombstone and updates delete then re-add. Once the unmerged tail grows
+    past ``merge_docs`` the postings are rebuilt without the dead docs.
+
+    With a ``path`` the engine loads a snapshot from it at start (postings
+    and stored dishes stay memory-mapped) and writes one on close().
+    """
+
+    name = 'memory'
+
+    def __init__(self, path: str = '', merge_docs: Optional[int] = None):
+        super().__init__()
+        self.path = path
+        self.merge_docs = merge_docs or int(os.getenv('SEARCH_MEMORY_MERGE_DOCS', 50000))
+        self._index_lock = threading.RLock()
+        self._reset()
+        if path and os.path.exists(os.path.join(path, 'meta.json')):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def _reset(self):
+        self.postings = {field: Postings() for field, _ in FIELDS}
+        self.dish_ids: List[str] = []
+        self.doc_numbers: Dict[str, int] = {}
+        self.categories: List[str] = []
+        self.category_numbers: Dict[str, int] = {}
+        self.currencies: List[str] = []
+        self.currency_numbers: Dict[str, int] = {}
+
+        self.lengths = np.zeros((len(FIELDS), INITIAL_CAPACITY), dtype=np.uint16)
+        self.category = np.full(INITIAL_CAPACITY, -1, dtype=np.int32)
+        self.currency = np.full(INITIAL_CAPACITY, -1, dtype=np.int32)
+        self.price = np.full(INITIAL_CAPACITY, np.nan, dtype=np.float32)
+        self.live = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._length_sums = np.zeros(len(FIELDS), dtype=np.float64)
+        self._live_count = 0
+
+        # Serialized Dish messages: merged docs in one blob, newer in a list
+        self.payload = np.empty(0, dtype=np.uint8)
+        self.payload_offsets = np.zeros(1, dtype=np.int64)
+        self.delta_payloads: List[bytes] = []
+        self._merged_docs = 0
+        self._name_terms: Optional[Dict[str, List[str]]] = None
+
+    # Writes
+
+    def index(self, dishes: List[menu_pb2.Dish]):
+        with self._index_lock:
+            for dish in dishes:
+                doc = self.doc_numbers.get(dish.dish_id)
+                if doc is not None:
+                    self._delete(doc)
+                self._append(dish)
+            self._name_terms = None
+            if len(self.dish_ids) - self._merged_docs >= self.merge_docs:
+                self.merge()
+
+    def remove(self, dish_ids: List[str]):
+        with self._index_lock:
+            for dish_id in dish_ids:
+                doc = self.doc_numbers.pop(dish_id, None)
+                if doc is not None:
+                    self._delete(doc)
+
+    def _append(self, dish: menu_pb2.Dish):
+        doc = len(self.dish_ids)
+        if doc == len(self.live):
+            self._grow(doc * 2)
+        self.dish_ids.append(dish.dish_id)
+        self.doc_numbers[dish.dish_id] = doc
+
+        for i, (field, _) in enumerate(FIELDS):
+            tokens = field_tokens(dish, field)
+            self.postings[field].add(doc, tokens)
+            self.lengths[i, doc] = min(len(tokens), 65535)
+        self._length_sums += self.lengths[:, doc]
+
+        self.category[doc] = self._number(dish.category, self.categories, self.category_numbers)
+        if dish.HasField('price'):
+            self.price[doc] = dish.price.amount
+            self.currency[doc] = self._number(dish.price.currency.lower(), self.currencies, self.currency_numbers)
+        self.live[doc] = True
+        self._live_count += 1
+        self.delta_payloads.append(dish.SerializeToString())
+
+    def _delete(self, doc: int):
+        if self.live[doc]:
+            self.live[doc] = False
+            self._live_count -= 1
+            self._length_sums -= self.lengths[:, doc]
+
+    def _grow(self, capacity: int):
+        self.lengths = self._compact(self.lengths, capacity, 0)
+        self.category = self._compact(self.category, capacity, -1)
+        self.currency = self._compact(self.currency, capacity, -1)
+        self.price = self._compact(self.price, capacity, np.nan)
+        self.live = self._compact(self.live, capacity, False)
+
+    def _number(self, value: str, values: List[str], numbers: Dict[str, int]) -> int:
+        number = numbers.get(value)
+        if number is None:
+            number = numbers[value] = len(values)
+            values.append(value)
+        return number
+
+    def merge(self):
+        """Rebuild the postings and payload blob from the live documents."""
+        with self._index_lock:
+            count = len(self.dish_ids)
+            live = self.live[:count].copy()
+            remap = np.full(count, -1, dtype=np.int32)
+            remap[live] = np.arange(int(live.sum()), dtype=np.int32)
+            self.postings = {field: postings.merge(remap) for field, postings in self.postings.items()}
+
+            blobs = []
+            for doc in np.flatnonzero(live):
+                blobs.append(self._payload(int(doc)))
+            sizes = np.fromiter((len(blob) for blob in blobs), dtype=np.int64, count=len(blobs))
+            self.payload_offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+            np.cumsum(sizes, out=self.payload_offsets[1:])
+            self.payload = np.frombuffer(b''.join(blobs), dtype=np.uint8)
+            self.delta_payloads = []
+
+            capacity = max(INITIAL_CAPACITY, len(blobs) * 2)
+            self.lengths = self._compact(self.lengths[:, :count][:, live], capacity, 0)
+            self.category = self._compact(self.category[:count][live], capacity, -1)
+            self.currency = self._compact(self.currency[:count][live], capacity, -1)
+            self.price = self._compact(self.price[:count][live], capacity, np.nan)
+            self.live = self._compact(self.live[:count][live], capacity, False)
+
+            self.dish_ids = [dish_id for dish_id, alive in zip(self.dish_ids, live) if alive]
+            self.doc_numbers = {dish_id: doc for doc, dish_id in enumerate(self.dish_ids)}
+            self._merged_docs = len(self.dish_ids)
+            self._name_terms = None
+
+    def _compact(self, array: np.ndarray, capacity: int, fill) -> np.ndarray:
+        """Copy of ``array`` padded with ``fill`` to ``capacity`` columns."""
+        new = np.full(array.shape[:-1] + (capacity,), fill, dtype=array.dtype)
+        new[..., :array.shape[-1]] = array
+        return new
+
+    # Snapshots
+
+    def save(self, path: Optional[str] = None):
+        """Write a snapshot directory, replacing any previous one atomically."""
+        path = path or self.path
+        with self._index_lock:
+            self.merge()
+            tmp_path = f"{path}.tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            count = len(self.dish_ids)
+            arrays = {
+                'lengths': self.lengths[:, :count],
+                'category': self.category[:count],
+                'currency': self.currency[:count],
+                'price': self.price[:count],
+                'payload': self.payload,
+                'payload_offsets': self.payload_offsets
+            }
+            for field, postings in self.postings.items():
+                arrays[f'{field}.offsets'] = postings.offsets
+                arrays[f'{field}.docs'] = postings.docs
+                arrays[f'{field}.tfs'] = postings.tfs
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(array))
+            meta = {
+                'version': SNAPSHOT_VERSION,
+                'dish_ids': self.dish_ids,
+                'categories': self.categories,
+                'currencies': self.currencies,
+                'terms': {field: list(postings.terms) for field, postings in self.postings.items()}
+            }
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+
+            old_path = f"{path}.old"
+            shutil.rmtree(old_path, ignore_errors=True)
+            if os.path.exists(path):
+                os.rename(path, old_path)
+            os.rename(tmp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+        logger.info(f"Saved search snapshot of {count} dishes to {path}")
+
+    def load(self, path: str):
+        """Replace the index with a snapshot; postings and payloads are memory-mapped."""
+        start = time.perf_counter()
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported search snapshot version {meta.get('version')}")
+
+        def mapped(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+        with self._index_lock:
+            self._reset()
+            for field, _ in FIELDS:
+                terms = {term: i for i, term in enumerate(meta['terms'][field])}
+                self.postings[field] = Postings(
+                    terms, mapped(f'{field}.offsets'), mapped(f'{field}.docs'), mapped(f'{field}.tfs')
+                )
+            self.payload = mapped('payload')
+            self.payload_offsets = mapped('payload_offsets')
+
+            self.dish_ids = meta['dish_ids']
+            self.doc_numbers = {dish_id: doc for doc, dish_id in enumerate(self.dish_ids)}
+            self.categories = meta['categories']
+            self.category_numbers = {value: i for i, value in enumerate(self.categories)}
+            self.currencies = meta['currencies']
+            self.currency_numbers = {value: i for i, value in enumerate(self.currencies)}
+
+            count = len(self.dish_ids)
+            capacity = max(INITIAL_CAPACITY, count * 2)
+            self.lengths = self._compact(np.load(os.path.join(path, 'lengths.npy')), capacity, 0)
+            self.category = self._compact(np.load(os.path.join(path, 'category.npy')), capacity, -1)
+            self.currency = self._compact(np.load(os.path.join(path, 'currency.npy')), capacity, -1)
+            self.price = self._compact(np.load(os.path.join(path, 'price.npy')), capacity, np.nan)
+            self.live = self._compact(np.ones(count, dtype=bool), capacity, False)
+            self._length_sums = self.lengths[:, :count].sum(axis=1, dtype=np.float64)
+            self._live_count = count
+            self._merged_docs = count
+        logger.info(f"Loaded search snapshot of {count} dishes in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def close(self):
+        if self.path:
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"Failed to save search snapshot: {e}")
+
+    # Queries
+
+    def _search(self, request: menu_pb2.SearchRequest, cursor: Optional[SearchCursor]) -> menu_pb2.SearchResponse:
+        start = time.perf_counter()
+        terms = list(dict.fromkeys(analyze(request.query)))
+        limit = request.limit or DEFAULT_PAGE_SIZE
+        if cursor is not None:
+            page, offset = cursor.page, cursor.offset
+        else:
+            page = (request.offset // request.limit) + 1 if request.limit else 1
+            offset = request.offset
+
+        with self._index_lock:
+            docs, scores = self._score(terms, FIELDS, best_field=True)
+            keep = self._filter(request, docs)
+            docs, scores = docs[keep], scores[keep]
+            top = self._top(docs, scores, offset + limit)[offset:]
+            dishes = [self._dish(int(doc)) for doc in top]
+
+            metadata = menu_pb2.SearchMetadata()
+            if cursor is None:
+                self._facets(docs, metadata)
+                metadata.suggested_queries.extend(self._suggestions(request.query, terms))
+
+        total = len(docs)
+        next_cursor = ''
+        if dishes and offset + len(dishes) < total:
+            next_cursor = SearchCursor(
+                digest=request_digest(request, include_offset=False),
+                page=page + 1,
+                offset=offset + len(dishes)
+            ).encode()
+        metadata.search_time_ms = int((time.perf_counter() - start) * 1000)
+        return menu_pb2.SearchResponse(
+            dishes=dishes,
+            total_results=total,
+            page=page,
+            next_cursor=next_cursor,
+            metadata=metadata
+        )
+
+    def _similar_batch(self, dishes: Dict[str, menu_pb2.Dish]) -> Dict[str, List[menu_pb2.Dish]]:
+        similar = {}
+        with self._index_lock:
+            for dish_id, dish in dishes.items():
+                terms = list(dict.fromkeys(analyze(dish.name)))[:12]
+                docs, scores = self._score(terms, SIMILAR_FIELDS, best_field=False)
+                top = self._top(docs, scores, SIMILAR_DISHES)
+                similar[dish_id] = [
+                    self._dish(int(doc)) for doc in top if self.dish_ids[doc] != dish_id
+                ]
+        return similar
+
+    def _score(self, terms: List[str], fields, best_field: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 over the matching live docs: summed over terms within a field,
+        then the best boosted field (best_fields) or the sum of fields."""
+        if not terms or not self._live_count:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        doc_parts, score_parts, field_parts = [], [], []
+        for field, boost in fields:
+            i = FIELD_INDEX[field]
+            postings = self.postings[field]
+            avg_length = max(self._length_sums[i] / self._live_count, 1e-9)
+            for term in terms:
+                docs, tfs = postings.get(term)
+                if not len(docs):
+                    continue
+                frequency = len(docs)
+                idf = math.log(1 + (self._live_count - frequency + 0.5) / (frequency + 0.5))
+                tf = tfs.astype(np.float32)
+                norm = K1 * (1 - B + B * self.lengths[i, docs] / avg_length)
+                doc_parts.append(docs)
+                score_parts.append(boost * idf * tf / (tf + norm))
+                field_parts.append(np.full(len(docs), i, dtype=np.int8))
+        if not doc_parts:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.concatenate(score_parts)
+        if best_field:
+            fields_of = np.concatenate(field_parts)
+            per_field = np.zeros((len(FIELDS), len(docs)), dtype=np.float64)
+            for i in np.unique(fields_of):
+                mask = fields_of == i
+                per_field[i] = np.bincount(inverse[mask], weights=scores[mask], minlength=len(docs))
+            combined = per_field.max(axis=0)
+        else:
+            combined = np.bincount(inverse, weights=scores, minlength=len(docs))
+        alive = self.live[docs]
+        return docs[alive].astype(np.int32), combined[alive].astype(np.float32)
+
+    def _filter(self, request: menu_pb2.SearchRequest, docs: np.ndarray) -> np.ndarray:
+        """Mask of ``docs`` passing the request filters; raises ValueError
+        for a filter that is not "field:value"."""
+        keep = np.ones(len(docs), dtype=bool)
+        if request.categories:
+            numbers = [self.category_numbers[c] for c in request.categories if c in self.category_numbers]
+            keep &= np.isin(self.category[docs], numbers)
+
+        if request.HasField('price_range'):
+            price_range = request.price_range
+            prices = self.price[docs]
+            if price_range.min > 0:
+                keep &= prices >= price_range.min
+            if price_range.max > 0:
+                keep &= prices <= price_range.max
+            if price_range.currency:
+                keep &= self._currency_mask(price_range.currency, docs)
+
+        for search_filter in request.filters:
+            field, _, value = search_filter.partition(':')
+            field, value = field.strip(), value.strip()
+            if not field or not value:
+                raise ValueError(f"Invalid filter {search_filter!r}, expected field:value")
+            if field in self.postings:
+                for token in analyze(value):
+                    keep &= np.isin(docs, self.postings[field].get(token)[0])
+            elif field == 'category':
+                numbers = [n for c, n in self.category_numbers.items() if set(analyze(value)) <= set(analyze(c))]
+                keep &= np.isin(self.category[docs], numbers)
+            elif field == 'price.currency':
+                keep &= self._currency_mask(value, docs)
+            else:
+                # Unknown fields match nothing, as with an unmapped field
+                keep[:] = False
+        return keep
+
+    def _currency_mask(self, currency: str, docs: np.ndarray) -> np.ndarray:
+        number = self.currency_numbers.get(currency.lower(), -2)
+        return self.currency[docs] == number
+
+    def _top(self, docs: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+        """The ``k`` best docs by score, ties in index order."""
+        if k <= 0 or not len(docs):
+            return docs[:0]
+        if k < len(docs):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+            # Pull in docs tied with the cut-off so the tiebreak is stable
+            cutoff = scores[candidates].min()
+            candidates = np.flatnonzero(scores >= cutoff)
+        else:
+            candidates = np.arange(len(docs))
+        order = candidates[np.lexsort((docs[candidates], -scores[candidates]))]
+        return docs[order[:k]]
+
+    def _facets(self, docs: np.ndarray, metadata: menu_pb2.SearchMetadata):
+        categories = self.category[docs]
+        categories = categories[categories >= 0]
+        if len(categories):
+            counts = np.bincount(categories, minlength=len(self.categories))
+            for number in np.argsort(-counts, kind='stable')[:CATEGORY_FACETS]:
+                if counts[number]:
+                    metadata.category_counts[self.categories[number]] = int(counts[number])
+
+        prices = self.price[docs]
+        prices = prices[~np.isnan(prices)]
+        if len(prices):
+            keys, counts = np.unique(np.floor(prices / PRICE_HISTOGRAM_INTERVAL) * PRICE_HISTOGRAM_INTERVAL, return_counts=True)
+            for key, count in zip(keys, counts):
+                metadata.price_histogram.append(menu_pb2.PriceBucket(
+                    min=float(key),
+                    max=float(key) + PRICE_HISTOGRAM_INTERVAL,
+                    count=int(count)
+                ))
+
+    def _suggestions(self, query: str, terms: List[str]) -> List[str]:
+        """Term-suggester style corrections from the name vocabulary."""
+        postings = self.postings['name']
+        if self._name_terms is None:
+            by_initial: Dict[str, List[str]] = {}
+            for term in postings.vocabulary():
+                by_initial.setdefault(term[0], []).append(term)
+            self._name_terms = by_initial
+
+        entries = []
+        for term in terms:
+            options = []
+            if not len(postings.get(term)[0]):
+                for candidate in self._name_terms.get(term[0], []):
+                    if abs(len(candidate) - len(term)) > 2:
+                        continue
+                    distance = edit_distance(term, candidate)
+                    if distance <= 2:
+                        frequency = len(postings.get(candidate)[0])
+                        if frequency:
+                            options.append((distance, -frequency, candidate))
+            entries.append({'text': term, 'options': [{'text': text} for _, _, text in sorted(options)[:5]]})
+        return suggested_queries(query, entries)
+
+    def _dish(self, doc: int) -> menu_pb2.Dish:
+        dish = menu_pb2.Dish()
+        dish.ParseFromString(self._payload(doc))
+        return dish
+
+    def _payload(self, doc: int) -> bytes:
+        if doc < self._merged_docs:
+            return self.payload[self.payload_offsets[doc]:self.payload_offsets[doc + 1]].tobytes()
+        return self.delta_payloads[doc - self._merged_docs]
+
+    # Introspection
+
+    def nbytes(self) -> int:
+        """Bytes held by the index arrays, stored dishes and id tables."""
+        count = len(self.dish_ids)
+        arrays = sum(postings.nbytes() for postings in self.postings.values())
+        arrays += self.lengths.nbytes + self.category.nbytes + self.currency.nbytes
+        arrays += self.price.nbytes + self.live.nbytes
+        arrays += self.payload.nbytes + self.payload_offsets.nbytes
+        arrays += sum(len(blob) for blob in self.delta_payloads)
+        # Rough per-entry cost of the dish ID list and lookup dict
+        return int(arrays + count * 150)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._index_lock:
+            stats[self.name].update({
+                'documents': self._live_count,
+                'deleted': len(self.dish_ids) - self._live_count,
+                'unmerged': len(self.dish_ids) - self._merged_docs,
+                'bytes': self.nbytes()
+            })
+        return stats
@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import base64
+import hashlib
+from typing import Any, List, Optional
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+
+DEFAULT_PAGE_SIZE = 20
+PIT_KEEP_ALIVE = os.getenv('SEARCH_PIT_KEEP_ALIVE', '1m')
+
+
+def normalized_request(request: menu_pb2.SearchRequest) -> menu_pb2.SearchRequest:
+    """Copy of a SearchRequest with the spelling differences that do not
+    change results removed (query case and spacing, list order, default limit)."""
+    normalized = menu_pb2.SearchRequest()
+    normalized.CopyFrom(request)
+    normalized.query = ' '.join(request.query.lower().split())
+    normalized.ClearField('categories')
+    normalized.categories.extend(sorted(set(request.categories)))
+    normalized.ClearField('filters')
+    normalized.filters.extend(sorted(set(request.filters)))
+    normalized.limit = request.limit or DEFAULT_PAGE_SIZE
+    normalized.ClearField('cursor')
+    return normalized
+
+
+def request_digest(request: menu_pb2.SearchRequest, include_offset: bool = True) -> str:
+    normalized = normalized_request(request)
+    if not include_offset:
+        normalized.ClearField('offset')
+    return hashlib.sha256(normalized.SerializeToString(deterministic=True)).hexdigest()[:24]
+
+
+class SearchCursor:
+    """Position in a result set, handed to clients as an opaque string.
+
+    The first page is a plain search. Following its cursor opens a point in
+    time (PIT) so later pages see one snapshot of the index; from then on
+    each page starts after the sort values of the previous page's last hit,
+    so page 100 costs the same as page 2.
+    """
+
+    __slots__ = ('digest', 'page', 'offset', 'pit_id', 'search_after')
+
+    def __init__(
+        self,
+        digest: str,
+        page: int,
+        offset: int,
+        pit_id: str = '',
+        search_after: Optional[List[Any]] = None
+    ):
+        self.digest = digest
+        self.page = page
+        self.offset = offset
+        self.pit_id = pit_id
+        self.search_after = search_after
+
+    def encode(self) -> str:
+        data = {'d': self.digest, 'p': self.page, 'o': self.offset}
+        if self.pit_id:
+            data['pit'] = self.pit_id
+        if self.search_after is not None:
+            data['after'] = self.search_after
+        raw = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @classmethod
+    def decode(cls, text: str, request: menu_pb2.SearchRequest) -> 'SearchCursor':
+        """Parse a cursor; raises ValueError if it is malformed or was issued
+        for a different query."""
+        try:
+            raw = base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+            data = json.loads(raw)
+            cursor = cls(data['d'], int(data['p']), int(data['o']), data.get('pit', ''), data.get('after'))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid search cursor: {e}")
+        if cursor.digest != request_digest(request, include_offset=False):
+            raise ValueError("Search cursor does not belong to this query")
+        return cursor
@@ -0,0 +1,403 @@
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Add proto_gen to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'proto_gen'))
+
+import menu_pb2
+from scanner_common.metrics import Histogram
+from search.backend import SIMILAR_DISHES
+from search.memory_engine import analyze
+
+logger = logging.getLogger(__name__)
+
+# Weight of each field in a dish vector
+VECTOR_FIELDS = (('name', 1.0), ('description', 0.5))
+VECTORIZE_BATCH = 20000
+SNAPSHOT_VERSION = 1
+INITIAL_CAPACITY = 1024
+SIMILAR_LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100)
+
+
+class DishVectorizer:
+    """Hashed character-trigram TF-IDF vectors, L2-normalized.
+
+    Text is lowercased and tokenized like the search index, padded with
+    spaces so word boundaries form their own trigrams, and hashed over its
+    UTF-8 bytes into ``dim`` buckets. Term frequencies are sublinear
+    (1 + log tf). Document frequencies are kept per bucket and grow with
+    every fit, so a vector is weighted by the IDF at the time it was added.
+    """
+
+    def __init__(self, dim: int):
+        if dim & (dim - 1):
+            raise ValueError(f"Vector dimension must be a power of two, got {dim}")
+        self.dim = dim
+        self.shift = 64 - int(math.log2(dim))
+        self.doc_freq = np.zeros(dim, dtype=np.int64)
+        self.doc_count = 0
+
+    def fit_transform(self, dishes: List[menu_pb2.Dish]) -> np.ndarray:
+        """Vectors for new dishes, counting them in the document frequencies."""
+        return self._transform(dishes, fit=True)
+
+    def transform(self, dishes: List[menu_pb2.Dish]) -> np.ndarray:
+        return self._transform(dishes, fit=False)
+
+    def _transform(self, dishes: List[menu_pb2.Dish], fit: bool) -> np.ndarray:
+        vectors = np.zeros((len(dishes), self.dim), dtype=np.float32)
+        for start in range(0, len(dishes), VECTORIZE_BATCH):
+            batch = dishes[start:start + VECTORIZE_BATCH]
+            counts = [self._counts([getattr(dish, field) for dish in batch]) for field, _ in VECTOR_FIELDS]
+            if fit:
+                present = np.zeros((len(batch), self.dim), dtype=bool)
+                for field_counts in counts:
+                    present |= field_counts > 0
+                self.doc_freq += present.sum(axis=0)
+                self.doc_count += len(batch)
+            idf = np.log((1 + self.doc_count) / (1 + self.doc_freq)) + 1
+            block = vectors[start:start + len(batch)]
+            for (_, weight), field_counts in zip(VECTOR_FIELDS, counts):
+                tf = np.zeros_like(field_counts, dtype=np.float32)
+                np.log(field_counts, out=tf, where=field_counts > 0)
+                tf[field_counts > 0] += 1
+                block += weight * tf * idf.astype(np.float32)
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            np.divide(block, norms, out=block, where=norms > 0)
+        return vectors
+
+    def _counts(self, texts: List[str]) -> np.ndarray:
+        """Trigram bucket counts, one row per text."""
+        encoded = [f" {' '.join(analyze(text))} ".encode('utf-8') for text in texts]
+        lengths = np.fromiter((len(text) for text in encoded), dtype=np.int64, count=len(encoded))
+        counts = np.zeros(len(texts) * self.dim, dtype=np.float32)
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+        if len(data) >= 3:
+            owner = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+            # Trigrams that start and end inside the same text
+            valid = owner[:-2] == owner[2:]
+            codes = (data[:-2] << np.uint64(16)) | (data[1:-1] << np.uint64(8)) | data[2:]
+            buckets = (codes * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(self.shift)
+            slots = owner[:-2][valid] * self.dim + buckets[valid].astype(np.int64)
+            counts += np.bincount(slots, minlength=len(counts)).astype(np.float32)
+        return counts.reshape(len(texts), self.dim)
+
+
+class VectorIndex:
+    """Approximate nearest-neighbour index of dish vectors (IVF).
+
+    Vectors live in one float32 matrix. After a rebuild its rows are
+    grouped by nearest k-means centroid, so each inverted list is a
+    contiguous slice; dishes added since then sit in an unclustered tail
+    that every query scans. A query scores the centroids, scans up to
+    ``nprobe`` of the closest lists (stopping early once ``max_candidates``
+    rows are queued, since k-means lists are uneven) plus the tail, and
+    keeps the best cosine matches scoring at least ``SIMILAR_MIN_SCORE``.
+    Deletes and updates leave a tombstone until the next rebuild, which
+    runs once the tail reaches ``rebuild_rows`` or a quarter of the
+    clustered rows, and retrains the centroids when the index has doubled
+    since they were trained.
+
+    With a ``path`` the index loads a snapshot from it at start and writes
+    one on close().
+    """
+
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        path: str = '',
+        nprobe: Optional[int] = None,
+        max_candidates: Optional[int] = None,
+        rebuild_rows: Optional[int] = None
+    ):
+        self.dim = dim or int(os.getenv('SIMILAR_VECTOR_DIM', 128))
+        self.path = path
+        self.nprobe = nprobe or int(os.getenv('SIMILAR_NPROBE', 16))
+        self.max_candidates = max_candidates or int(os.getenv('SIMILAR_MAX_CANDIDATES', 4096))
+        self.min_score = float(os.getenv('SIMILAR_MIN_SCORE', 0.2))
+        self.rebuild_rows = rebuild_rows or int(os.getenv('SIMILAR_REBUILD_ROWS', 20000))
+        self.latency = Histogram(
+            'similar_vector_latency_ms',
+            'Latency of similar-dish lookups in the vector index',
+            buckets=SIMILAR_LATENCY_BUCKETS_MS
+        )
+        self._lock = threading.RLock()
+        self._stats = {'lookups': 0, 'rebuilds': 0}
+        self._reset()
+        if path and os.path.exists(os.path.join(path, 'meta.json')):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def _reset(self):
+        self.vectorizer = DishVectorizer(self.dim)
+        self.matrix = np.zeros((INITIAL_CAPACITY, self.dim), dtype=np.float32)
+        self.live = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self.dish_ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.centroids = np.zeros((0, self.dim), dtype=np.float32)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+        self._clustered = 0
+        self._trained_rows = 0
+        self._live_count = 0
+
+    # Writes
+
+    def add(self, dishes: List[menu_pb2.Dish]):
+        """Add or replace dishes."""
+        if not dishes:
+            return
+        with self._lock:
+            # Under the lock: fitting updates the shared document frequencies
+            vectors = self.vectorizer.fit_transform(dishes)
+            count = len(self.dish_ids)
+            if count + len(dishes) > len(self.live):
+                self._grow(max(2 * len(self.live), count + len(dishes)))
+            for i, dish in enumerate(dishes):
+                old = self.rows.get(dish.dish_id)
+                if old is not None:
+                    self._delete(old)
+                row = len(self.dish_ids)
+                self.dish_ids.append(dish.dish_id)
+                self.rows[dish.dish_id] = row
+                self.matrix[row] = vectors[i]
+                self.live[row] = True
+                self._live_count += 1
+            if len(self.dish_ids) - self._clustered >= max(self.rebuild_rows, self._clustered // 4):
+                self.rebuild()
+
+    def remove(self, dish_ids: List[str]):
+        with self._lock:
+            for dish_id in dish_ids:
+                row = self.rows.pop(dish_id, None)
+                if row is not None:
+                    self._delete(row)
+
+    def _delete(self, row: int):
+        if self.live[row]:
+            self.live[row] = False
+            self._live_count -= 1
+
+    def _grow(self, capacity: int):
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:len(self.matrix)] = self.matrix
+        live = np.zeros(capacity, dtype=bool)
+        live[:len(self.live)] = self.live
+        self.matrix, self.live = matrix, live
+
+    def rebuild(self):
+        """Drop tombstones and regroup every row under its nearest centroid."""
+        with self._lock:
+            start = time.perf_counter()
+            rows = np.flatnonzero(self.live[:len(self.dish_ids)])
+            vectors = self.matrix[rows]
+            if not len(self.centroids) or len(rows) >= 2 * self._trained_rows:
+                self.centroids = self._train(vectors)
+                self._trained_rows = len(rows)
+            assignment = self._assign(vectors)
+            order = np.argsort(assignment, kind='stable')
+
+            capacity = max(INITIAL_CAPACITY, 2 * len(rows))
+            self.matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            self.matrix[:len(rows)] = vectors[order]
+            self.live = np.zeros(capacity, dtype=bool)
+            self.live[:len(rows)] = True
+            self.list_offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assignment, minlength=len(self.centroids)), out=self.list_offsets[1:])
+            self.dish_ids = [self.dish_ids[row] for row in rows[order]]
+            self.rows = {dish_id: row for row, dish_id in enumerate(self.dish_ids)}
+            self._clustered = len(rows)
+            self._stats['rebuilds'] += 1
+        logger.info(
+            f"Rebuilt similar-dish index: {len(rows)} dishes in {len(self.centroids)} lists "
+            f"in {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+
+    def _train(self, vectors: np.ndarray, iterations: int = 8) -> np.ndarray:
+        """Spherical k-means over a sample of the rows, about 2 * sqrt(n) lists."""
+        n_lists = int(os.getenv('SIMILAR_LISTS', 0)) or max(1, int(2 * math.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        if not n_lists:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), 32 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~np.bincount(assignment, minlength=n_lists).astype(bool)
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+        return centroids.astype(np.float32)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if not len(self.centroids):
+            return np.zeros(len(vectors), dtype=np.int64)
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), 65536):
+            block = vectors[start:start + 65536]
+            assignment[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignment
+
+    # Queries
+
+    def similar(self, dish_id: str, dish: Optional[menu_pb2.Dish] = None, k: int = SIMILAR_DISHES) -> List[str]:
+        """IDs of the dishes closest to one dish, excluding itself."""
+        return self.similar_batch({dish_id: dish}, k).get(dish_id, [])
+
+    def similar_batch(self, dishes: Dict[str, Optional[menu_pb2.Dish]], k: int = SIMILAR_DISHES) -> Dict[str, List[str]]:
+        """Similar dish IDs for each dish. Indexed dishes use their stored
+        vector; others are vectorized from the Dish given."""
+        start = time.perf_counter()
+        similar = {}
+        with self._lock:
+            missing = [dish for dish_id, dish in dishes.items() if dish_id not in self.rows and dish is not None]
+            computed = iter(self.vectorizer.transform(missing)) if missing else iter(())
+            for dish_id, dish in dishes.items():
+                row = self.rows.get(dish_id)
+                if row is not None:
+                    query = self.matrix[row]
+                elif dish is not None:
+                    query = next(computed)
+                else:
+                    continue
+                rows, scores = self._nearest(query, k + 1)
+                similar[dish_id] = [
+                    self.dish_ids[row] for row, score in zip(rows, scores)
+                    if score >= self.min_score and self.dish_ids[row] != dish_id
+                ][:k]
+            self._stats['lookups'] += len(dishes)
+        self.latency.observe((time.perf_counter() - start) * 1000)
+        return similar
+
+    def _nearest(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and cosine scores of the approximate top-k for one query vector."""
+        ranges = []
+        if self._clustered:
+            centroid_scores = self.centroids @ query
+            nprobe = min(self.nprobe, len(centroid_scores))
+            probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            probed = probed[np.argsort(-centroid_scores[probed])]
+            # Closest lists first, until the candidate budget is spent
+            sizes = self.list_offsets[probed + 1] - self.list_offsets[probed]
+            within = np.cumsum(sizes) - sizes < self.max_candidates
+            for list_id in probed[within]:
+                ranges.append((self.list_offsets[list_id], self.list_offsets[list_id + 1]))
+        ranges.append((self._clustered, len(self.dish_ids)))
+
+        candidates, scores = [], []
+        for start, end in ranges:
+            if end > start:
+                candidates.append(np.arange(start, end))
+                scores.append(self.matrix[start:end] @ query)
+        if not candidates:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        candidates = np.concatenate(candidates)
+        scores = np.concatenate(scores)
+        if self._live_count < len(self.dish_ids):
+            alive = self.live[candidates]
+            candidates, scores = candidates[alive], scores[alive]
+        return self._top(candidates, scores, k)
+
+    def exact_nearest(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and scores of the exact top-k by brute force, for measuring recall."""
+        with self._lock:
+            count = len(self.dish_ids)
+            scores = self.matrix[:count] @ query
+            scores[~self.live[:count]] = -np.inf
+            return self._top(np.arange(count), scores, k)
+
+    def _top(self, rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if len(rows) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        return rows[order], scores[order]
+
+    # Snapshots
+
+    def save(self, path: Optional[str] = None):
+        """Write a snapshot directory, replacing any previous one atomically."""
+        path = path or self.path
+        with self._lock:
+            self.rebuild()
+            tmp_path = f"{path}.tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            count = len(self.dish_ids)
+            np.save(os.path.join(tmp_path, 'vectors.npy'), self.matrix[:count])
+            np.save(os.path.join(tmp_path, 'centroids.npy'), self.centroids)
+            np.save(os.path.join(tmp_path, 'list_offsets.npy'), self.list_offsets)
+            np.save(os.path.join(tmp_path, 'doc_freq.npy'), self.vectorizer.doc_freq)
+            meta = {
+                'version': SNAPSHOT_VERSION,
+                'dim': self.dim,
+                'doc_count': self.vectorizer.doc_count,
+                'trained_rows': self._trained_rows,
+                'dish_ids': self.dish_ids
+            }
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+
+            old_path = f"{path}.old"
+            shutil.rmtree(old_path, ignore_errors=True)
+            if os.path.exists(path):
+                os.rename(path, old_path)
+            os.rename(tmp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+        logger.info(f"Saved similar-dish index of {count} dishes to {path}")
+
+    def load(self, path: str):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != SNAPSHOT_VERSION or meta.get('dim') != self.dim:
+            raise ValueError(f"Similar-dish snapshot at {path} does not match this index")
+        vectors = np.load(os.path.join(path, 'vectors.npy'))
+        with self._lock:
+            self._reset()
+            self._grow(max(INITIAL_CAPACITY, 2 * len(vectors)))
+            self.matrix[:len(vectors)] = vectors
+            self.live[:len(vectors)] = True
+            self.centroids = np.load(os.path.join(path, 'centroids.npy'))
+            self.list_offsets = np.load(os.path.join(path, 'list_offsets.npy'))
+            self.vectorizer.doc_freq = np.load(os.path.join(path, 'doc_freq.npy'))
+            self.vectorizer.doc_count = meta['doc_count']
+            self.dish_ids = meta['dish_ids']
+            self.rows = {dish_id: row for row, dish_id in enumerate(self.dish_ids)}
+            self._clustered = len(self.dish_ids)
+            self._trained_rows = meta['trained_rows']
+            self._live_count = len(self.dish_ids)
+        logger.info(f"Loaded similar-dish index of {len(vectors)} dishes from {path}")
+
+    def close(self):
+        if self.path:
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"Failed to save similar-dish index: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'dishes': self._live_count,
+                'lists': len(self.centroids),
+                'unclustered': len(self.dish_ids) - self._clustered,
+                'bytes': int(self.matrix.nbytes + self.centroids.nbytes)
+            })
+        stats['latency_p50_ms'] = self.latency.percentile(50)
+        stats['latency_p99_ms'] = self.latency.percentile(99)
+        return stats
+
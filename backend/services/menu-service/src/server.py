@@ -1,5 +1,8 @@
 import os
 import sys
+import signal
+import asyncio
+import argparse
 import logging
 from concurrent import futures
 import grpc
@@ -9,6 +12,12 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto_gen'))
 
 import menu_pb2
 import menu_pb2_grpc
+from fetch.fetcher import ImageFetchError
+from health import add_health_servicer
+from instrumentation import start_metrics_server, track_rpc
+from jobs.queue import QueueFull
+from scanner_common.metrics import REGISTRY
+from processors.base import GET_DISHES_MAX_IDS
 from processors.menu_processor import MenuProcessor
 
 logging.basicConfig(
@@ -21,30 +30,73 @@ logger = logging.getLogger(__name__)
 class MenuServiceServicer(menu_pb2_grpc.MenuServiceServicer):
     """Implements the MenuService gRPC service."""
     
-    def __init__(self):
-        self.processor = MenuProcessor()
+    def __init__(self, processor=None):
+        self.processor = processor or MenuProcessor()
+        self.health = None
         logger.info("MenuService initialized")
     
+    @track_rpc
     def ProcessMenuImage(self, request, context):
         """Process a menu image and extract dishes."""
         try:
             logger.info(f"Processing menu image, format: {request.format}")
             
+            # Queue it and answer at once; the client polls GetMenuStatus
+            if request.options.async_processing:
+                return self.processor.submit_menu(
+                    image_data=request.image_data,
+                    image_url=request.image_url,
+                    options=request.options
+                )
+            
             # Process the image
             result = self.processor.process_menu(
                 image_data=request.image_data,
                 image_url=request.image_url,
-                options=request.options
+                options=request.options,
+                timeout=context.time_remaining()
             )
             
             return result
             
+        except QueueFull as e:
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details(str(e))
+            return menu_pb2.MenuResponse()
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return menu_pb2.MenuResponse()
+        except ImageFetchError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+            return menu_pb2.MenuResponse()
         except Exception as e:
             logger.error(f"Error processing menu image: {e}")
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(str(e))
             return menu_pb2.MenuResponse()
     
+    @track_rpc
+    def GetMenuStatus(self, request, context):
+        """Get the status, or the result, of an asynchronously processed menu."""
+        try:
+            result = self.processor.menu_status(request.menu_id)
+            
+            if not result:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details(f"Menu {request.menu_id} not found")
+                return menu_pb2.MenuResponse()
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error getting menu status: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+            return menu_pb2.MenuResponse()
+    
+    @track_rpc
     def GetDish(self, request, context):
         """Get dish details by ID."""
         try:
@@ -68,6 +120,29 @@ class MenuServiceServicer(menu_pb2_grpc.MenuServiceServicer):
             context.set_details(str(e))
             return menu_pb2.DishResponse()
     
+    @track_rpc
+    def GetDishes(self, request, context):
+        """Get several dishes by ID."""
+        try:
+            logger.info(f"Getting {len(request.dish_ids)} dishes")
+            
+            if len(request.dish_ids) > GET_DISHES_MAX_IDS:
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                context.set_details(f"At most {GET_DISHES_MAX_IDS} dish IDs per request")
+                return menu_pb2.DishesResponse()
+            
+            return self.processor.get_dishes(
+                dish_ids=list(request.dish_ids),
+                include_similar=request.include_similar
+            )
+            
+        except Exception as e:
+            logger.error(f"Error getting dishes: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+            return menu_pb2.DishesResponse()
+    
+    @track_rpc
     def SearchDishes(self, request, context):
         """Search dishes."""
         try:
@@ -76,12 +151,17 @@ class MenuServiceServicer(menu_pb2_grpc.MenuServiceServicer):
             result = self.processor.search_dishes(request)
             return result
             
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return menu_pb2.SearchResponse()
         except Exception as e:
             logger.error(f"Error searching dishes: {e}")
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(str(e))
             return menu_pb2.SearchResponse()
     
+    @track_rpc
     def StreamDishProcessing(self, request, context):
         """Stream dish processing results."""
         try:
@@ -90,36 +170,90 @@ class MenuServiceServicer(menu_pb2_grpc.MenuServiceServicer):
             for dish in self.processor.process_menu_stream(
                 image_data=request.image_data,
                 image_url=request.image_url,
-                options=request.options
+                options=request.options,
+                timeout=context.time_remaining(),
+                is_active=context.is_active
             ):
                 yield dish
                 
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+        except ImageFetchError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
         except Exception as e:
             logger.error(f"Error in streaming processing: {e}")
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(str(e))
 
 
+def create_server(servicer, address):
+    """Build a thread-pool gRPC server for the servicer; returns (server, port)."""
+    max_workers = int(os.getenv('GRPC_MAX_WORKERS', 10))
+    executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+    server = grpc.server(executor)
+    
+    # RPCs waiting for a worker thread, and the workers started so far
+    REGISTRY.gauge('grpc_server_thread_pool_queue_depth', 'RPCs queued for a worker thread', function=executor._work_queue.qsize)
+    REGISTRY.gauge('grpc_server_thread_pool_threads', 'Worker threads started', function=lambda: len(executor._threads))
+    REGISTRY.gauge('grpc_server_thread_pool_max_workers', 'GRPC_MAX_WORKERS').set(max_workers)
+    
+    menu_pb2_grpc.add_MenuServiceServicer_to_server(servicer, server)
+    # grpc.health.v1: liveness, readiness and each dependency, from the processor's checks
+    servicer.health = add_health_servicer(server, servicer.processor.readiness)
+    
+    port = server.add_insecure_port(address)
+    return server, port
+
+
 def serve():
     """Start the gRPC server."""
     port = os.getenv('GRPC_PORT', '50051')
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    
-    menu_pb2_grpc.add_MenuServiceServicer_to_server(
-        MenuServiceServicer(), server
-    )
-    
-    server.add_insecure_port(f'[::]:{port}')
+    servicer = MenuServiceServicer()
+    # Connections, GCP clients and indexes come up in the background; the
+    # health service reports NOT_SERVING for readiness until they have
+    servicer.processor.start_warmup()
+    # Job workers are opt-in: each is a process with its own MenuProcessor
+    if int(os.getenv('JOB_WORKERS', 0)) > 0:
+        servicer.processor.start_job_workers()
+    server, _ = create_server(servicer, f'[::]:{port}')
+    metrics_server = start_metrics_server()
     server.start()
     
     logger.info(f"Menu Service started on port {port}")
     
+    def handle_sigterm(signum, frame):
+        logger.info("Received SIGTERM, draining in-flight requests...")
+        servicer.health.enter_graceful_shutdown()
+        server.stop(int(os.getenv('SHUTDOWN_GRACE_SECONDS', 10)))
+    
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    
     try:
         server.wait_for_termination()
     except KeyboardInterrupt:
         logger.info("Shutting down...")
         server.stop(0)
+    finally:
+        # Flush queued Elasticsearch writes before exiting
+        servicer.processor.shutdown()
+        if metrics_server is not None:
+            metrics_server.stop()
 
 
 if __name__ == '__main__':
-    serve()
+    parser = argparse.ArgumentParser(description='Menu Service gRPC server')
+    parser.add_argument(
+        '--mode',
+        choices=['sync', 'aio'],
+        default=os.getenv('GRPC_SERVER_MODE', 'sync'),
+        help='thread-pool server (sync) or asyncio server (aio)'
+    )
+    args = parser.parse_args()
+    
+    if args.mode == 'aio':
+        from aio_server import serve_aio
+        asyncio.run(serve_aio())
+    else:
+        serve()
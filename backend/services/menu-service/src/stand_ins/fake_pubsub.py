@@ -0,0 +1,46 @@
+import time
+import threading
+from concurrent import futures
+from typing import List, Tuple
+
+
+class FakePublisherClient:
+    """Stand-in for pubsub_v1.PublisherClient.
+
+    publish() returns a future at once, like the real client, and the
+    message is "delivered" on a background thread after ``latency``
+    seconds. Delivered messages are kept in ``messages`` as (topic, data)
+    pairs when ``keep`` is set; otherwise only counted.
+    """
+
+    def __init__(self, latency: float = 0.0, keep: bool = False, max_workers: int = 10):
+        self.latency = latency
+        self.keep = keep
+        self.published = 0
+        self.delivered = 0
+        self.messages: List[Tuple[str, bytes]] = []
+        self._lock = threading.Lock()
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fake-pubsub')
+
+    def topic_path(self, project: str, topic: str) -> str:
+        return f"projects/{project}/topics/{topic}"
+
+    def publish(self, topic: str, data: bytes, **attributes) -> futures.Future:
+        if not isinstance(data, bytes):
+            raise TypeError('Data being published to Pub/Sub must be sent as a bytestring.')
+        with self._lock:
+            self.published += 1
+            message_id = str(self.published)
+        return self._executor.submit(self._deliver, topic, data, message_id)
+
+    def stop(self):
+        self._executor.shutdown(wait=True)
+
+    def _deliver(self, topic: str, data: bytes, message_id: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.delivered += 1
+            if self.keep:
+                self.messages.append((topic, data))
+        return message_id
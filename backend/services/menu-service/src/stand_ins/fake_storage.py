@@ -0,0 +1,63 @@
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+
+class FakeBlob:
+    """The part of storage.Blob the image fetcher uses."""
+
+    def __init__(self, client: 'FakeStorageClient', name: str, data: bytes, generation: int):
+        self.client = client
+        self.name = name
+        self.size = len(data)
+        self.generation = generation
+        self.etag = hashlib.md5(data).hexdigest()
+        self._data = data
+
+    def download_to_file(self, file_obj, if_generation_match: Optional[int] = None):
+        if if_generation_match is not None and if_generation_match != self.generation:
+            raise RuntimeError(f"412 Precondition Failed: generation {self.generation}")
+        file_obj.write(self._data)
+        self.client._sent(len(self._data))
+
+
+class FakeBucket:
+    def __init__(self, client: 'FakeStorageClient', name: str):
+        self.client = client
+        self.name = name
+
+    def get_blob(self, blob_name: str) -> Optional[FakeBlob]:
+        return self.client._get(self.name, blob_name)
+
+
+class FakeStorageClient:
+    """Stand-in for storage.Client over an in-memory set of objects, with
+    object metadata reads and downloads counted like GCS requests."""
+
+    def __init__(self):
+        self.metadata_reads = 0
+        self.downloads = 0
+        self.bytes_sent = 0
+        self._objects: Dict[Tuple[str, str], FakeBlob] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def bucket(self, bucket_name: str) -> FakeBucket:
+        return FakeBucket(self, bucket_name)
+
+    def put(self, bucket_name: str, blob_name: str, data: bytes) -> str:
+        """Write an object (a new generation); returns its gs:// URL."""
+        with self._lock:
+            self._generation += 1
+            self._objects[(bucket_name, blob_name)] = FakeBlob(self, blob_name, data, self._generation)
+        return f"gs://{bucket_name}/{blob_name}"
+
+    def _get(self, bucket_name: str, blob_name: str) -> Optional[FakeBlob]:
+        with self._lock:
+            self.metadata_reads += 1
+            return self._objects.get((bucket_name, blob_name))
+
+    def _sent(self, size: int):
+        with self._lock:
+            self.downloads += 1
+            self.bytes_sent += size
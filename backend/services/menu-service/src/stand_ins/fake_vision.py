@@ -0,0 +1,105 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+from typing import List, Optional, Set
+
+from scanner_common.ocr.vision_batcher import VISION_MAX_BATCH
+from processors.base import MOCK_TEXT_ANNOTATIONS
+
+
+class FakeVisionClient:
+    """Stand-in for vision.ImageAnnotatorClient text detection.
+
+    Lays ``text_annotations`` (one entry per menu line) out as words with
+    bounding boxes and returns them in Vision's layout - full text first,
+    then each word - after ``latency`` seconds. Counts calls and images,
+    and records the timeout of each call. Images whose content is in
+    ``fail_contents`` get a per-image error, as Vision reports them inside
+    an otherwise successful batch; a batch over ``max_request_bytes`` of
+    image content fails as a whole, as Vision rejects oversized requests.
+    """
+
+    def __init__(
+        self,
+        text_annotations: Optional[List[str]] = None,
+        latency: float = 0.0,
+        fail_contents: Optional[Set[bytes]] = None,
+        max_request_bytes: int = 10 * 1024 * 1024
+    ):
+        self.text_annotations = text_annotations or list(MOCK_TEXT_ANNOTATIONS)
+        self.latency = latency
+        self.fail_contents = fail_contents or set()
+        self.max_request_bytes = max_request_bytes
+        self.calls = 0
+        self.images = 0
+        self.batch_sizes = []
+        self.timeouts = []
+        self._lock = threading.Lock()
+
+    def text_detection(self, image, **kwargs):
+        self._record([getattr(image, 'content', b'')], kwargs.get('timeout'))
+        if self.latency:
+            time.sleep(self.latency)
+        return self._response(getattr(image, 'content', b''))
+
+    def batch_annotate_images(self, requests, **kwargs):
+        self._record([request.image.content for request in requests], kwargs.get('timeout'))
+        if self.latency:
+            time.sleep(self.latency)
+        return self._batch_response(requests)
+
+    def _record(self, contents: List[bytes], timeout: Optional[float]):
+        if len(contents) > VISION_MAX_BATCH:
+            raise ValueError(f"At most {VISION_MAX_BATCH} images per batch, got {len(contents)}")
+        size = sum(len(content) for content in contents)
+        if size > self.max_request_bytes:
+            raise ValueError(f"Request of {size} bytes exceeds {self.max_request_bytes}")
+        with self._lock:
+            self.calls += 1
+            self.images += len(contents)
+            self.batch_sizes.append(len(contents))
+            self.timeouts.append(timeout)
+
+    def _batch_response(self, requests):
+        return SimpleNamespace(responses=[self._response(request.image.content) for request in requests])
+
+    def _response(self, content: bytes):
+        if content in self.fail_contents:
+            return SimpleNamespace(text_annotations=[], error=SimpleNamespace(message='Bad image data.'))
+        return SimpleNamespace(text_annotations=self._annotations, error=SimpleNamespace(message=''))
+
+    @property
+    def _annotations(self):
+        annotations = [SimpleNamespace(description='\n'.join(self.text_annotations), bounding_poly=None)]
+        for line_number, line in enumerate(self.text_annotations):
+            x, y = 40, 40 + 36 * line_number
+            for word in line.split():
+                width = 11 * len(word)
+                annotations.append(SimpleNamespace(description=word, bounding_poly=_poly(x, y, width, 20)))
+                x += width + 8
+        return annotations
+
+
+def _poly(x: int, y: int, width: int, height: int):
+    return SimpleNamespace(vertices=[
+        SimpleNamespace(x=x, y=y), SimpleNamespace(x=x + width, y=y),
+        SimpleNamespace(x=x + width, y=y + height), SimpleNamespace(x=x, y=y + height)
+    ])
+
+
+class AsyncFakeVisionClient(FakeVisionClient):
+    """Stand-in for vision.ImageAnnotatorAsyncClient."""
+
+    async def batch_annotate_images(self, requests, **kwargs):
+        self._record([request.image.content for request in requests], kwargs.get('timeout'))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._batch_response(requests)
+
+
+def fake_vision_ocr_engine(text_annotations: Optional[List[str]] = None, latency: float = 0.0):
+    """VisionOCREngine over a FakeVisionClient. With functools.partial, a
+    picklable ocr_factory for PagePool workers."""
+    from scanner_common.ocr.vision_engine import VisionOCREngine
+    return VisionOCREngine(FakeVisionClient(text_annotations, latency))
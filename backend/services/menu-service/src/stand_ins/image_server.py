@@ -0,0 +1,132 @@
+import time
+import hashlib
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop connections mid-response (an image over the size limit)
+        pass
+
+
+class ImageServer:
+    """Local HTTP server standing in for the hosts behind image_url.
+
+    Serves the images put() on it with an ETag and Last-Modified, answers
+    conditional requests with 304 Not Modified, and keeps connections
+    alive. ``latency`` delays each response, like a remote host would;
+    redirect() makes a path answer 302 to another URL.
+    Counts requests, 304s and body bytes sent, so the bytes a client saved
+    can be measured.
+    """
+
+    def __init__(self, latency: float = 0.0, max_age: Optional[int] = None):
+        self.latency = latency
+        self.max_age = max_age
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self.connections = 0
+        self._images: Dict[str, Tuple[bytes, str, str]] = {}
+        self._redirects: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._server = _QuietHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name='image-server', daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}/{path.lstrip('/')}"
+
+    def put(self, path: str, data: bytes) -> str:
+        """Serve ``data`` at ``path`` (a new ETag and Last-Modified); returns its URL."""
+        etag = f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+        with self._lock:
+            self._images['/' + path.lstrip('/')] = (data, etag, formatdate(time.time(), usegmt=True))
+        return self.url(path)
+
+    def redirect(self, path: str, location: str) -> str:
+        """Answer ``path`` with a 302 to ``location``; returns its URL."""
+        with self._lock:
+            self._redirects['/' + path.lstrip('/')] = location
+        return self.url(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'not_modified': self.not_modified,
+                'bytes_sent': self.bytes_sent,
+                'connections': self.connections
+            }
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    server.requests += 1
+                    image = server._images.get(self.path.split('?')[0])
+                    location = server._redirects.get(self.path.split('?')[0])
+                if location is not None:
+                    self.send_response(302)
+                    self.send_header('Location', location)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if image is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                data, etag, last_modified = image
+                if self.headers.get('If-None-Match') == etag or (
+                    'If-None-Match' not in self.headers and self.headers.get('If-Modified-Since') == last_modified
+                ):
+                    with server._lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self._validators(etag, last_modified)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(data)))
+                self._validators(etag, last_modified)
+                self.end_headers()
+                self.wfile.write(data)
+                with server._lock:
+                    server.bytes_sent += len(data)
+
+            def _validators(self, etag: str, last_modified: str):
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', last_modified)
+                if server.max_age is not None:
+                    self.send_header('Cache-Control', f'max-age={server.max_age}')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,421 @@
+import re
+import uuid
+import functools
+import heapq
+import asyncio
+import copy
+import time
+import threading
+from typing import Any, Dict, FrozenSet, List, Optional
+
+
+class NotFoundError(Exception):
+    """Raised by get() for a missing document, like elasticsearch.NotFoundError."""
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+@functools.lru_cache(maxsize=262144)
+def _terms(text: str) -> FrozenSet[str]:
+    """Analyzed terms of a field value; cached since stored values repeat across queries."""
+    return frozenset(TOKEN_RE.findall((text or '').lower()))
+
+
+def _field(source: Dict[str, Any], path: str) -> Any:
+    """Look up a dotted field; ``.keyword`` subfields read the field itself."""
+    if path.endswith('.keyword'):
+        path = path[:-len('.keyword')]
+    value = source
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, list):
+        return ' '.join(str(item) for item in value)
+    return '' if value is None else str(value)
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 once it is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class InMemoryElasticsearch:
+    """In-process stand-in for the Elasticsearch calls made by menu-service.
+
+    Every API call counts as one round trip, optionally delayed by
+    ``latency`` seconds. ``fail_statuses`` maps a document id to a list of
+    per-item statuses that bulk() returns for it before succeeding, which is
+    enough to exercise partial-failure handling.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.indices = {}  # index -> {doc_id: source}
+        self.pits = {}  # pit id -> (index, snapshot of the index)
+        self.fail_statuses = {}
+        self.round_trips = 0
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _round_trip(self, api: str):
+        with self._lock:
+            self.round_trips += 1
+            self.calls[api] = self.calls.get(api, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def ping(self, **kwargs) -> bool:
+        self._round_trip('ping')
+        return True
+
+    def index(self, index: str, id: str, document: Dict[str, Any], **kwargs):
+        self._round_trip('index')
+        with self._lock:
+            self.indices.setdefault(index, {})[id] = copy.deepcopy(document)
+        return {'_index': index, '_id': id, 'result': 'created'}
+
+    def bulk(self, operations: List[Dict[str, Any]], **kwargs):
+        self._round_trip('bulk')
+        items = []
+        errors = False
+        with self._lock:
+            for action, document in zip(operations[::2], operations[1::2]):
+                meta = action['index']
+                doc_id = meta['_id']
+                pending = self.fail_statuses.get(doc_id)
+                if pending:
+                    status = pending.pop(0)
+                    items.append({'index': {
+                        '_id': doc_id,
+                        'status': status,
+                        'error': {'type': 'injected_failure', 'reason': f'injected status {status}'}
+                    }})
+                    errors = True
+                    continue
+                self.indices.setdefault(meta['_index'], {})[doc_id] = copy.deepcopy(document)
+                items.append({'index': {'_id': doc_id, 'status': 201, 'result': 'created'}})
+        return {'took': 1, 'errors': errors, 'items': items}
+
+    def get(self, index: str, id: str, **kwargs):
+        self._round_trip('get')
+        with self._lock:
+            source = self.indices.get(index, {}).get(id)
+        if source is None:
+            raise NotFoundError(f"{index}/{id} not found")
+        return {'_index': index, '_id': id, 'found': True, '_source': copy.deepcopy(source)}
+
+    def mget(self, index: str, ids: List[str], **kwargs):
+        self._round_trip('mget')
+        docs = []
+        with self._lock:
+            stored = self.indices.get(index, {})
+            for doc_id in ids:
+                source = stored.get(doc_id)
+                if source is None:
+                    docs.append({'_index': index, '_id': doc_id, 'found': False})
+                else:
+                    docs.append({'_index': index, '_id': doc_id, 'found': True, '_source': copy.deepcopy(source)})
+        return {'docs': docs}
+
+    def search(self, index: Optional[str] = None, body: Optional[Dict[str, Any]] = None, **kwargs):
+        self._round_trip('search')
+        return self._search(index, body)
+
+    def open_point_in_time(self, index: str, keep_alive: str, **kwargs):
+        self._round_trip('open_point_in_time')
+        with self._lock:
+            # Documents are replaced, never mutated, so a shallow copy is a snapshot
+            snapshot = dict(self.indices.get(index, {}))
+            pit_id = uuid.uuid4().hex
+            self.pits[pit_id] = (index, snapshot)
+        return {'id': pit_id}
+
+    def close_point_in_time(self, id: str, **kwargs):
+        self._round_trip('close_point_in_time')
+        with self._lock:
+            found = self.pits.pop(id, None) is not None
+        return {'succeeded': found, 'num_freed': int(found)}
+
+    def msearch(self, searches: List[Dict[str, Any]], index: Optional[str] = None, **kwargs):
+        self._round_trip('msearch')
+        responses = []
+        for header, body in zip(searches[::2], searches[1::2]):
+            try:
+                result = self._search(header.get('index', index), body)
+                result['status'] = 200
+            except Exception as e:
+                result = {'error': {'type': type(e).__name__, 'reason': str(e)}, 'status': 400}
+            responses.append(result)
+        return {'took': 1, 'responses': responses}
+
+    def _search(self, index: Optional[str], body: Optional[Dict[str, Any]]):
+        """Score every document, then keep the top ``from + size`` like a shard's
+        priority queue, or the top ``size`` after ``search_after``."""
+        body = body or {}
+        pit = body.get('pit')
+        with self._lock:
+            if pit:
+                if pit['id'] not in self.pits:
+                    raise NotFoundError(f"point in time {pit['id']} not found")
+                index, stored = self.pits[pit['id']]
+                docs = list(stored.items())
+            else:
+                docs = list(self.indices.get(index, {}).items())
+
+        sort = list(body.get('sort', []))
+        if pit and not any('_shard_doc' in spec for spec in sort):
+            sort.append({'_shard_doc': 'asc'})
+
+        query = body.get('query', {'match_all': {}})
+        matches = []
+        for doc_id, source in docs:
+            score = self._score(query, source)
+            if score is not None:
+                matches.append((self._sort_key(score, doc_id, source, sort), score, doc_id, source))
+        total = len(matches)
+        all_matches = matches
+
+        after = body.get('search_after')
+        if after is not None:
+            after_key = self._after_key(after, sort)
+            matches = [match for match in matches if match[0] > after_key]
+            offset = 0
+        else:
+            offset = body.get('from', 0)
+        size = body.get('size', 10)
+        top = heapq.nsmallest(offset + size, matches, key=lambda match: match[0])[offset:]
+
+        hits = []
+        for _, score, doc_id, source in top:
+            hit = {'_index': index, '_id': doc_id, '_score': score, '_source': copy.deepcopy(source)}
+            if sort:
+                hit['sort'] = [self._sort_value(spec, score, doc_id, source) for spec in sort]
+            hits.append(hit)
+
+        result = {
+            'took': 1,
+            'hits': {
+                'total': {'value': total, 'relation': 'eq'},
+                'hits': hits
+            }
+        }
+        if 'aggs' in body:
+            result['aggregations'] = {
+                name: self._aggregate(spec, [match[3] for match in all_matches])
+                for name, spec in body['aggs'].items()
+            }
+        if 'suggest' in body:
+            result['suggest'] = self._suggest(body['suggest'], docs)
+        if pit:
+            result['pit_id'] = pit['id']
+        return result
+
+    def _aggregate(self, spec: Dict[str, Any], sources: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if 'terms' in spec:
+            counts = {}
+            for source in sources:
+                value = _field(source, spec['terms']['field'])
+                if value not in (None, ''):
+                    counts[value] = counts.get(value, 0) + 1
+            ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            return {'buckets': [{'key': key, 'doc_count': count} for key, count in ranked[:spec['terms'].get('size', 10)]]}
+
+        if 'histogram' in spec:
+            histogram = spec['histogram']
+            interval = histogram['interval']
+            counts = {}
+            for source in sources:
+                value = _field(source, histogram['field'])
+                if isinstance(value, (int, float)):
+                    key = (value // interval) * interval
+                    counts[key] = counts.get(key, 0) + 1
+            if histogram.get('min_doc_count', 0) == 0 and counts:
+                # Like Elasticsearch, fill the empty buckets between min and max
+                key = min(counts)
+                while key < max(counts):
+                    counts.setdefault(key, 0)
+                    key += interval
+            return {'buckets': [{'key': key, 'doc_count': counts[key]} for key in sorted(counts)]}
+
+        raise ValueError(f"unsupported aggregation {spec}")
+
+    def _suggest(self, spec: Dict[str, Any], docs) -> Dict[str, Any]:
+        """Term suggester: per query term, indexed terms within two edits."""
+        text = spec.get('text', '')
+        suggestions = {}
+        for name, suggester in spec.items():
+            if name == 'text':
+                continue
+            term = suggester['term']
+            frequencies = {}
+            for _, source in docs:
+                for token in _terms(_text(_field(source, term['field']))):
+                    frequencies[token] = frequencies.get(token, 0) + 1
+            entries = []
+            offset = 0
+            for token in TOKEN_RE.findall(suggester.get('text', text).lower()):
+                options = []
+                if term.get('suggest_mode', 'missing') != 'missing' or token not in frequencies:
+                    for candidate, freq in frequencies.items():
+                        distance = _edit_distance(token, candidate, 2)
+                        if 0 < distance <= 2 and candidate[:1] == token[:1]:
+                            score = 1.0 - distance / max(len(token), len(candidate))
+                            options.append({'text': candidate, 'score': round(score, 3), 'freq': freq})
+                    options.sort(key=lambda option: (-option['score'], -option['freq'], option['text']))
+                entries.append({
+                    'text': token, 'offset': offset, 'length': len(token),
+                    'options': options[:term.get('size', 5)]
+                })
+                offset += len(token) + 1
+            suggestions[name] = entries
+        return suggestions
+
+    @staticmethod
+    def _sort_field(spec) -> str:
+        return spec if isinstance(spec, str) else next(iter(spec))
+
+    def _sort_value(self, spec, score: float, doc_id: str, source: Dict[str, Any]):
+        field = self._sort_field(spec)
+        if field == '_score':
+            return score
+        if field == '_shard_doc':
+            return doc_id
+        return source.get(field)
+
+    def _sort_key(self, score: float, doc_id: str, source: Dict[str, Any], sort: List[Any]) -> tuple:
+        if not sort:
+            return (-score, doc_id)
+        return self._after_key([self._sort_value(spec, score, doc_id, source) for spec in sort], sort)
+
+    def _after_key(self, values: List[Any], sort: List[Any]) -> tuple:
+        key = []
+        for spec, value in zip(sort, values):
+            # Only _score sorts descending in the queries menu-service sends
+            key.append(-value if self._sort_field(spec) == '_score' else value)
+        return tuple(key)
+
+    def _score(self, query: Dict[str, Any], source: Dict[str, Any]) -> Optional[float]:
+        """Score a document against the small query subset menu-service uses."""
+        if 'match_all' in query:
+            return 1.0
+
+        if 'multi_match' in query:
+            terms = _terms(query['multi_match']['query'])
+            score = 0.0
+            for field in query['multi_match']['fields']:
+                name, _, boost = field.partition('^')
+                score += len(terms & _terms(_text(source.get(name)))) * float(boost or 1)
+            return score or None
+
+        if 'match' in query:
+            field, match = next(iter(query['match'].items()))
+            if not isinstance(match, dict):
+                match = {'query': match}
+            terms = _terms(str(match['query']))
+            found = terms & _terms(_text(_field(source, field)))
+            if match.get('operator', 'or') == 'and':
+                return 1.0 if terms and found == terms else None
+            return float(len(found)) or None
+
+        if 'range' in query:
+            field, bounds = next(iter(query['range'].items()))
+            value = _field(source, field)
+            if not isinstance(value, (int, float)):
+                return None
+            if 'gte' in bounds and value < bounds['gte'] or 'lte' in bounds and value > bounds['lte']:
+                return None
+            if 'gt' in bounds and value <= bounds['gt'] or 'lt' in bounds and value >= bounds['lt']:
+                return None
+            return 1.0
+
+        if 'more_like_this' in query:
+            terms = _terms(query['more_like_this']['like'])
+            fields = query['more_like_this']['fields']
+            overlap = sum(len(terms & _terms(source.get(field))) for field in fields)
+            return float(overlap) or None
+
+        if 'terms' in query:
+            field, values = next(iter(query['terms'].items()))
+            return 1.0 if _field(source, field) in values else None
+
+        if 'term' in query:
+            field, value = next(iter(query['term'].items()))
+            if isinstance(value, dict):
+                value = value['value']
+            return 1.0 if _field(source, field) == value else None
+
+        if 'bool' in query:
+            clauses = query['bool']
+            filters = clauses.get('filter', [])
+            for clause in filters if isinstance(filters, list) else [filters]:
+                if self._score(clause, source) is None:
+                    return None
+            must = clauses.get('must')
+            if must is None:
+                return 1.0
+            return self._score(must, source)
+
+        return None
+
+
+class AsyncInMemoryElasticsearch:
+    """AsyncElasticsearch-style wrapper around InMemoryElasticsearch."""
+
+    def __init__(self, latency: float = 0.0):
+        self.sync = InMemoryElasticsearch()
+        self.latency = latency
+
+    @property
+    def round_trips(self) -> int:
+        return self.sync.round_trips
+
+    async def _call(self, api: str, *args, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return getattr(self.sync, api)(*args, **kwargs)
+
+    async def ping(self, *args, **kwargs):
+        return await self._call('ping', *args, **kwargs)
+
+    async def index(self, *args, **kwargs):
+        return await self._call('index', *args, **kwargs)
+
+    async def bulk(self, *args, **kwargs):
+        return await self._call('bulk', *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await self._call('get', *args, **kwargs)
+
+    async def search(self, *args, **kwargs):
+        return await self._call('search', *args, **kwargs)
+
+    async def mget(self, *args, **kwargs):
+        return await self._call('mget', *args, **kwargs)
+
+    async def msearch(self, *args, **kwargs):
+        return await self._call('msearch', *args, **kwargs)
+
+    async def open_point_in_time(self, *args, **kwargs):
+        return await self._call('open_point_in_time', *args, **kwargs)
+
+    async def close_point_in_time(self, *args, **kwargs):
+        return await self._call('close_point_in_time', *args, **kwargs)
+
+    async def close(self):
+        pass
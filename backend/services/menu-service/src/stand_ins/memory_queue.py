@@ -0,0 +1,76 @@
+import os
+import heapq
+import threading
+from typing import Optional, Tuple
+
+from jobs.queue import Job, QueueFull
+
+
+class InMemoryJobQueue:
+    """In-process stand-in for RedisJobQueue.
+
+    Same interface and semantics (bounded, highest priority first, FIFO
+    within a priority, identical in-flight submissions deduplicated), but
+    local to one process, so only that replica's workers see its jobs.
+    pop() blocks on a condition instead of polling.
+    """
+
+    def __init__(self, max_depth: Optional[int] = None):
+        self.max_depth = max_depth or int(os.getenv('JOB_QUEUE_MAX_DEPTH', 1000))
+        self._heap = []  # (-priority, sequence, menu_id)
+        self._jobs = {}  # menu_id -> Job, while waiting
+        self._inflight = {}  # dedupe_key -> menu_id, while waiting or running
+        self._sequence = 0
+        self._ready = threading.Condition()
+        self._stats = {
+            'submitted': 0,
+            'deduplicated': 0,
+            'rejected': 0,
+            'popped': 0
+        }
+
+    def submit(self, job: Job) -> Tuple[str, bool]:
+        with self._ready:
+            existing = self._inflight.get(job.dedupe_key)
+            if existing is not None:
+                self._stats['deduplicated'] += 1
+                return existing, False
+            if len(self._jobs) >= self.max_depth:
+                self._stats['rejected'] += 1
+                raise QueueFull(f"Job queue is full ({self.max_depth} waiting)")
+            self._sequence += 1
+            heapq.heappush(self._heap, (-job.priority, self._sequence, job.menu_id))
+            self._jobs[job.menu_id] = job
+            self._inflight[job.dedupe_key] = job.menu_id
+            self._stats['submitted'] += 1
+            self._ready.notify()
+        return job.menu_id, True
+
+    def pop(self, timeout: float = 0.0) -> Optional[Job]:
+        with self._ready:
+            if not self._heap and timeout > 0:
+                self._ready.wait(timeout)
+            if not self._heap:
+                return None
+            _, _, menu_id = heapq.heappop(self._heap)
+            self._stats['popped'] += 1
+            return self._jobs.pop(menu_id)
+
+    def done(self, job: Job):
+        with self._ready:
+            if self._inflight.get(job.dedupe_key) == job.menu_id:
+                del self._inflight[job.dedupe_key]
+
+    def position(self, menu_id: str) -> Optional[int]:
+        with self._ready:
+            if menu_id not in self._jobs:
+                return None
+            entry = next(entry for entry in self._heap if entry[2] == menu_id)
+            return sum(1 for other in self._heap if other < entry) + 1
+
+    def depth(self) -> int:
+        return len(self._jobs)
+
+    def stats(self) -> dict:
+        with self._ready:
+            return dict(self._stats, depth=len(self._jobs))
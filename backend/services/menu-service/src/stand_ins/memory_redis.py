@@ -0,0 +1,371 @@
+import time
+import queue
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+
+class InMemoryRedis:
+    """In-process LRU stand-in for the subset of the Redis API used by menu-service.
+
+    Each command, and each pipeline execute(), counts as one round trip and
+    is optionally delayed by ``latency`` seconds.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        decode_responses: bool = False,
+        latency: float = 0.0
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.decode_responses = decode_responses
+        self.latency = latency
+        self.round_trips = 0
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._subscribers = {}  # channel -> set of InMemoryPubSub
+        self._sorted_sets = {}  # key -> {member: score}
+
+    def ping(self) -> bool:
+        self._round_trip()
+        return True
+
+    def get(self, key: str) -> Optional[Any]:
+        self._round_trip()
+        return self._read(key)
+
+    def _read(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._evict(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        self._round_trip()
+        return self._write(key, value, ex, nx)
+
+    def _write(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        value = self._encode(value)
+        expires_at = time.monotonic() + ex if ex else None
+        with self._lock:
+            if nx and self._read(key) is not None:
+                return None
+            if key in self._data:
+                self._evict(key)
+            self._data[key] = (value, expires_at)
+            self._bytes += len(value)
+            self._enforce_bounds()
+        return True
+
+    def setex(self, key: str, time_seconds: int, value: Any) -> bool:
+        return self.set(key, value, ex=time_seconds)
+
+    def expire(self, key: str, seconds: int) -> bool:
+        self._round_trip()
+        with self._lock:
+            if self._read(key) is None:
+                return False
+            value, _ = self._data[key]
+            self._data[key] = (value, time.monotonic() + seconds)
+        return True
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        self._round_trip()
+        with self._lock:
+            value = int(self._read(key) or 0) + amount
+            self._write(key, str(value))
+        return value
+
+    def delete(self, *keys: str) -> int:
+        self._round_trip()
+        return self._delete(*keys)
+
+    def _delete(self, *keys: str) -> int:
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._evict(key)
+                    removed += 1
+        return removed
+
+    def exists(self, *keys: str) -> int:
+        self._round_trip()
+        return sum(1 for key in keys if self._read(key) is not None)
+
+    def mget(self, keys: List[str], *args: str) -> List[Optional[Any]]:
+        self._round_trip()
+        keys = ([keys] if isinstance(keys, str) else list(keys)) + list(args)
+        return [self._read(key) for key in keys]
+
+    def pipeline(self, transaction: bool = True) -> 'InMemoryPipeline':
+        return InMemoryPipeline(self)
+
+    def zadd(self, key: str, mapping: dict, nx: bool = False) -> int:
+        self._round_trip()
+        return self._zadd(key, mapping, nx)
+
+    def _zadd(self, key: str, mapping: dict, nx: bool = False) -> int:
+        added = 0
+        with self._lock:
+            members = self._sorted_sets.setdefault(key, {})
+            for member, score in mapping.items():
+                member = self._encode(member)
+                if member not in members:
+                    added += 1
+                elif nx:
+                    continue
+                members[member] = float(score)
+        return added
+
+    def zpopmax(self, key: str, count: Optional[int] = None) -> List[tuple]:
+        self._round_trip()
+        with self._lock:
+            members = self._sorted_sets.get(key, {})
+            popped = self._zrange(key, 0, (count or 1) - 1, desc=True)
+            for member, _ in popped:
+                del members[member]
+        return popped
+
+    def zrem(self, key: str, *members: Any) -> int:
+        self._round_trip()
+        with self._lock:
+            stored = self._sorted_sets.get(key, {})
+            return sum(1 for member in members if stored.pop(self._encode(member), None) is not None)
+
+    def zcard(self, key: str) -> int:
+        self._round_trip()
+        return len(self._sorted_sets.get(key, {}))
+
+    def zrevrank(self, key: str, member: Any) -> Optional[int]:
+        self._round_trip()
+        member = self._encode(member)
+        with self._lock:
+            ranked = [name for name, _ in self._zrange(key, 0, -1, desc=True)]
+        return ranked.index(member) if member in ranked else None
+
+    def _zrange(self, key: str, start: int, end: int, desc: bool = False) -> List[tuple]:
+        # Ordered by score, ties by member, as Redis does
+        members = sorted(self._sorted_sets.get(key, {}).items(), key=lambda item: (item[1], item[0]), reverse=desc)
+        return members[start:None if end == -1 else end + 1]
+
+    def publish(self, channel: str, message: Any) -> int:
+        self._round_trip()
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber._deliver(channel, self._encode(message))
+        return len(subscribers)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> 'InMemoryPubSub':
+        return InMemoryPubSub(self)
+
+    def flushall(self) -> bool:
+        with self._lock:
+            self._data.clear()
+            self._sorted_sets.clear()
+            self._bytes = 0
+        return True
+
+    def dbsize(self) -> int:
+        return len(self._data)
+
+    def memory_bytes(self) -> int:
+        """Total size of stored values."""
+        return self._bytes
+
+    def _round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _encode(self, value: Any) -> Any:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value = bytes(value)
+            return value.decode('utf-8') if self.decode_responses else value
+        if not isinstance(value, str):
+            value = str(value)
+        return value if self.decode_responses else value.encode('utf-8')
+
+    def _evict(self, key: str):
+        value, _ = self._data.pop(key)
+        self._bytes -= len(value)
+
+    def _enforce_bounds(self):
+        while self._data and (
+            len(self._data) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._data))
+            self._evict(oldest)
+
+
+class InMemoryPipeline:
+    """Buffers commands and runs them in one round trip on execute()."""
+
+    def __init__(self, redis_client: InMemoryRedis):
+        self.redis_client = redis_client
+        self._commands = []
+
+    def get(self, key: str) -> 'InMemoryPipeline':
+        self._commands.append((self.redis_client._read, (key,)))
+        return self
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> 'InMemoryPipeline':
+        self._commands.append((self.redis_client._write, (key, value, ex, nx)))
+        return self
+
+    def setex(self, key: str, time_seconds: int, value: Any) -> 'InMemoryPipeline':
+        return self.set(key, value, ex=time_seconds)
+
+    def delete(self, *keys: str) -> 'InMemoryPipeline':
+        self._commands.append((self.redis_client._delete, keys))
+        return self
+
+    def zadd(self, key: str, mapping: dict, nx: bool = False) -> 'InMemoryPipeline':
+        self._commands.append((self.redis_client._zadd, (key, mapping, nx)))
+        return self
+
+    def execute(self) -> List[Any]:
+        self.redis_client._round_trip()
+        commands, self._commands = self._commands, []
+        return [command(*args) for command, args in commands]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._commands = []
+
+
+class AsyncInMemoryPipeline(InMemoryPipeline):
+    """redis.asyncio-style pipeline: commands buffer synchronously, execute() is awaited."""
+
+    def __init__(self, redis_client: InMemoryRedis, latency: float = 0.0):
+        super().__init__(redis_client)
+        self.latency = latency
+
+    async def execute(self) -> List[Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return InMemoryPipeline.execute(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._commands = []
+
+
+class InMemoryPubSub:
+    """Subscriber handle returned by InMemoryRedis.pubsub()."""
+
+    def __init__(self, redis_client: InMemoryRedis):
+        self.redis_client = redis_client
+        self.channels = set()
+        self._messages = queue.Queue()
+
+    def subscribe(self, *channels: str):
+        with self.redis_client._lock:
+            for channel in channels:
+                self.redis_client._subscribers.setdefault(channel, set()).add(self)
+                self.channels.add(channel)
+
+    def get_message(self, ignore_subscribe_messages: bool = True, timeout: float = 0.0) -> Optional[dict]:
+        try:
+            return self._messages.get(timeout=timeout) if timeout else self._messages.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        with self.redis_client._lock:
+            for channel in self.channels:
+                self.redis_client._subscribers.get(channel, set()).discard(self)
+        self.channels.clear()
+
+    def _deliver(self, channel: str, data: Any):
+        self._messages.put({'type': 'message', 'channel': channel, 'data': data})
+
+
+class AsyncInMemoryPubSub:
+    """redis.asyncio-style wrapper around InMemoryPubSub."""
+
+    def __init__(self, sync: InMemoryPubSub):
+        self.sync = sync
+
+    async def subscribe(self, *channels: str):
+        self.sync.subscribe(*channels)
+
+    async def get_message(self, ignore_subscribe_messages: bool = True, timeout: float = 0.0) -> Optional[dict]:
+        return await asyncio.to_thread(self.sync.get_message, ignore_subscribe_messages, timeout)
+
+    async def aclose(self):
+        self.sync.close()
+
+
+class AsyncInMemoryRedis:
+    """redis.asyncio-style wrapper around InMemoryRedis.
+
+    ``latency`` is awaited rather than slept, so a slow stand-in delays the
+    calling coroutine but not the event loop.
+    """
+
+    def __init__(self, *args, latency: float = 0.0, **kwargs):
+        self.sync = InMemoryRedis(*args, **kwargs)
+        self.latency = latency
+
+    async def ping(self) -> bool:
+        await self._round_trip()
+        return self.sync.ping()
+
+    async def get(self, key: str) -> Optional[Any]:
+        await self._round_trip()
+        return self.sync.get(key)
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        await self._round_trip()
+        return self.sync.set(key, value, ex=ex, nx=nx)
+
+    async def setex(self, key: str, time_seconds: int, value: Any) -> bool:
+        await self._round_trip()
+        return self.sync.setex(key, time_seconds, value)
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        await self._round_trip()
+        return self.sync.incr(key, amount)
+
+    async def delete(self, *keys: str) -> int:
+        await self._round_trip()
+        return self.sync.delete(*keys)
+
+    async def mget(self, keys: List[str], *args: str) -> List[Optional[Any]]:
+        await self._round_trip()
+        return self.sync.mget(keys, *args)
+
+    def pipeline(self, transaction: bool = True) -> AsyncInMemoryPipeline:
+        return AsyncInMemoryPipeline(self.sync, self.latency)
+
+    async def publish(self, channel: str, message: Any) -> int:
+        await self._round_trip()
+        return self.sync.publish(channel, message)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> AsyncInMemoryPubSub:
+        return AsyncInMemoryPubSub(self.sync.pubsub(ignore_subscribe_messages))
+
+    async def aclose(self):
+        pass
+
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(SERVICE_DIR, 'src'))
+sys.path.insert(0, os.path.join(SERVICE_DIR, 'proto_gen'))
+
+# Local state (outbox, image cache) goes to a scratch directory, not /var/lib
+_SCRATCH = tempfile.mkdtemp(prefix='menu-service-tests-')
+os.environ.setdefault('OUTBOX_PATH', os.path.join(_SCRATCH, 'outbox'))
+os.environ.setdefault('FETCH_CACHE_PATH', os.path.join(_SCRATCH, 'images'))
+os.environ.setdefault('NEAR_DUPLICATE_ENABLED', 'false')
+
+
+@pytest.fixture
+def menu_processor():
+    """MenuProcessor over the Redis, Elasticsearch, Vision and Pub/Sub stand-ins."""
+    from processors.menu_processor import MenuProcessor
+    from stand_ins.fake_pubsub import FakePublisherClient
+    from stand_ins.fake_vision import FakeVisionClient
+    from stand_ins.memory_elasticsearch import InMemoryElasticsearch
+    from stand_ins.memory_redis import InMemoryRedis
+
+    processor = MenuProcessor(
+        redis_client=InMemoryRedis(),
+        es_client=InMemoryElasticsearch(),
+        vision_client=FakeVisionClient(),
+        publisher=FakePublisherClient()
+    )
+    yield processor
+    processor.shutdown()
+
+
+@pytest.fixture
+def async_menu_processor():
+    """Builds an AsyncMenuProcessor over the asyncio stand-ins; call it
+    inside the event loop and close() the processor there."""
+    from processors.async_menu_processor import AsyncMenuProcessor
+    from stand_ins.fake_pubsub import FakePublisherClient
+    from stand_ins.fake_vision import AsyncFakeVisionClient
+    from stand_ins.memory_elasticsearch import AsyncInMemoryElasticsearch
+    from stand_ins.memory_redis import AsyncInMemoryRedis
+
+    def create() -> AsyncMenuProcessor:
+        return AsyncMenuProcessor(
+            redis_client=AsyncInMemoryRedis(),
+            es_client=AsyncInMemoryElasticsearch(),
+            vision_client=AsyncFakeVisionClient(),
+            publisher=FakePublisherClient()
+        )
+    return create
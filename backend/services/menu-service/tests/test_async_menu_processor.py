@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import menu_pb2
+from cache import menu_cache
+
+OPTIONS = menu_pb2.ProcessingOptions(use_cache=True, extract_prices=True)
+
+
+class ThreadRecordingParser:
+    """Wraps the real parser, recording the threads it runs on."""
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.threads = set()
+
+    def parse(self, result):
+        self.threads.add(threading.get_ident())
+        yield from self.parser.parse(result)
+
+
+class RecordingIndex:
+    """In-process index stand-in recording the threads dishes are added on."""
+
+    def __init__(self, threads):
+        self.threads = threads
+
+    def add(self, dishes):
+        self.threads.add(threading.get_ident())
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+def test_cpu_bound_work_runs_off_the_event_loop(async_menu_processor, monkeypatch):
+    digest_threads = set()
+    image_digest = menu_cache.MenuCache.image_digest
+
+    def recording_digest(image_data, image_url=''):
+        digest_threads.add(threading.get_ident())
+        return image_digest(image_data, image_url)
+
+    monkeypatch.setattr(menu_cache.MenuCache, 'image_digest', staticmethod(recording_digest))
+    index_threads = set()
+
+    async def run():
+        processor = async_menu_processor()
+        parser = processor.menu_parser = ThreadRecordingParser(processor.menu_parser)
+        processor.similar_index = RecordingIndex(index_threads)
+        await processor.process_menu(b'menu', '', OPTIONS)
+        options = menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True)
+        [response async for response in processor.process_menu_stream(b'other menu', '', options)]
+        await processor.close()
+        return parser.threads
+
+    loop_thread = threading.get_ident()
+    parse_threads = asyncio.run(run())
+    assert digest_threads and loop_thread not in digest_threads
+    assert parse_threads and loop_thread not in parse_threads
+    assert index_threads and loop_thread not in index_threads
+
+
+def test_stream_serves_a_cached_menu_without_ocr(async_menu_processor):
+    async def run():
+        processor = async_menu_processor()
+        first = await processor.process_menu(b'menu', '', OPTIONS)
+        calls = processor.vision_client.calls
+        bulk = processor.es_client.sync.calls['bulk']
+        streamed = [response.dish async for response in processor.process_menu_stream(b'menu', '', OPTIONS)]
+        stats = processor.menu_cache.stats()
+        result = (first, streamed, processor.vision_client.calls - calls, processor.es_client.sync.calls['bulk'] - bulk)
+        await processor.close()
+        return result, stats
+
+    (first, streamed, ocr_calls, bulk_requests), stats = asyncio.run(run())
+    assert [dish.dish_id for dish in streamed] == [dish.dish_id for dish in first.dishes]
+    assert ocr_calls == 0
+    # Cached dishes are already indexed
+    assert bulk_requests == 0
+    assert stats['menu_hits'] == 1
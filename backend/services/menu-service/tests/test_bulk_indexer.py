@@ -0,0 +1,227 @@
+import time
+import asyncio
+import threading
+
+import menu_pb2
+from indexing.bulk_indexer import AsyncBulkIndexer, BulkIndexer
+from stand_ins.memory_elasticsearch import AsyncInMemoryElasticsearch, InMemoryElasticsearch
+
+
+def documents(prefix: str, count: int):
+    return [(f"{prefix}-{i}", {'dish_id': f"{prefix}-{i}", 'name': f"Dish {i}"}) for i in range(count)]
+
+
+def test_concurrent_submissions_share_bulk_round_trips():
+    es = InMemoryElasticsearch()
+    indexer = BulkIndexer(es, max_actions=500, flush_interval=0.2)
+    barrier = threading.Barrier(20)
+    errors = []
+
+    def submit(menu: int):
+        barrier.wait()
+        errors.extend(indexer.submit(documents(f"menu{menu}", 4)).wait(timeout=5))
+
+    threads = [threading.Thread(target=submit, args=(menu,)) for menu in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    indexer.close()
+
+    assert errors == []
+    assert len(es.indices['dishes']) == 80
+    assert es.calls.get('index', 0) == 0
+    # 80 documents from 20 requests, far fewer round trips than one per document
+    assert es.calls['bulk'] <= 4
+
+
+def test_flushes_at_max_actions():
+    es = InMemoryElasticsearch()
+    indexer = BulkIndexer(es, max_actions=10, flush_interval=1.0)
+    assert indexer.submit(documents('menu', 25)).wait(timeout=5) == []
+    indexer.close()
+
+    assert es.calls['bulk'] == 3
+
+
+def test_only_retryable_items_are_resent():
+    es = InMemoryElasticsearch()
+    es.fail_statuses = {'menu-1': [429, 503], 'menu-2': [400]}
+    indexer = BulkIndexer(es, max_retries=3, flush_interval=0.01)
+    errors = indexer.submit(documents('menu', 4)).wait(timeout=5)
+    indexer.close()
+
+    assert len(errors) == 1 and errors[0].startswith('menu-2:')
+    assert set(es.indices['dishes']) == {'menu-0', 'menu-1', 'menu-3'}
+    # The first request, then two more carrying only menu-1
+    assert es.calls['bulk'] == 3
+    assert indexer.stats()['retried'] == 2
+
+
+def test_retries_give_up_after_max_retries():
+    es = InMemoryElasticsearch()
+    es.fail_statuses = {'menu-0': [503] * 10}
+    indexer = BulkIndexer(es, max_retries=2, flush_interval=0.01)
+    errors = indexer.submit(documents('menu', 1)).wait(timeout=5)
+    indexer.close()
+
+    assert len(errors) == 1
+    assert es.calls['bulk'] == 3
+
+
+def test_submit_after_close_fails_the_ticket():
+    indexer = BulkIndexer(InMemoryElasticsearch())
+    indexer.close()
+
+    errors = indexer.submit(documents('menu', 2)).wait(timeout=1)
+    assert len(errors) == 2
+
+
+def test_submits_racing_close_resolve_every_ticket():
+    es = InMemoryElasticsearch(latency=0.005)
+    indexer = BulkIndexer(es, max_actions=5, max_queue=4, flush_interval=0.01)
+    tickets = []
+    lock = threading.Lock()
+
+    def submit(menu: int):
+        for round in range(5):
+            ticket = indexer.submit(documents(f"menu{menu}-{round}", 5))
+            with lock:
+                tickets.append(ticket)
+
+    threads = [threading.Thread(target=submit, args=(menu,)) for menu in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.02)
+    indexer.close()
+    for thread in threads:
+        thread.join()
+
+    errors = [error for ticket in tickets for error in ticket.wait(timeout=5)]
+    assert all(error.endswith('indexer is shut down') for error in errors)
+    assert len(es.indices['dishes']) + len(errors) == 8 * 5 * 5
+
+
+def test_close_does_not_block_on_a_full_queue():
+    es = InMemoryElasticsearch(latency=0.2)
+    indexer = BulkIndexer(es, max_actions=1, max_queue=2, flush_interval=0.01)
+    ticket = indexer.submit(documents('menu', 3))
+
+    start = time.monotonic()
+    indexer.close(timeout=0.05)
+    assert time.monotonic() - start < 0.5
+
+    # The worker still drains what was queued, then stops
+    assert ticket.wait(timeout=5) == []
+    indexer._worker.join(timeout=5)
+    assert not indexer._worker.is_alive()
+    assert len(es.indices['dishes']) == 3
+
+
+def test_process_menu_indexes_in_one_bulk_request(menu_processor):
+    es = menu_processor.es_client
+    options = menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True)
+    response = menu_processor.process_menu(b'menu image', '', options)
+
+    assert response.status.status == menu_pb2.ProcessingStatus.COMPLETED
+    assert len(response.dishes) > 1
+    assert es.calls.get('index', 0) == 0
+    assert es.calls['bulk'] == 1
+    assert set(es.indices['dishes']) == {dish.dish_id for dish in response.dishes}
+
+
+def test_async_concurrent_submissions_share_bulk_round_trips():
+    async def run():
+        es = AsyncInMemoryElasticsearch()
+        indexer = AsyncBulkIndexer(es, max_actions=500, flush_interval=0.05)
+        tickets = await asyncio.gather(*[indexer.submit(documents(f"menu{menu}", 4)) for menu in range(20)])
+        errors = [error for ticket in tickets for error in await ticket.wait(5)]
+        await indexer.close()
+        return es.sync, errors
+
+    es, errors = asyncio.run(run())
+    assert errors == []
+    assert len(es.indices['dishes']) == 80
+    assert es.calls['bulk'] == 1
+
+
+def test_async_only_retryable_items_are_resent():
+    async def run():
+        es = AsyncInMemoryElasticsearch()
+        es.sync.fail_statuses = {'menu-1': [429], 'menu-2': [400]}
+        indexer = AsyncBulkIndexer(es, max_retries=3, flush_interval=0.01)
+        errors = await (await indexer.submit(documents('menu', 4))).wait(5)
+        await indexer.close()
+        return es.sync, errors, indexer.stats()
+
+    es, errors, stats = asyncio.run(run())
+    assert len(errors) == 1 and errors[0].startswith('menu-2:')
+    assert es.calls['bulk'] == 2
+    assert stats['retried'] == 1
+
+
+def test_async_submit_waits_for_queue_space():
+    async def run():
+        es = AsyncInMemoryElasticsearch(latency=0.05)
+        indexer = AsyncBulkIndexer(es, max_actions=2, max_queue=2, flush_interval=0.01)
+        tickets = [await indexer.submit(documents(f"menu{menu}", 2)) for menu in range(4)]
+        # Each submit waited for the queue to drain below max_queue
+        queued = indexer.stats()['queued']
+        errors = [error for ticket in tickets for error in await ticket.wait(5)]
+        await indexer.close()
+        return es.sync, errors, queued
+
+    es, errors, queued = asyncio.run(run())
+    assert errors == []
+    assert queued <= 2
+    assert len(es.indices['dishes']) == 8
+
+
+def test_async_process_menu_stream_indexes_through_the_bulk_indexer(async_menu_processor):
+    async def run():
+        processor = async_menu_processor()
+        processor.vision_client.text_annotations = [f"Dish {i} ${i + 5}.99" for i in range(30)]
+        options = menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True)
+        dishes = [response.dish async for response in processor.process_menu_stream(b'menu', '', options)]
+        await processor.close()
+        return processor.es_client.sync, dishes
+
+    es, dishes = asyncio.run(run())
+    assert len(dishes) == 30
+    assert set(es.indices['dishes']) == {dish.dish_id for dish in dishes}
+    # One bulk request for the stream, not one per dish
+    assert es.calls['bulk'] < len(dishes) / 5
+
+
+def test_async_submits_racing_close_resolve_every_ticket():
+    async def run():
+        es = AsyncInMemoryElasticsearch(latency=0.005)
+        indexer = AsyncBulkIndexer(es, max_actions=5, max_queue=4, flush_interval=0.01)
+        submits = [asyncio.create_task(indexer.submit(documents(f"menu{menu}", 5))) for menu in range(20)]
+        await asyncio.sleep(0.01)
+        await indexer.close()
+        tickets = await asyncio.gather(*submits)
+        errors = [error for ticket in tickets for error in await ticket.wait(5)]
+        return es.sync, errors
+
+    es, errors = asyncio.run(run())
+    assert all(error.endswith('indexer is shut down') for error in errors)
+    assert len(es.indices['dishes']) + len(errors) == 100
+
+
+def test_async_close_does_not_block_on_a_full_queue():
+    async def run():
+        es = AsyncInMemoryElasticsearch(latency=0.2)
+        indexer = AsyncBulkIndexer(es, max_actions=1, max_queue=2, flush_interval=0.01)
+        ticket = await indexer.submit(documents('menu', 3))
+        start = time.monotonic()
+        await indexer.close(timeout=0.05)
+        elapsed = time.monotonic() - start
+        errors = await ticket.wait(5)
+        await indexer._worker
+        return es.sync, errors, elapsed
+
+    es, errors, elapsed = asyncio.run(run())
+    assert elapsed < 0.5
+    assert errors == []
+    assert len(es.indices['dishes']) == 3
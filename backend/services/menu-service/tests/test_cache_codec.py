@@ -0,0 +1,143 @@
+import json
+import os
+
+import pytest
+
+import menu_pb2
+from cache import codec
+from cache.codec import HEADER, CacheCodec, content_hash
+from cache.menu_cache import MenuCache
+from stand_ins.memory_redis import InMemoryRedis
+
+COMPRESSIBLE = b'Pho Bo, beef noodle soup, 45.000d. ' * 100
+
+
+def dish() -> menu_pb2.Dish:
+    return menu_pb2.Dish(dish_id='dish-1', name='Pho Bo', description='beef noodle soup', category='soup')
+
+
+def method_of(value: bytes) -> int:
+    return HEADER.unpack_from(value)[3]
+
+
+@pytest.mark.parametrize('compression', ['none', 'zlib', 'zstd', 'lz4'])
+def test_round_trip(compression):
+    if not codec.compression_available(compression):
+        pytest.skip(f"{compression} is not installed")
+    cache_codec = CacheCodec(compression, min_compress_bytes=64)
+
+    for payload in [b'', b'short', COMPRESSIBLE, os.urandom(4096)]:
+        assert cache_codec.decode(cache_codec.encode(payload)) == payload
+    assert cache_codec.decode_message(cache_codec.encode_message(dish()), menu_pb2.Dish) == dish()
+
+
+def test_header_layout():
+    value = CacheCodec('zlib').encode(b'payload')
+
+    assert HEADER.size == 13
+    assert HEADER.unpack_from(value) == (b'MC', codec.FORMAT_VERSION, codec.CACHE_SCHEMA_VERSION, codec.NONE, content_hash(b'payload'))
+    assert value[HEADER.size:] == b'payload'
+
+
+def test_payloads_under_the_threshold_are_stored_as_is():
+    cache_codec = CacheCodec('zlib', min_compress_bytes=len(COMPRESSIBLE))
+
+    assert method_of(cache_codec.encode(COMPRESSIBLE[:-1])) == codec.NONE
+    assert method_of(cache_codec.encode(COMPRESSIBLE)) == codec.ZLIB
+    assert cache_codec.stats()['compressed'] == 1
+
+
+def test_incompressible_payloads_are_stored_as_is():
+    cache_codec = CacheCodec('zlib', min_compress_bytes=0)
+    payload = os.urandom(4096)
+    value = cache_codec.encode(payload)
+
+    assert method_of(value) == codec.NONE
+    assert len(value) == HEADER.size + len(payload)
+
+
+def reframed(value: bytes, **fields) -> bytes:
+    header = dict(zip(['magic', 'version', 'schema', 'method', 'digest'], HEADER.unpack_from(value)))
+    header.update(fields)
+    return HEADER.pack(*header.values()) + value[HEADER.size:]
+
+
+@pytest.mark.parametrize('fields', [
+    {'magic': b'XX'},
+    {'version': codec.FORMAT_VERSION + 1},
+    {'schema': codec.CACHE_SCHEMA_VERSION + 1},
+    {'method': 9},
+    {'method': codec.ZLIB},
+    {'digest': b'\0' * 8},
+])
+def test_mismatched_headers_read_as_misses(fields):
+    cache_codec = CacheCodec('zlib')
+    value = reframed(cache_codec.encode(b'payload'), **fields)
+
+    assert cache_codec.decode(value) is None
+    assert cache_codec.stats()['rejected'] == 1
+
+
+def test_a_replica_on_another_schema_version_misses():
+    value = CacheCodec('zlib', schema_version=1).encode(b'payload')
+
+    assert CacheCodec('zlib', schema_version=2).decode(value) is None
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_corrupted_payloads_fail_the_content_hash(compressed):
+    cache_codec = CacheCodec('zlib', min_compress_bytes=0 if compressed else 1 << 20)
+    value = bytearray(cache_codec.encode(COMPRESSIBLE))
+    value[-20] ^= 0xFF
+
+    assert cache_codec.decode(bytes(value)) is None
+    assert cache_codec.decode(bytes(value[:HEADER.size - 1])) is None
+    assert cache_codec.stats()['rejected'] == 2
+
+
+def test_payloads_that_are_not_the_message_type_read_as_misses():
+    cache_codec = CacheCodec('zlib')
+
+    assert cache_codec.decode_message(cache_codec.encode(b'\xff\xff\xff'), menu_pb2.Dish) is None
+
+
+@pytest.mark.parametrize('legacy', [
+    # Menus were cached as the hex of the serialized MenuResponse
+    menu_pb2.MenuResponse(menu_id='menu-1').SerializeToString().hex(),
+    menu_pb2.MenuResponse(menu_id='menu-1').SerializeToString().hex().encode('ascii'),
+    # Dishes were cached as their Elasticsearch JSON source
+    json.dumps({'name': 'Pho Bo', 'category': 'soup'}).encode('utf-8'),
+    None,
+])
+def test_legacy_entries_read_as_misses(legacy):
+    cache_codec = CacheCodec('zlib')
+
+    assert cache_codec.decode(legacy) is None
+    assert cache_codec.decode_message(legacy, menu_pb2.MenuResponse) is None
+
+
+def test_a_legacy_menu_entry_is_a_miss_and_gets_rewritten():
+    redis_client = InMemoryRedis()
+    cache = MenuCache(redis_client)
+    options = menu_pb2.ProcessingOptions(use_cache=True)
+    response = menu_pb2.MenuResponse(menu_id='menu-1')
+    key = cache._menu_key('digest', options)
+    redis_client.setex(key, 60, response.SerializeToString().hex())
+
+    assert cache.get_menu('digest', options) is None
+    cache.put_menu('digest', options, response)
+    assert cache.get_menu('digest', options) == response
+
+
+def test_a_legacy_dish_entry_is_reloaded_from_elasticsearch(menu_processor):
+    options = menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True)
+    dish_id = menu_processor.process_menu(b'menu', '', options).dishes[0].dish_id
+    menu_processor.bulk_indexer.close()
+    menu_processor.redis_client.setex(f"dish:{dish_id}", 60, json.dumps({'name': 'stale'}).encode('utf-8'))
+
+    loaded = menu_processor.get_dish(dish_id, False).dish
+
+    assert loaded.dish_id == dish_id and loaded.name != 'stale'
+    assert menu_processor.dish_cache_stats()['origin_loads'] == 1
+    rewritten = menu_processor.redis_client.get(f"dish:{dish_id}")
+    assert menu_processor.cache_codec.decode_message(rewritten, menu_pb2.Dish) == loaded
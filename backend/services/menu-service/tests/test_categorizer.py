@@ -0,0 +1,140 @@
+import json
+import os
+
+import pytest
+
+from parsing.categorizer import Automaton, Categorizer, Taxonomy, normalize_tokens
+
+TAXONOMY = {
+    'default': 'other',
+    'head_final': ['en'],
+    'categories': {
+        'soup': {'keywords': {'vi': ['phở', 'bún bò huế'], 'en': ['soup'], 'ja': ['ラーメン']}},
+        'main': {'keywords': {'vi': ['bún bò', 'gà'], 'en': ['chicken', 'beef']}},
+        'salad': {'keywords': {'en': ['salad']}},
+        'dessert': {'keywords': {'en': ['chocolate', 'ice cream']}, 'weights': {'chocolate': 0.5}}
+    }
+}
+
+
+def test_automaton_finds_every_overlapping_keyword():
+    automaton = Automaton()
+    for value, keyword in enumerate(['he', 'she', 'his', 'hers']):
+        automaton.add(keyword, value)
+    automaton.build()
+
+    # "ushers": "she" and "he" both end at 3, "hers" at 5
+    assert sorted(automaton.find('ushers')) == [(0, 3), (1, 3), (3, 5)]
+    assert automaton.find('xyz') == []
+
+
+def test_automaton_matches_whole_word_sequences():
+    automaton = Automaton()
+    automaton.add(('ice', 'cream'), 0)
+    automaton.add(('cream',), 1)
+    automaton.build()
+
+    assert sorted(automaton.find(['vanilla', 'ice', 'cream'])) == [(0, 2), (1, 2)]
+    assert automaton.find(['icecream']) == []
+
+
+def test_normalized_tokens_drop_accents_and_plurals():
+    assert normalize_tokens('Phở Bò') == normalize_tokens('pho bo') == ['pho', 'bo']
+    assert normalize_tokens('CHICKEN WINGS') == ['chicken', 'wing']
+    assert normalize_tokens('Bún đặc biệt') == ['bun', 'dac', 'biet']
+
+
+def test_the_longest_match_wins():
+    taxonomy = Taxonomy(TAXONOMY)
+
+    # "bún bò" (main) is inside "bún bò huế" (soup) and does not count
+    assert taxonomy.categorize('Bún Bò Huế', 'vi') == 'soup'
+    assert taxonomy.categorize('Bún Bò', 'vi') == 'main'
+
+
+@pytest.mark.parametrize('name, language, category', [
+    # English is head-final: the last keyword is the head noun
+    ('Chicken Soup', 'en', 'soup'),
+    ('Soup with Chicken', 'vi', 'soup'),
+    ('Beef Salad', 'en', 'salad'),
+    # Vietnamese is head-initial: phở is the head of "phở gà"
+    ('Phở Gà', 'vi', 'soup'),
+    # Without a language the head comes from the keyword's own language
+    ('Phở Gà', '', 'soup'),
+    ('Chicken Salad', '', 'salad'),
+])
+def test_the_head_noun_outweighs_modifiers(name, language, category):
+    assert Taxonomy(TAXONOMY).categorize(name, language) == category
+
+
+def test_keyword_weights_and_defaults():
+    taxonomy = Taxonomy(TAXONOMY)
+
+    # "chocolate" weighs 0.5, even as the head noun
+    assert taxonomy.categorize('Chicken Chocolate', 'en') == 'main'
+    assert taxonomy.categorize('Ice Creams', 'en') == 'dessert'
+    assert taxonomy.categorize('Garlic Bread', 'en') == 'other'
+
+
+def test_unspaced_keywords_match_inside_words():
+    assert Taxonomy(TAXONOMY).categorize('味噌ラーメン', 'ja') == 'soup'
+
+
+def write(path, data):
+    with open(path, 'w') as f:
+        f.write(data if isinstance(data, str) else json.dumps(data))
+
+
+def touch(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+
+def test_an_edited_file_is_reloaded(tmp_path):
+    path = str(tmp_path / 'taxonomy.json')
+    write(path, TAXONOMY)
+    touch(path, 1000)
+    categorizer = Categorizer(path, reload_interval=0)
+    version = categorizer.version
+    assert categorizer.categorize(['Garlic Bread']) == ['other']
+
+    edited = json.loads(json.dumps(TAXONOMY))
+    edited['categories']['bread'] = {'keywords': {'en': ['bread']}}
+    write(path, edited)
+    touch(path, 2000)
+
+    assert categorizer.categorize(['Garlic Bread']) == ['bread']
+    assert categorizer.version != version
+    assert categorizer.stats()['reloads'] == 1
+
+
+def test_a_broken_file_keeps_the_old_taxonomy(tmp_path):
+    path = str(tmp_path / 'taxonomy.json')
+    write(path, TAXONOMY)
+    touch(path, 1000)
+    categorizer = Categorizer(path, reload_interval=0)
+    version = categorizer.version
+
+    write(path, '{"categories": ')
+    touch(path, 2000)
+    assert categorizer.categorize(['Chicken Soup']) == ['soup']
+    assert categorizer.version == version
+    # The broken file is not retried until it changes again
+    categorizer.categorize(['Chicken Soup'])
+    assert categorizer.stats()['reload_errors'] == 1
+
+    write(path, TAXONOMY)
+    touch(path, 3000)
+    categorizer.categorize(['Chicken Soup'])
+    assert categorizer.stats()['reloads'] == 1
+
+
+def test_the_file_is_checked_at_most_every_reload_interval(tmp_path):
+    path = str(tmp_path / 'taxonomy.json')
+    write(path, TAXONOMY)
+    touch(path, 1000)
+    categorizer = Categorizer(path, reload_interval=3600)
+
+    write(path, '{}')
+    touch(path, 2000)
+    assert categorizer.categorize(['Chicken Soup']) == ['soup']
+    assert categorizer.stats()['reload_errors'] == 0
@@ -0,0 +1,29 @@
+from scanner_common import cpus
+from scanner_common.ocr.tesseract_engine import TesseractOCREngine
+
+
+def test_cgroup_v2_quota(tmp_path):
+    (tmp_path / 'cpu.max').write_text('150000 100000\n')
+    assert cpus._cgroup_quota(str(tmp_path)) == 1.5
+
+    (tmp_path / 'cpu.max').write_text('max 100000\n')
+    assert cpus._cgroup_quota(str(tmp_path)) is None
+
+
+def test_cgroup_v1_quota(tmp_path):
+    (tmp_path / 'cpu').mkdir()
+    (tmp_path / 'cpu' / 'cpu.cfs_quota_us').write_text('50000\n')
+    (tmp_path / 'cpu' / 'cpu.cfs_period_us').write_text('100000\n')
+    assert cpus._cgroup_quota(str(tmp_path)) == 0.5
+
+    (tmp_path / 'cpu' / 'cpu.cfs_quota_us').write_text('-1\n')
+    assert cpus._cgroup_quota(str(tmp_path)) is None
+
+
+def test_worker_defaults_follow_the_cpu_quota_not_the_node(monkeypatch):
+    monkeypatch.setattr(cpus.os, 'sched_getaffinity', lambda pid: set(range(64)))
+    monkeypatch.setattr(cpus, '_cgroup_quota', lambda: 1.0)
+    monkeypatch.delenv('OCR_LOCAL_WORKERS', raising=False)
+
+    assert cpus.available_cpus() == 1
+    assert TesseractOCREngine().max_workers == 1
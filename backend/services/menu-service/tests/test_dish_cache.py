@@ -0,0 +1,115 @@
+import threading
+import time
+
+import menu_pb2
+from cache.dish_cache import DishCacheStats, DishInvalidationListener, LocalDishCache, encode_invalidation
+from stand_ins.memory_redis import InMemoryRedis
+
+
+def dish(dish_id: str) -> menu_pb2.Dish:
+    return menu_pb2.Dish(dish_id=dish_id, name=f"Dish {dish_id}")
+
+
+def test_invalidation_only_blocks_fills_of_that_dish():
+    l1 = LocalDishCache(max_entries=10)
+    generation = l1.generation
+    l1.invalidate(['a'])
+
+    # Loads of 'a' and 'b' both started before 'a' was invalidated
+    l1.put('a', dish('a'), generation)
+    l1.put('b', dish('b'), generation)
+
+    assert l1.get('a') is None
+    assert l1.get('b') is not None
+
+    l1.put('a', dish('a'), l1.generation)
+    assert l1.get('a') is not None
+
+
+def test_forgotten_invalidations_still_block_older_loads():
+    l1 = LocalDishCache(max_entries=1)
+    generation = l1.generation
+    l1.invalidate([f"dish-{i}" for i in range(10)])
+
+    # 'dish-0' fell out of the bounded record; it still counts as invalidated
+    l1.put('dish-0', dish('dish-0'), generation)
+    assert l1.get('dish-0') is None
+
+
+def test_clear_blocks_every_load_that_started_before_it():
+    l1 = LocalDishCache(max_entries=10)
+    generation = l1.generation
+    l1.clear()
+
+    l1.put('a', dish('a'), generation)
+    assert l1.get('a') is None
+
+
+def test_new_dishes_are_not_invalidated(menu_processor):
+    options = menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True)
+    menu_processor.process_menu(b'menu', '', options)
+    list(menu_processor.process_menu_stream(b'other menu', '', options))
+    # Done callbacks run on the indexer thread, which close() joins
+    menu_processor.bulk_indexer.close()
+
+    assert menu_processor.dish_cache_stats()['invalidations_sent'] == 0
+
+
+def test_reindexed_dishes_are_invalidated(menu_processor):
+    options = menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True)
+    dishes = list(menu_processor.process_menu(b'menu', '', options).dishes)
+    for existing in dishes:
+        menu_processor.get_dish(existing.dish_id, False)
+    assert len(menu_processor.dish_l1) == len(dishes)
+
+    menu_processor._index_dishes(dishes, reindex=True)
+    # Done callbacks run on the indexer thread, which close() joins
+    menu_processor.bulk_indexer.close()
+
+    assert menu_processor.dish_cache_stats()['invalidations_sent'] == len(dishes)
+    assert len(menu_processor.dish_l1) == 0
+
+
+class DroppingRedis(InMemoryRedis):
+    """Its first subscription fails on the first read, like a dropped connection."""
+
+    def __init__(self):
+        super().__init__()
+        self.subscriptions = []
+        self.resubscribed = threading.Event()
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        pubsub = super().pubsub(ignore_subscribe_messages)
+        if not self.subscriptions:
+            def dropped(**kwargs):
+                raise ConnectionError('connection reset')
+            pubsub.get_message = dropped
+        else:
+            self.resubscribed.set()
+        self.subscriptions.append(pubsub)
+        return pubsub
+
+
+def test_a_lost_subscription_is_closed_before_resubscribing():
+    redis_client = DroppingRedis()
+    l1 = LocalDishCache(max_entries=10)
+    l1.put('a', dish('a'), l1.generation)
+    stats = DishCacheStats()
+    listener = DishInvalidationListener(redis_client, l1, stats)
+    try:
+        assert redis_client.resubscribed.wait(5)
+        lost, current = redis_client.subscriptions
+        assert lost.channels == set()
+        # Invalidations may have been missed while disconnected
+        assert l1.get('a') is None
+
+        l1.put('b', dish('b'), l1.generation)
+        redis_client.publish(listener.channel, encode_invalidation(['b']))
+        for _ in range(50):
+            if l1.get('b') is None:
+                break
+            time.sleep(0.05)
+        assert l1.get('b') is None
+    finally:
+        listener.stop()
+    assert current.channels == set()
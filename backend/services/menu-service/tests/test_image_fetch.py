@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+from fetch.disk_cache import ImageDiskCache
+from fetch.fetcher import ImageFetchError, ImageFetcher
+from fetch.guarded_pool import BlockedAddress, is_public
+from stand_ins.fake_storage import FakeStorageClient
+from stand_ins.image_server import ImageServer
+
+IMAGE = bytes(range(256)) * 400
+
+
+@pytest.fixture
+def server():
+    server = ImageServer()
+    yield server
+    server.close()
+
+
+def local_fetcher(tmp_path, **kwargs) -> ImageFetcher:
+    """A fetcher allowed to reach the stand-in server on loopback."""
+    return ImageFetcher(ImageDiskCache(str(tmp_path / 'images')), allow_private=True, **kwargs)
+
+
+def test_revalidation_saves_the_image_bytes(server, tmp_path):
+    url = server.put('menu.jpg', IMAGE)
+    fetcher = local_fetcher(tmp_path)
+
+    assert [fetcher.fetch(url) for _ in range(3)] == [IMAGE] * 3
+
+    sent = server.stats()
+    assert sent['requests'] == 3
+    assert sent['not_modified'] == 2
+    assert sent['bytes_sent'] == len(IMAGE)
+    assert fetcher.stats()['bytes_saved'] == 2 * len(IMAGE)
+    # Keep-alive: one connection for all three requests
+    assert sent['connections'] == 1
+
+
+def test_fresh_images_are_not_requested_again(server, tmp_path):
+    server.max_age = 300
+    url = server.put('menu.jpg', IMAGE)
+    fetcher = local_fetcher(tmp_path)
+    fetcher.fetch(url)
+    fetcher.fetch(url)
+
+    assert server.stats()['requests'] == 1
+    assert fetcher.stats()['fresh_hits'] == 1
+
+
+def test_concurrent_fetches_share_one_download(server, tmp_path):
+    server.latency = 0.1
+    url = server.put('menu.jpg', IMAGE)
+    fetcher = local_fetcher(tmp_path)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def fetch():
+        barrier.wait()
+        results.append(fetcher.fetch(url))
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [IMAGE] * 8
+    assert server.stats()['bytes_sent'] == len(IMAGE)
+    assert fetcher.stats()['bytes_saved'] == 7 * len(IMAGE)
+
+
+def test_private_addresses_are_refused_by_default(server, tmp_path):
+    url = server.put('menu.jpg', IMAGE)
+    fetcher = ImageFetcher(ImageDiskCache(str(tmp_path / 'images')))
+
+    with pytest.raises(BlockedAddress):
+        fetcher.fetch(url)
+    assert server.stats()['requests'] == 0
+
+
+@pytest.mark.parametrize('address', [
+    '127.0.0.1', '10.0.0.5', '172.16.3.4', '192.168.1.1', '169.254.169.254',
+    '100.64.0.1', '0.0.0.0', '::1', 'fe80::1', 'fd00::1', '::ffff:10.0.0.1', '224.0.0.1'
+])
+def test_non_public_addresses(address):
+    assert not is_public(address)
+
+
+@pytest.mark.parametrize('address', ['8.8.8.8', '142.250.72.14', '2001:4860:4860::8888'])
+def test_public_addresses(address):
+    assert is_public(address)
+
+
+def test_redirects_are_checked_at_every_hop(server, tmp_path, monkeypatch):
+    monkeypatch.setenv('FETCH_ALLOWED_HOSTS', '127.0.0.1')
+    fetcher = local_fetcher(tmp_path)
+    target = server.put('menu.jpg', IMAGE)
+
+    assert fetcher.fetch(server.redirect('moved.jpg', target)) == IMAGE
+
+    elsewhere = server.redirect('elsewhere.jpg', f"http://localhost:{server.port}/menu.jpg")
+    with pytest.raises(ValueError, match='FETCH_ALLOWED_HOSTS'):
+        fetcher.fetch(elsewhere)
+
+    to_bucket = server.redirect('bucket.jpg', 'gs://menu-scanner-images/upload')
+    with pytest.raises(ValueError, match='Unsupported'):
+        fetcher.fetch(to_bucket)
+
+
+def test_redirect_loops_stop(server, tmp_path):
+    fetcher = local_fetcher(tmp_path)
+    server.redirect('a.jpg', server.url('b.jpg'))
+    server.redirect('b.jpg', server.url('a.jpg'))
+
+    with pytest.raises(ImageFetchError, match='redirects'):
+        fetcher.fetch(server.url('a.jpg'))
+    assert server.stats()['requests'] == fetcher.max_redirects + 1
+
+
+def test_gs_urls_are_limited_to_the_configured_buckets(tmp_path):
+    storage = FakeStorageClient()
+    allowed = storage.put('menu-scanner-images', 'uploads/1.jpg', IMAGE)
+    other = storage.put('billing-exports', 'invoices.csv', b'secret')
+    fetcher = ImageFetcher(ImageDiskCache(str(tmp_path / 'images')), storage_client=storage)
+
+    with pytest.raises(ValueError, match='FETCH_GCS_BUCKETS'):
+        fetcher.fetch(other)
+    assert storage.downloads == 0
+
+    assert fetcher.fetch(allowed) == IMAGE
+    assert fetcher.fetch(allowed) == IMAGE
+    # The second fetch revalidated with a metadata read only
+    assert storage.downloads == 1
+    assert storage.bytes_sent == len(IMAGE)
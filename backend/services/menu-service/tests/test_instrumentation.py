@@ -0,0 +1,77 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from instrumentation import MetricsServer, SamplingProfiler
+from scanner_common.metrics import Registry
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = SamplingProfiler(interval_ms=5, slow_ms=1000, output_dir=str(tmp_path))
+    yield profiler
+    profiler.disable()
+
+
+def serve(profiler, **kwargs) -> MetricsServer:
+    return MetricsServer(0, registry=Registry(), profiler=profiler, **kwargs).start()
+
+
+def post(server, query, headers=None):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.port}/debug/profiler?{query}", data=b'', method='POST', headers=headers or {}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_listens_on_loopback_by_default(profiler):
+    server = serve(profiler)
+    try:
+        assert server.host == '127.0.0.1'
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/healthz", timeout=5) as response:
+            assert response.read() == b'ok\n'
+    finally:
+        server.stop()
+
+
+def test_toggles_the_profiler(profiler):
+    server = serve(profiler)
+    try:
+        status, body = post(server, 'enabled=true&slow_ms=250')
+        assert status == 200 and json.loads(body)
+        assert profiler.enabled and profiler.slow_ms == 250
+
+        assert post(server, 'enabled=off')[0] == 200
+        assert not profiler.enabled
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize('query', ['slow_ms=fast', 'slow_ms=-1', 'slow_ms=nan', 'slow_ms=inf', 'enabled=maybe'])
+def test_invalid_parameters_are_rejected_without_changes(profiler, query):
+    server = serve(profiler)
+    try:
+        status, _ = post(server, f'{query}&enabled=true' if query.startswith('slow_ms') else query)
+        assert status == 400
+        assert not profiler.enabled and profiler.slow_ms == 1000
+    finally:
+        server.stop()
+
+
+def test_a_configured_token_is_required(profiler):
+    server = serve(profiler, token='secret')
+    try:
+        assert post(server, 'enabled=true')[0] == 403
+        assert post(server, 'enabled=true', {'Authorization': 'Bearer wrong'})[0] == 403
+        assert not profiler.enabled
+
+        assert post(server, 'enabled=true', {'Authorization': 'Bearer secret'})[0] == 200
+        assert profiler.enabled
+    finally:
+        server.stop()
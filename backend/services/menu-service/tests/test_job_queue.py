@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+
+import menu_pb2
+from jobs.queue import Job, QueueFull, RedisJobQueue
+from jobs.store import JobStore, job_status
+from stand_ins.memory_redis import InMemoryRedis
+
+
+def job(menu_id: str) -> Job:
+    return Job(menu_id, b'request', dedupe_key='image:options')
+
+
+def test_identical_submissions_share_one_job():
+    queue = RedisJobQueue(InMemoryRedis())
+
+    assert queue.submit(job('menu-1')) == ('menu-1', True)
+    assert queue.submit(job('menu-2')) == ('menu-1', False)
+
+
+def test_a_lost_job_blocks_resubmission_only_for_the_inflight_ttl():
+    queue = RedisJobQueue(InMemoryRedis(), ttl_seconds=3600, inflight_ttl=1)
+    queue.submit(job('menu-1'))
+    # Popped by a worker that then dies without calling done()
+    assert queue.pop().menu_id == 'menu-1'
+    assert queue.submit(job('menu-2')) == ('menu-1', False)
+
+    time.sleep(1.1)
+    assert queue.submit(job('menu-3')) == ('menu-3', True)
+
+
+def test_done_allows_resubmission_at_once():
+    queue = RedisJobQueue(InMemoryRedis())
+    queue.submit(job('menu-1'))
+    queue.done(queue.pop())
+
+    assert queue.submit(job('menu-2')) == ('menu-2', True)
+
+
+OPTIONS = menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True)
+COMPLETED = menu_pb2.ProcessingStatus.Status.COMPLETED
+PROCESSING = menu_pb2.ProcessingStatus.Status.PROCESSING
+
+
+class FastWorkerQueue:
+    """Wraps a queue so a worker finishes each new job before submit() returns."""
+
+    def __init__(self, queue, job_store: JobStore):
+        self.queue = queue
+        self.job_store = job_store
+        self.submitted = []
+
+    def submit(self, job):
+        self.submitted.append(job.menu_id)
+        menu_id, created = self.queue.submit(job)
+        if created:
+            self.job_store.put(menu_id, job_status(menu_id, COMPLETED, 'done'))
+        return menu_id, created
+
+    def __getattr__(self, name):
+        return getattr(self.queue, name)
+
+
+def test_a_job_finished_before_submit_returns_keeps_its_result(menu_processor):
+    queue = menu_processor.job_queue = FastWorkerQueue(menu_processor.job_queue, menu_processor.job_store)
+
+    response = menu_processor.submit_menu(b'menu', '', OPTIONS)
+
+    assert response.status.status == COMPLETED
+    assert menu_processor.menu_status(queue.submitted[0]).status.status == COMPLETED
+
+
+def test_a_deduplicated_submission_leaves_no_status_behind(menu_processor):
+    queue = menu_processor.job_queue = FastWorkerQueue(menu_processor.job_queue, menu_processor.job_store)
+    queue.job_store = JobStore(InMemoryRedis())
+    first = menu_processor.submit_menu(b'menu', '', OPTIONS)
+
+    second = menu_processor.submit_menu(b'menu', '', OPTIONS)
+
+    assert second.menu_id == first.menu_id
+    assert second.status.status == PROCESSING
+    assert menu_processor.job_store.get(queue.submitted[1]) is None
+
+
+def test_a_rejected_submission_leaves_no_status_behind(menu_processor):
+    queue = menu_processor.job_queue = FastWorkerQueue(menu_processor.job_queue, menu_processor.job_store)
+    queue.queue.max_depth = 0
+
+    with pytest.raises(QueueFull):
+        menu_processor.submit_menu(b'menu', '', OPTIONS)
+    assert menu_processor.job_store.get(queue.submitted[0]) is None
+
+
+def test_async_job_finished_before_submit_returns_keeps_its_result(async_menu_processor):
+    async def run():
+        processor = async_menu_processor()
+        try:
+            store = JobStore(processor.redis_client.sync, codec=processor.job_store.codec)
+            queue = processor.job_queue = FastWorkerQueue(processor.job_queue, store)
+
+            response = await processor.submit_menu(b'menu', '', OPTIONS)
+            assert response.status.status == COMPLETED
+
+            duplicate = await processor.submit_menu(b'menu', '', OPTIONS)
+            assert duplicate.menu_id == response.menu_id
+            assert await processor.job_store.get(queue.submitted[1]) is None
+        finally:
+            await processor.close()
+
+    asyncio.run(run())
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+
+from clients import LazyClient, async_resolve, resolve
+
+
+def test_async_resolve_prepares_off_the_loop():
+    threads = {}
+
+    def prepare():
+        threads['prepare'] = threading.get_ident()
+        time.sleep(0.2)  # a slow credential lookup
+        return 'credentials'
+
+    def create(credentials):
+        threads['create'] = threading.get_ident()
+        return ('client', credentials)
+
+    async def run():
+        client = LazyClient('vision', create, required=False, prepare=prepare)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        resolved = await async_resolve(client)
+        ticker.cancel()
+        return resolved, ticks, threading.get_ident()
+
+    resolved, ticks, loop_thread = asyncio.run(run())
+    assert resolved == ('client', 'credentials')
+    assert threads['prepare'] != loop_thread
+    assert threads['create'] == loop_thread
+    # The loop kept running while the credentials were looked up
+    assert ticks >= 5
+
+
+def test_failed_prepare_leaves_an_optional_client_unavailable():
+    calls = []
+
+    def prepare():
+        calls.append('prepare')
+        raise RuntimeError('no credentials')
+
+    client = LazyClient('vision', lambda credentials: credentials, required=False, prepare=prepare)
+
+    assert asyncio.run(async_resolve(client)) is None
+    assert resolve(client) is None
+    assert calls == ['prepare']
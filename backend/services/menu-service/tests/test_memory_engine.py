@@ -0,0 +1,177 @@
+import math
+
+import numpy as np
+import pytest
+
+import menu_pb2
+from search.memory_engine import B, FIELDS, K1, MemorySearchEngine
+
+DISHES = [
+    menu_pb2.Dish(dish_id='d1', name='Margherita Pizza', description='tomato and basil', category='main',
+                  ingredients=['tomato', 'mozzarella'], price=menu_pb2.Price(amount=12, currency='USD')),
+    menu_pb2.Dish(dish_id='d2', name='Caprese Salad', description='tomato mozzarella basil', category='salad',
+                  ingredients=['tomato', 'basil'], price=menu_pb2.Price(amount=9, currency='USD')),
+    menu_pb2.Dish(dish_id='d3', name='Pasta Carbonara', description='egg and pecorino', category='main',
+                  ingredients=['pancetta', 'pizza dough'], price=menu_pb2.Price(amount=14, currency='EUR')),
+    menu_pb2.Dish(dish_id='d4', name='Tiramisu', description='coffee and mascarpone', category='dessert',
+                  ingredients=['mascarpone'])
+]
+
+
+def engine_with(dishes=DISHES, **kwargs) -> MemorySearchEngine:
+    engine = MemorySearchEngine(merge_docs=kwargs.pop('merge_docs', 1000), **kwargs)
+    engine.index(list(dishes))
+    return engine
+
+
+def search(engine, query='', **fields) -> menu_pb2.SearchResponse:
+    return engine.search(menu_pb2.SearchRequest(query=query, limit=10, **fields))
+
+
+def ids(response) -> list:
+    return [dish.dish_id for dish in response.dishes]
+
+
+def bm25_best_field(query: str, dishes) -> dict:
+    """Reference scores for the `dishes` multi_match, computed directly
+    from the BM25 formula and the boosts in the Elasticsearch query."""
+    def tokens(dish, field):
+        if field == 'ingredients':
+            return ' '.join(dish.ingredients).lower().split()
+        return getattr(dish, field).lower().split()
+
+    terms = list(dict.fromkeys(query.lower().split()))
+    scores = {}
+    for dish in dishes:
+        best = 0.0
+        for field, boost in FIELDS:
+            lengths = [len(tokens(other, field)) for other in dishes]
+            avg_length = sum(lengths) / len(dishes)
+            field_score = 0.0
+            for term in terms:
+                frequency = sum(term in tokens(other, field) for other in dishes)
+                tf = tokens(dish, field).count(term)
+                if not tf:
+                    continue
+                idf = math.log(1 + (len(dishes) - frequency + 0.5) / (frequency + 0.5))
+                norm = K1 * (1 - B + B * len(tokens(dish, field)) / avg_length)
+                field_score += boost * idf * tf / (tf + norm)
+            best = max(best, field_score)
+        if best:
+            scores[dish.dish_id] = best
+    return scores
+
+
+def test_fields_and_boosts_match_the_elasticsearch_query(menu_processor):
+    body = menu_processor._search_body(menu_pb2.SearchRequest(query='pizza'))
+
+    fields = body['query']['multi_match']['fields']
+    assert [f"{field}^{boost:g}" if boost != 1 else field for field, boost in FIELDS] == fields
+
+
+@pytest.mark.parametrize('query', ['pizza', 'tomato basil', 'mascarpone coffee', 'tomato mozzarella pizza'])
+def test_scores_are_bm25_over_the_best_boosted_field(query):
+    engine = engine_with()
+    expected = bm25_best_field(query, DISHES)
+
+    docs, scores = engine._score(query.split(), FIELDS, best_field=True)
+    actual = {engine.dish_ids[doc]: float(score) for doc, score in zip(docs, scores)}
+
+    assert actual == pytest.approx(expected, rel=1e-5)
+    assert ids(search(engine, query)) == sorted(expected, key=lambda dish_id: (-expected[dish_id], dish_id))
+
+
+def test_a_name_match_outranks_the_same_term_in_ingredients():
+    # d1 has "pizza" in its name (boost 3), d3 only in its ingredients
+    assert ids(search(engine_with(), 'pizza')) == ['d1', 'd3']
+
+
+@pytest.mark.parametrize('merge', [False, True])
+def test_updates_and_deletes_survive_a_merge(merge):
+    engine = engine_with()
+    renamed = menu_pb2.Dish()
+    renamed.CopyFrom(DISHES[0])
+    renamed.name = 'Marinara Pizza'
+    engine.index([renamed])
+    engine.remove(['d4'])
+    if merge:
+        engine.merge()
+
+    assert len(engine) == 3
+    assert ids(search(engine, 'margherita')) == []
+    assert ids(search(engine, 'marinara')) == ['d1']
+    assert search(engine, 'marinara').dishes[0].name == 'Marinara Pizza'
+    assert ids(search(engine, 'tiramisu')) == []
+    assert engine.stats()['memory']['deleted'] == (0 if merge else 2)
+    # Only the live docs count towards BM25 statistics
+    assert search(engine, 'mascarpone').total_results == 0
+
+
+def test_scores_after_a_merge_match_a_fresh_index():
+    engine = engine_with()
+    engine.remove(['d2'])
+    engine.merge()
+    fresh = engine_with([dish for dish in DISHES if dish.dish_id != 'd2'])
+
+    for query in ['tomato basil', 'pizza', 'mascarpone']:
+        docs, scores = engine._score(query.split(), FIELDS, best_field=True)
+        fresh_docs, fresh_scores = fresh._score(query.split(), FIELDS, best_field=True)
+        assert [engine.dish_ids[doc] for doc in docs] == [fresh.dish_ids[doc] for doc in fresh_docs]
+        np.testing.assert_allclose(scores, fresh_scores, rtol=1e-6)
+
+
+def test_reaching_merge_docs_merges_automatically():
+    engine = engine_with(merge_docs=2)
+
+    assert engine.stats()['memory']['unmerged'] == 0
+    assert ids(search(engine, 'tomato basil')) == ids(search(engine_with(), 'tomato basil'))
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'search')
+    engine = engine_with()
+    engine.remove(['d4'])
+    engine.save(path)
+
+    loaded = MemorySearchEngine(path)
+    assert len(loaded) == 3
+    for query in ['pizza', 'tomato basil', 'tiramisu']:
+        assert ids(search(loaded, query)) == ids(search(engine, query))
+    response = search(loaded, 'tomato', categories=['main'])
+    assert ids(response) == ['d1']
+    assert response.dishes[0] == DISHES[0]
+    assert dict(search(loaded, 'tomato').metadata.category_counts) == {'main': 1, 'salad': 1}
+
+    # A loaded snapshot still takes writes and saves over itself
+    loaded.index([menu_pb2.Dish(dish_id='d5', name='Pizza Bianca', category='main')])
+    loaded.close()
+    assert ids(search(MemorySearchEngine(path), 'pizza')) == ['d1', 'd5', 'd3']
+
+
+def test_loading_an_unknown_snapshot_version_fails(tmp_path):
+    path = str(tmp_path / 'search')
+    engine_with().save(path)
+    with open(tmp_path / 'search' / 'meta.json') as f:
+        meta = f.read()
+    with open(tmp_path / 'search' / 'meta.json', 'w') as f:
+        f.write(meta.replace('"version": 1', '"version": 99'))
+
+    with pytest.raises(ValueError):
+        MemorySearchEngine(path)
+
+
+def test_filters():
+    engine = engine_with()
+
+    assert ids(search(engine, 'tomato', filters=['category:salad'])) == ['d2']
+    assert ids(search(engine, 'tomato', filters=['ingredients: mozzarella'])) == ['d1']
+    assert ids(search(engine, 'pizza', filters=['price.currency:usd'])) == ['d1']
+    assert ids(search(engine, 'pizza', price_range=menu_pb2.PriceRange(min=13))) == ['d3']
+    # Unknown fields match nothing, as with an unmapped field
+    assert ids(search(engine, 'tomato', filters=['spiciness:hot'])) == []
+
+
+@pytest.mark.parametrize('search_filter', ['category', 'category:', ':main', '  :  '])
+def test_malformed_filter_raises_value_error(search_filter):
+    with pytest.raises(ValueError):
+        search(engine_with(), 'tomato', filters=[search_filter])
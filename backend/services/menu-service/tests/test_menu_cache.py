@@ -0,0 +1,114 @@
+import os
+from types import SimpleNamespace
+
+import menu_pb2
+from cache import menu_cache
+from cache.menu_cache import MenuCache
+from scanner_common.ocr.base import OCRResult
+from stand_ins.memory_redis import InMemoryRedis
+
+OPTIONS = menu_pb2.ProcessingOptions(use_cache=True, extract_prices=True)
+
+
+def menu_response(menu_id: str = 'menu-1') -> menu_pb2.MenuResponse:
+    response = menu_pb2.MenuResponse(menu_id=menu_id)
+    response.dishes.add(dish_id='dish-1', name='Pho Bo')
+    return response
+
+
+def test_ocr_and_menu_layers_are_separate():
+    cache = MenuCache(InMemoryRedis())
+    digest = MenuCache.image_digest(b'menu image')
+    cache.put_ocr(digest, OCRResult('vision', 'Pho Bo $9.99', []))
+    cache.put_menu(digest, OPTIONS, menu_response())
+
+    assert cache.get_menu(digest, OPTIONS).menu_id == 'menu-1'
+    # Other parse options miss the menu layer but still find the OCR text
+    other = menu_pb2.ProcessingOptions(use_cache=True, extract_prices=False)
+    assert cache.get_menu(digest, other) is None
+    assert cache.get_ocr(digest).full_text == 'Pho Bo $9.99'
+    # OCR is kept per language
+    assert cache.get_ocr(digest, 'vi') is None
+
+    stats = cache.stats()
+    assert (stats['menu_hits'], stats['menu_misses']) == (1, 1)
+    assert (stats['ocr_hits'], stats['ocr_misses']) == (1, 1)
+
+
+def test_image_digest_is_content_addressed():
+    assert MenuCache.image_digest(b'a') == MenuCache.image_digest(b'a')
+    assert MenuCache.image_digest(b'a') != MenuCache.image_digest(b'b')
+    assert MenuCache.image_digest(b'', 'HTTPS://Example.com/menu.jpg#top') == \
+        MenuCache.image_digest(b'', 'https://example.com/menu.jpg')
+    assert MenuCache.image_digest(b'', '') is None
+
+
+def test_options_digest_ignores_fields_that_do_not_change_parsing():
+    assert MenuCache.options_digest(OPTIONS) == \
+        MenuCache.options_digest(menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True))
+    assert MenuCache.options_digest(OPTIONS) != \
+        MenuCache.options_digest(menu_pb2.ProcessingOptions(use_cache=True, extract_prices=True, language='vi'))
+
+
+def test_options_digest_changes_with_the_parser_version(monkeypatch):
+    before = MenuCache.options_digest(OPTIONS)
+    monkeypatch.setattr(menu_cache, 'PARSER_VERSION', 'next')
+
+    assert MenuCache.options_digest(OPTIONS) != before
+
+
+def test_options_digest_changes_with_the_taxonomy_version(monkeypatch):
+    before = MenuCache.options_digest(OPTIONS)
+    monkeypatch.setattr(menu_cache, 'default_categorizer', lambda: SimpleNamespace(version='edited'))
+
+    assert MenuCache.options_digest(OPTIONS) != before
+
+
+def test_oversize_entries_are_not_cached():
+    redis = InMemoryRedis()
+    cache = MenuCache(redis, max_entry_bytes=64)
+    response = menu_response()
+    # Incompressible, so the codec cannot bring it under the limit
+    response.dishes[0].description = os.urandom(2048).hex()
+    cache.put_menu('digest', OPTIONS, response)
+
+    assert redis.dbsize() == 0
+    assert cache.stats()['skipped_oversize'] == 1
+
+
+def test_stand_in_evicts_least_recently_used_entries():
+    redis = InMemoryRedis(max_entries=2)
+    redis.set('a', b'1')
+    redis.set('b', b'2')
+    redis.get('a')
+    redis.set('c', b'3')
+
+    assert redis.get('b') is None
+    assert (redis.get('a'), redis.get('c')) == (b'1', b'3')
+
+
+def test_stand_in_evicts_to_stay_under_max_bytes():
+    redis = InMemoryRedis(max_bytes=1000)
+    for key in range(5):
+        redis.set(f"menu:{key}", b'x' * 300)
+
+    assert redis.memory_bytes() <= 1000
+    assert redis.dbsize() == 3
+    assert redis.get('menu:0') is None and redis.get('menu:4') is not None
+
+
+def test_rescans_reuse_cached_menu_and_ocr(menu_processor):
+    vision = menu_processor.vision_client
+    first = menu_processor.process_menu(b'menu image', '', OPTIONS)
+    again = menu_processor.process_menu(b'menu image', '', OPTIONS)
+
+    assert again.menu_id == first.menu_id
+    calls = vision.calls
+
+    reparsed = menu_processor.process_menu(
+        b'menu image', '', menu_pb2.ProcessingOptions(use_cache=True, extract_prices=False)
+    )
+    assert reparsed.menu_id != first.menu_id
+    # New parse options: a menu miss, but the OCR layer avoided another read
+    assert vision.calls == calls
+    assert menu_processor.menu_cache.stats()['ocr_hits'] == 1
@@ -0,0 +1,109 @@
+import pytest
+
+from parsing.menu_parser import NEXT_ROW, SAME_ROW, MenuParser, parse_price, split_trailing_price
+from scanner_common.ocr.base import OCRResult, TextRegion
+
+
+@pytest.mark.parametrize('text, amount, currency', [
+    ('$12.99', 12.99, 'USD'),
+    ('12,50 €', 12.5, 'EUR'),
+    ('45.000đ', 45000, 'VND'),
+    ('45.000 VND', 45000, 'VND'),
+    ('45k', 45000, 'VND'),
+    ('£1,250.50', 1250.5, 'GBP'),
+    ('9.5', 9.5, 'USD'),
+])
+def test_parse_price(text, amount, currency):
+    price = parse_price(text)
+
+    assert price is not None
+    assert (price.amount, price.currency, price.text) == (amount, currency, text)
+
+
+@pytest.mark.parametrize('text', ['12', 'Burger', '12 Burgers', ''])
+def test_parse_price_rejects_bare_numbers_and_words(text):
+    assert parse_price(text) is None
+
+
+def test_parse_price_allows_bare_numbers_when_asked():
+    assert parse_price('12', allow_bare=True).amount == 12
+
+
+def test_split_trailing_price_rejects_a_bare_number():
+    # "Burger 12" is more likely a count or a size than a price
+    assert split_trailing_price('Burger 12') == ('Burger 12', None)
+
+
+@pytest.mark.parametrize('text, name, amount', [
+    ('Pad Thai ..... $11.50', 'Pad Thai', 11.5),
+    ('Burger ..... 12', 'Burger', 12),
+    ('Bun Cha - grilled pork 45.000đ', 'Bun Cha - grilled pork', 45000),
+    ('Croque Monsieur 12,50 €', 'Croque Monsieur', 12.5),
+])
+def test_split_trailing_price(text, name, amount):
+    rest, price = split_trailing_price(text)
+
+    assert rest == name
+    assert price.amount == amount
+
+
+def words(*rows):
+    """Word boxes for rows of (x, text) cells: 20px tall, rows 36px apart, 90% confident."""
+    regions = []
+    for line, row in enumerate(rows):
+        for x, text in row:
+            for word in text.split():
+                regions.append(TextRegion(word, x, 40 + 36 * line, 11 * len(word), 20, 0.9))
+                x += 11 * len(word) + 8
+    return regions
+
+
+def parse(regions):
+    return list(MenuParser().parse(OCRResult('test', '', regions)))
+
+
+def test_prices_in_a_right_hand_column_pair_with_their_row():
+    dishes = parse(words(
+        [(40, 'Pho Bo'), (600, '$9.99')],
+        [(40, 'Bun Cha'), (600, '$8.50')]
+    ))
+
+    assert [(dish.name, dish.price.amount) for dish in dishes] == [('Pho Bo', 9.99), ('Bun Cha', 8.5)]
+    assert dishes[0].confidence == round(0.9 * SAME_ROW, 3)
+
+
+def test_a_price_on_the_row_below_pairs_with_the_name_above():
+    dishes = parse(words(
+        [(40, 'Grilled Salmon')],
+        [(600, '$24.00')]
+    ))
+
+    assert [(dish.name, dish.price.amount) for dish in dishes] == [('Grilled Salmon', 24.0)]
+    assert dishes[0].confidence == round(0.9 * NEXT_ROW, 3)
+
+
+def test_unpriced_text_under_a_dish_becomes_its_description():
+    dishes = parse(words(
+        [(40, 'Pho Bo'), (600, '$9.99')],
+        [(40, 'beef noodle soup')],
+        [(40, 'Bun Cha'), (600, '$8.50')]
+    ))
+
+    assert [(dish.name, dish.description) for dish in dishes] == [
+        ('Pho Bo', 'beef noodle soup'), ('Bun Cha', '')
+    ]
+
+
+def test_headings_are_not_dishes():
+    dishes = parse(words(
+        [(40, 'MAINS')],
+        [(40, 'Pho Bo'), (600, '$9.99')]
+    ))
+
+    assert [dish.name for dish in dishes] == ['Pho Bo']
+
+
+def test_text_only_results_pair_a_price_line_with_the_line_above():
+    dishes = list(MenuParser().parse(OCRResult('mock', 'STARTERS\nSpring Rolls\n$6.50\nBurger 12', [])))
+
+    assert [(dish.name, dish.price.amount) for dish in dishes] == [('Spring Rolls', 6.5)]
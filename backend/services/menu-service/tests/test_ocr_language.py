@@ -0,0 +1,60 @@
+import asyncio
+
+import menu_pb2
+from scanner_common.ocr import tesseract_engine
+from scanner_common.ocr.base import OCREngine, OCRResult
+from scanner_common.ocr.tesseract_engine import TesseractOCREngine
+
+
+class RecordingOCREngine(OCREngine):
+    """Reads the same two menu lines from any image, recording the language asked for."""
+
+    name = 'recording'
+
+    def __init__(self):
+        super().__init__()
+        self.languages = []
+
+    def _extract(self, image_data: bytes, language: str, timeout=None) -> OCRResult:
+        self.languages.append(language)
+        return OCRResult(self.name, "Pho Bo $9.99\nBun Cha $8.50", [], confidence=0.95)
+
+
+def test_process_menu_passes_the_menu_language_to_ocr(menu_processor):
+    engine = menu_processor.ocr_engine = RecordingOCREngine()
+    menu_processor.process_menu(b'menu', '', menu_pb2.ProcessingOptions(language='vi', extract_prices=True))
+    list(menu_processor.process_menu_stream(b'other menu', '', menu_pb2.ProcessingOptions(language='fr')))
+
+    assert engine.languages == ['vi', 'fr']
+
+
+def test_ocr_cache_is_kept_per_language(menu_processor):
+    engine = menu_processor.ocr_engine = RecordingOCREngine()
+    for language in ('vi', 'vi', 'en'):
+        options = menu_pb2.ProcessingOptions(language=language, use_cache=True, extract_prices=False)
+        menu_processor.process_menu(b'same menu', '', options)
+
+    # The second 'vi' scan is a menu cache hit; 'en' is read again
+    assert engine.languages == ['vi', 'en']
+
+
+def test_async_local_ocr_gets_the_menu_language(async_menu_processor):
+    async def run():
+        processor = async_menu_processor()
+        processor.local_ocr = RecordingOCREngine()
+        processor.ocr_mode = 'local'
+        await processor.process_menu(b'menu', '', menu_pb2.ProcessingOptions(language='de'))
+        await processor.close()
+        return processor.local_ocr.languages
+
+    assert asyncio.run(run()) == ['de']
+
+
+def test_tesseract_maps_the_language_to_traineddata(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tesseract_engine, '_run_tesseract', lambda data, language, psm: calls.append(language) or [])
+    engine = TesseractOCREngine(in_process=True)
+    for language in ('vi', 'zh-Hans', '', 'xx'):
+        engine._extract(b'image', language)
+
+    assert calls == ['vie', 'chi_sim', 'eng', 'eng']
@@ -0,0 +1,33 @@
+from events.log import EventLog
+from events.outbox import EventOutbox
+from events.publishers import EventPublisher
+from scanner_common.metrics import REGISTRY
+
+
+class RecordingPublisher(EventPublisher):
+    name = 'recording'
+
+    def __init__(self):
+        self.events = []
+
+    def publish(self, events):
+        self.events.extend(events)
+
+
+def test_lag_gauges_still_scrape_after_close(tmp_path):
+    publisher = RecordingPublisher()
+    outbox = EventOutbox(EventLog(str(tmp_path)), publisher, max_delay=0.01)
+    outbox.append(b'menu processed')
+    outbox.close(timeout=5)
+
+    assert publisher.events == [b'menu processed']
+    metrics = REGISTRY.render()
+    assert 'menu_events_outbox_lag 0' in metrics
+    assert 'menu_events_outbox_lag_seconds 0' in metrics
+
+
+def test_close_twice(tmp_path):
+    outbox = EventOutbox(EventLog(str(tmp_path)), RecordingPublisher())
+    outbox.close(timeout=5)
+    outbox.close(timeout=5)
+    assert outbox.log.pending() == 0
@@ -0,0 +1,212 @@
+import io
+import os
+import functools
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image
+
+import menu_pb2
+from pages import splitter
+from pages.merge import OverlapDeduper
+from pages.pool import PagePool
+from pages.splitter import Page, PageSplitter, render_page
+from scanner_common.ocr.base import OCREngine
+from stand_ins.fake_vision import fake_vision_ocr_engine
+
+ORIENTATION = 0x0112
+
+
+def image_bytes(width: int, height: int, orientation: int = 0, format: str = 'PNG') -> bytes:
+    """An image whose rows encode their own index, so crops can be checked."""
+    image = Image.new('L', (width, height))
+    image.putdata([row % 256 for row in range(height) for _ in range(width)])
+    exif = Image.Exif()
+    if orientation:
+        exif[ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format, exif=exif)
+    return buffer.getvalue()
+
+
+def tiles(height: int, width: int = 10, **kwargs):
+    settings = dict(tile_height=100, tile_overlap=30, min_aspect=2.0, max_pages=50)
+    settings.update(kwargs)
+    return PageSplitter(**settings).split(image_bytes(width, height))
+
+
+def spans(pages):
+    return [(page.top, page.bottom) for page in pages]
+
+
+def test_images_up_to_one_tile_high_are_not_split():
+    assert tiles(100) is None
+    assert tiles(40) is None
+
+
+def test_one_row_over_the_tile_height_makes_a_second_tile():
+    assert spans(tiles(101)) == [(0, 100), (70, 101)]
+
+
+def test_tiles_overlap_and_the_last_one_ends_at_the_bottom():
+    pages = tiles(240)
+
+    assert spans(pages) == [(0, 100), (70, 170), (140, 240)]
+    assert [page.index for page in pages] == [0, 1, 2]
+    assert all(page.kind == 'tile' for page in pages)
+    assert spans(tiles(241)) == [(0, 100), (70, 170), (140, 240), (210, 241)]
+
+
+def test_wide_images_are_not_split():
+    # Tall enough, but less than twice as tall as wide
+    assert tiles(300, width=151) is None
+    assert tiles(300, width=150) is not None
+
+
+def test_the_exif_orientation_decides_what_is_tall():
+    splitter_ = PageSplitter(tile_height=100, tile_overlap=30)
+
+    # Stored 300 wide and 10 high, displayed rotated: 300 high
+    assert spans(splitter_.split(image_bytes(300, 10, orientation=6))) == [
+        (0, 100), (70, 170), (140, 240), (210, 300)
+    ]
+    assert splitter_.split(image_bytes(10, 300, orientation=6)) is None
+
+
+def test_too_many_tiles_are_refused():
+    with pytest.raises(ValueError):
+        tiles(1000, max_pages=5)
+
+
+def test_data_that_is_not_an_image_is_processed_whole():
+    assert PageSplitter().split(b'not an image') is None
+    assert PageSplitter().split(b'') is None
+
+
+def spooled(tmp_path, data: bytes, name: str = 'menu') -> str:
+    path = str(tmp_path / name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def rows_of(jpeg: bytes):
+    image = Image.open(io.BytesIO(jpeg)).convert('L')
+    return image.size, [image.getpixel((image.width // 2, y)) for y in (0, image.height - 1)]
+
+
+def test_render_crops_the_tile_from_the_upright_image(tmp_path):
+    path = spooled(tmp_path, image_bytes(20, 240))
+
+    size, (first, last) = rows_of(render_page(path, Page(1, 'tile', 70, 170), 150))
+
+    assert size == (20, 100)
+    # JPEG is lossy; rows 70 and 169 keep their value roughly
+    assert abs(first - 70) <= 8 and abs(last - 169) <= 8
+
+
+def test_render_decodes_each_image_once(tmp_path, monkeypatch):
+    first_tiles, second_tiles = tiles(240), tiles(300)
+    opened = []
+    original = splitter.Image.open
+    monkeypatch.setattr(splitter.Image, 'open', lambda *args: opened.append(args) or original(*args))
+    first = spooled(tmp_path, image_bytes(20, 240), 'first')
+    second = spooled(tmp_path, image_bytes(20, 300), 'second')
+
+    for page in first_tiles:
+        render_page(first, page, 150)
+    assert len(opened) == 1
+
+    for page in second_tiles:
+        render_page(second, page, 150)
+    assert len(opened) == 2
+
+    # The same path with other contents is decoded again
+    with open(first, 'wb') as f:
+        f.write(image_bytes(20, 260))
+    os.utime(first, ns=(0, 0))
+    rendered = render_page(first, Page(2, 'tile', 160, 260), 150)
+    assert len(opened) == 3
+    assert rows_of(rendered)[0] == (20, 100)
+
+
+def dish(name: str, price: float = 9.5) -> menu_pb2.Dish:
+    return menu_pb2.Dish(name=name, price=menu_pb2.Price(amount=price, currency='USD'))
+
+
+PAGES = [Page(0, 'tile', 0, 100), Page(1, 'tile', 70, 170), Page(2, 'tile', 140, 240)]
+
+
+def names(dishes):
+    return [dish.name for dish in dishes]
+
+
+def test_a_dish_in_the_overlap_is_kept_once_whichever_tile_finishes_first():
+    deduper = OverlapDeduper(PAGES)
+
+    # Tile 1 finishes first; "Pho Bo" ends at row 90 of the image in both tiles
+    assert names(deduper.add(PAGES[1], [dish('Pho Bo'), dish('Bun Cha')], [20, 60])) == ['Pho Bo', 'Bun Cha']
+    assert names(deduper.add(PAGES[0], [dish('Goi Cuon'), dish('PHO  bo')], [40, 90])) == ['Goi Cuon']
+    assert deduper.dropped == 1
+
+
+def test_the_last_tile_is_checked_against_its_upper_neighbour():
+    deduper = OverlapDeduper(PAGES)
+    deduper.add(PAGES[2], [dish('Mi Quang')], [10])
+    deduper.add(PAGES[0], [dish('Pho Bo')], [85])
+
+    # Tile 1 arrives last, sharing one dish with each neighbour
+    assert names(deduper.add(PAGES[1], [dish('Mi Quang'), dish('Banh Mi'), dish('Pho Bo')], [80, 40, 15])) == [
+        'Banh Mi'
+    ]
+
+
+def test_the_same_dish_outside_the_overlap_is_a_second_listing():
+    deduper = OverlapDeduper(PAGES)
+    deduper.add(PAGES[0], [dish('Pho Bo')], [20])
+
+    assert names(deduper.add(PAGES[1], [dish('Pho Bo')], [90])) == ['Pho Bo']
+    # Another price is another dish
+    assert names(deduper.add(PAGES[2], [dish('Pho Bo', 11)], [10])) == ['Pho Bo']
+
+
+def test_dishes_without_positions_count_as_in_the_overlap():
+    deduper = OverlapDeduper(PAGES)
+    deduper.add(PAGES[0], [dish('Pho Bo')], [0])
+
+    assert names(deduper.add(PAGES[1], [dish('Pho Bo')], [0])) == []
+
+
+def test_pdf_pages_are_kept_whole():
+    pages = [Page(0, 'pdf'), Page(1, 'pdf')]
+    deduper = OverlapDeduper(pages)
+    deduper.add(pages[0], [dish('Pho Bo')], [10])
+
+    assert names(deduper.add(pages[1], [dish('Pho Bo')], [10])) == ['Pho Bo']
+
+
+class CrashingOCREngine(OCREngine):
+    """Kills the page worker, as a segfaulting OCR library would."""
+
+    name = 'crashing'
+
+    def _extract(self, image_data, language, timeout=None):
+        os._exit(1)
+
+
+def test_a_dead_worker_restarts_the_pool_for_the_next_menu():
+    pool = PagePool(CrashingOCREngine, workers=1, splitter=PageSplitter(tile_height=100, tile_overlap=30))
+    data = image_bytes(20, 240)
+    options = menu_pb2.ProcessingOptions()
+    try:
+        with pytest.raises(BrokenProcessPool):
+            list(pool.process(data, pool.split(data), options))
+        assert pool.stats()['pool_restarts'] == 1
+
+        pool.ocr_factory = functools.partial(fake_vision_ocr_engine)
+        results = list(pool.process(data, pool.split(data), options))
+        assert sorted(result.page.index for result in results) == [0, 1, 2]
+        assert pool.stats()['pool_restarts'] == 1
+        assert pool.stats()['pages'] == 3
+    finally:
+        pool.close()
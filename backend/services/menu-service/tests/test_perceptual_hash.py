@@ -0,0 +1,140 @@
+import io
+import random
+
+import pytest
+from PIL import Image, ImageDraw, ImageEnhance
+
+import menu_pb2
+from cache import perceptual_hash
+from cache.perceptual_hash import MultiIndexHash, NearDuplicateIndex, dhash, hamming_distance
+
+
+def menu_photo(seed: int, quality: int = 90, brightness: float = 1.0) -> bytes:
+    rng = random.Random(seed)
+    image = Image.new('L', (480, 640), 240)
+    draw = ImageDraw.Draw(image)
+    for row in range(12):
+        y = 30 + row * 50
+        draw.rectangle((30, y, 30 + rng.randint(120, 300), y + 18), fill=rng.randint(0, 80))
+        draw.rectangle((380, y, 440, y + 18), fill=rng.randint(0, 80))
+    image = ImageEnhance.Brightness(image).enhance(brightness)
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def test_dhash_is_stable_across_reencoding_and_lighting():
+    original = dhash(menu_photo(1))
+
+    assert dhash(menu_photo(1)) == original
+    assert hamming_distance(original, dhash(menu_photo(1, quality=55))) <= 4
+    assert hamming_distance(original, dhash(menu_photo(1, brightness=1.15))) <= 4
+    # A different menu is outside the default PHASH_MAX_DISTANCE
+    assert hamming_distance(original, dhash(menu_photo(2))) > 6
+
+
+def test_dhash_of_undecodable_data_is_none():
+    assert dhash(b'not an image') is None
+
+
+def flip(value: int, bits) -> int:
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+@pytest.mark.parametrize('max_distance', [0, 3, 6, 8])
+def test_search_includes_max_distance_and_excludes_beyond(max_distance):
+    index = MultiIndexHash()
+    query = random.Random(max_distance).getrandbits(64)
+    # Flipped bits spread over every chunk, the hardest case for the probe radius
+    spread = [bit * 9 % 64 for bit in range(max_distance + 1)]
+    at_limit = flip(query, spread[:max_distance])
+    beyond = flip(query, spread)
+    index.add(at_limit, 'at-limit')
+    index.add(beyond, 'beyond')
+
+    assert index.search(query, max_distance) == [(max_distance, 'at-limit')]
+
+
+def test_search_matches_brute_force_closest_first():
+    rng = random.Random(3)
+    index = MultiIndexHash()
+    stored = [rng.getrandbits(64) for _ in range(500)]
+    query = stored[0]
+    stored += [flip(query, rng.sample(range(64), distance)) for distance in (1, 2, 5, 6, 7)]
+    for value in stored:
+        index.add(value, value)
+
+    expected = sorted(
+        (hamming_distance(query, value), value) for value in set(stored)
+        if hamming_distance(query, value) <= 6
+    )
+    found = index.search(query, 6)
+    assert sorted(found) == expected
+    assert [distance for distance, _ in found] == sorted(distance for distance, _ in found)
+
+
+def test_removed_hashes_are_not_found():
+    index = MultiIndexHash()
+    index.add(0b1011, 'a')
+    index.add(0b1010, 'b')
+
+    assert index.remove(0b1011)
+    assert not index.remove(0b1011)
+    assert index.search(0b1011, 2) == [(1, 'b')]
+    assert len(index) == 1
+
+
+def test_near_duplicate_index_evicts_least_recently_used():
+    index = NearDuplicateIndex(max_distance=2, max_entries=2)
+    index.add(0b0001 << 40, 'first')
+    index.add(0b0011 << 20, 'second')
+    assert index.find(0b0001 << 40) == 'first'
+    index.add(0b0111, 'third')
+
+    assert index.find(0b0011 << 20) is None
+    assert index.find(0b0001 << 40) == 'first'
+    assert len(index) == 2
+    assert index.stats()['evicted'] == 1
+
+
+def test_near_duplicate_entries_expire_with_the_ocr_cache(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(perceptual_hash.time, 'monotonic', lambda: now[0])
+    index = NearDuplicateIndex(max_distance=2, ttl_seconds=60)
+    index.add(0b1111, 'digest')
+
+    now[0] += 59
+    assert index.find(0b1110) == 'digest'
+    now[0] += 2
+    assert index.find(0b1110) is None
+    assert len(index) == 0
+    assert index.stats()['expired'] == 1
+
+
+def test_near_duplicate_entries_are_kept_per_language():
+    index = NearDuplicateIndex(max_distance=2)
+    index.add(0b1111, 'digest', 'vi')
+
+    assert index.find(0b1111, 'en') is None
+    assert index.find(0b1111, 'vi') == 'digest'
+
+    index.discard('digest', 'vi')
+    assert index.find(0b1111, 'vi') is None
+    assert index.stats()['discarded'] == 1
+
+
+def test_processor_drops_near_duplicates_whose_ocr_left_redis(menu_processor):
+    menu_processor.near_duplicates = NearDuplicateIndex()
+    options = menu_pb2.ProcessingOptions(use_cache=True, extract_prices=True)
+    menu_processor.process_menu(menu_photo(1), '', options)
+    assert len(menu_processor.near_duplicates) == 1
+
+    menu_processor.redis_client.flushall()
+    menu_processor.process_menu(menu_photo(1, quality=60), '', options)
+
+    stats = menu_processor.near_duplicates.stats()
+    assert stats['discarded'] == 1
+    # Replaced by the re-shot photo, whose OCR is cached again
+    assert len(menu_processor.near_duplicates) == 1
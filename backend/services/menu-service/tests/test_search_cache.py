@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import menu_pb2
+from cache.search_cache import AsyncSearchCache, SearchCache
+from stand_ins.memory_redis import AsyncInMemoryRedis, InMemoryRedis
+
+
+def test_invalidations_within_the_interval_share_one_bump():
+    redis = InMemoryRedis()
+    cache = SearchCache(redis)
+    cache.invalidate_interval = 0.05
+    for _ in range(50):
+        cache.invalidate()
+    assert redis.get(SearchCache.GENERATION_KEY) is None
+
+    time.sleep(0.2)
+    assert int(redis.get(SearchCache.GENERATION_KEY)) == 1
+    assert cache.stats()['invalidations'] == 1
+    assert cache.stats()['coalesced'] == 49
+
+
+def test_close_makes_the_pending_bump():
+    redis = InMemoryRedis()
+    cache = SearchCache(redis)
+    cache.invalidate_interval = 60
+    cache.invalidate()
+    cache.close()
+
+    assert int(redis.get(SearchCache.GENERATION_KEY)) == 1
+
+
+def test_cached_search_is_stale_after_the_bump():
+    cache = SearchCache(InMemoryRedis())
+    cache.invalidate_interval = 60
+    request = menu_pb2.SearchRequest(query='pho', limit=10)
+    _, generation = cache.get(request)
+    cache.put(request, menu_pb2.SearchResponse(total_results=1), generation)
+
+    cache.invalidate()
+    assert cache.get(request)[0] is not None
+    cache.close()
+    assert cache.get(request)[0] is None
+
+
+def test_async_invalidations_within_the_interval_share_one_bump():
+    async def run():
+        redis = AsyncInMemoryRedis()
+        cache = AsyncSearchCache(redis)
+        cache.invalidate_interval = 0.05
+        for _ in range(50):
+            await cache.invalidate()
+        await asyncio.sleep(0.2)
+        await cache.close()
+        return await redis.get(SearchCache.GENERATION_KEY), cache.stats()
+
+    generation, stats = asyncio.run(run())
+    assert int(generation) == 1
+    assert stats['coalesced'] == 49
+
+
+def test_a_streamed_menu_bumps_the_generation_once(menu_processor):
+    menu_processor.vision_client.text_annotations = [f"Dish {i} ${i + 5}.99" for i in range(30)]
+    options = menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True)
+    assert len(list(menu_processor.process_menu_stream(b'menu', '', options))) == 30
+    menu_processor.bulk_indexer.close()
+    menu_processor.search_cache.close()
+
+    assert menu_processor.search_cache.stats()['invalidations'] == 1
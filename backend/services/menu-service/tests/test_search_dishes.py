@@ -0,0 +1,50 @@
+import menu_pb2
+
+QUERY = 'pizza pasta salad tiramisu'
+
+
+def indexed_processor(menu_processor):
+    """The fake Vision menu (pizza and pasta mains, a salad, a dessert) indexed,
+    with the search cache off so every search reaches the stand-in."""
+    menu_processor.process_menu(b'menu', '', menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True))
+    menu_processor.search_cache.enabled = False
+    return menu_processor.es_client
+
+
+def test_page_with_facets_and_price_filter_is_one_round_trip(menu_processor):
+    es = indexed_processor(menu_processor)
+    before = es.round_trips
+
+    response = menu_processor.search_dishes(menu_pb2.SearchRequest(
+        query=QUERY, limit=10, price_range=menu_pb2.PriceRange(min=7, max=13)
+    ))
+
+    assert es.round_trips - before == 1
+    assert es.calls['msearch'] == 1
+    assert es.calls.get('search', 0) == 0
+    assert sorted(dish.name for dish in response.dishes) == ['Caesar Salad', 'Margherita Pizza']
+    assert dict(response.metadata.category_counts) == {'main': 1, 'salad': 1}
+    assert sum(bucket.count for bucket in response.metadata.price_histogram) == 2
+
+
+def test_category_and_generic_filters_in_the_same_request(menu_processor):
+    es = indexed_processor(menu_processor)
+    before = es.round_trips
+
+    response = menu_processor.search_dishes(menu_pb2.SearchRequest(
+        query=QUERY, limit=10, categories=['main'], filters=['category:main']
+    ))
+
+    assert es.round_trips - before == 1
+    assert sorted(dish.name for dish in response.dishes) == ['Margherita Pizza', 'Pasta Carbonara']
+    assert dict(response.metadata.category_counts) == {'main': 2}
+
+
+def test_suggestions_come_from_the_same_msearch(menu_processor):
+    es = indexed_processor(menu_processor)
+    before = es.round_trips
+
+    response = menu_processor.search_dishes(menu_pb2.SearchRequest(query='piza', limit=10))
+
+    assert es.round_trips - before == 1
+    assert list(response.metadata.suggested_queries) == ['pizza']
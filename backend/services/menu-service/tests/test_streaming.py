@@ -0,0 +1,51 @@
+import menu_pb2
+from scanner_common.ocr.base import OCRResult
+
+MENU_LINES = [f"Dish {i} - house special ${i % 20 + 5}.99" for i in range(100)]
+
+
+class CountingParser:
+    """Parses OCR text one line at a time with the real parser, counting
+    the lines consumed so far."""
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.lines_read = 0
+
+    def parse(self, result: OCRResult):
+        for line in result.full_text.split('\n'):
+            self.lines_read += 1
+            yield from self.parser.parse(OCRResult(result.engine, line, []))
+
+
+def streaming_processor(menu_processor) -> CountingParser:
+    menu_processor.vision_client.text_annotations = list(MENU_LINES)
+    parser = CountingParser(menu_processor.menu_parser)
+    menu_processor.menu_parser = parser
+    return parser
+
+
+def test_first_dish_arrives_before_the_last_line_is_parsed(menu_processor):
+    parser = streaming_processor(menu_processor)
+    options = menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True)
+    stream = menu_processor.process_menu_stream(b'long menu', '', options)
+
+    first = next(stream)
+    lines_at_first_dish = parser.lines_read
+    rest = list(stream)
+
+    assert first.dish.name.startswith('Dish 0')
+    assert lines_at_first_dish < len(MENU_LINES)
+    assert parser.lines_read == len(MENU_LINES)
+    assert len(rest) + 1 == len(MENU_LINES)
+    assert menu_processor.time_to_first_dish.snapshot()['count'] == 1
+
+
+def test_cancelled_stream_stops_parsing(menu_processor):
+    parser = streaming_processor(menu_processor)
+    options = menu_pb2.ProcessingOptions(use_cache=False, extract_prices=True)
+    active = iter([True, True, False])
+    dishes = list(menu_processor.process_menu_stream(b'long menu', '', options, is_active=lambda: next(active)))
+
+    assert len(dishes) == 2
+    assert parser.lines_read < len(MENU_LINES)
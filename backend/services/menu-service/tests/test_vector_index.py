@@ -0,0 +1,140 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import menu_pb2
+from search.vector_index import DishVectorizer, VectorIndex
+
+NAMES = [
+    'Margherita Pizza', 'Pizza Margherita', 'Pepperoni Pizza', 'Pasta Carbonara', 'Spaghetti Carbonara',
+    'Caesar Salad', 'Chicken Caesar Salad', 'Tiramisu', 'Beef Pho', 'Chicken Pho'
+]
+
+
+def dishes(names=NAMES, prefix='d'):
+    return [menu_pb2.Dish(dish_id=f'{prefix}{i}', name=name) for i, name in enumerate(names)]
+
+
+def index_with(items=None, **kwargs) -> VectorIndex:
+    index = VectorIndex(dim=256, rebuild_rows=kwargs.pop('rebuild_rows', 1000), **kwargs)
+    index.add(items if items is not None else dishes())
+    return index
+
+
+def test_similar_dishes_share_trigrams():
+    index = index_with()
+
+    assert index.similar('d0')[0] == 'd1'
+    assert 'd4' in index.similar('d3')
+    assert 'd0' not in index.similar('d0')
+    assert index.similar('d7') == []
+
+
+def test_an_unindexed_dish_is_vectorized_from_the_dish_given():
+    index = index_with()
+
+    assert index.similar('new', menu_pb2.Dish(name='Margherita Pizza'))[:2] == ['d0', 'd1']
+    assert index.similar('new') == []
+
+
+def test_adding_an_existing_dish_replaces_it():
+    index = index_with()
+    index.add([menu_pb2.Dish(dish_id='d7', name='Beef Pho Tai')])
+
+    assert len(index) == len(NAMES)
+    assert index.similar('d7')[0] == 'd8'
+    assert 'd7' in index.similar('d8')
+
+
+def test_removed_dishes_are_never_returned():
+    index = index_with()
+    index.remove(['d1', 'missing'])
+
+    assert len(index) == len(NAMES) - 1
+    assert 'd1' not in index.similar('d0')
+    assert index.similar('d1') == []
+
+
+def test_rebuild_drops_tombstones_and_keeps_results():
+    index = index_with()
+    index.remove(['d2'])
+    before = {dish_id: index.similar(dish_id) for dish_id in index.rows}
+
+    index.rebuild()
+
+    assert index.stats()['unclustered'] == 0
+    assert len(index.dish_ids) == len(NAMES) - 1
+    assert {dish_id: index.similar(dish_id) for dish_id in index.rows} == before
+
+
+def test_the_tail_triggers_a_rebuild():
+    index = index_with(rebuild_rows=4)
+
+    assert index.stats()['rebuilds'] == 1
+    index.add(dishes(['Hawaiian Pizza'], prefix='x'))
+    assert index.stats()['unclustered'] == 1
+    assert 'x0' in index.similar('d2')
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'similar')
+    index = index_with()
+    index.remove(['d9'])
+    index.save(path)
+
+    loaded = VectorIndex(dim=256, path=path)
+    assert len(loaded) == len(NAMES) - 1
+    assert loaded.vectorizer.doc_count == index.vectorizer.doc_count
+    np.testing.assert_array_equal(loaded.vectorizer.doc_freq, index.vectorizer.doc_freq)
+    for dish_id in index.rows:
+        assert loaded.similar(dish_id) == index.similar(dish_id)
+
+    with pytest.raises(ValueError):
+        VectorIndex(dim=128, path=path)
+
+
+class OverlapRecordingVectorizer(DishVectorizer):
+    """Records how many fits run at once; sleeps to widen any overlap."""
+
+    def __init__(self, dim):
+        super().__init__(dim)
+        self.active = 0
+        self.max_active = 0
+
+    def fit_transform(self, items):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(0.01)
+            return super().fit_transform(items)
+        finally:
+            self.active -= 1
+
+
+def test_concurrent_adds_fit_one_at_a_time():
+    batches = [dishes(NAMES, prefix=f't{thread}-') for thread in range(8)]
+    index = VectorIndex(dim=256, rebuild_rows=100000)
+    index.vectorizer = OverlapRecordingVectorizer(256)
+    expected = DishVectorizer(256)
+    for batch in batches:
+        expected.fit_transform(batch)
+
+    barrier = threading.Barrier(len(batches))
+
+    def add(batch):
+        barrier.wait()
+        index.add(batch)
+
+    threads = [threading.Thread(target=add, args=(batch,)) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # doc_freq and doc_count are read-modify-write, so fits must not overlap
+    assert index.vectorizer.max_active == 1
+    assert index.vectorizer.doc_count == expected.doc_count
+    np.testing.assert_array_equal(index.vectorizer.doc_freq, expected.doc_freq)
+    assert len(index) == 8 * len(NAMES)
@@ -0,0 +1,177 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import menu_pb2
+from scanner_common.ocr.vision_batcher import AsyncVisionBatcher, VisionBatcher
+from scanner_common.ocr.vision_engine import VisionOCREngine
+from stand_ins.fake_vision import AsyncFakeVisionClient, FakeVisionClient
+
+
+def annotate_together(batcher: VisionBatcher, images, **kwargs):
+    """annotate() each image from its own thread, all at once; results or exceptions in order."""
+    barrier = threading.Barrier(len(images))
+
+    def annotate(image):
+        barrier.wait()
+        try:
+            return batcher.annotate(image, **kwargs)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(len(images)) as pool:
+        return list(pool.map(annotate, images))
+
+
+def test_concurrent_callers_share_one_batch():
+    client = FakeVisionClient()
+    batcher = VisionBatcher(client, max_wait=0.1)
+    responses = annotate_together(batcher, [f"menu {i}".encode() for i in range(8)])
+    batcher.close()
+
+    assert all(response.text_annotations for response in responses)
+    assert client.batch_sizes == [8]
+    assert batcher.stats()['batches'] == 1
+
+
+def test_batches_are_cut_at_max_images():
+    client = FakeVisionClient()
+    batcher = VisionBatcher(client, max_batch=4, max_wait=0.1)
+    annotate_together(batcher, [f"menu {i}".encode() for i in range(10)])
+    batcher.close()
+
+    assert sorted(client.batch_sizes) == [2, 4, 4]
+
+
+def test_batches_are_cut_before_max_bytes():
+    # Phone photos: three of these are over the request limit together
+    client = FakeVisionClient(max_request_bytes=10 * 1024 * 1024)
+    batcher = VisionBatcher(client, max_wait=0.1, max_bytes=8 * 1024 * 1024)
+    photos = [bytes([i]) * (3 * 1024 * 1024) for i in range(5)]
+    responses = annotate_together(batcher, photos)
+    batcher.close()
+
+    assert all(not isinstance(response, Exception) for response in responses)
+    assert sorted(client.batch_sizes) == [1, 2, 2]
+
+
+def test_a_bad_image_fails_only_its_own_caller():
+    client = FakeVisionClient(fail_contents={b'corrupt'})
+    engine = VisionOCREngine(client, VisionBatcher(client, max_wait=0.1))
+    barrier = threading.Barrier(3)
+
+    def extract(image):
+        barrier.wait()
+        try:
+            return engine.extract(image)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(3) as pool:
+        good, bad, other = pool.map(extract, [b'menu 1', b'corrupt', b'menu 2'])
+    engine.close()
+
+    assert client.calls == 1
+    assert isinstance(bad, RuntimeError) and 'Bad image data' in str(bad)
+    assert good.full_text and other.full_text
+    assert engine.batcher.stats()['item_errors'] == 1
+
+
+def test_a_tight_deadline_flushes_early():
+    client = FakeVisionClient()
+    batcher = VisionBatcher(client, max_wait=5.0)
+    start = time.monotonic()
+    response = batcher.annotate(b'menu', timeout=0.3)
+    batcher.close()
+
+    assert response.text_annotations
+    assert time.monotonic() - start < 0.3
+    # Vision is told how long the caller can still wait
+    assert 0 < client.timeouts[0] <= 0.3
+
+
+def test_expired_images_are_not_sent():
+    client = FakeVisionClient(latency=0.2)
+    batcher = VisionBatcher(client, max_wait=0.0, max_inflight=1)
+    # The first batch holds the only sender while the second caller's deadline passes
+    first = batcher.submit(b'slow menu', timeout=5)
+    with pytest.raises(TimeoutError):
+        batcher.annotate(b'late menu', timeout=0.05)
+    first.result(timeout=5)
+    batcher.close()
+
+    assert client.images == 1
+
+
+def test_batch_sizes_are_recorded_in_the_histogram():
+    client = FakeVisionClient()
+    batcher = VisionBatcher(client, max_wait=0.1)
+    annotate_together(batcher, [b'a', b'b', b'c', b'd'])
+    annotate_together(batcher, [b'e', b'f'])
+    batcher.close()
+
+    snapshot = batcher.policy.batch_size.snapshot()
+    assert snapshot['count'] == 2
+    assert snapshot['sum'] == 6
+    stats = batcher.stats()
+    assert stats['mean_batch_size'] == 3.0
+    assert stats['batch_size_p99'] >= 4
+
+
+def test_async_callers_share_one_batch_and_keep_their_errors():
+    async def run():
+        client = AsyncFakeVisionClient(fail_contents={b'corrupt'})
+        batcher = AsyncVisionBatcher(client, max_wait=0.05)
+        responses = await asyncio.gather(*[
+            batcher.annotate(image) for image in (b'menu 1', b'corrupt', b'menu 2')
+        ])
+        await batcher.close()
+        return client, responses
+
+    client, responses = asyncio.run(run())
+    assert client.batch_sizes == [3]
+    assert [bool(response.error.message) for response in responses] == [False, True, False]
+
+
+def test_async_batches_are_cut_before_max_bytes():
+    async def run():
+        client = AsyncFakeVisionClient(max_request_bytes=1000)
+        batcher = AsyncVisionBatcher(client, max_wait=0.05, max_bytes=1000)
+        await asyncio.gather(*[batcher.annotate(bytes([i]) * 400) for i in range(5)])
+        await batcher.close()
+        return client
+
+    assert sorted(asyncio.run(run()).batch_sizes) == [1, 2, 2]
+
+
+def test_async_deadline_is_passed_to_vision():
+    async def run():
+        client = AsyncFakeVisionClient()
+        batcher = AsyncVisionBatcher(client, max_wait=5.0)
+        await batcher.annotate(b'menu', timeout=0.5)
+        await batcher.close()
+        return client
+
+    timeouts = asyncio.run(run()).timeouts
+    assert 0 < timeouts[0] <= 0.5
+
+
+def test_servicer_passes_the_rpc_deadline_to_vision(menu_processor):
+    from server import MenuServiceServicer
+
+    class Context:
+        def time_remaining(self):
+            return 2.0
+
+    client = FakeVisionClient()
+    menu_processor.ocr_engine = VisionOCREngine(client, VisionBatcher(client, max_wait=0.0))
+    servicer = MenuServiceServicer(processor=menu_processor)
+    request = menu_pb2.MenuImageRequest(image_data=b'menu', options=menu_pb2.ProcessingOptions(use_cache=False))
+    servicer.ProcessMenuImage(request, Context())
+    menu_processor.ocr_engine.close()
+
+    assert client.calls == 1
+    assert 0 < client.timeouts[0] <= 2.0
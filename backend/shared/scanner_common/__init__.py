@@ -0,0 +1 @@
+"""Code shared by menu-service and image-service."""
@@ -0,0 +1,40 @@
+import os
+import math
+from typing import Optional
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use: the container's cgroup CPU
+    quota when one is set, else the scheduler affinity, else cpu_count.
+
+    os.cpu_count() is the node's core count, far above a pod's CPU limit;
+    sizing worker pools from it starts dozens of processes in a pod
+    limited to one CPU.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+
+def _cgroup_quota(root: str = '/sys/fs/cgroup') -> Optional[float]:
+    # cgroup v2: "<quota> <period>", quota "max" when unlimited
+    try:
+        with open(os.path.join(root, 'cpu.max')) as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    # cgroup v1: quota -1 when unlimited
+    try:
+        with open(os.path.join(root, 'cpu', 'cpu.cfs_quota_us')) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, 'cpu', 'cpu.cfs_period_us')) as f:
+            period = int(f.read())
+        return None if quota <= 0 or period <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import importlib
+import threading
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyUnavailable(RuntimeError):
+    """A required client could not be created."""
+
+
+class LazyClient:
+    """A client created on first use, by whichever thread gets there first.
+
+    The factory imports its library itself, so neither the import nor the
+    connection setup happens at startup unless warm-up asks for it.
+    Attribute access is forwarded to the client, so a LazyClient stands in
+    wherever the client itself would be passed; its own state is private
+    and read through resolve(), created() and import_modules().
+
+    A required client that cannot be created raises DependencyUnavailable on
+    every use (and is retried on the next one). An optional client (Vision,
+    Pub/Sub, whose absence the service falls back from) is tried once;
+    resolve() then returns None, the same as running without credentials.
+
+    ``prepare`` is blocking setup (a credential lookup) whose result the
+    factory is called with. async_resolve() runs it in a worker thread and
+    only the factory on the event loop, for asyncio clients that must be
+    created on the loop they bind to.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[..., object],
+        required: bool = True,
+        modules: Iterable[str] = (),
+        prepare: Optional[Callable[[], object]] = None
+    ):
+        self._name = name
+        self._factory = factory
+        self._required = required
+        self._modules = tuple(modules)
+        self._prepare = prepare
+        self._client = None
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    def _resolve(self, prepared: Optional[Callable[[], object]] = None):
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is None and self._pending():
+                try:
+                    if self._prepare is None:
+                        self._client = self._factory()
+                    else:
+                        self._client = self._factory((prepared or self._prepare)())
+                    self._error = None
+                    logger.info(f"{self._name} client created")
+                except Exception as e:
+                    if self._required:
+                        raise DependencyUnavailable(f"{self._name} client could not be created: {e}") from e
+                    logger.warning(f"{self._name} client not initialized: {e}")
+                    self._error = e
+            return self._client
+
+    def _pending(self) -> bool:
+        """Whether a use should (still) try to create the client."""
+        return self._client is None and (self._required or self._error is None)
+
+    def __getattr__(self, attribute):
+        # Only reached for attributes not set in __init__; private and special
+        # names (copy and pickle probe for those) are not forwarded
+        if attribute.startswith('_'):
+            raise AttributeError(attribute)
+        client = self._resolve()
+        if client is None:
+            raise DependencyUnavailable(f"{self._name} client is not available: {self._error}")
+        return getattr(client, attribute)
+
+    def __repr__(self) -> str:
+        return f"LazyClient({self._name!r}, created={self._client is not None})"
+
+
+def resolve(client):
+    """The client itself, or the one a LazyClient creates (None when an
+    optional client could not be)."""
+    return client._resolve() if isinstance(client, LazyClient) else client
+
+
+async def async_resolve(client):
+    """resolve() from a coroutine: a LazyClient's ``prepare`` step runs in a
+    worker thread, so only creating the client itself runs on the loop."""
+    if not isinstance(client, LazyClient) or client._prepare is None or not client._pending():
+        return resolve(client)
+    try:
+        value = await asyncio.to_thread(client._prepare)
+    except Exception as e:
+        error = e
+
+        def prepared():
+            raise error
+    else:
+        def prepared():
+            return value
+    return client._resolve(prepared)
+
+
+def created(client) -> bool:
+    """False for a LazyClient nothing has used yet (so there is nothing to close)."""
+    return not isinstance(client, LazyClient) or client._client is not None
+
+
+def import_modules(client):
+    """Import a LazyClient's libraries without creating it; warm-up does
+    this off the event loop."""
+    if isinstance(client, LazyClient):
+        for module in client._modules:
+            importlib.import_module(module)
@@ -0,0 +1,161 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from scanner_common.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class TextRegion:
+    """A piece of recognized text with its axis-aligned box and confidence."""
+
+    __slots__ = ('text', 'x', 'y', 'width', 'height', 'confidence')
+
+    def __init__(
+        self,
+        text: str,
+        x: int = 0,
+        y: int = 0,
+        width: int = 0,
+        height: int = 0,
+        confidence: float = 0.0
+    ):
+        self.text = text
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.confidence = confidence
+
+    def to_list(self) -> list:
+        return [self.text, self.x, self.y, self.width, self.height, self.confidence]
+
+    @classmethod
+    def from_list(cls, values: list) -> 'TextRegion':
+        return cls(*values)
+
+
+class OCRResult:
+    """Text recognized in one image.
+
+    ``words`` are individual words; ``blocks`` are larger units (lines for
+    the local engine, layout blocks for Vision).
+    """
+
+    def __init__(
+        self,
+        engine: str,
+        full_text: str,
+        words: List[TextRegion],
+        blocks: Optional[List[TextRegion]] = None,
+        confidence: Optional[float] = None
+    ):
+        self.engine = engine
+        self.full_text = full_text
+        self.words = words
+        self.blocks = blocks or []
+        if confidence is None:
+            confidence = mean_confidence(words)
+        self.confidence = confidence
+        self.latency_ms = 0.0
+
+    def to_annotations(self) -> List[str]:
+        """Vision text_annotations layout: full text first, then each word."""
+        return [self.full_text] + [word.text for word in self.words]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'engine': self.engine,
+            'full_text': self.full_text,
+            'words': [word.to_list() for word in self.words],
+            'blocks': [block.to_list() for block in self.blocks],
+            'confidence': self.confidence
+        }
+
+    @classmethod
+    def from_annotations(cls, annotations: List[str], engine: str = 'vision') -> 'OCRResult':
+        """Build a text-only result from Vision-style annotations (no boxes)."""
+        if not annotations:
+            return cls(engine, '', [], confidence=0.0)
+        full_text = annotations[0]
+        if '\n' not in full_text and len(annotations) > 1:
+            full_text = '\n'.join(annotations[1:])
+        return cls(engine, full_text, [TextRegion(text) for text in annotations[1:]])
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'OCRResult':
+        return cls(
+            engine=data['engine'],
+            full_text=data['full_text'],
+            words=[TextRegion.from_list(word) for word in data['words']],
+            blocks=[TextRegion.from_list(block) for block in data.get('blocks', [])],
+            confidence=data.get('confidence')
+        )
+
+
+def mean_confidence(regions: List[TextRegion]) -> float:
+    """Confidence averaged over regions, weighted by text length."""
+    total = sum(len(region.text) for region in regions)
+    if not total:
+        return 0.0
+    return sum(region.confidence * len(region.text) for region in regions) / total
+
+
+class OCREngine:
+    """Base class for OCR backends.
+
+    Subclasses implement available() and _extract(); extract() adds
+    per-engine latency and error accounting.
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        self.latency = Histogram(
+            f'ocr_{self.name}_latency_ms',
+            f'Latency of the {self.name} OCR engine'
+        )
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'errors': 0}
+
+    def available(self) -> bool:
+        return True
+
+    def extract(self, image_data: bytes, language: str = '', timeout: Optional[float] = None) -> Optional[OCRResult]:
+        """Recognize text in an image; None if the engine is unavailable.
+        ``timeout`` is the caller's remaining deadline in seconds, if any."""
+        if not self.available():
+            return None
+
+        start = time.perf_counter()
+        try:
+            result = self._extract(image_data, language, timeout)
+        except Exception:
+            self._count('errors')
+            raise
+        finally:
+            self._count('calls')
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.latency.observe(elapsed_ms)
+
+        result.latency_ms = elapsed_ms
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['latency_p50_ms'] = self.latency.percentile(50)
+        stats['latency_p99_ms'] = self.latency.percentile(99)
+        return {self.name: stats}
+
+    def close(self):
+        pass
+
+    def _extract(self, image_data: bytes, language: str, timeout: Optional[float] = None) -> OCRResult:
+        raise NotImplementedError
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + amount
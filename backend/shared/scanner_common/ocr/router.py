@@ -0,0 +1,88 @@
+import os
+import time
+import logging
+import threading
+from typing import Optional
+
+from scanner_common.ocr.base import OCREngine, OCRResult
+from scanner_common.ocr.tesseract_engine import TesseractOCREngine
+from scanner_common.ocr.vision_batcher import VisionBatcher
+from scanner_common.ocr.vision_engine import VisionOCREngine
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingOCREngine:
+    """Try a primary (local) engine first, falling back below a confidence threshold."""
+
+    name = 'local_first'
+
+    def __init__(self, primary: OCREngine, fallback: OCREngine, min_confidence: float):
+        self.primary = primary
+        self.fallback = fallback
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._stats = {'primary_accepted': 0, 'fallbacks': 0}
+
+    def available(self) -> bool:
+        return self.primary.available() or self.fallback.available()
+
+    def extract(self, image_data: bytes, language: str = '', timeout: Optional[float] = None) -> Optional[OCRResult]:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        result = None
+        try:
+            result = self.primary.extract(image_data, language, timeout)
+        except Exception as e:
+            logger.warning(f"{self.primary.name} OCR failed: {e}")
+
+        if result is not None and result.words and result.confidence >= self.min_confidence:
+            self._count('primary_accepted')
+            return result
+
+        if not self.fallback.available():
+            return result
+
+        self._count('fallbacks')
+        if result is not None:
+            logger.info(
+                f"{self.primary.name} OCR confidence {result.confidence:.2f} below "
+                f"{self.min_confidence}, using {self.fallback.name}"
+            )
+        # The fallback gets what is left of the caller's deadline
+        remaining = max(deadline - time.monotonic(), 0.0) if deadline is not None else None
+        return self.fallback.extract(image_data, language, remaining)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {self.name: dict(self._stats)}
+        stats.update(self.primary.stats())
+        stats.update(self.fallback.stats())
+        return stats
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+
+def create_ocr_engine(vision_client, in_process: bool = False):
+    """Build the OCR engine selected by OCR_ENGINE (vision, local or local_first);
+    ``in_process`` runs Tesseract in the calling process, not a pool."""
+    mode = os.getenv('OCR_ENGINE', 'vision')
+    batcher = None
+    if vision_client is not None and os.getenv('VISION_BATCH_ENABLED', 'true').lower() == 'true':
+        batcher = VisionBatcher(vision_client)
+    vision = VisionOCREngine(vision_client, batcher)
+    if mode == 'vision':
+        return vision
+
+    local = TesseractOCREngine(in_process=in_process)
+    if not local.available():
+        logger.warning("Local OCR requested but tesseract is not installed")
+    if mode == 'local':
+        return local
+
+    return RoutingOCREngine(local, vision, float(os.getenv('OCR_MIN_CONFIDENCE', 0.8)))
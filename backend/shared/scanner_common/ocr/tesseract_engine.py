@@ -0,0 +1,129 @@
+import io
+import os
+import shutil
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from scanner_common.cpus import available_cpus
+from scanner_common.ocr.base import OCREngine, OCRResult, TextRegion, mean_confidence
+
+try:
+    import pytesseract
+except ImportError:  # optional dependency
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+# ProcessingOptions.language (ISO 639-1) to Tesseract traineddata names
+TESSERACT_LANGUAGES = {
+    'en': 'eng', 'fr': 'fra', 'de': 'deu', 'es': 'spa', 'it': 'ita',
+    'pt': 'por', 'nl': 'nld', 'vi': 'vie', 'zh': 'chi_sim', 'ja': 'jpn',
+    'ko': 'kor', 'th': 'tha'
+}
+
+
+def _run_tesseract(image_data: bytes, language: str, psm: int) -> List[Tuple]:
+    """Worker-process entry point: word tuples from tesseract image_to_data.
+
+    Returns (text, left, top, width, height, confidence, line_key) with
+    confidence in 0-1, so results pickle cheaply back to the parent.
+    """
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_data))).convert('L')
+    data = pytesseract.image_to_data(
+        image,
+        lang=language,
+        config=f'--psm {psm}',
+        output_type=pytesseract.Output.DICT
+    )
+
+    words = []
+    for i, text in enumerate(data['text']):
+        text = text.strip()
+        confidence = float(data['conf'][i])
+        if not text or confidence < 0:
+            continue
+        words.append((
+            text,
+            int(data['left'][i]),
+            int(data['top'][i]),
+            int(data['width'][i]),
+            int(data['height'][i]),
+            confidence / 100.0,
+            (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        ))
+    return words
+
+
+class TesseractOCREngine(OCREngine):
+    """Local CPU OCR with Tesseract, run in a process pool.
+
+    Recognition happens in worker processes, so gRPC worker threads only
+    wait on a future and never hold the GIL during OCR. ``in_process``
+    runs it in the calling process instead, for callers that already are
+    a worker process (PagePool).
+    """
+
+    name = 'local'
+
+    def __init__(self, max_workers: int = None, psm: int = None, in_process: bool = False):
+        super().__init__()
+        self.in_process = in_process
+        self.max_workers = max_workers or int(os.getenv('OCR_LOCAL_WORKERS', available_cpus()))
+        self.psm = psm or int(os.getenv('OCR_TESSERACT_PSM', 4))
+        self.timeout = float(os.getenv('OCR_LOCAL_TIMEOUT', 30))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def available(self) -> bool:
+        return pytesseract is not None and shutil.which('tesseract') is not None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn, not fork: forking a process with live gRPC threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def _extract(self, image_data: bytes, language: str, timeout: Optional[float] = None) -> OCRResult:
+        tesseract_language = TESSERACT_LANGUAGES.get((language or 'en').lower()[:2], 'eng')
+        if self.in_process:
+            return self._to_result(_run_tesseract(image_data, tesseract_language, self.psm))
+        future = self._executor().submit(_run_tesseract, image_data, tesseract_language, self.psm)
+        raw_words = future.result(timeout=self.timeout if timeout is None else min(timeout, self.timeout))
+        return self._to_result(raw_words)
+
+    def _to_result(self, raw_words: List[Tuple]) -> OCRResult:
+        words = []
+        lines = {}
+        for text, x, y, width, height, confidence, line_key in raw_words:
+            word = TextRegion(text, x, y, width, height, confidence)
+            words.append(word)
+            lines.setdefault(line_key, []).append(word)
+
+        blocks = []
+        for line_words in lines.values():
+            left = min(word.x for word in line_words)
+            top = min(word.y for word in line_words)
+            right = max(word.x + word.width for word in line_words)
+            bottom = max(word.y + word.height for word in line_words)
+            blocks.append(TextRegion(
+                ' '.join(word.text for word in line_words),
+                left, top, right - left, bottom - top,
+                confidence=mean_confidence(line_words)
+            ))
+
+        full_text = '\n'.join(block.text for block in blocks)
+        return OCRResult(self.name, full_text, words, blocks)
@@ -0,0 +1,382 @@
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from scanner_common.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# images:annotate accepts at most 16 images per synchronous batch request
+VISION_MAX_BATCH = 16
+# and requests of at most 10 MB; image bytes are kept under this, leaving
+# room for the rest of the request
+VISION_MAX_BATCH_BYTES = 8 * 1024 * 1024
+# Batch round-trip estimate until calls have been timed
+INITIAL_CALL_SECONDS = 0.5
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 12, 16)
+
+
+def _annotate_request(image_data: bytes, language: str):
+    # Imported on first use, not with the module: google.cloud.vision is slow to import
+    from google.cloud import vision
+    return vision.AnnotateImageRequest(
+        image=vision.Image(content=image_data),
+        features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)],
+        image_context=vision.ImageContext(language_hints=[language]) if language else None
+    )
+
+
+class _PendingImage:
+    __slots__ = ('request', 'size', 'deadline', 'future')
+
+    def __init__(self, request, size: int, deadline: float, future):
+        self.request = request
+        self.size = size
+        self.deadline = deadline
+        self.future = future
+
+
+class _BatchPolicy:
+    """Batch limits, latency estimate and counters shared by both batchers."""
+
+    def __init__(
+        self,
+        max_batch: Optional[int],
+        max_wait: Optional[float],
+        timeout: Optional[float],
+        max_bytes: Optional[int] = None
+    ):
+        self.max_batch = min(max_batch or int(os.getenv('VISION_BATCH_MAX_IMAGES', VISION_MAX_BATCH)), VISION_MAX_BATCH)
+        self.max_bytes = max_bytes or int(os.getenv('VISION_BATCH_MAX_BYTES', VISION_MAX_BATCH_BYTES))
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv('VISION_BATCH_MAX_WAIT_MS', 5)) / 1000
+        self.timeout = timeout or float(os.getenv('VISION_BATCH_TIMEOUT', 30))
+        self.batch_size = Histogram(
+            'ocr_vision_batch_size',
+            'Images per Vision batch_annotate_images request',
+            buckets=BATCH_SIZE_BUCKETS
+        )
+        # Moving average of a batch round trip, used to flush early for tight deadlines
+        self.call_seconds = INITIAL_CALL_SECONDS
+        self._lock = threading.Lock()
+        self._stats = {'images': 0, 'batches': 0, 'item_errors': 0, 'batch_errors': 0, 'expired': 0}
+
+    def call_timeout(self, timeout: Optional[float]) -> float:
+        """A caller's timeout (its remaining RPC deadline), capped at VISION_BATCH_TIMEOUT."""
+        return self.timeout if timeout is None else max(min(timeout, self.timeout), 0.0)
+
+    def fits(self, batch_bytes: int, item: _PendingImage) -> bool:
+        """Whether ``item`` can join a non-empty batch of ``batch_bytes``
+        without pushing the request over max_bytes."""
+        return batch_bytes + item.size <= self.max_bytes
+
+    def split(self, items: List[_PendingImage]) -> List[List[_PendingImage]]:
+        """Cut items into batches within both max_batch and max_bytes."""
+        batches = []
+        batch, batch_bytes = [], 0
+        for item in items:
+            if batch and (len(batch) >= self.max_batch or not self.fits(batch_bytes, item)):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(item)
+            batch_bytes += item.size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def flush_at(self, first_arrival: float, pending: List[_PendingImage]) -> float:
+        """When to send: after max_wait, or earlier so the tightest deadline can still be met."""
+        tightest = min(item.deadline for item in pending)
+        return min(first_arrival + self.max_wait, tightest - self.call_seconds)
+
+    def record_call(self, seconds: float, size: int):
+        self.batch_size.observe(size)
+        with self._lock:
+            self.call_seconds = 0.8 * self.call_seconds + 0.2 * seconds
+            self._stats['batches'] += 1
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['mean_batch_size'] = round(stats['images'] / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['batch_size_p50'] = self.batch_size.percentile(50)
+        stats['batch_size_p99'] = self.batch_size.percentile(99)
+        return stats
+
+
+class VisionBatcher:
+    """Coalesces text detection from concurrent requests into batch_annotate_images calls.
+
+    Callers get a Future resolved with their own AnnotateImageResponse; a
+    per-image error only fails that caller, a failed batch call fails the
+    whole batch. A collector thread flushes after ``max_wait`` seconds,
+    once ``max_batch`` images are pending, before an image that would take
+    the request past ``max_bytes``, or earlier when a caller's deadline
+    would otherwise be missed. Batches are sent from a small pool so a
+    slow call does not hold up the next batch.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        vision_client,
+        max_batch: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        max_inflight: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.vision_client = vision_client
+        self.policy = _BatchPolicy(max_batch, max_wait, timeout, max_bytes)
+        self._queue = queue.Queue()
+        self._closed = False
+        self._senders = ThreadPoolExecutor(
+            max_workers=max_inflight or int(os.getenv('VISION_BATCH_MAX_INFLIGHT', 8)),
+            thread_name_prefix='vision-batch'
+        )
+        self._worker = threading.Thread(target=self._run, name='vision-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, image_data: bytes, language: str = '', timeout: Optional[float] = None) -> Future:
+        """Queue one image for text detection; the Future yields its AnnotateImageResponse.
+
+        ``timeout`` is the caller's remaining deadline, if it has one.
+        """
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("Vision batcher is shut down"))
+            return future
+        deadline = time.monotonic() + self.policy.call_timeout(timeout)
+        self._queue.put(_PendingImage(_annotate_request(image_data, language), len(image_data), deadline, future))
+        self.policy.count('images')
+        return future
+
+    def annotate(self, image_data: bytes, language: str = '', timeout: Optional[float] = None):
+        """Blocking form of submit()."""
+        timeout = self.policy.call_timeout(timeout)
+        future = self.submit(image_data, language, timeout)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def close(self, timeout: Optional[float] = None):
+        """Send everything still pending and stop the collector."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._worker.join(timeout)
+        self._senders.shutdown(wait=True)
+        logger.info(f"Vision batcher drained: {self.stats()}")
+
+    def stats(self) -> dict:
+        stats = self.policy.stats()
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _run(self):
+        stopping = False
+        carried = None
+        while not stopping:
+            item = carried if carried is not None else self._queue.get()
+            carried = None
+            if item is self._STOP:
+                break
+
+            batch = [item]
+            batch_bytes = item.size
+            first_arrival = time.monotonic()
+            while len(batch) < self.policy.max_batch:
+                remaining = self.policy.flush_at(first_arrival, batch) - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                if not self.policy.fits(batch_bytes, item):
+                    # Too big for this request: it starts the next batch
+                    carried = item
+                    break
+                batch.append(item)
+                batch_bytes += item.size
+
+            self._senders.submit(self._send, batch)
+
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                leftover.append(item)
+        for batch in self.policy.split(leftover):
+            self._senders.submit(self._send, batch)
+
+    def _send(self, batch: List[_PendingImage]):
+        now = time.monotonic()
+        live = []
+        for item in batch:
+            if item.future.set_running_or_notify_cancel() is False:
+                continue
+            if item.deadline <= now:
+                # The caller has given up; don't spend quota on it
+                item.future.set_exception(TimeoutError("Vision batch deadline exceeded"))
+                self.policy.count('expired')
+            else:
+                live.append(item)
+        if not live:
+            return
+
+        start = time.monotonic()
+        try:
+            result = self.vision_client.batch_annotate_images(
+                requests=[item.request for item in live],
+                timeout=max(item.deadline for item in live) - start
+            )
+        except Exception as e:
+            logger.error(f"Vision batch of {len(live)} failed: {e}")
+            self.policy.count('batch_errors')
+            for item in live:
+                item.future.set_exception(e)
+            return
+        finally:
+            self.policy.record_call(time.monotonic() - start, len(live))
+
+        for item, response in zip(live, result.responses):
+            error = getattr(response, 'error', None)
+            if error is not None and error.message:
+                self.policy.count('item_errors')
+            item.future.set_result(response)
+
+
+class AsyncVisionBatcher:
+    """asyncio counterpart of VisionBatcher for ImageAnnotatorAsyncClient.
+
+    Pending images are flushed by a loop timer instead of a collector
+    thread; each batch call runs as its own task.
+    """
+
+    def __init__(
+        self,
+        vision_client,
+        max_batch: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.vision_client = vision_client
+        self.policy = _BatchPolicy(max_batch, max_wait, timeout, max_bytes)
+        self._pending = []
+        self._pending_bytes = 0
+        self._first_arrival = 0.0
+        self._timer = None
+        self._timer_at = 0.0
+        self._tasks = set()
+
+    async def annotate(self, image_data: bytes, language: str = '', timeout: Optional[float] = None):
+        """Text detection for one image, sent as part of a shared batch;
+        ``timeout`` is the caller's remaining deadline, if it has one."""
+        loop = asyncio.get_running_loop()
+        timeout = self.policy.call_timeout(timeout)
+        future = loop.create_future()
+        item = _PendingImage(_annotate_request(image_data, language), len(image_data), time.monotonic() + timeout, future)
+        if self._pending and not self.policy.fits(self._pending_bytes, item):
+            # Too big to join the pending batch: send that one first
+            self._flush()
+        if not self._pending:
+            self._first_arrival = time.monotonic()
+        self._pending.append(item)
+        self._pending_bytes += item.size
+        self.policy.count('images')
+
+        if len(self._pending) >= self.policy.max_batch:
+            self._flush()
+        else:
+            flush_at = self.policy.flush_at(self._first_arrival, self._pending)
+            if self._timer is None or flush_at < self._timer_at:
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._timer_at = flush_at
+                self._timer = loop.call_later(max(flush_at - time.monotonic(), 0), self._flush)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Drop it from the batch if it has not been sent yet
+            future.cancel()
+            raise
+
+    async def close(self):
+        """Send whatever is pending and wait for in-flight batches."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        stats = self.policy.stats()
+        stats['queued'] = len(self._pending)
+        return stats
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        self._pending_bytes = 0
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[_PendingImage]):
+        now = time.monotonic()
+        live = []
+        for item in batch:
+            if item.future.done():
+                continue
+            if item.deadline <= now:
+                item.future.set_exception(TimeoutError("Vision batch deadline exceeded"))
+                self.policy.count('expired')
+            else:
+                live.append(item)
+        if not live:
+            return
+
+        start = time.monotonic()
+        try:
+            result = await self.vision_client.batch_annotate_images(
+                requests=[item.request for item in live],
+                timeout=max(item.deadline for item in live) - start
+            )
+        except Exception as e:
+            logger.error(f"Vision batch of {len(live)} failed: {e}")
+            self.policy.count('batch_errors')
+            for item in live:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        finally:
+            self.policy.record_call(time.monotonic() - start, len(live))
+
+        for item, response in zip(live, result.responses):
+            error = getattr(response, 'error', None)
+            if error is not None and error.message:
+                self.policy.count('item_errors')
+            if not item.future.done():
+                item.future.set_result(response)
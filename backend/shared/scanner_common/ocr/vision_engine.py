@@ -0,0 +1,100 @@
+import logging
+from typing import List, Optional, Tuple
+
+from scanner_common.lazy_client import resolve
+from scanner_common.ocr.base import OCREngine, OCRResult, TextRegion
+from scanner_common.ocr.vision_batcher import VisionBatcher
+
+logger = logging.getLogger(__name__)
+
+
+def _box(bounding_poly) -> Tuple[int, int, int, int]:
+    vertices = getattr(bounding_poly, 'vertices', None) or []
+    if not vertices:
+        return 0, 0, 0, 0
+    xs = [vertex.x for vertex in vertices]
+    ys = [vertex.y for vertex in vertices]
+    return min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys)
+
+
+def _blocks(full_text_annotation) -> List[TextRegion]:
+    """Layout blocks with their text and confidence from full_text_annotation."""
+    blocks = []
+    for page in getattr(full_text_annotation, 'pages', None) or []:
+        for block in page.blocks:
+            paragraphs = []
+            for paragraph in block.paragraphs:
+                words = [''.join(symbol.text for symbol in word.symbols) for word in paragraph.words]
+                paragraphs.append(' '.join(words))
+            blocks.append(TextRegion(
+                '\n'.join(paragraphs),
+                *_box(block.bounding_box),
+                confidence=block.confidence
+            ))
+    return blocks
+
+
+def result_from_vision_response(response, engine: str = 'vision') -> OCRResult:
+    """Convert a Vision AnnotateImageResponse into an OCRResult."""
+    error = getattr(response, 'error', None)
+    if error is not None and error.message:
+        raise RuntimeError(f"Vision API error: {error.message}")
+
+    annotations = list(response.text_annotations)
+    if not annotations:
+        return OCRResult(engine, '', [], confidence=0.0)
+
+    blocks = _blocks(getattr(response, 'full_text_annotation', None))
+    # text_detection leaves per-word confidence empty; use the page-level
+    # block confidence when Vision provides it
+    page_confidence = (sum(block.confidence for block in blocks) / len(blocks)) if blocks else 0.0
+
+    words = [
+        TextRegion(
+            annotation.description,
+            *_box(getattr(annotation, 'bounding_poly', None)),
+            confidence=page_confidence
+        )
+        for annotation in annotations[1:]
+    ]
+    return OCRResult(engine, annotations[0].description, words, blocks, confidence=page_confidence)
+
+
+class VisionOCREngine(OCREngine):
+    """Google Cloud Vision text detection.
+
+    With a VisionBatcher, concurrent callers share batch_annotate_images
+    requests instead of sending one text_detection call each.
+    """
+
+    name = 'vision'
+
+    def __init__(self, vision_client, batcher: Optional[VisionBatcher] = None):
+        super().__init__()
+        self.vision_client = vision_client
+        self.batcher = batcher
+
+    def available(self) -> bool:
+        # A lazy client is created here, on the first OCR call, unless warm-up got to it first
+        return resolve(self.vision_client) is not None
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        if self.batcher is not None:
+            stats['vision_batch'] = self.batcher.stats()
+        return stats
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+
+    def _extract(self, image_data: bytes, language: str, timeout: Optional[float] = None) -> OCRResult:
+        if self.batcher is not None:
+            return result_from_vision_response(self.batcher.annotate(image_data, language, timeout), self.name)
+        from google.cloud import vision
+        image = vision.Image(content=image_data)
+        image_context = vision.ImageContext(language_hints=[language]) if language else None
+        # Without a caller deadline the client's default timeout applies
+        deadline = {'timeout': timeout} if timeout is not None else {}
+        response = self.vision_client.text_detection(image=image, image_context=image_context, **deadline)
+        return result_from_vision_response(response, self.name)